@@ -22,6 +22,7 @@ import psycopg2.extras
 import json
 from datetime import datetime
 from werkzeug.utils import secure_filename
+from core.db.dashboard_stats import get_dashboard_stats
 
 # Заменим неработающий импорт
 # from admin_panel.context_processors import utility_processor
@@ -144,6 +145,25 @@ def get_db_connection():
         logger.error(f"Error connecting to database: {e}")
         raise
 
+def bump_character_catalog_version(cursor):
+    """
+    Mark the API's cached character catalog as changed; run in the transaction of the edit
+    (same statement as app.services.catalog_service.BUMP_VERSION_SQL)
+    """
+    try:
+        cursor.execute("SAVEPOINT bump_catalog_version")
+        cursor.execute("""
+            INSERT INTO cache_versions (name, version, updated_at)
+            VALUES ('characters', 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (name) DO UPDATE
+            SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+        """)
+        cursor.execute("RELEASE SAVEPOINT bump_catalog_version")
+    except Exception as e:
+        # The API falls back to rebuilding its catalog on every version check
+        cursor.execute("ROLLBACK TO SAVEPOINT bump_catalog_version")
+        logger.error(f"Error bumping character catalog version: {e}")
+
 # Login manager setup
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -186,12 +206,8 @@ app.context_processor(utility_processor)
 def index():
     """Admin panel home page"""
     try:
-        # Get table counts using direct SQL
-        stats = {}
-        for table in ['users', 'characters', 'messages']:
-            query = f"SELECT COUNT(*) FROM {table}"
-            results = execute_query(query)
-            stats[table] = results[0][0] if results else 0
+        # Precomputed table counts, refreshed in the background
+        stats = get_dashboard_stats(engine).totals()
             
         return render_template('index.html', stats=stats)
     except Exception as e:
@@ -243,12 +259,9 @@ def logout():
 def dashboard():
     """Dashboard with system statistics"""
     try:
-        # Get table counts
-        stats = {}
-        for table in ['users', 'characters', 'messages', 'memory_entries']:
-            query = f"SELECT COUNT(*) FROM {table}"
-            results = execute_query(query)
-            stats[table] = results[0][0] if results else 0
+        # Precomputed table counts, refreshed in the background
+        stats = get_dashboard_stats(engine).totals()
+        stats['memories'] = stats['memory_entries']
         
         # Get recent messages using created_at
         query = """
@@ -674,9 +687,8 @@ def memories():
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
             
-            # Get total memory count
-            cursor.execute("SELECT COUNT(*) FROM memory_entries")
-            total_count = cursor.fetchone()[0]
+            # Precomputed total memory count
+            total_count = get_dashboard_stats(engine).totals()['memory_entries']
             
             # Get memories with character names - don't filter by user ID
             cursor.execute("""
@@ -995,6 +1007,7 @@ def edit_character(character_id):
                             flash(f"Failed to save avatar: {str(e)}", "danger")
                 
                 # Commit all changes
+                bump_character_catalog_version(cursor)
                 conn.commit()
                 flash("Персонаж успешно обновлен", "success")
                 return redirect(url_for('characters'))
@@ -1056,6 +1069,7 @@ def add_character():
                     character_id, name, age, gender, background, 
                     json.dumps(personality_traits), json.dumps(interests), datetime.now()
                 ))
+                bump_character_catalog_version(cursor)
                 conn.commit()
             
             flash("Character created successfully", "success")
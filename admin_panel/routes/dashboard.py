@@ -4,8 +4,8 @@ from flask_login import login_required, current_user
 from sqlalchemy import text
 
 from admin_panel.app import db
+from core.db.dashboard_stats import get_dashboard_stats
 from core.utils.db_helpers import (
-    safe_count_query, 
     execute_safe_query, 
     reset_db_connection
 )
@@ -20,12 +20,14 @@ def dashboard():
         # Reset any failed transaction
         reset_db_connection(db)
         
-        # Get table counts using safe method
+        # Precomputed table counts, refreshed in the background
+        totals = get_dashboard_stats(db.engine).totals()
         stats = {
-            "users": safe_count_query(db, "users"),
-            "characters": safe_count_query(db, "characters"),
-            "messages": safe_count_query(db, "messages"),
-            "total_memory_entries": safe_count_query(db, "memory_entries")
+            "users": totals["users"],
+            "characters": totals["characters"],
+            "messages": totals["messages"],
+            "memories": totals["memory_entries"],
+            "total_memory_entries": totals["memory_entries"]
         }
         
         # Get recent messages directly using SQL with created_at instead of timestamp
@@ -4,13 +4,15 @@ Routes for managing character memories in the admin panel.
 from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional
 import uuid
 import json
 from datetime import datetime
 
 from admin_panel.dependencies import templates, get_current_admin_user
 from admin_panel.database import get_db
+from core.db.admin_browse import Page, keyset_page
+from core.db.dashboard_stats import get_dashboard_stats
 from sqlalchemy import text
 import logging
 
@@ -18,68 +20,64 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/memories", tags=["memories"])
 
+# Same columns as memory_entries_view, read from the table so paging and search use its indexes
+MEMORIES_SELECT = """
+    SELECT 
+        m.id, 
+        m.character_id, 
+        m.user_id,
+        c.name as character_name,
+        u.name as user_name,
+        COALESCE(m.memory_type, m.type, 'unknown') as memory_type, 
+        COALESCE(m.category, 'general') as category, 
+        m.content, 
+        m.importance,
+        m.is_active,
+        m.created_at
+    FROM memory_entries m
+    LEFT JOIN characters c ON CAST(c.id AS TEXT) = CAST(m.character_id AS TEXT)
+    LEFT JOIN users u ON CAST(u.user_id AS TEXT) = CAST(m.user_id AS TEXT)
+"""
+
+MEMORIES_PER_PAGE = 50
+
+def memory_page(db: Session, cursor: Optional[str], search: Optional[str],
+                conditions: Optional[List[str]] = None, params: Optional[Dict] = None) -> Page:
+    """One page of memories, newest first; an invalid cursor falls back to the first page"""
+    try:
+        page = keyset_page(db, MEMORIES_SELECT, "memory_entries", conditions=conditions, params=params,
+                           limit=MEMORIES_PER_PAGE, cursor=cursor, search=search)
+    except ValueError:
+        page = keyset_page(db, MEMORIES_SELECT, "memory_entries", conditions=conditions, params=params,
+                           limit=MEMORIES_PER_PAGE, search=search)
+    
+    for memory in page.rows:
+        memory["character_name"] = memory["character_name"] or "Unknown"
+        memory["user_name"] = memory["user_name"] or "Unknown"
+        memory["importance"] = memory["importance"] if memory["importance"] is not None else 5
+        memory["is_active"] = memory["is_active"] if memory["is_active"] is not None else True
+    return page
+
 @router.get("/", response_class=HTMLResponse)
 async def list_memories(
     request: Request,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    """List all memories"""
+    """List all memories, newest first, paged by cursor and searchable by content"""
     try:
-        # Get all characters that have memories
-        characters = db.execute(text("""
-            SELECT DISTINCT c.id, c.name
-            FROM characters c
-            JOIN memory_entries m ON c.id::text = m.character_id::text
-            ORDER BY c.name
-        """)).fetchall()
+        # Memory counts by character, precomputed with one grouped aggregate
+        memory_counts = get_dashboard_stats(db.get_bind()).memory_counts()
         
-        # Get memory counts by character
-        memory_counts = {}
-        for char in characters:
-            char_id = str(char[0])
-            count = db.execute(text("""
-                SELECT COUNT(*) FROM memory_entries
-                WHERE character_id::text = :character_id
-            """), {"character_id": char_id}).scalar()
-            memory_counts[char_id] = count
+        # Characters that have memories
+        characters = [
+            char for char in db.execute(text("SELECT id, name FROM characters ORDER BY name")).fetchall()
+            if str(char[0]) in memory_counts
+        ]
         
-        # Get recent memories using the view for consistency
-        recent_memories = db.execute(text("""
-            SELECT 
-                m.id, 
-                m.character_id, 
-                c.name as character_name,
-                m.memory_type, 
-                m.category, 
-                m.content, 
-                m.importance,
-                m.created_at
-            FROM memory_entries_view m
-            LEFT JOIN characters c ON c.id::text = m.character_id::text  
-            ORDER BY m.created_at DESC
-            LIMIT 20
-        """)).fetchall()
-        
-        # Convert to list of dicts
-        recent_memory_list = []
-        for m in recent_memories:
-            created_at = m[7]
-            if hasattr(created_at, 'strftime'):
-                created_at_str = created_at.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                created_at_str = str(created_at)
-                
-            recent_memory_list.append({
-                "id": m[0],
-                "character_id": m[1],
-                "character_name": m[2] or "Unknown",
-                "memory_type": m[3] or "unknown",
-                "category": m[4] or "general",
-                "content": m[5],
-                "importance": m[6] if m[6] is not None else 5,
-                "created_at": created_at_str
-            })
+        page = memory_page(db, cursor, q)
         
         return templates.TemplateResponse(
             "memories/list.html",
@@ -88,7 +86,11 @@ async def list_memories(
                 "title": "Memories",
                 "characters": characters,
                 "memory_counts": memory_counts,
-                "recent_memories": recent_memory_list
+                "total_count": sum(memory_counts.values()),
+                "memories": page.rows,
+                "recent_memories": page.rows,
+                "next_cursor": page.next_cursor,
+                "search": q or ""
             }
         )
     except Exception as e:
@@ -100,7 +102,10 @@ async def list_memories(
                 "title": "Memories",
                 "characters": [],
                 "memory_counts": {},
+                "memories": [],
                 "recent_memories": [],
+                "next_cursor": None,
+                "search": q or "",
                 "error": str(e)
             }
         )
@@ -109,59 +114,26 @@ async def list_memories(
 async def character_memories(
     request: Request,
     character_id: str,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    """List memories for a specific character"""
+    """List memories for a specific character, newest first, paged by cursor and searchable by content"""
     try:
         # Get character details
         character = db.execute(text("""
             SELECT id, name, age, gender
             FROM characters
-            WHERE id::text = :character_id
+            WHERE CAST(id AS TEXT) = :character_id
         """), {"character_id": character_id}).fetchone()
         
         if not character:
             raise HTTPException(status_code=404, detail="Character not found")
         
-        # Get memories for this character using the view for consistency
-        memories = db.execute(text("""
-            SELECT 
-                m.id, 
-                m.user_id,
-                u.name as user_name,
-                m.memory_type, 
-                m.category, 
-                m.content, 
-                m.importance,
-                m.is_active,
-                m.created_at
-            FROM memory_entries_view m
-            LEFT JOIN users u ON u.user_id::text = m.user_id::text
-            WHERE m.character_id::text = :character_id
-            ORDER BY m.importance DESC, m.created_at DESC
-        """), {"character_id": character_id}).fetchall()
-        
-        # Convert to list of dicts
-        memory_list = []
-        for m in memories:
-            created_at = m[8]
-            if hasattr(created_at, 'strftime'):
-                created_at_str = created_at.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                created_at_str = str(created_at)
-                
-            memory_list.append({
-                "id": m[0],
-                "user_id": m[1],
-                "user_name": m[2] or "Unknown",
-                "memory_type": m[3] or "unknown",
-                "category": m[4] or "general",
-                "content": m[5],
-                "importance": m[6] if m[6] is not None else 5,
-                "is_active": m[7] if m[7] is not None else True,
-                "created_at": created_at_str
-            })
+        page = memory_page(db, cursor, q, conditions=["CAST(m.character_id AS TEXT) = :character_id"],
+                           params={"character_id": character_id})
+        memory_list = page.rows
         
         # Group by type and category
         memories_by_type = {}
@@ -188,9 +160,13 @@ async def character_memories(
                     "gender": character[3]
                 },
                 "memories": memory_list,
-                "memories_by_type": memories_by_type
+                "memories_by_type": memories_by_type,
+                "next_cursor": page.next_cursor,
+                "search": q or ""
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving character memories: {e}")
         return templates.TemplateResponse(
@@ -1,64 +1,63 @@
 import logging
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
-from sqlalchemy import text
 from datetime import datetime
 # Fix import path for login_required - using Flask-Login's standard implementation
 from flask_login import login_required
 # Fix the import path for get_db
 from admin_panel.database import get_db
+from core.db.admin_browse import keyset_page
 
 logger = logging.getLogger(__name__)
 
 messages_bp = Blueprint('messages', __name__)
 
+# Явное приведение типов к тексту: иначе "CASE types uuid and character varying cannot be matched"
+MESSAGES_SELECT = """
+    SELECT 
+        m.id, 
+        m.sender_id, 
+        m.sender_type, 
+        m.recipient_id, 
+        m.recipient_type, 
+        m.content, 
+        m.emotion, 
+        m.created_at,
+        CASE 
+            WHEN m.sender_type = 'user' AND u1.username IS NOT NULL THEN CAST(u1.username AS TEXT)
+            WHEN m.sender_type = 'character' AND c1.name IS NOT NULL THEN CAST(c1.name AS TEXT)
+            ELSE CAST(m.sender_id AS TEXT)
+        END as sender_name,
+        CASE 
+            WHEN m.recipient_type = 'user' AND u2.username IS NOT NULL THEN CAST(u2.username AS TEXT)
+            WHEN m.recipient_type = 'character' AND c2.name IS NOT NULL THEN CAST(c2.name AS TEXT)
+            ELSE CAST(m.recipient_id AS TEXT)
+        END as recipient_name
+    FROM messages m
+    LEFT JOIN users u1 ON CAST(m.sender_id AS TEXT) = CAST(u1.user_id AS TEXT) AND m.sender_type = 'user'
+    LEFT JOIN characters c1 ON CAST(m.sender_id AS TEXT) = CAST(c1.id AS TEXT) AND m.sender_type = 'character'
+    LEFT JOIN users u2 ON CAST(m.recipient_id AS TEXT) = CAST(u2.user_id AS TEXT) AND m.recipient_type = 'user'
+    LEFT JOIN characters c2 ON CAST(m.recipient_id AS TEXT) = CAST(c2.id AS TEXT) AND m.recipient_type = 'character'
+"""
+
 @messages_bp.route('/messages')
 @login_required
 def messages_list():
-    """Отображение списка сообщений с правильным приведением типов"""
+    """Отображение списка сообщений, новые первыми, с постраничным переходом по курсору и поиском"""
+    # Курсор следующей страницы и строка поиска по содержанию
+    cursor = request.args.get('cursor') or None
+    search = request.args.get('q', '').strip()
+    per_page = 100
     try:
-        # Получаем страницу и количество записей на страницу
-        page = request.args.get('page', 1, type=int)
-        per_page = 100
-        
-        # Создаем правильный SQL запрос с явным приведением типов для PostgreSQL
-        # Решение проблемы с CASE types uuid and character varying cannot be matched
-        query = text("""
-            SELECT 
-                m.id, 
-                m.sender_id, 
-                m.sender_type, 
-                m.recipient_id, 
-                m.recipient_type, 
-                m.content, 
-                m.emotion, 
-                m.created_at,
-                CASE 
-                    WHEN m.sender_type = 'user' AND u1.username IS NOT NULL THEN u1.username::text
-                    WHEN m.sender_type = 'character' AND c1.name IS NOT NULL THEN c1.name::text
-                    ELSE m.sender_id::text
-                END as sender_name,
-                CASE 
-                    WHEN m.recipient_type = 'user' AND u2.username IS NOT NULL THEN u2.username::text
-                    WHEN m.recipient_type = 'character' AND c2.name IS NOT NULL THEN c2.name::text
-                    ELSE m.recipient_id::text
-                END as recipient_name
-            FROM messages m
-            LEFT JOIN users u1 ON m.sender_id::text = u1.user_id::text AND m.sender_type = 'user'
-            LEFT JOIN characters c1 ON m.sender_id::text = c1.id::text AND m.sender_type = 'character'
-            LEFT JOIN users u2 ON m.recipient_id::text = u2.user_id::text AND m.recipient_type = 'user'
-            LEFT JOIN characters c2 ON m.recipient_id::text = c2.id::text AND m.recipient_type = 'character'
-            ORDER BY m.created_at DESC
-            LIMIT :limit
-            OFFSET :offset
-        """)
-        
-        # Выполняем запрос
         db = get_db()
-        result = db.execute(query, {"limit": per_page, "offset": (page - 1) * per_page})
-        messages = [dict(row) for row in result]
+        try:
+            page = keyset_page(db, MESSAGES_SELECT, "messages", limit=per_page, cursor=cursor, search=search)
+        except ValueError:
+            flash("Некорректный курсор страницы, показана первая страница", "warning")
+            page = keyset_page(db, MESSAGES_SELECT, "messages", limit=per_page, search=search)
         
-        return render_template('messages/list.html', messages=messages, page=page)
+        return render_template('messages/list.html', messages=page.rows,
+                               next_cursor=page.next_cursor, search=search)
     except Exception as e:
         logger.error(f"Error loading messages: {e}")
         flash(f"Ошибка при загрузке сообщений: {e}", "danger")
-        return render_template('messages/list.html', messages=[])
+        return render_template('messages/list.html', messages=[], next_cursor=None, search=search)
@@ -0,0 +1,46 @@
+"""Index messages and memories for keyset paging and content search in the admin panel
+
+Revision ID: add_admin_search
+Revises: add_dashboard_stats
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+from core.db.admin_browse import SEARCH_TABLES, create_sqlite_fts, drop_sqlite_fts
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_admin_search'
+down_revision: Union[str, None] = 'add_dashboard_stats'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    tables = [t for t in SEARCH_TABLES if t in sa.inspect(conn).get_table_names()]
+    if conn.dialect.name == 'postgresql':
+        # Built without locking writes to the (large) tables
+        with op.get_context().autocommit_block():
+            op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table in tables:
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_created_id '
+                           f'ON {table} (created_at DESC, id DESC)')
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_content_trgm '
+                           f'ON {table} USING gin (content gin_trgm_ops)')
+        return
+
+    for table in tables:
+        op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_created_id ON {table} (created_at DESC, id DESC)')
+        if conn.dialect.name == 'sqlite':
+            create_sqlite_fts(conn, table)
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    for table in SEARCH_TABLES:
+        if conn.dialect.name == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_content_trgm')
+        elif conn.dialect.name == 'sqlite':
+            drop_sqlite_fts(conn, table)
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_created_id')
@@ -0,0 +1,29 @@
+"""Add cache_versions table for versioned read-model caches
+
+Revision ID: add_cache_versions
+Revises: add_memory_content_hash
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_cache_versions'
+down_revision: Union[str, None] = 'add_memory_content_hash'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if 'cache_versions' not in sa.inspect(conn).get_table_names():
+        op.create_table(
+            'cache_versions',
+            sa.Column('name', sa.String(50), primary_key=True),
+            sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now())
+        )
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
@@ -0,0 +1,31 @@
+"""Add dashboard_stats table holding precomputed admin dashboard figures
+
+Revision ID: add_dashboard_stats
+Revises: add_image_variants
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_dashboard_stats'
+down_revision: Union[str, None] = 'add_image_variants'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if 'dashboard_stats' in sa.inspect(conn).get_table_names():
+        return
+    # Filled by the first dashboard load, nothing to backfill
+    op.create_table(
+        'dashboard_stats',
+        sa.Column('name', sa.String(100), primary_key=True),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+
+def downgrade() -> None:
+    op.drop_table('dashboard_stats')
@@ -0,0 +1,41 @@
+"""Add discovery_queue table holding the pre-shuffled discovery feed of each user
+
+Revision ID: add_discovery_queue
+Revises: add_scheduled_events
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_discovery_queue'
+down_revision: Union[str, None] = 'add_scheduled_events'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'discovery_queue' in inspector.get_table_names():
+        columns = {column['name']: column['type'] for column in inspector.get_columns('discovery_queue')}
+        if conn.dialect.name != 'postgresql' or isinstance(columns['character_id'], postgresql.UUID):
+            return
+        # Early string-keyed queues cannot be joined with characters.id; they are rebuilt on demand
+        op.drop_table('discovery_queue')
+    # Queues are built lazily on the first feed request, nothing to backfill
+    op.create_table(
+        'discovery_queue',
+        # Same key types as users.user_id and characters.id, which the feed joins on
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('position', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('character_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index('ix_discovery_queue_user_character', 'discovery_queue', ['user_id', 'character_id'])
+
+def downgrade() -> None:
+    op.drop_index('ix_discovery_queue_user_character', table_name='discovery_queue')
+    op.drop_table('discovery_queue')
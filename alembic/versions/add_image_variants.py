@@ -0,0 +1,35 @@
+"""Record resized image variants of user photos and character avatars
+
+Revision ID: add_image_variants
+Revises: add_match_last_message
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_image_variants'
+down_revision: Union[str, None] = 'add_match_last_message'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (('user_photos', 'variants'), ('characters', 'avatar_variants'))
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    for table, column in COLUMNS:
+        if table not in tables:
+            continue
+        if column not in {c['name'] for c in inspector.get_columns(table)}:
+            # Filled in by the image variant pipeline; existing images keep serving the original
+            op.add_column(table, sa.Column(column, sa.Text(), nullable=True))
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, column in COLUMNS:
+        if table in inspector.get_table_names() and \
+                column in {c['name'] for c in inspector.get_columns(table)}:
+            op.drop_column(table, column)
@@ -0,0 +1,53 @@
+"""Denormalize the last message time and preview onto matches
+
+Revision ID: add_match_last_message
+Revises: add_discovery_queue
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_match_last_message'
+down_revision: Union[str, None] = 'add_discovery_queue'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Messages of the match's pair in either direction
+PAIR_MESSAGES = """
+    FROM messages msg
+    WHERE (CAST(msg.sender_id AS TEXT) = CAST(matches.user_id AS TEXT)
+           AND CAST(msg.recipient_id AS TEXT) = CAST(matches.character_id AS TEXT))
+       OR (CAST(msg.sender_id AS TEXT) = CAST(matches.character_id AS TEXT)
+           AND CAST(msg.recipient_id AS TEXT) = CAST(matches.user_id AS TEXT))
+"""
+
+BACKFILL_SQL = f"""
+    UPDATE matches SET
+        last_message_at = COALESCE((SELECT MAX(msg.created_at) {PAIR_MESSAGES}), created_at, CURRENT_TIMESTAMP),
+        last_message_preview = (SELECT SUBSTR(msg.content, 1, 200) {PAIR_MESSAGES}
+                                ORDER BY msg.created_at DESC LIMIT 1)
+"""
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'matches' not in inspector.get_table_names():
+        return
+    columns = {column['name'] for column in inspector.get_columns('matches')}
+    if 'last_message_at' in columns:
+        return
+    # The default covers new matches: they sort by match time until the first message
+    op.add_column('matches', sa.Column('last_message_at', sa.DateTime(), server_default=sa.func.now()))
+    op.add_column('matches', sa.Column('last_message_preview', sa.String(200)))
+    if 'messages' in inspector.get_table_names():
+        conn.execute(sa.text(BACKFILL_SQL))
+    op.create_index('ix_matches_user_last_message', 'matches',
+                    ['user_id', sa.text('last_message_at DESC'), sa.text('id DESC')])
+
+def downgrade() -> None:
+    op.drop_index('ix_matches_user_last_message', table_name='matches')
+    op.drop_column('matches', 'last_message_preview')
+    op.drop_column('matches', 'last_message_at')
@@ -0,0 +1,51 @@
+"""Add content_hash column and dedup index to memory_entries
+
+Revision ID: add_memory_content_hash
+Revises: merge_heads_add_is_read
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import hashlib
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_memory_content_hash'
+down_revision: Union[str, None] = 'merge_heads_add_is_read'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+def memory_content_hash(content: str) -> str:
+    # Frozen copy of core.db.models.memory_entry.memory_content_hash
+    normalized = " ".join(content.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    columns = [col['name'] for col in sa.inspect(conn).get_columns('memory_entries')]
+    if 'content_hash' not in columns:
+        op.add_column('memory_entries', sa.Column('content_hash', sa.String(64), nullable=True))
+
+    # Backfill existing rows so new batches are deduplicated against them too
+    while True:
+        rows = conn.execute(sa.text(
+            "SELECT id, content FROM memory_entries WHERE content_hash IS NULL LIMIT :limit"
+        ), {"limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE memory_entries SET content_hash = :content_hash WHERE id = :id"),
+            [{"id": row[0], "content_hash": memory_content_hash(row[1] or "")} for row in rows]
+        )
+
+    op.create_index(
+        'ix_memory_entries_pair_hash', 'memory_entries',
+        ['character_id', 'user_id', 'content_hash']
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_memory_entries_pair_hash', table_name='memory_entries')
+    op.drop_column('memory_entries', 'content_hash')
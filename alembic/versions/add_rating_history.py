@@ -0,0 +1,46 @@
+"""Add rating_changes log and rating_daily_rollups for rating trends
+
+Revision ID: add_rating_history
+Revises: add_relationship_stats
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_rating_history'
+down_revision: Union[str, None] = 'add_relationship_stats'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    tables = sa.inspect(conn).get_table_names()
+    if 'rating_changes' not in tables:
+        op.create_table(
+            'rating_changes',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('user_id', sa.String(36), nullable=False),
+            sa.Column('partner_id', sa.String(36), nullable=False),
+            sa.Column('delta', sa.SmallInteger(), nullable=False),
+            sa.Column('score', sa.SmallInteger(), nullable=False),
+            sa.Column('reason', sa.String(100)),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now())
+        )
+        op.create_index('ix_rating_changes_pair_time', 'rating_changes', ['user_id', 'partner_id', 'created_at'])
+    if 'rating_daily_rollups' not in tables:
+        op.create_table(
+            'rating_daily_rollups',
+            sa.Column('user_id', sa.String(36), primary_key=True),
+            sa.Column('partner_id', sa.String(36), primary_key=True),
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('delta_sum', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('changes', sa.Integer(), nullable=False, server_default='0')
+        )
+
+def downgrade() -> None:
+    op.drop_table('rating_daily_rollups')
+    op.drop_index('ix_rating_changes_pair_time', table_name='rating_changes')
+    op.drop_table('rating_changes')
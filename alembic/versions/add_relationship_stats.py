@@ -0,0 +1,53 @@
+"""Add relationship_stats table with per user/character counters
+
+Revision ID: add_relationship_stats
+Revises: add_cache_versions
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_relationship_stats'
+down_revision: Union[str, None] = 'add_cache_versions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of core.db.relationship_stats.REBUILD_SQL at the time of this revision
+BACKFILL_SQL = """
+    INSERT INTO relationship_stats
+        (user_id, character_id, message_count, gift_count, last_interaction_at, updated_at)
+    SELECT
+        CASE WHEN sender_type = 'user' THEN sender_id ELSE recipient_id END,
+        CASE WHEN sender_type = 'user' THEN recipient_id ELSE sender_id END,
+        COUNT(*),
+        SUM(CASE WHEN is_gift AND sender_type = 'user' THEN 1 ELSE 0 END),
+        MAX(created_at),
+        CURRENT_TIMESTAMP
+    FROM messages
+    WHERE (sender_type = 'user' AND recipient_type <> 'user')
+       OR (sender_type <> 'user' AND recipient_type = 'user')
+    GROUP BY 1, 2
+"""
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    tables = sa.inspect(conn).get_table_names()
+    if 'relationship_stats' in tables:
+        return
+    op.create_table(
+        'relationship_stats',
+        sa.Column('user_id', sa.String(36), primary_key=True),
+        sa.Column('character_id', sa.String(36), primary_key=True),
+        sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('gift_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_interaction_at', sa.DateTime(timezone=True)),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    if 'messages' in tables:
+        conn.execute(sa.text(BACKFILL_SQL))
+
+def downgrade() -> None:
+    op.drop_table('relationship_stats')
@@ -0,0 +1,63 @@
+"""Add scheduled_events table with an indexed target_date for the event scheduler
+
+Revision ID: add_scheduled_events
+Revises: add_rating_history
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_scheduled_events'
+down_revision: Union[str, None] = 'add_rating_history'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Databases still on the initial events schema keep the target date inside the schedule JSON
+BACKFILL_SQL = r"""
+    INSERT INTO scheduled_events
+        (event_id, user_id, partner_id, type, status, target_date, schedule, details, created_at)
+    SELECT
+        CAST(event_id AS TEXT), CAST(user_id AS TEXT), CAST(partner_id AS TEXT), type, COALESCE(status, 'pending'),
+        CASE WHEN schedule->>'target_date' ~ '^\d{4}-\d{2}-\d{2}'
+             THEN CAST(schedule->>'target_date' AS TIMESTAMP) END,
+        schedule, details, created_at
+    FROM events
+    WHERE user_id IS NOT NULL AND partner_id IS NOT NULL AND type IS NOT NULL
+"""
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if 'scheduled_events' in tables:
+        return
+    op.create_table(
+        'scheduled_events',
+        sa.Column('event_id', sa.String(36), primary_key=True),
+        sa.Column('user_id', sa.String(36), nullable=False),
+        sa.Column('partner_id', sa.String(36), nullable=False),
+        sa.Column('type', sa.String(32), nullable=False),
+        sa.Column('status', sa.String(32), nullable=False, server_default='pending'),
+        sa.Column('target_date', sa.DateTime(timezone=True)),
+        sa.Column('schedule', sa.JSON()),
+        sa.Column('details', sa.JSON()),
+        sa.Column('activated_at', sa.DateTime(timezone=True)),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.CheckConstraint("status IN ('pending', 'active', 'completed')", name='check_scheduled_event_status')
+    )
+    op.create_index('ix_scheduled_events_pair_status_target', 'scheduled_events',
+                    ['user_id', 'partner_id', 'status', 'target_date'])
+    op.create_index('ix_scheduled_events_status_target', 'scheduled_events', ['status', 'target_date'])
+
+    if 'events' in tables and conn.dialect.name == 'postgresql':
+        columns = {column['name'] for column in inspector.get_columns('events')}
+        if {'event_id', 'partner_id', 'type', 'status', 'schedule', 'details'} <= columns:
+            conn.execute(sa.text(BACKFILL_SQL))
+
+def downgrade() -> None:
+    op.drop_index('ix_scheduled_events_status_target', table_name='scheduled_events')
+    op.drop_index('ix_scheduled_events_pair_status_target', table_name='scheduled_events')
+    op.drop_table('scheduled_events')
@@ -1,14 +1,15 @@
 from typing import List, Optional, Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form, Path, Body, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form, Path, Body, Header, Request, Response
 from pydantic import UUID4
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text  # Add this import for the func reference
+from sqlalchemy import text
 from uuid import UUID, uuid4
 from datetime import datetime, timedelta
 import logging
 import random
 import json
 import os
+import hashlib
 
 from app.db.session import get_db
 from app.auth.jwt import get_current_user, get_current_user_optional
@@ -19,6 +20,10 @@ from core.services.ai_partner import AIPartnerService
 from core.services.user import UserService
 from core.services.gift import GiftService
 from core.models import User, AIPartner, Message
+from core.db.unit_of_work import TurnUnitOfWork
+from core.db.relationship_stats import get_relationship_stats, record_messages, reset_relationship_stats
+from app.services.catalog_service import character_catalog, bump_catalog_version
+from app.services.character_repository import character_repository
 
 from core.ai.gemini import GeminiAI
 
@@ -28,180 +33,63 @@ router = APIRouter()
 
 ai_client = GeminiAI()
 
-def safe_set_attributes(obj, data_dict):
+def etag_response(request: Request, body: bytes, etag: str) -> Response:
     """
-    Safely copy attributes from a dictionary to an object.
-    Only sets attributes that already exist on the object.
+    Serve a serialized JSON body with its ETag, answering 304 if the client copy is current
     """
-    allowed_attrs = vars(obj).keys()
-    for key, value in data_dict.items():
-        if key in allowed_attrs or hasattr(obj, key):
-            setattr(obj, key, value)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
     
-    # Always ensure partner_id is set (it may be used in queries)
-    if hasattr(obj, 'id') and hasattr(obj, 'partner_id'):
-        obj.partner_id = obj.id
-    return obj
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def catalog_response(request: Request, payload: Any) -> Response:
+    """
+    Serialize a catalog payload with an ETag, answering 304 if the client copy is current
+    """
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    return etag_response(request, body, f'W/"{hashlib.sha1(body).hexdigest()}"')
 
 @router.get("/characters", response_model=List[Dict[str, Any]])
 async def get_characters(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ) -> List[Dict[str, Any]]:
     """
     Get a list of available AI characters
-    """
-    # Enhanced debugging for database inspection
-    logger.info("Fetching AI characters from database")
     
+    Served from the precomputed catalog snapshot; clients revalidate with If-None-Match.
+    """
     try:
-        # First, check what tables exist in the database
-        from sqlalchemy import inspect, text
-        inspector = inspect(db.bind)
-        tables = inspector.get_table_names()
-        logger.info(f"Available tables in database: {tables}")
-        
-        # Try to get characters from both potential tables
-        result = []
-        
-        # First try the characters table since admin panel seems to be using it
-        if 'characters' in tables:
-            logger.info("Checking characters table")
-            try:
-                # Check columns in the characters table
-                columns = [col['name'] for col in inspector.get_columns('characters')]
-                logger.info(f"Columns in characters table: {columns}")
-                
-                # Try direct SQL query to count records
-                count = db.execute(text("SELECT COUNT(*) FROM characters")).scalar()
-                logger.info(f"Count of records in characters table: {count}")
-                
-                if count > 0:
-                    # Get character records from characters table
-                    char_rows = db.execute(text("SELECT * FROM characters")).fetchall()
-                    logger.info(f"Found {len(char_rows)} records in characters table")
-                    
-                    for row in char_rows:
-                        row_dict = dict(row)
-                        logger.info(f"Character record: {row_dict}")
-                        
-                        # Create a dictionary with fields from the characters table
-                        char_dict = {
-                            "id": str(row_dict.get('id')),
-                            "name": row_dict.get('name', 'Unknown'),
-                            "age": row_dict.get('age'),
-                            "gender": row_dict.get('gender', 'female'),
-                            "personality_traits": [],
-                            "interests": [],
-                            "background": row_dict.get('background', ''),
-                            "avatar_url": row_dict.get('avatar_url'),
-                            "current_emotion": {
-                                "name": row_dict.get('current_emotion', 'neutral'),
-                                "intensity": 0.5,
-                            }
-                        }
-                        
-                        # Try to parse personality and interests
-                        try:
-                            personality = row_dict.get('personality')
-                            if personality:
-                                if isinstance(personality, str):
-                                    import json
-                                    try:
-                                        char_dict["personality_traits"] = json.loads(personality)
-                                    except json.JSONDecodeError:
-                                        char_dict["personality_traits"] = [personality]
-                        except Exception as e:
-                            logger.error(f"Error parsing personality: {e}")
-                            
-                        try:
-                            interests = row_dict.get('interests')
-                            if interests:
-                                if isinstance(interests, str):
-                                    import json
-                                    try:
-                                        char_dict["interests"] = json.loads(interests)
-                                    except json.JSONDecodeError:
-                                        char_dict["interests"] = [interests]
-                        except Exception as e:
-                            logger.error(f"Error parsing interests: {e}")
-                        
-                        result.append(char_dict)
-            except Exception as e:
-                logger.error(f"Error retrieving from characters table: {e}")
-        
-        # If no characters found, then try ai_partners table as a fallback
-        if not result and 'ai_partners' in tables:
-            logger.info("Checking ai_partners table")
-            try:
-                # Check columns in the ai_partners table
-                columns = [col['name'] for col in inspector.get_columns('ai_partners')]
-                logger.info(f"Columns in ai_partners table: {columns}")
-                
-                # Try direct SQL query to count records
-                count = db.execute(text("SELECT COUNT(*) FROM ai_partners")).scalar()
-                logger.info(f"Count of records in ai_partners table: {count}")
-                
-                if count > 0:
-                    # Get character records from ai_partners table
-                    char_rows = db.execute(text("SELECT * FROM ai_partners")).fetchall()
-                    logger.info(f"Found {len(char_rows)} records in ai_partners table")
-                    
-                    for row in char_rows:
-                        row_dict = dict(row)
-                        logger.info(f"Character record: {row_dict}")
-                        
-                        # Create a dictionary with fields from the ai_partners table
-                        char_dict = {
-                            "id": str(row_dict.get('id')),
-                            "name": row_dict.get('name', 'Unknown'),
-                            "age": row_dict.get('age'),
-                            "gender": row_dict.get('gender', 'female'),
-                            "personality_traits": [],
-                            "interests": [],
-                            "background": row_dict.get('background', ''),
-                            "avatar_url": row_dict.get('avatar_url'),
-                            "current_emotion": {
-                                "name": row_dict.get('current_emotion', 'neutral'),
-                                "intensity": 0.5,
-                            }
-                        }
-                        
-                        # Try to parse personality and interests
-                        try:
-                            personality = row_dict.get('personality')
-                            if personality:
-                                if isinstance(personality, str):
-                                    import json
-                                    try:
-                                        char_dict["personality_traits"] = json.loads(personality)
-                                    except json.JSONDecodeError:
-                                        char_dict["personality_traits"] = [personality]
-                        except Exception as e:
-                            logger.error(f"Error parsing personality: {e}")
-                            
-                        try:
-                            interests = row_dict.get('interests')
-                            if interests:
-                                if isinstance(interests, str):
-                                    import json
-                                    try:
-                                        char_dict["interests"] = json.loads(interests)
-                                    except json.JSONDecodeError:
-                                        char_dict["interests"] = [interests]
-                        except Exception as e:
-                            logger.error(f"Error parsing interests: {e}")
-                        
-                        result.append(char_dict)
-            except Exception as e:
-                logger.error(f"Error retrieving from ai_partners table: {e}")
-        
-        logger.info(f"Found {len(result)} characters in total")
-        return result
+        snapshot = character_catalog.get(db)
+        return etag_response(request, snapshot.body, snapshot.etag)
     except Exception as e:
         logger.exception(f"Error retrieving characters: {e}")
         return []
 
+@router.get("/characters/{character_id}")
+async def get_character(
+    character_id: str,
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Get a single AI character by ID (supports If-None-Match revalidation)
+    
+    Served from the catalog snapshot like the list endpoint.
+    """
+    character = character_catalog.get_character(db, character_id)
+    
+    if not character:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Character not found with ID: {character_id}"
+        )
+    
+    return catalog_response(request, character)
+
 @router.post("/characters/{character_id}/start-chat")
 async def start_chat(
     character_id: UUID,
@@ -211,76 +99,13 @@ async def start_chat(
     """
     Start a new chat with an AI character
     """
-    # Convert UUID to string for compatibility with string columns in database
-    character_id_str = str(character_id)
-    logger.info(f"Looking for character with ID: {character_id_str}")
-    
-    # First try direct SQL to avoid type conversion issues
-    from sqlalchemy import text
-    character = None
-    
-    # Try multiple query variations to find the character
-    try:
-        # Try with direct text comparison
-        query1 = "SELECT * FROM characters WHERE id::text = :id"
-        raw_character = db.execute(text(query1), {"id": character_id_str}).fetchone()
-        
-        if raw_character:
-            logger.info(f"Found character in characters table using query1: {raw_character['name']}")
-            character = AIPartner()
-            character = safe_set_attributes(character, dict(raw_character))
-        else:
-            # Try alternative casting
-            query2 = "SELECT * FROM characters WHERE id = :id::uuid"
-            raw_character = db.execute(text(query2), {"id": character_id_str}).fetchone()
-            
-            if raw_character:
-                logger.info(f"Found character in characters table using query2: {raw_character['name']}")
-                character = AIPartner()
-                character = safe_set_attributes(character, dict(raw_character))
-            else:
-                # Try ai_partners table with explicit UUID cast
-                query3 = "SELECT * FROM ai_partners WHERE id::text = :id"
-                raw_character = db.execute(text(query3), {"id": character_id_str}).fetchone()
-                
-                if raw_character:
-                    logger.info(f"Found character in ai_partners table: {raw_character['name']}")
-                    character = AIPartner()
-                    character = safe_set_attributes(character, dict(raw_character))
-                else:
-                    # One last attempt with raw character ID string in both tables
-                    query4 = f"SELECT * FROM characters WHERE id = '{character_id_str}'"
-                    raw_character = db.execute(text(query4)).fetchone()
-                    
-                    if raw_character:
-                        logger.info(f"Found character using direct string in query: {raw_character['name']}")
-                        character = AIPartner()
-                        character = safe_set_attributes(character, dict(raw_character))
-                    else:
-                        logger.warning(f"Character not found in any table with ID: {character_id_str}")
-    except Exception as e:
-        logger.error(f"Error in SQL queries: {e}")
-        
+    character = character_repository.get(db, character_id)
     if not character:
-        # Log the tables and their contents for debugging
-        try:
-            char_count = db.execute(text("SELECT COUNT(*) FROM characters")).scalar()
-            logger.info(f"Total characters in characters table: {char_count}")
-            
-            if char_count > 0:
-                sample_chars = db.execute(text("SELECT id, name FROM characters LIMIT 5")).fetchall()
-                logger.info(f"Sample characters: {[dict(c) for c in sample_chars]}")
-                
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Character not found with ID: {character_id_str}"
-            )
-        except Exception as e:
-            logger.error(f"Error in debugging queries: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Character not found"
-            )
+        logger.warning(f"Character not found in any table with ID: {character_id}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Character not found with ID: {character_id}"
+        )
     
     # Load any existing memories and format personalized greeting if possible
     greeting = "Привет! Рада познакомиться с тобой. Как твои дела?"
@@ -319,13 +144,8 @@ async def start_chat(
     
     user_id = current_user.user_id if current_user else None
     if user_id:
-        # Ensure partner_id is set correctly
-        sender_id = character.id
-        if hasattr(character, 'partner_id') and character.partner_id:
-            sender_id = character.partner_id
-            
         message = Message(
-            sender_id=sender_id,
+            sender_id=character.partner_id,
             sender_type="character",
             recipient_id=user_id,
             recipient_type="user",
@@ -333,6 +153,7 @@ async def start_chat(
             emotion="happy"
         )
         db.add(message)
+        record_messages(db, [message])
         db.commit()
     return {
         "messages": [
@@ -357,71 +178,14 @@ async def send_message(
     """
     Send a message to an AI character and get a response
     """
-    # Унифицированный подход к поиску персонажа
-    character = None
-    
-    # Сначала ищем в ai_partners таблице
-    character = db.query(AIPartner).filter(AIPartner.id == character_id).first()
-    
-    # Если не нашли, пробуем в characters таблице через SQL
-    if not character:
-        try:
-            raw_character = db.execute(
-                text("SELECT * FROM characters WHERE id = :id"),
-                {"id": str(character_id)}
-            ).fetchone()
-            if raw_character:
-                character = AIPartner()
-                character = safe_set_attributes(character, dict(raw_character))
-        except Exception as e:
-            logger.error(f"Error in fallback query: {e}")
-            
+    character = character_repository.get(db, character_id)
     if not character:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Character not found"
         )
     
-    # Parse personality traits and interests for the character info
-    traits = []
-    interests = []
-    
-    if character.personality_traits:
-        try:
-            if isinstance(character.personality_traits, str):
-                traits = json.loads(character.personality_traits)
-            else:
-                traits = character.personality_traits
-        except (json.JSONDecodeError, TypeError):
-            if isinstance(character.personality_traits, str):
-                traits = [character.personality_traits]
-            else:
-                traits = []
-                
-    if character.interests:
-        try:
-            if isinstance(character.interests, str):
-                interests = json.loads(character.interests)
-            else:
-                interests = character.interests
-        except (json.JSONDecodeError, TypeError):
-            if isinstance(character.interests, str):
-                interests = [character.interests]
-            else:
-                interests = []
-    
-    character_info = {
-        "name": character.name,
-        "age": character.age,
-        "gender": character.gender,
-        "personality_traits": traits,
-        "interests": interests,
-        "background": character.background,
-        "current_emotion": {
-            "name": character.current_emotion or "neutral",
-            "intensity": 0.7
-        }
-    }
+    character_info = character.to_context()
     relationship_info = {
         "stage": "acquaintance",
         "score": 50,
@@ -470,25 +234,15 @@ async def send_message(
         logger.error(f"Error retrieving events: {e}")
         context["events"] = []
 
-    if current_user:
-        user_id = current_user.user_id
-        user_message = Message(
-            sender_id=str(user_id),
-            sender_type="user",
-            recipient_id=str(character.id),  # Используем просто id вместо partner_id
-            recipient_type="character",
-            content=message,
-            emotion="neutral"
-        )
-        db.add(user_message)
-        try:
-            db.commit()
-            logger.info(f"✅ User message saved to database: '{message[:50]}...'")
-        except Exception as e:
-            logger.error(f"❌ Error saving user message: {e}")
-            db.rollback()
+    # All writes of this turn are collected here and committed once
+    turn = TurnUnitOfWork(
+        db,
+        character_id=character.id,
+        user_id=current_user.user_id if current_user else None
+    )
+    turn.add_user_message(message)
 
-    response = ai_client.generate_response(context, message)
+    response = ai_client.generate_response(context, message, unit_of_work=turn)
     is_multi_message = False
     multi_messages = []
     main_text = ""
@@ -507,36 +261,14 @@ async def send_message(
     else:
         main_text = str(response)
         
+    if is_multi_message:
+        for msg in multi_messages:
+            turn.add_character_message(msg.get("text", ""), msg.get("emotion", "neutral"))
+    else:
+        turn.add_character_message(main_text, emotion)
     if current_user:
-        try:
-            if is_multi_message:
-                for i, msg in enumerate(multi_messages):
-                    character_message = Message(
-                        sender_id=str(character.id),  # Используем просто id вместо partner_id
-                        sender_type="character",
-                        recipient_id=str(current_user.user_id),
-                        recipient_type="user",
-                        content=msg.get("text", ""),
-                        emotion=msg.get("emotion", "neutral")
-                    )
-                    db.add(character_message)
-            else:
-                character_message = Message(
-                    sender_id=str(character.id),  # Используем просто id вместо partner_id
-                    sender_type="character",
-                    recipient_id=str(current_user.user_id),
-                    recipient_type="user",
-                    content=main_text,
-                    emotion=emotion
-                )
-                db.add(character_message)
-            if emotion and character:
-                character.current_emotion = emotion
-            db.commit()
-            logger.info(f"✅ AI response saved to messages table: '{main_text[:50]}...'")
-        except Exception as e:
-            logger.error(f"❌ Error saving AI response to database: {e}")
-            db.rollback()
+        turn.set_character_emotion(character, emotion)
+    turn.commit()
     if is_multi_message:
         return {
             "is_multi_message": True,
@@ -560,22 +292,7 @@ async def send_gift(
     """
     Send a gift to the character
     """
-    # Change from partner_id to id to match the characters table
-    character = db.query(AIPartner).filter(AIPartner.id == character_id).first()
-    if not character:
-        # Try raw SQL as fallback
-        from sqlalchemy import text
-        try:
-            raw_character = db.execute(
-                text("SELECT * FROM characters WHERE id = :id"),
-                {"id": str(character_id)}
-            ).fetchone()
-            if raw_character:
-                character = AIPartner()
-                character = safe_set_attributes(character, dict(raw_character))
-        except Exception as e:
-            logger.error(f"Error in fallback query: {e}")
-            
+    character = character_repository.get(db, character_id)
     if not character:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -615,48 +332,8 @@ async def send_gift(
                 "emotion": msg.emotion or "neutral"
             })
     
-    # Parse personality traits and interests for the character info
-    traits = []
-    interests = []
-    
-    if character.personality_traits:
-        try:
-            if isinstance(character.personality_traits, str):
-                traits = json.loads(character.personality_traits)
-            else:
-                traits = character.personality_traits
-        except (json.JSONDecodeError, TypeError):
-            if isinstance(character.personality_traits, str):
-                traits = [character.personality_traits]
-            else:
-                traits = []
-    
-    if character.interests:
-        try:
-            if isinstance(character.interests, str):
-                interests = json.loads(character.interests)
-            else:
-                interests = character.interests
-        except (json.JSONDecodeError, TypeError):
-            if isinstance(character.interests, str):
-                interests = [character.interests]
-            else:
-                interests = []
-    
     # Prepare character context with more detailed information
-    character_info = {
-        "id": str(character_id),
-        "name": character.name,
-        "age": character.age,
-        "gender": character.gender,
-        "personality_traits": traits,
-        "interests": interests,
-        "background": character.background,
-        "current_emotion": {
-            "name": character.current_emotion or "neutral",
-            "intensity": 0.7
-        }
-    }
+    character_info = character.to_context()
     
     # Create gift context with more detailed information to influence the AI's responses
     gift_context = {
@@ -852,62 +529,22 @@ async def send_gift(
             emotion=emotion
         )
         db.add(reaction_message)
+        record_messages(db, [gift_message, reaction_message])
         
         # Update character's emotion
-        if emotion:
-            character.current_emotion = emotion
+        character_repository.update_emotion(db, character, emotion)
             
-        # Add gift event to conversation history for future context
+        # Gift event for the events table and the conversation history
+        gift_event = {
+            "event_type": "gift_received",
+            "gift_id": gift_id,
+            "gift_name": gift["name"],
+            "gift_effect": gift["effect"],
+            "timestamp": datetime.now().isoformat(),
+            "reaction": reaction_text,
+            "emotion": emotion
+        }
         try:
-            from core.db.models.chat_history import ChatHistory
-            
-            # Get next position in chat history
-            max_position = db.query(func.max(ChatHistory.position)).filter(
-                ChatHistory.character_id == character_id,
-                ChatHistory.user_id == current_user.user_id
-            ).scalar() or 0
-            
-            # Create gift event entry with more detailed information
-            gift_event = {
-                "event_type": "gift_received",
-                "gift_id": gift_id,
-                "gift_name": gift["name"],
-                "gift_effect": gift["effect"],
-                "timestamp": datetime.now().isoformat(),
-                "reaction": reaction_text,
-                "emotion": emotion
-            }
-            
-            # Store gift event in chat history
-            gift_history_entry = ChatHistory(
-                id=uuid4(),
-                character_id=character_id,
-                user_id=current_user.user_id,
-                role="system",
-                content=f"Пользователь отправил подарок: {gift['name']}",
-                message_metadata=json.dumps({"gift_event": gift_event}),
-                position=max_position + 1,
-                is_active=True,
-                compressed=False,
-                created_at=datetime.now()
-            )
-            db.add(gift_history_entry)
-            
-            # Store AI response in chat history
-            response_history_entry = ChatHistory(
-                id=uuid4(),
-                character_id=character_id,
-                user_id=current_user.user_id,
-                role="assistant",
-                content=reaction_text,
-                message_metadata=json.dumps({"emotion": emotion, "gift_response": True}),
-                position=max_position + 2,
-                is_active=True,
-                compressed=False,
-                created_at=datetime.now()
-            )
-            db.add(response_history_entry)
-            
             # Also add to events table for broader context
             from core.models import Event
             
@@ -937,9 +574,10 @@ async def send_gift(
                 )
                 db.add(new_event)
         except Exception as e:
-            logger.error(f"Error storing gift in chat history: {e}")
+            logger.error(f"Error storing gift event: {e}")
         
         db.commit()
+        record_gift_history(character_id, current_user.user_id, gift["name"], reaction_text, emotion, gift_event)
         
     return {
         "reaction": {
@@ -956,6 +594,25 @@ async def send_gift(
         "character_name": character.name
     }
 
+def record_gift_history(character_id: Any, user_id: Any, gift_name: str, reaction_text: str,
+                        emotion: str, gift_event: Dict[str, Any]) -> None:
+    """
+    Add the gift and the character's reaction to the conversation history for future context.
+
+    The rows go through the conversation journal like chat turns, so their positions
+    follow the turns still buffered there.
+    """
+    from core.ai.conversation_journal import get_conversation_journal
+
+    try:
+        journal = get_conversation_journal()
+        journal.append(str(character_id), str(user_id), "system",
+                       f"Пользователь отправил подарок: {gift_name}", {"gift_event": gift_event})
+        journal.append(str(character_id), str(user_id), "assistant", reaction_text,
+                       {"emotion": emotion, "gift_response": True})
+    except Exception as e:
+        logger.error(f"Error storing gift in chat history: {e}")
+
 @router.post("/characters/{character_id}/clear-history")
 async def clear_chat_history(
     character_id: UUID,
@@ -965,32 +622,19 @@ async def clear_chat_history(
     """
     Clear chat history with a character
     """
-    # Change from partner_id to id to match the characters table
-    character = db.query(AIPartner).filter(AIPartner.id == character_id).first()
-    if not character:
-        # Try raw SQL as fallback
-        from sqlalchemy import text
-        try:
-            raw_character = db.execute(
-                text("SELECT * FROM characters WHERE id = :id"),
-                {"id": str(character_id)}
-            ).fetchone()
-            if raw_character:
-                character = AIPartner()
-                character = safe_set_attributes(character, dict(raw_character))
-        except Exception as e:
-            logger.error(f"Error in fallback query: {e}")
-            
+    character = character_repository.get(db, character_id)
     if not character:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Character not found"
         )
     
+    user_id = str(current_user.user_id)
     deleted_count = db.query(Message).filter(
-        ((Message.sender_id == character.partner_id) and (Message.recipient_id == current_user.user_id)) or
-        ((Message.sender_id == current_user.user_id) and (Message.recipient_id == character.partner_id))
-    ).delete()
+        ((Message.sender_id == character.partner_id) & (Message.recipient_id == user_id)) |
+        ((Message.sender_id == user_id) & (Message.recipient_id == character.partner_id))
+    ).delete(synchronize_session=False)
+    reset_relationship_stats(db, user_id, character.partner_id)
     db.commit()
     
     try:
@@ -1016,22 +660,7 @@ async def compress_character_chat(
     logger.info(f"Compression request received for character {character_id}")
     
     try:
-        # Change from partner_id to id to match the characters table
-        character = db.query(AIPartner).filter(AIPartner.id == character_id).first()
-        if not character:
-            # Try raw SQL as fallback
-            from sqlalchemy import text
-            try:
-                raw_character = db.execute(
-                    text("SELECT * FROM characters WHERE id = :id"),
-                    {"id": str(character_id)}
-                ).fetchone()
-                if raw_character:
-                    character = AIPartner()
-                    character = safe_set_attributes(character, dict(raw_character))
-            except Exception as e:
-                logger.error(f"Error in fallback query: {e}")
-                
+        character = character_repository.get(db, character_id)
         if not character:
             logger.error(f"Character not found for compression: {character_id}")
             raise HTTPException(
@@ -1095,22 +724,7 @@ async def get_relationship(
     """
     Get relationship status with a character
     """
-    # Change from partner_id to id to match the characters table
-    character = db.query(AIPartner).filter(AIPartner.id == character_id).first()
-    if not character:
-        # Try raw SQL as fallback
-        from sqlalchemy import text
-        try:
-            raw_character = db.execute(
-                text("SELECT * FROM characters WHERE id = :id"),
-                {"id": str(character_id)}
-            ).fetchone()
-            if raw_character:
-                character = AIPartner()
-                character = safe_set_attributes(character, dict(raw_character))
-        except Exception as e:
-            logger.error(f"Error in fallback query: {e}")
-            
+    character = character_repository.get(db, character_id)
     if not character:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1133,15 +747,10 @@ async def get_relationship(
                 "trust": {"percentage": 30, "level": "low"}
             }
         }
-    message_count = db.query(Message).filter(
-        ((Message.sender_id == character.partner_id) and (Message.recipient_id == current_user.user_id)) or
-        ((Message.sender_id == current_user.user_id) and (Message.recipient_id == character.partner_id))
-    ).count()
-    gift_count = db.query(Message).filter(
-        (Message.sender_id == current_user.user_id) and
-        (Message.recipient_id == character.partner_id) and
-        (Message.is_gift == True)
-    ).count()
+    # Counters are maintained with every message insert, so this is a single-row read
+    stats = get_relationship_stats(db, current_user.user_id, character.partner_id)
+    message_count = stats["message_count"]
+    gift_count = stats["gift_count"]
     base_rating = min(50 + message_count * 2 + gift_count * 10, 100)
     status = {"label": "Знакомые", "description": "Вы только начали общаться", "emoji": "👋"}
     if base_rating >= 80:
@@ -1176,6 +785,21 @@ async def get_relationship(
 from app.dependencies import get_current_user_or_api_key, validate_api_key
 from app.schemas.memory import MemorySchema
 
+def is_bot_api_key(x_api_key: Optional[str], authorization: Optional[str]) -> bool:
+    """
+    Check whether a request carries the bot API key in X-API-Key or a Bearer token
+    """
+    bot_api_key = os.getenv("BOT_API_KEY")
+    if not bot_api_key:
+        return False
+    if x_api_key and x_api_key == bot_api_key:
+        return True
+    if authorization:
+        auth_parts = authorization.split()
+        if len(auth_parts) == 2 and auth_parts[0].lower() == "bearer" and auth_parts[1] == bot_api_key:
+            return True
+    return False
+
 @router.get("/characters/{character_id}/memories")
 async def get_character_memories(
     character_id: str,
@@ -1194,24 +818,8 @@ async def get_character_memories(
         user_id: Optional ID of the user. If provided, only memories for this user are returned
         telegram_id: Optional Telegram ID of the user. Used as alternative to user_id
     """
-    # Check API key authentication
-    bot_api_key = os.getenv("BOT_API_KEY")
-    is_authenticated = False
-    
-    # Check if API key provided in X-API-Key header
-    if x_api_key and x_api_key == bot_api_key:
-        is_authenticated = True
-    
-    # Check if API key provided in Authorization header
-    if authorization and not is_authenticated:
-        auth_parts = authorization.split()
-        if len(auth_parts) == 2 and auth_parts[0].lower() == "bearer":
-            token = auth_parts[1]
-            if token == bot_api_key:
-                is_authenticated = True
-    
     # If authentication failed, return 401
-    if not is_authenticated:
+    if not is_bot_api_key(x_api_key, authorization):
         logger.warning(f"Unauthorized access attempt to memories: x_api_key={x_api_key}, auth={authorization}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1573,7 +1181,8 @@ async def get_character_memories(
                 logger.error(f"All memory queries failed: {e3}")
                 return {"memories": [], "count": 0, "error": f"Could not fetch memories: {str(e)}"}
 
-from app.schemas.memory import MemoryCreate, MemoryUpdate
+from app.schemas.memory import MemoryCreate, MemoryUpdate, MemoryBulkCreate, MemoryBulkResult
+from app.services.memory_service import bulk_create_memories, memory_content_hash
 
 @router.post("/characters/{character_id}/memories", response_model=MemorySchema)
 def create_character_memory(
@@ -1601,11 +1210,11 @@ def create_character_memory(
     db.execute(text("""
         INSERT INTO memory_entries (
             id, character_id, user_id,
-            type, memory_type, category, content,
+            type, memory_type, category, content, content_hash,
             importance, is_active, created_at, updated_at
         ) VALUES (
             :id, :character_id, :user_id,
-            :memory_type, :memory_type, :category, :content,
+            :memory_type, :memory_type, :category, :content, :content_hash,
             :importance, TRUE, :created_at, :updated_at
         )
     """), {
@@ -1615,6 +1224,7 @@ def create_character_memory(
         "memory_type": memory.memory_type,
         "category": memory.category,
         "content": memory.content,
+        "content_hash": memory_content_hash(memory.content),
         "importance": memory.importance,
         "created_at": timestamp,
         "updated_at": timestamp
@@ -1635,6 +1245,58 @@ def create_character_memory(
         "created_at": timestamp
     }
 
+@router.post("/characters/{character_id}/memories/bulk", response_model=MemoryBulkResult)
+def create_character_memories_bulk(
+    character_id: str,
+    payload: MemoryBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Store a batch of memories for one user in a single statement
+
+    Memories already stored for the (character, user) pair, or repeated within
+    the batch, are reported as duplicates instead of being inserted again.
+    Requires the bot API key (user_id from the body) or a logged in user.
+    """
+    if is_bot_api_key(x_api_key, authorization):
+        user_id = payload.user_id
+    elif current_user:
+        user_id = str(current_user.id)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    character = None
+    for table in ("characters", "ai_partners"):
+        try:
+            character = db.execute(
+                text(f"SELECT id FROM {table} WHERE CAST(id AS TEXT) = :id"),
+                {"id": character_id}
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Error looking up character {character_id} in {table}: {e}")
+            db.rollback()
+        if character:
+            break
+    
+    if not character:
+        raise HTTPException(status_code=404, detail="Character not found")
+    
+    result = bulk_create_memories(
+        db, character_id, user_id, [memory.model_dump() for memory in payload.memories]
+    )
+    logger.info(
+        f"Stored {result['created']} of {len(payload.memories)} memories for character "
+        f"{character_id} and user {result['user_id']} ({result['duplicates']} duplicates)"
+    )
+    return result
+
 @router.post("/generate-character")
 async def generate_character(
     prompt: str,
@@ -1685,8 +1347,10 @@ async def generate_character(
         current_emotion="happy"
     )
     db.add(character)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(character)
+    character_catalog.invalidate()
     
     return {
         "id": str(character.partner_id),
@@ -3,25 +3,27 @@ Debug endpoints for development and testing purposes.
 These endpoints should be disabled in production.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse
 from pydantic import UUID4
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from uuid import UUID
 import os
-from pathlib import Path
 import json
+from datetime import datetime
+from html import escape
+from urllib.parse import quote
 
 from app.db.session import get_db
 from app.auth.jwt import get_current_user, get_current_user_optional
 from core.models import User
-from core.utils.conversation_logger import get_recent_conversations
+from core.utils.conversation_logger import LOGS_DIR, get_recent_conversations, log_catalog
 
 router = APIRouter()
 
 @router.get("/conversations/{character_id}")
-async def get_character_conversations(
+def get_character_conversations(
     character_id: UUID,
     limit: int = 10,
     db: Session = Depends(get_db),
@@ -51,61 +53,45 @@ async def get_character_conversations(
     return logs
 
 @router.get("/logs-status")
-async def logs_status(
+def logs_status(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: Optional[User] = Depends(get_current_user_optional)
 ) -> Dict[str, Any]:
     """
     Get status of conversation logging.
     
+    Args:
+        limit: Character directories per page
+        cursor: next_cursor of the previous page
+        
     Returns:
         Status information
     """
     try:
-        from pathlib import Path
-        
-        # Get log directory
-        log_dir = Path("logs/conversations")
-        
-        # Check if directory exists
-        exists = log_dir.exists()
-        
-        # Count files and directories
-        character_dirs = []
-        total_files = 0
+        log_catalog.ensure_synced()
+        totals = log_catalog.totals()
+        page = log_catalog.characters(limit=limit, cursor=cursor)
         
-        if exists:
-            # Get all character directories
-            for char_dir in log_dir.iterdir():
-                if char_dir.is_dir():
-                    # Count files in this directory
-                    files = list(char_dir.glob("*.json"))
-                    file_count = len(files)
-                    
-                    # Get most recent file
-                    most_recent = None
-                    if files:
-                        most_recent = max(files, key=lambda x: x.stat().st_mtime)
-                        most_recent = {
-                            "path": str(most_recent),
-                            "timestamp": most_recent.stat().st_mtime
-                        }
-                    
-                    # Add to character directories
-                    character_dirs.append({
-                        "character_id": char_dir.name,
-                        "file_count": file_count,
-                        "most_recent": most_recent
-                    })
-                    
-                    total_files += file_count
+        character_dirs = [
+            {
+                "character_id": row["character_id"],
+                "file_count": row["file_count"],
+                "total_size": row["total_size"],
+                "most_recent": {"timestamp": row["last_timestamp"]}
+            }
+            for row in page.rows
+        ]
         
         return {
             "logs_enabled": True,
-            "logs_directory": str(log_dir),
-            "logs_directory_exists": exists,
-            "character_count": len(character_dirs),
-            "total_log_files": total_files,
-            "character_directories": character_dirs
+            "logs_directory": str(LOGS_DIR),
+            "logs_directory_exists": LOGS_DIR.exists(),
+            "character_count": totals["character_count"],
+            "total_log_files": totals["total_log_files"],
+            "total_size": totals["total_size"],
+            "character_directories": character_dirs,
+            "next_cursor": page.next_cursor
         }
     except Exception as e:
         return {
@@ -113,6 +99,43 @@ async def logs_status(
             "error": str(e)
         }
 
+@router.post("/logs-sync")
+def sync_logs_catalog(
+    current_user: Optional[User] = Depends(get_current_user_optional)
+) -> Dict[str, Any]:
+    """
+    Reconcile the log catalog with the log files on disk.
+    
+    Returns:
+        Numbers of files added to and removed from the catalog
+    """
+    # Check if user is admin
+    if not current_user or not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access debug data"
+        )
+    return log_catalog.sync()
+
+@router.get("/journal-metrics")
+async def journal_metrics(
+    current_user: Optional[User] = Depends(get_current_user_optional)
+) -> Dict[str, Any]:
+    """
+    Get counters and flush latency of the conversation journal.
+    
+    Returns:
+        Journal metrics
+    """
+    # Check if user is admin
+    if not current_user or not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access debug data"
+        )
+    from core.ai.conversation_journal import get_conversation_journal
+    return get_conversation_journal().get_metrics()
+
 @router.post("/clear-messages")
 async def clear_all_messages(
     character_id: Optional[str] = None,
@@ -348,14 +371,15 @@ async def clear_messages_ui():
     return HTMLResponse(content=html_content)
 
 @router.get("/chat-logs", response_class=HTMLResponse)
-async def view_chat_logs_ui():
+def view_chat_logs_ui(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
     """
     User-friendly interface to browse chat logs
     """
-    logs_dir = Path("logs/conversations")
-    
     # Check if directory exists
-    if not logs_dir.exists():
+    if not LOGS_DIR.exists():
         return HTMLResponse(content="""
         <html>
             <head><title>Chat Logs</title></head>
@@ -366,10 +390,14 @@ async def view_chat_logs_ui():
         </html>
         """)
     
-    # Get all character directories
-    character_dirs = [d for d in logs_dir.iterdir() if d.is_dir()]
+    # One page of characters from the log catalog, most recently active first
+    log_catalog.ensure_synced()
+    try:
+        page = log_catalog.characters(limit=limit, cursor=cursor)
+    except ValueError:
+        return HTMLResponse(status_code=400, content="<h1>Invalid page cursor</h1>")
     
-    if not character_dirs:
+    if not page.rows and not cursor:
         return HTMLResponse(content="""
         <html>
             <head><title>Chat Logs</title></head>
@@ -380,33 +408,14 @@ async def view_chat_logs_ui():
         </html>
         """)
     
-    # Count files for each character and get the most recent file
-    characters = []
-    for char_dir in character_dirs:
-        files = list(char_dir.glob("*.json"))
-        if files:
-            most_recent = max(files, key=lambda x: x.stat().st_mtime)
-            
-            # Try to get character name from any log file
-            character_name = char_dir.name  # Default to directory name
-            try:
-                with open(most_recent, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    ai_response = data.get('ai_response', {}).get('processed', {})
-                    if isinstance(ai_response, dict) and 'text' in ai_response:
-                        character_name = f"Character {char_dir.name}"
-            except:
-                pass
-                
-            characters.append({
-                "id": char_dir.name,
-                "name": character_name,
-                "file_count": len(files),
-                "most_recent": most_recent.stat().st_mtime
-            })
-    
+    return StreamingResponse(_render_chat_logs(page, limit), media_type="text/html")
+
+def _render_chat_logs(page, limit: int):
+    """
+    Chunks of the character list page
+    """
     # HTML content with basic styling
-    html_content = """
+    yield """
     <!DOCTYPE html>
     <html>
     <head>
@@ -504,49 +513,66 @@ async def view_chat_logs_ui():
     """
     
     # Add characters to the list
-    for character in sorted(characters, key=lambda x: x["most_recent"], reverse=True):
-        import datetime
-        most_recent_date = datetime.datetime.fromtimestamp(character["most_recent"]).strftime("%Y-%m-%d %H:%M:%S")
+    for character in page.rows:
+        most_recent_date = datetime.fromtimestamp(character["last_timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        character_id = escape(character["character_id"])
         
-        html_content += f"""
+        yield f"""
         <li class="character-item">
-            <h2>{character["name"]}</h2>
+            <h2>Character {character_id}</h2>
             <div class="file-count">{character["file_count"]} conversation logs</div>
             <div>Last activity: {most_recent_date}</div>
-            <a href="/api/v1/debug/character-logs/{character["id"]}" class="view-button">View Logs</a>
+            <a href="/api/v1/debug/character-logs/{quote(character["character_id"])}" class="view-button">View Logs</a>
         </li>
         """
     
-    html_content += """
+    yield """
             </ul>
+    """
+    
+    if page.next_cursor:
+        yield f"""
+            <a href="/api/v1/debug/chat-logs?limit={limit}&cursor={quote(page.next_cursor)}" class="view-button">Next page →</a>
+        """
+    
+    yield """
         </div>
     </body>
     </html>
     """
-    
-    return HTMLResponse(content=html_content)
 
 @router.get("/character-logs/{character_id}", response_class=HTMLResponse)
-async def view_character_logs(character_id: str):
+def view_character_logs(
+    character_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
     """
     View logs for a specific character
     """
-    logs_dir = Path("logs/conversations") / character_id
-    
-    if not logs_dir.exists():
-        return HTMLResponse(content=f"<h1>No logs found for character {character_id}</h1>")
+    log_catalog.ensure_synced()
+    summary = log_catalog.character(character_id)
     
-    # Get all JSON log files
-    log_files = list(logs_dir.glob("*.json"))
+    if summary is None:
+        return HTMLResponse(content=f"<h1>No log files found for character {escape(character_id)}</h1>")
     
-    if not log_files:
-        return HTMLResponse(content=f"<h1>No log files found for character {character_id}</h1>")
-    
-    # Sort by modification time (newest first)
-    log_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+    # One page of log summaries from the catalog, newest first; no log file is opened
+    try:
+        page = log_catalog.logs(character_id, limit=limit, cursor=cursor)
+    except ValueError:
+        return HTMLResponse(status_code=400, content="<h1>Invalid page cursor</h1>")
     
+    return StreamingResponse(
+        _render_character_logs(escape(character_id), summary["file_count"], page, limit),
+        media_type="text/html"
+    )
+
+def _render_character_logs(character_id: str, total: int, page, limit: int):
+    """
+    Chunks of the log list page of a character
+    """
     # Generate HTML content
-    html_content = f"""
+    yield f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -619,381 +645,357 @@ async def view_character_logs(character_id: str):
             
             <h1>Chat Logs for Character {character_id}</h1>
             
-            <p>Total logs: {len(log_files)}</p>
+            <p>Total logs: {total}</p>
             
             <ul class="log-list">
     """
     
     # Add each log file to the list
-    for log_file in log_files:
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-            datetime_str = data.get("datetime", "Unknown date")
-            user_message = data.get("user_message", "")
-            ai_response = data.get("ai_response", {}).get("processed", {})
-            
-            if isinstance(ai_response, dict) and "text" in ai_response:
-                ai_text = ai_response["text"]
-            else:
-                ai_text = str(ai_response)
-            
-            # Truncate messages if too long
-            if len(user_message) > 100:
-                user_message = user_message[:100] + "..."
-                
-            if len(ai_text) > 100:
-                ai_text = ai_text[:100] + "..."
-                
-            html_content += f"""
-            <li class="log-item">
-                <div class="log-date">{datetime_str}</div>
-                <div><strong>User:</strong> {user_message}</div>
-                <div><strong>AI:</strong> {ai_text}</div>
-                <a href="/api/v1/debug/view-log/{character_id}/{log_file.name}" class="view-button">View Full Log</a>
-                <a href="/api/v1/debug/raw-log/{character_id}/{log_file.name}" class="view-button">Raw JSON</a>
-            </li>
-            """
-        except Exception as e:
-            html_content += f"""
-            <li class="log-item">
-                <div class="log-date">Error reading file {log_file.name}</div>
-                <div><strong>Error:</strong> {str(e)}</div>
-            </li>
-            """
-    
-    html_content += """
+    for entry in page.rows:
+        name = quote(entry["name"])
+        
+        yield f"""
+        <li class="log-item">
+            <div class="log-date">{escape(entry["datetime"] or "Unknown date")}</div>
+            <div><strong>User:</strong> {escape(entry["user_preview"] or "")}</div>
+            <div><strong>AI:</strong> {escape(entry["ai_preview"] or "")}</div>
+            <a href="/api/v1/debug/view-log/{character_id}/{name}" class="view-button">View Full Log</a>
+            <a href="/api/v1/debug/raw-log/{character_id}/{name}" class="view-button">Raw JSON</a>
+        </li>
+        """
+    
+    yield """
             </ul>
+    """
+    
+    if page.next_cursor:
+        yield f"""
+            <a href="/api/v1/debug/character-logs/{character_id}?limit={limit}&cursor={quote(page.next_cursor)}" class="view-button">Next page →</a>
+        """
+    
+    yield """
         </div>
     </body>
     </html>
     """
-    
-    return HTMLResponse(content=html_content)
 
 @router.get("/view-log/{character_id}/{log_file}", response_class=HTMLResponse)
-async def view_log_content(character_id: str, log_file: str):
+def view_log_content(character_id: str, log_file: str):
     """
     View the content of a specific log file
     """
-    file_path = Path("logs/conversations") / character_id / log_file
+    entry = log_catalog.get(character_id, log_file)
     
-    if not file_path.exists():
-        return HTMLResponse(content=f"<h1>Log file not found</h1>")
+    if entry is None:
+        return HTMLResponse(status_code=404, content=f"<h1>Log file not found</h1>")
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with open(log_catalog.file_path(entry), 'r', encoding='utf-8') as f:
             data = json.load(f)
-        
-        datetime_str = data.get("datetime", "Unknown date")
-        user_message = data.get("user_message", "")
-        
-        # Get raw and processed responses
-        ai_response_raw = data.get("ai_response", {}).get("raw", "")
-        ai_response_processed = data.get("ai_response", {}).get("processed", {})
-        
-        if isinstance(ai_response_processed, dict) and "text" in ai_response_processed:
-            ai_text = ai_response_processed["text"]
-            emotion = ai_response_processed.get("emotion", "Unknown")
-            relationship_changes = ai_response_processed.get("relationship_changes", {})
-        else:
-            ai_text = str(ai_response_processed)
-            emotion = "Unknown"
-            relationship_changes = {}
-        
-        # HTML content with styled components
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Conversation Log Details</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 0;
-                    padding: 20px;
-                    line-height: 1.6;
-                    background-color: #f5f5f5;
-                }}
-                .container {{
-                    max-width: 900px;
-                    margin: 0 auto;
-                    background-color: white;
-                    padding: 20px;
-                    border-radius: 5px;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                }}
-                h1 {{
-                    color: #333;
-                    border-bottom: 1px solid #eee;
-                    padding-bottom: 10px;
-                }}
-                .back-button {{
-                    display: inline-block;
-                    background-color: #607d8b;
-                    color: white;
-                    padding: 8px 16px;
-                    text-decoration: none;
-                    border-radius: 4px;
-                    margin-bottom: 20px;
-                }}
-                .back-button:hover {{
-                    background-color: #546e7a;
-                }}
-                .date {{
-                    color: #666;
-                    font-style: italic;
-                    margin-bottom: 20px;
-                }}
-                .message-container {{
-                    margin-bottom: 30px;
-                }}
-                .message-header {{
-                    font-weight: bold;
-                    margin-bottom: 5px;
-                }}
-                .user-message {{
-                    background-color: #e3f2fd;
-                    padding: 15px;
-                    border-radius: 5px;
-                    white-space: pre-wrap;
-                }}
-                .ai-message {{
-                    background-color: #f1f8e9;
-                    padding: 15px;
-                    border-radius: 5px;
-                    white-space: pre-wrap;
-                }}
-                .raw-response {{
-                    background-color: #f5f5f5;
-                    padding: 15px;
-                    border: 1px solid #ddd;
-                    border-radius: 5px;
-                    white-space: pre-wrap;
-                    font-family: monospace;
-                    margin-top: 10px;
-                    font-size: 0.9em;
-                    overflow-x: auto;
-                }}
-                .metadata {{
-                    margin-top: 10px;
-                    padding: 10px;
-                    background-color: #fafafa;
-                    border-radius: 5px;
-                }}
-                .metadata-item {{
-                    margin-bottom: 5px;
-                }}
-                .tab-buttons {{
-                    display: flex;
-                    margin-bottom: 10px;
-                }}
-                .tab-button {{
-                    padding: 8px 16px;
-                    background-color: #f0f0f0;
-                    border: 1px solid #ddd;
-                    cursor: pointer;
-                    margin-right: 5px;
-                }}
-                .tab-button.active {{
-                    background-color: #fff;
-                    border-bottom: 1px solid #fff;
-                }}
-                .tab-content {{
-                    display: none;
-                    padding: 15px;
-                    border: 1px solid #ddd;
-                    border-radius: 0 0 5px 5px;
-                }}
-                .tab-content.active {{
-                    display: block;
-                }}
-                .memory-box {{
-                    background-color: #fff8e1;
-                    padding: 15px;
-                    border-radius: 5px;
-                    margin-top: 10px;
-                }}
-                .memory-item {{
-                    margin-bottom: 5px;
-                }}
-            </style>
-            <script>
-                function showTab(tabId) {{
-                    // Hide all tabs
-                    document.querySelectorAll('.tab-content').forEach(tab => {{
-                        tab.classList.remove('active');
-                    }});
-                    
-                    // Remove active class from all buttons
-                    document.querySelectorAll('.tab-button').forEach(button => {{
-                        button.classList.remove('active');
-                    }});
-                    
-                    // Show the selected tab
-                    document.getElementById(tabId).classList.add('active');
-                    
-                    // Add active class to the clicked button
-                    document.querySelector(`[onclick="showTab('${{tabId}}')"]`).classList.add('active');
-                }}
-            </script>
-        </head>
-        <body>
-            <div class="container">
-                <a href="/api/v1/debug/character-logs/{character_id}" class="back-button">← Back to Logs</a>
-                
-                <h1>Conversation Log Details</h1>
-                
-                <div class="date">Timestamp: {datetime_str}</div>
-                
-                <div class="message-container">
-                    <div class="message-header">User Message:</div>
-                    <div class="user-message">{user_message}</div>
+    except Exception as e:
+        return HTMLResponse(content=f"""
+        <h1>Error reading log file</h1>
+        <p>An error occurred while processing the log file: {escape(str(e))}</p>
+        <a href="/api/v1/debug/character-logs/{quote(character_id)}">Back to logs</a>
+        """)
+    
+    return StreamingResponse(_render_log_content(quote(character_id), data), media_type="text/html")
+
+def _render_log_content(character_id: str, data: Dict[str, Any]):
+    """
+    Chunks of the log details page
+    """
+    datetime_str = data.get("datetime", "Unknown date")
+    user_message = escape(data.get("user_message", ""))
+    
+    # Get raw and processed responses
+    ai_response_raw = data.get("ai_response", {}).get("raw", "")
+    ai_response_processed = data.get("ai_response", {}).get("processed", {})
+    
+    if isinstance(ai_response_processed, dict) and "text" in ai_response_processed:
+        ai_text = escape(ai_response_processed["text"])
+        emotion = ai_response_processed.get("emotion", "Unknown")
+        relationship_changes = ai_response_processed.get("relationship_changes", {})
+    else:
+        ai_text = escape(str(ai_response_processed))
+        emotion = "Unknown"
+        relationship_changes = {}
+    
+    # HTML content with styled components
+    yield f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Conversation Log Details</title>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                margin: 0;
+                padding: 20px;
+                line-height: 1.6;
+                background-color: #f5f5f5;
+            }}
+            .container {{
+                max-width: 900px;
+                margin: 0 auto;
+                background-color: white;
+                padding: 20px;
+                border-radius: 5px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            }}
+            h1 {{
+                color: #333;
+                border-bottom: 1px solid #eee;
+                padding-bottom: 10px;
+            }}
+            .back-button {{
+                display: inline-block;
+                background-color: #607d8b;
+                color: white;
+                padding: 8px 16px;
+                text-decoration: none;
+                border-radius: 4px;
+                margin-bottom: 20px;
+            }}
+            .back-button:hover {{
+                background-color: #546e7a;
+            }}
+            .date {{
+                color: #666;
+                font-style: italic;
+                margin-bottom: 20px;
+            }}
+            .message-container {{
+                margin-bottom: 30px;
+            }}
+            .message-header {{
+                font-weight: bold;
+                margin-bottom: 5px;
+            }}
+            .user-message {{
+                background-color: #e3f2fd;
+                padding: 15px;
+                border-radius: 5px;
+                white-space: pre-wrap;
+            }}
+            .ai-message {{
+                background-color: #f1f8e9;
+                padding: 15px;
+                border-radius: 5px;
+                white-space: pre-wrap;
+            }}
+            .raw-response {{
+                background-color: #f5f5f5;
+                padding: 15px;
+                border: 1px solid #ddd;
+                border-radius: 5px;
+                white-space: pre-wrap;
+                font-family: monospace;
+                margin-top: 10px;
+                font-size: 0.9em;
+                overflow-x: auto;
+            }}
+            .metadata {{
+                margin-top: 10px;
+                padding: 10px;
+                background-color: #fafafa;
+                border-radius: 5px;
+            }}
+            .metadata-item {{
+                margin-bottom: 5px;
+            }}
+            .tab-buttons {{
+                display: flex;
+                margin-bottom: 10px;
+            }}
+            .tab-button {{
+                padding: 8px 16px;
+                background-color: #f0f0f0;
+                border: 1px solid #ddd;
+                cursor: pointer;
+                margin-right: 5px;
+            }}
+            .tab-button.active {{
+                background-color: #fff;
+                border-bottom: 1px solid #fff;
+            }}
+            .tab-content {{
+                display: none;
+                padding: 15px;
+                border: 1px solid #ddd;
+                border-radius: 0 0 5px 5px;
+            }}
+            .tab-content.active {{
+                display: block;
+            }}
+            .memory-box {{
+                background-color: #fff8e1;
+                padding: 15px;
+                border-radius: 5px;
+                margin-top: 10px;
+            }}
+            .memory-item {{
+                margin-bottom: 5px;
+            }}
+        </style>
+        <script>
+            function showTab(tabId) {{
+                // Hide all tabs
+                document.querySelectorAll('.tab-content').forEach(tab => {{
+                    tab.classList.remove('active');
+                }});
+    
+                // Remove active class from all buttons
+                document.querySelectorAll('.tab-button').forEach(button => {{
+                    button.classList.remove('active');
+                }});
+    
+                // Show the selected tab
+                document.getElementById(tabId).classList.add('active');
+    
+                // Add active class to the clicked button
+                document.querySelector(`[onclick="showTab('${{tabId}}')"]`).classList.add('active');
+            }}
+        </script>
+    </head>
+    <body>
+        <div class="container">
+            <a href="/api/v1/debug/character-logs/{character_id}" class="back-button">← Back to Logs</a>
+    
+            <h1>Conversation Log Details</h1>
+    
+            <div class="date">Timestamp: {datetime_str}</div>
+    
+            <div class="message-container">
+                <div class="message-header">User Message:</div>
+                <div class="user-message">{user_message}</div>
+            </div>
+    
+            <div class="message-container">
+                <div class="message-header">AI Response:</div>
+                <div class="ai-message">{ai_text}</div>
+    
+                <div class="metadata">
+                    <div class="metadata-item"><strong>Emotion:</strong> {emotion}</div>
+    
+                    <div class="metadata-item"><strong>Relationship Changes:</strong></div>
+                    <ul>
+    """
+    
+    # Add relationship changes
+    for rel_type, value in relationship_changes.items():
+        yield f"<li>{rel_type}: {value}</li>"
+    
+    yield """
+                    </ul>
                 </div>
-                
-                <div class="message-container">
-                    <div class="message-header">AI Response:</div>
-                    <div class="ai-message">{ai_text}</div>
-                    
-                    <div class="metadata">
-                        <div class="metadata-item"><strong>Emotion:</strong> {emotion}</div>
-                        
-                        <div class="metadata-item"><strong>Relationship Changes:</strong></div>
-                        <ul>
-        """
-        
-        # Add relationship changes
-        for rel_type, value in relationship_changes.items():
-            html_content += f"<li>{rel_type}: {value}</li>"
-            
-        html_content += """
-                        </ul>
-                    </div>
+            </div>
+    
+            <div class="tab-buttons">
+                <button class="tab-button active" onclick="showTab('rawResponse')">Raw AI Response</button>
+                <button class="tab-button" onclick="showTab('conversationHistory')">Conversation History</button>
+                <button class="tab-button" onclick="showTab('systemPrompt')">System Prompt</button>
+            </div>
+    
+            <div id="rawResponse" class="tab-content active">
+                <div class="message-header">Raw AI Response:</div>
+                <div class="raw-response">
+    """
+    
+    # Add raw response
+    yield ai_response_raw.replace("<", "&lt;").replace(">", "&gt;")
+    
+    yield """
                 </div>
-                
-                <div class="tab-buttons">
-                    <button class="tab-button active" onclick="showTab('rawResponse')">Raw AI Response</button>
-                    <button class="tab-button" onclick="showTab('conversationHistory')">Conversation History</button>
-                    <button class="tab-button" onclick="showTab('systemPrompt')">System Prompt</button>
+            </div>
+    
+            <div id="conversationHistory" class="tab-content">
+                <div class="message-header">Conversation History:</div>
+    """
+    
+    # Add conversation history
+    conversation_history = data.get("conversation_history", [])
+    if conversation_history:
+        for msg in conversation_history:
+            role = msg.get("role", "unknown")
+            content = escape(msg.get("content", ""))
+    
+            if role == "system":
+                yield f"<div style='background-color: #e8eaf6; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>System:</strong> {content[:100]}{'...' if len(content) > 100 else ''}</div>"
+            elif role == "user":
+                yield f"<div style='background-color: #e3f2fd; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>User:</strong> {content}</div>"
+            elif role == "assistant":
+                yield f"<div style='background-color: #f1f8e9; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>Assistant:</strong> {content}</div>"
+            else:
+                yield f"<div style='background-color: #f5f5f5; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>{role}:</strong> {content}</div>"
+    else:
+        yield "<p>No conversation history available</p>"
+    
+    yield """
+            </div>
+    
+            <div id="systemPrompt" class="tab-content">
+                <div class="message-header">System Prompt:</div>
+                <div class="raw-response">
+    """
+    
+    # Add system prompt
+    system_prompt = data.get("system_prompt", "No system prompt available")
+    yield system_prompt.replace("<", "&lt;").replace(">", "&gt;")
+    
+    yield """
                 </div>
-                
-                <div id="rawResponse" class="tab-content active">
-                    <div class="message-header">Raw AI Response:</div>
-                    <div class="raw-response">
+            </div>
+    """
+    
+    # Add memory information if available
+    memory_data = None
+    if isinstance(ai_response_processed, dict) and "memory" in ai_response_processed:
+        memory_data = ai_response_processed["memory"]
+    
+    if memory_data:
+        yield """
+            <div class="memory-box">
+                <div class="message-header">Memory Information Extracted:</div>
         """
-        
-        # Add raw response
-        html_content += ai_response_raw.replace("<", "&lt;").replace(">", "&gt;")
-        
-        html_content += """
+    
+        if isinstance(memory_data, list):
+            for memory in memory_data:
+                if isinstance(memory, dict):
+                    memory_type = memory.get("type", "Unknown")
+                    memory_category = memory.get("category", "")
+                    memory_content = memory.get("content", "")
+    
+                    yield f"""
+                    <div class="memory-item">
+                        <strong>{memory_type}{f' ({memory_category})' if memory_category else ''}:</strong> {memory_content}
                     </div>
-                </div>
-                
-                <div id="conversationHistory" class="tab-content">
-                    <div class="message-header">Conversation History:</div>
-        """
-        
-        # Add conversation history
-        conversation_history = data.get("conversation_history", [])
-        if conversation_history:
-            for msg in conversation_history:
-                role = msg.get("role", "unknown")
-                content = msg.get("content", "")
-                
-                if role == "system":
-                    html_content += f"<div style='background-color: #e8eaf6; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>System:</strong> {content[:100]}{'...' if len(content) > 100 else ''}</div>"
-                elif role == "user":
-                    html_content += f"<div style='background-color: #e3f2fd; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>User:</strong> {content}</div>"
-                elif role == "assistant":
-                    html_content += f"<div style='background-color: #f1f8e9; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>Assistant:</strong> {content}</div>"
-                else:
-                    html_content += f"<div style='background-color: #f5f5f5; padding: 10px; margin-bottom: 5px; border-radius: 5px;'><strong>{role}:</strong> {content}</div>"
+                    """
         else:
-            html_content += "<p>No conversation history available</p>"
-        
-        html_content += """
-                </div>
-                
-                <div id="systemPrompt" class="tab-content">
-                    <div class="message-header">System Prompt:</div>
-                    <div class="raw-response">
-        """
-        
-        # Add system prompt
-        system_prompt = data.get("system_prompt", "No system prompt available")
-        html_content += system_prompt.replace("<", "&lt;").replace(">", "&gt;")
-        
-        html_content += """
-                    </div>
-                </div>
-        """
-        
-        # Add memory information if available
-        memory_data = None
-        if isinstance(ai_response_processed, dict) and "memory" in ai_response_processed:
-            memory_data = ai_response_processed["memory"]
-        
-        if memory_data:
-            html_content += """
-                <div class="memory-box">
-                    <div class="message-header">Memory Information Extracted:</div>
-            """
-            
-            if isinstance(memory_data, list):
-                for memory in memory_data:
-                    if isinstance(memory, dict):
-                        memory_type = memory.get("type", "Unknown")
-                        memory_category = memory.get("category", "")
-                        memory_content = memory.get("content", "")
-                        
-                        html_content += f"""
-                        <div class="memory-item">
-                            <strong>{memory_type}{f' ({memory_category})' if memory_category else ''}:</strong> {memory_content}
-                        </div>
-                        """
-            else:
-                html_content += f"<div class='memory-item'>{str(memory_data)}</div>"
-                
-            html_content += """
-                </div>
-            """
-        
-        html_content += """
+            yield f"<div class='memory-item'>{str(memory_data)}</div>"
+    
+        yield """
             </div>
-        </body>
-        </html>
         """
-        
-        return HTMLResponse(content=html_content)
-        
-    except Exception as e:
-        return HTMLResponse(content=f"""
-        <h1>Error reading log file</h1>
-        <p>An error occurred while processing the log file: {str(e)}</p>
-        <a href="/api/v1/debug/character-logs/{character_id}">Back to logs</a>
-        """)
+    
+    yield """
+        </div>
+    </body>
+    </html>
+    """
 
 @router.get("/raw-log/{character_id}/{log_file}")
-async def get_raw_log(character_id: str, log_file: str):
+def get_raw_log(character_id: str, log_file: str):
     """
     Return the raw JSON log file
     """
-    file_path = Path("logs/conversations") / character_id / log_file
+    entry = log_catalog.get(character_id, log_file)
     
-    if not file_path.exists():
+    if entry is None or not log_catalog.file_path(entry).exists():
         return JSONResponse(
             status_code=404,
             content={"error": "Log file not found"}
         )
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return data
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Error reading log file: {str(e)}"}
-        )
+    # Streamed from disk as written, without parsing
+    return FileResponse(log_catalog.file_path(entry), media_type="application/json")
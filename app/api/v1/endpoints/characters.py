@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body, Path, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Path, Header, Response, UploadFile, File, status
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from app.api.deps import get_db, get_current_user
 from app.schemas.character import CharacterResponse, CharacterFeedResponse, CharacterInteractionRequest, CharacterAvatarResponse
 from app.services.character_service import (
-    get_character_feed, 
     get_character_by_id,
     like_character,
     dislike_character,
     superlike_character,
     get_character_photos,
-    update_character_avatar
+    update_character_avatar,
+    set_character_avatar_url,
+    apply_avatar_variant
 )
+from app.services.discovery_feed import discovery_feed
+from app.services.storage_service import supports_direct_uploads
+from app.services.upload_intents import UploadIntentError, complete_upload, create_upload_intent
+from app.schemas.upload import UploadCompleteRequest, UploadIntentRequest, UploadIntentResponse
+from core.config import settings
 from app.schemas.user import User
 import logging
 import os
@@ -20,21 +26,34 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Image variants, see app.services.image_variants
+IMAGE_SIZE_PATTERN = "^(thumb|card|full)$"
+
 @router.get("/feed", response_model=List[CharacterFeedResponse])
 def get_feed(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     limit: int = Query(10, ge=1, le=50),
-    offset: int = Query(0, ge=0)
+    cursor: Optional[int] = Query(None, ge=0, description="X-Next-Cursor of the previous page"),
+    size: str = Query("card", pattern=IMAGE_SIZE_PATTERN, description="Avatar variant"),
+    accept: Optional[str] = Header(None)
 ):
     """
     Get a feed of characters for the current user to interact with.
+    
+    The position to continue from is returned in the X-Next-Cursor header.
+    avatar_url points to the avatar resized to ``size`` in a format the client accepts.
     """
     try:
-        characters = get_character_feed(db, current_user.id, limit, offset)
+        page = discovery_feed.get_page(db, current_user.id, limit, cursor)
+        characters = page.items
+        response.headers["X-Next-Cursor"] = str(page.next_cursor)
+        response.headers["Vary"] = "Accept"
         
         # Добавляем фотографии к каждому персонажу
         for character in characters:
+            apply_avatar_variant(character, size, accept)
             character_id = character.get("id")
             if character_id:
                 photos = get_character_photos(character_id)
@@ -51,9 +70,12 @@ def get_feed(
 
 @router.get("/{character_id}", response_model=CharacterResponse)
 def get_character(
+    response: Response,
     character_id: str = Path(..., description="Character ID"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    size: str = Query("full", pattern=IMAGE_SIZE_PATTERN, description="Avatar variant"),
+    accept: Optional[str] = Header(None)
 ):
     """
     Get detailed information about a specific character.
@@ -61,6 +83,8 @@ def get_character(
     character = get_character_by_id(db, character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
+    apply_avatar_variant(character, size, accept)
+    response.headers["Vary"] = "Accept"
     
     # Добавляем фотографии персонажа
     photos = get_character_photos(character_id)
@@ -197,3 +221,50 @@ async def upload_character_avatar(
             detail="Character not found or failed to update avatar"
         )
     return CharacterAvatarResponse(url=url)
+
+@router.post("/{character_id}/avatar/upload-intent", response_model=UploadIntentResponse)
+def create_avatar_upload_intent(
+    intent: UploadIntentRequest,
+    character_id: str = Path(..., description="Character ID"),
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Get a presigned URL to upload the avatar directly to storage
+    
+    After the upload, call /{character_id}/avatar/complete with the upload_token.
+    """
+    if not supports_direct_uploads():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Direct uploads are not available, use /{character_id}/avatar"
+        )
+    try:
+        return create_upload_intent(
+            settings.S3_BUCKET_NAME, f"character:{character_id}", f"characters/{character_id}",
+            intent.content_type, intent.size, ALLOWED_CONTENT_TYPES, MAX_PHOTO_SIZE,
+            filename=intent.filename
+        )
+    except UploadIntentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/{character_id}/avatar/complete", response_model=CharacterAvatarResponse)
+def complete_avatar_upload(
+    completion: UploadCompleteRequest,
+    character_id: str = Path(..., description="Character ID"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> CharacterAvatarResponse:
+    """
+    Set the avatar uploaded through a presigned URL
+    """
+    try:
+        upload = complete_upload(completion.upload_token, f"character:{character_id}")
+    except UploadIntentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    url = set_character_avatar_url(db, character_id, upload.url, upload.object_name)
+    if not url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found"
+        )
+    return CharacterAvatarResponse(url=url)
@@ -1,23 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.api.deps import get_db, get_current_user
 from app.schemas.user import User
 from app.schemas.match import MatchResponse
-from app.services.match_service import get_user_matches
+from app.services.match_service import get_user_matches_page
 
 router = APIRouter()
 
 @router.get("/", response_model=List[MatchResponse])
 def get_matches(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
 ):
     """
     Get all matches for the current user.
+    
+    The cursor of the next page, if any, is returned in the X-Next-Cursor header.
     """
     # Using user_id instead of id to match the User model
-    matches = get_user_matches(db, current_user.user_id, limit, offset)
+    try:
+        matches, next_cursor = get_user_matches_page(db, current_user.user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return matches
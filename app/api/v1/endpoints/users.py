@@ -1,5 +1,5 @@
 from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body, status, Path
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body, status, Path, Query, Header, Response
 from sqlalchemy.orm import Session
 from uuid import UUID
 import os
@@ -11,7 +11,9 @@ from app.db.session import get_db
 from app.auth.jwt import get_current_user
 from app.schemas.user import UserProfileResponse, UserProfileUpdate
 from app.services import photo_service, profile_service
-from app.services.storage_service import upload_file, delete_file
+from app.services.storage_service import store_file, delete_file, supports_direct_uploads
+from app.services.upload_intents import UploadIntentError, complete_upload, create_upload_intent
+from app.schemas.upload import UploadCompleteRequest, UploadIntentRequest, UploadIntentResponse
 from core.db.models.user import User
 from core.config import settings
 
@@ -25,15 +27,23 @@ os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 # Настройки загрузки фотографий
 MAX_PHOTO_SIZE = 10 * 1024 * 1024  # 10 MB
 ALLOWED_CONTENT_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+# Уменьшенные копии фотографий, см. app.services.image_variants
+IMAGE_SIZE_PATTERN = "^(thumb|card|full)$"
 
 @router.get("/me", response_model=UserProfileResponse)
 def get_current_user_profile(
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    size: str = Query("card", pattern=IMAGE_SIZE_PATTERN, description="Размер копий фотографий"),
+    accept: Optional[str] = Header(None)
 ) -> Dict[str, Any]:
     """
     Получить профиль текущего пользователя
+    
+    Фотографии отдаются уменьшенными копиями размера size в формате, который поддерживает клиент.
     """
+    response.headers["Vary"] = "Accept"
     user_id = str(current_user.user_id)
     profile = profile_service.get_user_profile(db, user_id)
     
@@ -47,7 +57,7 @@ def get_current_user_profile(
         profile = profile_service.create_or_update_profile(db, user_id, profile_data)
         
     # Добавляем фотографии
-    photos = photo_service.get_user_photos(db, user_id)
+    photos = photo_service.get_user_photos(db, user_id, size, accept)
     
     # Объединяем данные профиля и фотографии
     result = profile.copy() if profile else {"user_id": user_id}
@@ -60,12 +70,16 @@ def get_current_user_profile(
 @router.put("/me", response_model=UserProfileResponse)
 def update_current_user_profile(
     profile_update: UserProfileUpdate,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    size: str = Query("card", pattern=IMAGE_SIZE_PATTERN, description="Размер копий фотографий"),
+    accept: Optional[str] = Header(None)
 ) -> Dict[str, Any]:
     """
     Обновить профиль текущего пользователя
     """
+    response.headers["Vary"] = "Accept"
     user_id = str(current_user.user_id)
     
     # Преобразуем данные в словарь для обновления
@@ -81,7 +95,7 @@ def update_current_user_profile(
         )
     
     # Добавляем фотографии
-    photos = photo_service.get_user_photos(db, user_id)
+    photos = photo_service.get_user_photos(db, user_id, size, accept)
     
     # Возвращаем обновленный профиль
     result = profile.copy()
@@ -122,13 +136,14 @@ async def upload_user_photo(
             detail=f"Размер файла превышает максимально допустимый ({MAX_PHOTO_SIZE / 1024 / 1024} MB)"
         )
     
-    # Генерируем ключ объекта в хранилище
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    object_name = f"users/{user_id}/{timestamp}_{photo.filename}"
     try:
-        # Загружаем файл в хранилище
+        # Загружаем файл в хранилище; повторная загрузка того же файла не создает новый объект
         bucket = settings.S3_BUCKET_NAME
-        url = upload_file(bucket, object_name, photo.file, content_type=photo.content_type)
+        stored = store_file(
+            bucket, f"users/{user_id}", photo.file,
+            filename=photo.filename, content_type=photo.content_type
+        )
+        url, object_name = stored.url, stored.object_name
     except Exception as e:
         logger.error(f"Error uploading file to storage: {e}")
         raise HTTPException(
@@ -145,12 +160,13 @@ async def upload_user_photo(
     )
     
     if not photo_id:
-        # Если не удалось сохранить в БД, удаляем объект из хранилища
-        try:
-            bucket = settings.S3_BUCKET_NAME
-            delete_file(bucket, object_name)
-        except Exception:
-            pass
+        # Если не удалось сохранить в БД, удаляем объект из хранилища (если он не использовался раньше)
+        if not stored.deduplicated:
+            try:
+                bucket = settings.S3_BUCKET_NAME
+                delete_file(bucket, object_name)
+            except Exception:
+                pass
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -164,6 +180,68 @@ async def upload_user_photo(
         "message": "Фотография успешно загружена"
     }
 
+@router.post("/me/photos/upload-intent", response_model=UploadIntentResponse)
+def create_photo_upload_intent(
+    intent: UploadIntentRequest,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Получить presigned URL для загрузки фотографии напрямую в хранилище
+    
+    После загрузки файла по upload_url нужно вызвать /me/photos/complete с upload_token.
+    """
+    user_id = str(current_user.user_id)
+    if not supports_direct_uploads():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Прямая загрузка недоступна, используйте /me/photos"
+        )
+    try:
+        return create_upload_intent(
+            settings.S3_BUCKET_NAME, f"user:{user_id}", f"users/{user_id}",
+            intent.content_type, intent.size, ALLOWED_CONTENT_TYPES, MAX_PHOTO_SIZE,
+            filename=intent.filename
+        )
+    except UploadIntentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/me/photos/complete")
+def complete_photo_upload(
+    completion: UploadCompleteRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Зарегистрировать фотографию, загруженную по presigned URL
+    """
+    user_id = str(current_user.user_id)
+    try:
+        upload = complete_upload(completion.upload_token, f"user:{user_id}")
+    except UploadIntentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Повторный вызов с тем же токеном возвращает уже созданную запись
+    photo_id = photo_service.get_photo_id_by_filename(db, user_id, upload.object_name)
+    if not photo_id:
+        photo_id = photo_service.create_photo(
+            db, user_id, upload.url, upload.object_name,
+            content_type=upload.content_type,
+            size=upload.size,
+            is_primary=completion.is_primary
+        )
+    if not photo_id:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Не удалось сохранить информацию о фотографии"
+        )
+    
+    return {
+        "id": photo_id,
+        "url": photo_service.photo_read_url(upload.object_name, upload.url),
+        "is_primary": completion.is_primary,
+        "message": "Фотография успешно загружена"
+    }
+
 @router.delete("/me/photos/{photo_id}")
 def delete_user_photo(
     photo_id: str = Path(..., title="ID фотографии"),
@@ -4,8 +4,12 @@ from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
 
-from app.api.deps import get_current_user
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user, get_db
 from app.config import settings
+from app.services.character_repository import character_repository
+from app.services.recommendation import character_recommender
 
 router = APIRouter()
 
@@ -115,47 +119,41 @@ async def superlike_character(
     )
 
 @router.get("/discover/characters", response_model=List[ProfileFeedItem])
-async def get_character_feed(
-    limit: int = Query(10, description="Number of profiles to return"),
+def get_character_feed(
+    limit: int = Query(10, ge=1, le=50, description="Number of profiles to return"),
+    db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get a feed of character profiles for the discovery/swiping interface"""
-    # In a real implementation, you would:
-    # 1. Fetch profiles from DB that the user hasn't seen/swiped
-    # 2. Apply any filters/preferences the user has set
-    # 3. Return the next batch of profiles
-    
-    # For demo purposes, return sample data
-    profiles = [
-        ProfileFeedItem(
-            id=str(uuid.uuid4()),
-            name="Алиса",
-            age=25,
-            gender="female",
-            personality_traits=["friendly", "creative", "outgoing"],
-            interests=["art", "music", "travel"],
-            background="Художница из Москвы. Люблю путешествовать и рисовать новые места.",
-            photos=["https://example.com/photos/1.jpg", "https://example.com/photos/2.jpg"]
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-    ]
+    # Ranked by similarity to the user's interests and likes, re-ranked for variety;
+    # characters the user already swiped are excluded
+    character_ids = character_recommender.recommend_for_user(db, current_user.user_id, limit)
     
-    # Add more sample profiles
-    names = ["София", "Мария", "Виктория", "Ева", "Анна"]
-    for name in names:
+    profiles = []
+    for character_id in character_ids:
+        character = character_repository.get(db, character_id)
+        if character is None:
+            continue
         profiles.append(
             ProfileFeedItem(
-                id=str(uuid.uuid4()),
-                name=name,
-                age=20 + len(name),  # Just for variety
-                gender="female",
-                personality_traits=["intelligent", "caring", "funny"],
-                interests=["books", "movies", "cooking"],
-                background=f"{name} любит проводить время в хорошей компании.",
-                photos=[f"https://example.com/photos/{name.lower()}.jpg"]
+                id=character.id,
+                name=character.name,
+                age=character.age,
+                gender=character.gender,
+                personality_traits=[str(trait) for trait in character.personality_traits],
+                interests=[str(interest) for interest in character.interests],
+                background=character.background,
+                photos=[character.avatar_url] if character.avatar_url else []
             )
         )
     
-    return profiles[:limit]
+    return profiles
 
 @router.get("/matches", response_model=List[MatchProfile])
 async def get_matches(
@@ -137,12 +137,66 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("No database URL configured, using default SQLite")
     
+    # Activate due relationship events in the background
+    if core_settings.EVENT_SCHEDULER_ENABLED:
+        try:
+            from core.services.event_scheduler import start_event_scheduler
+            from app.services.notification_service import notify_activated_events
+            start_event_scheduler().on_activate(notify_activated_events)
+        except Exception as e:
+            logger.error(f"Error starting event scheduler: {e}")
+    
+    # Refill discovery feed queues in the background
+    try:
+        from app.services.discovery_feed import discovery_feed
+        discovery_feed.start()
+    except Exception as e:
+        logger.error(f"Error starting discovery feed worker: {e}")
+    
+    # Resize uploaded photos and avatars on a process pool
+    try:
+        from app.services.image_variants import image_pipeline
+        image_pipeline.start()
+    except Exception as e:
+        logger.error(f"Error starting image variant pipeline: {e}")
+    
     logger.info("All services initialized. API is ready!")
     
     yield  # This is where the app runs
     
     # Cleanup code (if any) goes here
     logger.info("Shutting down...")
+    
+    try:
+        from core.services.event_scheduler import stop_event_scheduler
+        stop_event_scheduler()
+    except Exception as e:
+        logger.error(f"Error stopping event scheduler: {e}")
+    
+    try:
+        from app.services.discovery_feed import discovery_feed
+        discovery_feed.stop()
+    except Exception as e:
+        logger.error(f"Error stopping discovery feed worker: {e}")
+    
+    try:
+        from app.services.image_variants import image_pipeline
+        image_pipeline.stop()
+    except Exception as e:
+        logger.error(f"Error stopping image variant pipeline: {e}")
+    
+    try:
+        from app.services.apns import close_apns_sender
+        close_apns_sender()
+    except Exception as e:
+        logger.error(f"Error closing APNS sender: {e}")
+    
+    # Flush buffered conversation turns before the process exits
+    try:
+        from core.ai.conversation_journal import close_conversation_journal
+        close_conversation_journal()
+    except Exception as e:
+        logger.error(f"Error closing conversation journal: {e}")
 
 # Create FastAPI instance with lifespan handler
 app = FastAPI(
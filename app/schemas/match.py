@@ -16,6 +16,7 @@ class MatchResponse(MatchBase):
     character_name: str
     avatar_url: Optional[str] = None
     last_interaction: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
     created_at: datetime
     
     class Config:
@@ -34,3 +34,21 @@ class MemorySchema(MemoryBase):
 
     class Config:
         from_attributes = True
+
+class MemoryBulkCreate(BaseModel):
+    """Schema for storing a batch of memories for one user"""
+    user_id: Optional[str] = None
+    memories: List[MemoryCreate] = Field(..., max_length=100)
+
+class MemoryBulkItemResult(BaseModel):
+    """Outcome of one memory in a bulk request"""
+    index: int
+    status: str  # created, duplicate or invalid
+    id: Optional[str] = None
+
+class MemoryBulkResult(BaseModel):
+    """Schema for returning the outcome of a bulk request"""
+    user_id: str
+    created: int
+    duplicates: int
+    results: List[MemoryBulkItemResult]
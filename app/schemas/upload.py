@@ -0,0 +1,19 @@
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+
+class UploadIntentRequest(BaseModel):
+    content_type: str = Field(..., description="MIME type of the file, e.g. image/jpeg")
+    size: int = Field(..., gt=0, description="Size of the file in bytes")
+    filename: Optional[str] = Field(None, description="Original file name (for the extension)")
+
+class UploadIntentResponse(BaseModel):
+    upload_url: str
+    method: str = "PUT"
+    headers: Dict[str, str] = Field(default_factory=dict, description="Headers to send with the upload")
+    upload_token: str
+    object_name: str
+    expires_in: int
+
+class UploadCompleteRequest(BaseModel):
+    upload_token: str
+    is_primary: bool = False
@@ -0,0 +1,293 @@
+"""
+Asynchronous Apple Push Notification service sender.
+
+APNs only speaks HTTP/2, so pushes go through a single httpx client with
+HTTP/2 enabled: requests to APNs are multiplexed as concurrent streams on a
+persistent connection instead of one blocking request per device. The
+provider JWT is signed once and reused until APNS_TOKEN_TTL, and a push is
+retried once with a fresh token when APNs reports it expired.
+
+Synchronous callers (API endpoints, the event scheduler thread) submit batches
+to the sender's own event loop thread, which keeps the connection open between
+calls. Results flag unregistered device tokens so callers can deactivate them.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Responses meaning the device token will never be valid again
+UNREGISTERED_REASONS = {"BadDeviceToken", "Unregistered"}
+EXPIRED_TOKEN_REASONS = {"ExpiredProviderToken"}
+
+
+def build_payload(title: str, body: str, data: Dict[str, Any] = None, badge: int = None) -> Dict[str, Any]:
+    """Собрать тело alert-уведомления APNS"""
+    payload = {
+        "aps": {
+            "alert": {
+                "title": title,
+                "body": body
+            },
+            "sound": "default"
+        }
+    }
+    if badge is not None:
+        payload["aps"]["badge"] = badge
+    if data:
+        payload["data"] = data
+    return payload
+
+
+@dataclass
+class PushResult:
+    device_token: str
+    status: int
+    reason: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+    @property
+    def unregistered(self) -> bool:
+        """Whether the device token should be deactivated."""
+        return self.status == 410 or self.reason in UNREGISTERED_REASONS
+
+
+class ProviderTokenCache:
+    """Provider JWT signed once and reused until it is close to expiry"""
+
+    def __init__(self, signer: Callable[[], str], ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            signer: Callable returning a newly signed token
+            ttl: Seconds a token is reused (defaults to APNS_TOKEN_TTL)
+            clock: Monotonic time source
+        """
+        self._signer = signer
+        self.ttl = ttl if ttl is not None else settings.APNS_TOKEN_TTL
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._issued_at = 0.0
+        self.signed = 0
+
+    def get(self) -> str:
+        with self._lock:
+            if self._token is None or self._clock() - self._issued_at >= self.ttl:
+                self._token = self._signer()
+                self._issued_at = self._clock()
+                self.signed += 1
+            return self._token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Drop the cached token (only if it is still ``token`` when given)."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+
+
+class APNSSender:
+    """HTTP/2 client for APNs with bounded concurrency and a cached provider token"""
+
+    def __init__(
+        self,
+        base_url: str,
+        topic: str,
+        token_provider: Callable[[], str],
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        token_ttl: Optional[float] = None,
+        transport: Any = None,
+    ):
+        """
+        Args:
+            base_url: APNs device endpoint, e.g. https://api.push.apple.com/3/device
+            topic: Bundle ID sent as apns-topic
+            token_provider: Callable signing a new provider JWT
+            max_concurrency: Maximum concurrent streams (defaults to APNS_MAX_CONCURRENCY)
+            timeout: Request timeout in seconds (defaults to APNS_TIMEOUT)
+            token_ttl: Seconds a provider token is reused (defaults to APNS_TOKEN_TTL)
+            transport: httpx transport override, e.g. for a local stub server
+        """
+        self.base_url = base_url.rstrip("/")
+        self.topic = topic
+        self.tokens = ProviderTokenCache(token_provider, ttl=token_ttl)
+        self.max_concurrency = max_concurrency or settings.APNS_MAX_CONCURRENCY
+        self.timeout = timeout if timeout is not None else settings.APNS_TIMEOUT
+        self._transport = transport
+
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.sent = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------
+
+    async def push(self, device_token: str, payload: Dict[str, Any],
+                   push_type: str = "alert", priority: int = 10) -> PushResult:
+        """Send one push; network errors are reported as status 0."""
+        client = self._get_client()
+        async with self._get_semaphore():
+            result = None
+            for attempt in range(2):
+                token = self.tokens.get()
+                try:
+                    response = await client.post(
+                        f"{self.base_url}/{device_token}",
+                        json=payload,
+                        headers={
+                            "authorization": f"bearer {token}",
+                            "apns-topic": self.topic,
+                            "apns-push-type": push_type,
+                            "apns-priority": str(priority),
+                        },
+                    )
+                except Exception as e:
+                    logger.error(f"Exception sending push notification: {e}")
+                    result = PushResult(device_token, 0, type(e).__name__)
+                    break
+
+                result = PushResult(device_token, response.status_code, self._reason(response))
+                if result.reason in EXPIRED_TOKEN_REASONS and attempt == 0:
+                    self.tokens.invalidate(token)
+                    continue
+                break
+
+        if result.ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+            logger.error(f"Error sending push notification: {result.status} - {result.reason}")
+        return result
+
+    async def push_many(self, device_tokens: Iterable[str], payload: Dict[str, Any],
+                        **kwargs) -> List[PushResult]:
+        """Send the same payload to several devices concurrently."""
+        return list(await asyncio.gather(*(self.push(token, payload, **kwargs) for token in device_tokens)))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ------------------------------------------------------------------
+    # Sync API
+    # ------------------------------------------------------------------
+
+    def send_batch(self, device_tokens: Iterable[str], payload: Dict[str, Any],
+                   **kwargs) -> List[PushResult]:
+        """Send a batch from synchronous code on the sender's event loop thread."""
+        device_tokens = list(device_tokens)
+        if not device_tokens:
+            return []
+        future = asyncio.run_coroutine_threadsafe(
+            self.push_many(device_tokens, payload, **kwargs), self._ensure_loop()
+        )
+        return future.result()
+
+    def close(self) -> None:
+        """Close the connection pool and stop the event loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = self._loop_thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(timeout=5.0)
+        except Exception as e:
+            logger.error(f"Error closing APNS client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5.0)
+        loop.close()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "tokens_signed": self.tokens.signed,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _get_client(self):
+        # Created lazily on the loop that uses it
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=self.timeout,
+                transport=self._transport,
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+            )
+        return self._client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="apns-sender", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    @staticmethod
+    def _reason(response) -> Optional[str]:
+        if response.status_code == 200:
+            return None
+        try:
+            return response.json().get("reason")
+        except Exception:
+            return response.text or None
+
+
+_sender: Optional[APNSSender] = None
+_sender_lock = threading.Lock()
+
+
+def get_apns_sender() -> APNSSender:
+    """Return the process-wide APNs sender, creating it on first use."""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            from app.services.notification_service import APNSConfig
+
+            _sender = APNSSender(
+                base_url=APNSConfig.get_apns_url(),
+                topic=APNSConfig.bundle_id,
+                token_provider=APNSConfig.get_auth_token,
+            )
+        return _sender
+
+
+def close_apns_sender() -> None:
+    """Close the process-wide sender if it was created."""
+    global _sender
+    with _sender_lock:
+        if _sender is not None:
+            _sender.close()
+            _sender = None
@@ -0,0 +1,197 @@
+"""
+Character catalog service - serves the character list from a precomputed, versioned snapshot
+
+Writers of the characters/ai_partners tables bump the catalog row of the
+cache_versions table in their own transaction. API processes compare that
+version at most every CHARACTER_CATALOG_VERSION_CHECK_INTERVAL seconds and
+rebuild the serialized response only when it changed, so the list endpoint is
+a memory read.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.image_variants import variant_urls
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAME = "characters"
+
+# Works on PostgreSQL and SQLite (3.24+); the admin panel runs the same statement
+BUMP_VERSION_SQL = """
+    INSERT INTO cache_versions (name, version, updated_at)
+    VALUES (:name, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (name) DO UPDATE
+    SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+"""
+
+def character_row_to_dict(row_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a row from the characters or ai_partners table to the API representation
+    """
+    char_dict = {
+        "id": str(row_dict.get('id')),
+        "name": row_dict.get('name', 'Unknown'),
+        "age": row_dict.get('age'),
+        "gender": row_dict.get('gender', 'female'),
+        "personality_traits": [],
+        "interests": [],
+        "background": row_dict.get('background', ''),
+        "avatar_url": row_dict.get('avatar_url'),
+        # Resized copies, e.g. avatar_variants["card"]["jpeg"]; empty until generated
+        "avatar_variants": variant_urls(settings.S3_BUCKET_NAME, row_dict.get('avatar_variants')),
+        "current_emotion": {
+            "name": row_dict.get('current_emotion', 'neutral'),
+            "intensity": 0.5,
+        }
+    }
+
+    # Try to parse personality and interests
+    for source, target in (("personality", "personality_traits"), ("interests", "interests")):
+        try:
+            value = row_dict.get(source)
+            if value and isinstance(value, str):
+                try:
+                    char_dict[target] = json.loads(value)
+                except json.JSONDecodeError:
+                    char_dict[target] = [value]
+        except Exception as e:
+            logger.error(f"Error parsing {source}: {e}")
+
+    return char_dict
+
+def read_catalog_version(db: Session) -> Optional[int]:
+    """
+    Read the current catalog version (0 if never bumped, None if the table is unavailable)
+    """
+    try:
+        version = db.execute(
+            text("SELECT version FROM cache_versions WHERE name = :name"),
+            {"name": CATALOG_NAME}
+        ).scalar()
+        return version or 0
+    except Exception as e:
+        logger.warning(f"Character catalog version unavailable: {e}")
+        db.rollback()
+        return None
+
+def bump_catalog_version(db: Session) -> None:
+    """
+    Mark the catalog as changed; call inside the transaction that edits characters
+    """
+    try:
+        # Savepoint, so a missing table does not abort the caller's transaction
+        with db.begin_nested():
+            db.execute(text(BUMP_VERSION_SQL), {"name": CATALOG_NAME})
+    except Exception as e:
+        # Without the table other processes fall back to rebuilding on every check
+        logger.error(f"Error bumping character catalog version: {e}")
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Serialized character list at one catalog version"""
+    version: Optional[int]
+    etag: str
+    body: bytes
+    count: int
+    # The same characters by id, for the single-character endpoint
+    by_id: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+class CharacterCatalogCache:
+    """In-process snapshot of the character list, rebuilt when the catalog version changes"""
+
+    def __init__(self, check_interval: Optional[float] = None):
+        """
+        Args:
+            check_interval: Seconds a snapshot is served before the version is checked again
+        """
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else settings.CHARACTER_CATALOG_VERSION_CHECK_INTERVAL
+        )
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        """Get the current snapshot, checking the version at most every check_interval seconds"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._snapshot
+
+            version = read_catalog_version(db)
+            if self._snapshot is None or version is None or version != self._snapshot.version:
+                self._snapshot = self._build(db, version)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def get_character(self, db: Session, character_id: str) -> Optional[Dict[str, Any]]:
+        """
+        One character in the API representation: from the snapshot, or by primary key
+        for characters the snapshot does not list (ai_partners when characters is not empty)
+        """
+        character = self.get(db).by_id.get(str(character_id))
+        if character is not None:
+            return character
+        return load_character(db, character_id)
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next request rebuilds it (for edits made by this process)"""
+        self._snapshot = None
+
+    def _build(self, db: Session, version: Optional[int]) -> CatalogSnapshot:
+        characters = load_characters(db)
+        body = json.dumps(characters, ensure_ascii=False, default=str).encode("utf-8")
+        etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        self.rebuilds += 1
+        logger.info(f"Character catalog rebuilt: {len(characters)} characters, version {version}")
+        return CatalogSnapshot(version=version, etag=etag, body=body, count=len(characters),
+                               by_id={character["id"]: character for character in characters})
+
+def load_characters(db: Session) -> List[Dict[str, Any]]:
+    """
+    Read the character list, preferring the characters table (used by the admin panel)
+    and falling back to ai_partners
+    """
+    for table in ("characters", "ai_partners"):
+        try:
+            rows = db.execute(text(f"SELECT * FROM {table}")).fetchall()
+        except Exception as e:
+            logger.error(f"Error retrieving from {table} table: {e}")
+            db.rollback()
+            continue
+        if rows:
+            return [character_row_to_dict(dict(row)) for row in rows]
+    return []
+
+def load_character(db: Session, character_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Read one character by id from either table
+    """
+    for table in ("characters", "ai_partners"):
+        try:
+            # Compare on the raw column so the primary key index is used
+            row = db.execute(text(f"SELECT * FROM {table} WHERE id = :id"), {"id": str(character_id)}).fetchone()
+        except Exception as e:
+            logger.error(f"Error retrieving character {character_id} from {table}: {e}")
+            db.rollback()
+            continue
+        if row:
+            return character_row_to_dict(dict(row))
+    return None
+
+character_catalog = CharacterCatalogCache()
@@ -0,0 +1,210 @@
+"""
+Character repository - resolves a character id across the ai_partners and characters tables
+
+Characters are hydrated once (personality traits and interests parsed from
+JSON) and kept in a bounded per-process identity map, so every chat endpoint
+gets the same CharacterRecord from one cache hit. Local edits invalidate the
+entry explicitly; edits made by other processes (the admin panel) are picked
+up through the character catalog version, checked at most every
+CHARACTER_CATALOG_VERSION_CHECK_INTERVAL seconds.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.catalog_service import read_catalog_version
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Chat endpoints historically preferred ai_partners, the table holding current_emotion
+CHARACTER_TABLES = ("ai_partners", "characters")
+
+def parse_list(value: Any) -> List[Any]:
+    """
+    Parse a JSON list stored as text; a plain string becomes a one-item list
+    """
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            return [value]
+        return parsed if isinstance(parsed, list) else [parsed]
+    return []
+
+@dataclass
+class CharacterRecord:
+    """A character hydrated from either table"""
+    id: str
+    source: str
+    name: str
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    personality_traits: List[Any] = field(default_factory=list)
+    interests: List[Any] = field(default_factory=list)
+    background: Optional[str] = None
+    avatar_url: Optional[str] = None
+    current_emotion: Optional[str] = None
+
+    @property
+    def partner_id(self) -> str:
+        # Messages reference characters by this id
+        return self.id
+
+    @classmethod
+    def from_row(cls, row_dict: Dict[str, Any], source: str) -> "CharacterRecord":
+        return cls(
+            id=str(row_dict.get("id")),
+            source=source,
+            name=row_dict.get("name") or "Unknown",
+            age=row_dict.get("age"),
+            gender=row_dict.get("gender") or "female",
+            # ai_partners stores personality_traits, characters stores personality
+            personality_traits=parse_list(row_dict.get("personality_traits") or row_dict.get("personality")),
+            interests=parse_list(row_dict.get("interests")),
+            background=row_dict.get("background"),
+            avatar_url=row_dict.get("avatar_url"),
+            current_emotion=row_dict.get("current_emotion")
+        )
+
+    def to_context(self) -> Dict[str, Any]:
+        """Character info for the AI context (lists are copied, the record is shared)"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "age": self.age,
+            "gender": self.gender,
+            "personality_traits": list(self.personality_traits),
+            "interests": list(self.interests),
+            "background": self.background,
+            "current_emotion": {
+                "name": self.current_emotion or "neutral",
+                "intensity": 0.7
+            }
+        }
+
+class CharacterRepository:
+    """Bounded identity map of CharacterRecords keyed by id"""
+
+    def __init__(self, max_size: Optional[int] = None, check_interval: Optional[float] = None):
+        """
+        Args:
+            max_size: Records kept before the least recently used is evicted
+            check_interval: Seconds between checks of the catalog version
+        """
+        self.max_size = max_size if max_size is not None else settings.CHARACTER_CACHE_SIZE
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else settings.CHARACTER_CATALOG_VERSION_CHECK_INTERVAL
+        )
+        self._records: "OrderedDict[str, CharacterRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._checked_at = float("-inf")
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, character_id: Union[str, UUID]) -> Optional[CharacterRecord]:
+        """
+        Get a character by id, loading it from the database on a cache miss
+
+        Returns:
+            CharacterRecord or None if neither table has the id
+        """
+        key = str(character_id)
+        self._check_version(db)
+
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+                self.hits += 1
+                return record
+            self.misses += 1
+
+        record = self._load(db, key)
+        if record is None:
+            # Not cached, so characters created later are found
+            return None
+
+        with self._lock:
+            # A concurrent miss may have stored the record first; keep one identity
+            record = self._records.setdefault(key, record)
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+        return record
+
+    def invalidate(self, character_id: Optional[Union[str, UUID]] = None) -> None:
+        """Drop one record, or all of them when no id is given"""
+        with self._lock:
+            if character_id is None:
+                self._records.clear()
+            else:
+                self._records.pop(str(character_id), None)
+
+    def update_emotion(self, db: Session, record: CharacterRecord, emotion: Optional[str]) -> None:
+        """
+        Stage the character's current emotion in the caller's transaction
+
+        Only ai_partners has a current_emotion column; the cached record is updated either way.
+        """
+        if not emotion:
+            return
+        if record.source == "ai_partners":
+            db.execute(
+                text("UPDATE ai_partners SET current_emotion = :emotion WHERE id = :id"),
+                {"emotion": emotion, "id": record.id}
+            )
+        record.current_emotion = emotion
+
+    def _check_version(self, db: Session) -> None:
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        version = read_catalog_version(db)
+        with self._lock:
+            if version is None or version != self._version:
+                if self._records:
+                    logger.info(f"Character catalog version changed to {version}, dropping cached characters")
+                self._records.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def _load(self, db: Session, character_id: str) -> Optional[CharacterRecord]:
+        for table in CHARACTER_TABLES:
+            try:
+                # Compare on the raw column so the primary key index is used
+                row = db.execute(
+                    text(f"SELECT * FROM {table} WHERE id = :id"),
+                    {"id": character_id}
+                ).fetchone()
+            except Exception as e:
+                logger.error(f"Error retrieving character {character_id} from {table}: {e}")
+                db.rollback()
+                continue
+            if row:
+                return CharacterRecord.from_row(dict(row), table)
+        return None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._version
+        }
+
+character_repository = CharacterRepository()
@@ -4,59 +4,20 @@ from typing import List, Dict, Any, Optional
 import uuid
 import logging
 
+from app.services.discovery_feed import discovery_feed
+
 logger = logging.getLogger(__name__)
 
-def get_character_feed(db: Session, user_id: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+def get_character_feed(db: Session, user_id: str, limit: int = 10, cursor: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Get a feed of characters for the current user to interact with.
     Excludes characters that the user has already liked/disliked.
-    """
-    query = text("""
-        SELECT 
-            c.id, 
-            c.name, 
-            c.age, 
-            c.gender, 
-            c.personality as personality_traits, 
-            c.interests, 
-            c.background,
-            c.avatar_url
-        FROM 
-            characters c
-        WHERE 
-            c.id NOT IN (
-                -- Get characters user has interacted with
-                SELECT DISTINCT i.character_id 
-                FROM interactions i 
-                WHERE i.user_id = :user_id
-            )
-            AND c.is_active = TRUE
-        ORDER BY 
-            -- Randomize to get different suggestions each time
-            random()
-        LIMIT :limit
-        OFFSET :offset
-    """)
     
+    Pages come from the user's pre-shuffled discovery queue; use
+    discovery_feed.get_page directly to also get the next cursor.
+    """
     try:
-        result = db.execute(query, {"user_id": user_id, "limit": limit, "offset": offset})
-        characters = []
-        
-        for row in result:
-            character = dict(row)
-            
-            # Parse JSON from strings if needed
-            for field in ['personality_traits', 'interests']:
-                if isinstance(character.get(field), str):
-                    import json
-                    try:
-                        character[field] = json.loads(character[field])
-                    except Exception:
-                        character[field] = []
-            
-            characters.append(character)
-        
-        return characters
+        return discovery_feed.get_page(db, user_id, limit, cursor).items
     except Exception as e:
         logger.error(f"Error getting character feed: {e}")
         return []
@@ -75,6 +36,7 @@ def get_character_by_id(db: Session, character_id: str) -> Optional[Dict[str, An
             c.interests, 
             c.background,
             c.avatar_url,
+            c.avatar_variants,
             c.created_at,
             c.updated_at
         FROM 
@@ -121,6 +83,7 @@ def like_character(db: Session, user_id: str, character_id: str) -> Dict[str, An
             "user_id": user_id,
             "character_id": character_id
         })
+        discovery_feed.consume(db, user_id, character_id)
         
         # For demo purposes, all likes are matches with a small random delay
         is_match = True
@@ -172,6 +135,7 @@ def dislike_character(db: Session, user_id: str, character_id: str) -> Dict[str,
             "user_id": user_id,
             "character_id": character_id
         })
+        discovery_feed.consume(db, user_id, character_id)
         
         db.commit()
         return {"success": True}
@@ -198,6 +162,7 @@ def superlike_character(db: Session, user_id: str, character_id: str) -> Dict[st
             "user_id": user_id,
             "character_id": character_id
         })
+        discovery_feed.consume(db, user_id, character_id)
         
         # For demo purposes, all superlikes are matches
         is_match = True
@@ -285,7 +250,11 @@ def get_character_photos(character_id: str, count: int = 3) -> List[Dict[str, An
     
     return photos
 
-from app.services.storage_service import upload_file
+from app.services import storage_service
+from app.services.storage_service import store_file
+from app.services.image_variants import choose_variant, delete_image, image_pipeline
+from app.services.catalog_service import bump_catalog_version, character_catalog
+from app.services.character_repository import character_repository
 from core.config import settings
 from core.db.models.character import Character
 from sqlalchemy.orm import Session
@@ -295,17 +264,50 @@ def update_character_avatar(db: Session, character_id: str, file_obj, filename:
     Uploads a file to storage and updates the character's avatar_url. Returns the URL if successful.
     """
     try:
-        # Upload to storage
-        object_name = f"characters/{character_id}/{filename}"
-        url = upload_file(settings.S3_BUCKET_NAME, object_name, file_obj, content_type=content_type)
-        # Update DB record
-        character = db.query(Character).filter(Character.id == character_id).first()
-        if not character:
-            return None
-        character.avatar_url = url
-        db.commit()
-        return url
+        # Upload to storage; re-uploading the same image reuses the stored object
+        stored = store_file(
+            settings.S3_BUCKET_NAME, f"characters/{character_id}", file_obj,
+            filename=filename, content_type=content_type
+        )
+        return set_character_avatar_url(db, character_id, stored.url, stored.object_name)
     except Exception as e:
         db.rollback()
         logger.error(f"Error updating character avatar: {e}")
         return None
+
+def set_character_avatar_url(db: Session, character_id: str, url: str,
+                             object_name: Optional[str] = None) -> Optional[str]:
+    """
+    Sets the character's avatar_url to an already stored file. Returns the URL, or None if there is no such character.
+
+    With the file's ``object_name``, resized variants of the new avatar are generated in the background.
+    A replaced avatar stored by us is deleted with its variants once no character references it.
+    """
+    character = db.query(Character).filter(Character.id == character_id).first()
+    if not character:
+        return None
+    old_url, old_variants = character.avatar_url, character.avatar_variants
+    if old_url != url:
+        character.avatar_variants = None
+    character.avatar_url = url
+    bump_catalog_version(db)
+    db.commit()
+    character_catalog.invalidate()
+    character_repository.invalidate(character_id)
+    old_object = storage_service.object_name_from_url(settings.S3_BUCKET_NAME, old_url)
+    if old_url != url and old_object:
+        if not db.query(Character.id).filter(Character.avatar_url == old_url).first():
+            delete_image(settings.S3_BUCKET_NAME, old_object, old_variants)
+    if object_name:
+        image_pipeline.submit(settings.S3_BUCKET_NAME, object_name, "avatar")
+    return url
+
+def apply_avatar_variant(character: Dict[str, Any], size: Optional[str] = None,
+                         accept: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Replace avatar_url with the best variant for the client (see image_variants.choose_variant).
+    """
+    variant = choose_variant(character.pop("avatar_variants", None), size, accept)
+    if variant:
+        character["avatar_url"] = storage_service.read_url(settings.S3_BUCKET_NAME, variant)
+    return character
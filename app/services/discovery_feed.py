@@ -0,0 +1,249 @@
+"""
+Discovery feed - per-user queues of pre-shuffled character candidates
+
+Instead of sorting the whole catalog with ORDER BY random() on every page,
+each user has a discovery_queue of candidates that were filtered (active, not
+swiped yet) and shuffled once, at increasing positions. A page is an index
+range read after the cursor (the last position the client saw), so pages are
+stable and cost the same whatever the catalog and swipe history size. Swipes
+remove the swiped character's entry; when fewer than
+DISCOVERY_QUEUE_LOW_WATERMARK candidates remain ahead of the cursor, a
+background worker drops the entries behind the cursor (characters paged past
+without a swipe become candidates again) and appends another shuffled batch
+of DISCOVERY_QUEUE_SIZE.
+"""
+import logging
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.services.character_repository import parse_list
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PAGE_SQL = """
+    SELECT
+        q.position,
+        c.id,
+        c.name,
+        c.age,
+        c.gender,
+        c.personality as personality_traits,
+        c.interests,
+        c.background,
+        c.avatar_url,
+        c.avatar_variants
+    FROM discovery_queue q
+    JOIN characters c ON c.id = q.character_id
+    WHERE q.user_id = :user_id AND q.position > :cursor AND c.is_active = TRUE
+    ORDER BY q.position
+    LIMIT :limit
+"""
+
+# Active characters neither swiped nor already queued for the user
+CANDIDATES_SQL = """
+    SELECT c.id
+    FROM characters c
+    WHERE c.is_active = TRUE
+      AND NOT EXISTS (
+          SELECT 1 FROM interactions i WHERE i.user_id = :user_id AND i.character_id = c.id
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM discovery_queue q WHERE q.user_id = :user_id AND q.character_id = c.id
+      )
+"""
+
+@dataclass
+class FeedPage:
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    # Position of the last item; pass it back to get the next page
+    next_cursor: Optional[int] = None
+
+class DiscoveryFeed:
+    """Reads and maintains the per-user discovery queues"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        queue_size: Optional[int] = None,
+        low_watermark: Optional[int] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            session_factory: Callable returning a new SQLAlchemy session
+                (defaults to core.db.session.SessionLocal)
+            queue_size: Candidates appended by one refill
+            low_watermark: Remaining candidates below which a refill is requested
+            background: Whether refills run on a worker thread once started
+        """
+        self._session_factory = session_factory
+        self.queue_size = queue_size or settings.DISCOVERY_QUEUE_SIZE
+        self.low_watermark = low_watermark if low_watermark is not None else settings.DISCOVERY_QUEUE_LOW_WATERMARK
+        self.background = background
+
+        self._lock = threading.Lock()
+        # user_id -> cursor of the page that requested the refill
+        self._pending: Dict[str, int] = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.refills = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_page(self, db: Session, user_id: Any, limit: int = 10, cursor: Optional[int] = None) -> FeedPage:
+        """
+        Next page of the user's feed after ``cursor`` (from the start when None).
+        """
+        user_id = str(user_id)
+        cursor = cursor or 0
+        rows = self._read_page(db, user_id, limit, cursor)
+        if not rows:
+            # First visit or the queue ran out: fill it before answering
+            self.refill(user_id, cursor)
+            rows = self._read_page(db, user_id, limit, cursor)
+
+        if not rows:
+            return FeedPage(next_cursor=cursor)
+
+        next_cursor = rows[-1]["position"]
+        remaining = db.execute(text(
+            "SELECT COUNT(*) FROM discovery_queue WHERE user_id = :user_id AND position > :cursor"
+        ), {"user_id": user_id, "cursor": next_cursor}).scalar()
+        if remaining < self.low_watermark:
+            self.request_refill(user_id, next_cursor)
+
+        items = []
+        for row in rows:
+            character = {key: value for key, value in row.items() if key != "position"}
+            character["personality_traits"] = parse_list(character.get("personality_traits"))
+            character["interests"] = parse_list(character.get("interests"))
+            items.append(character)
+        return FeedPage(items=items, next_cursor=next_cursor)
+
+    def consume(self, db: Session, user_id: Any, character_id: Any) -> None:
+        """
+        Remove a swiped character from the user's queue in the caller's transaction.
+        """
+        try:
+            with db.begin_nested():
+                db.execute(text(
+                    "DELETE FROM discovery_queue WHERE user_id = :user_id AND character_id = :character_id"
+                ), {"user_id": str(user_id), "character_id": str(character_id)})
+        except Exception as e:
+            # The interaction is recorded anyway; the next refill skips swiped characters
+            logger.error(f"Error consuming discovery queue entry: {e}")
+
+    def refill(self, user_id: Any, cursor: int = 0) -> int:
+        """
+        Append a shuffled batch of new candidates to the user's queue.
+
+        Entries up to ``cursor`` were paged past without a swipe: they are
+        dropped first, so the queue stays bounded and those characters can
+        be queued again.
+
+        Returns:
+            int: Number of candidates queued
+        """
+        user_id = str(user_id)
+        db = self._get_session_factory()()
+        try:
+            # Positions keep growing past the cursor even when everything behind it is dropped
+            last = max(cursor, db.execute(text(
+                "SELECT COALESCE(MAX(position), 0) FROM discovery_queue WHERE user_id = :user_id"
+            ), {"user_id": user_id}).scalar())
+            if cursor:
+                db.execute(text(
+                    "DELETE FROM discovery_queue WHERE user_id = :user_id AND position <= :cursor"
+                ), {"user_id": user_id, "cursor": cursor})
+            candidates = [row[0] for row in db.execute(text(CANDIDATES_SQL), {"user_id": user_id})]
+            if not candidates:
+                db.commit()
+                return 0
+            batch = random.sample(candidates, min(len(candidates), self.queue_size))
+            db.execute(text(
+                "INSERT INTO discovery_queue (user_id, position, character_id, created_at) "
+                "VALUES (:user_id, :position, :character_id, CURRENT_TIMESTAMP)"
+            ), [
+                {"user_id": user_id, "position": last + i, "character_id": character_id}
+                for i, character_id in enumerate(batch, start=1)
+            ])
+            db.commit()
+        except IntegrityError:
+            # A concurrent refill of the same user won the positions
+            db.rollback()
+            return 0
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error refilling discovery queue: {e}")
+            return 0
+        finally:
+            db.close()
+
+        self.refills += 1
+        return len(batch)
+
+    def request_refill(self, user_id: Any, cursor: int = 0) -> None:
+        """Refill on the worker thread, or inline when it is not running."""
+        if not (self._worker and self._worker.is_alive()):
+            self.refill(user_id, cursor)
+            return
+        with self._lock:
+            user_id = str(user_id)
+            self._pending[user_id] = max(cursor, self._pending.get(user_id, 0))
+        self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the refill worker (no-op without background mode)."""
+        if not self.background or (self._worker and self._worker.is_alive()):
+            return
+        self._stopped.clear()
+        self._worker = threading.Thread(target=self._run, name="discovery-feed", daemon=True)
+        self._worker.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout=5.0)
+        self._worker = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"pending_refills": len(self._pending), "refills": self.refills}
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _read_page(self, db: Session, user_id: str, limit: int, cursor: int) -> List[Dict[str, Any]]:
+        result = db.execute(text(PAGE_SQL), {"user_id": user_id, "cursor": cursor, "limit": limit})
+        return [dict(row) for row in result]
+
+    def _get_session_factory(self):
+        if self._session_factory is None:
+            from core.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    user_id, cursor = self._pending.popitem()
+                self.refill(user_id, cursor)
+
+discovery_feed = DiscoveryFeed()
@@ -0,0 +1,289 @@
+"""
+Image variants - resized copies of uploaded photos and avatars in modern formats
+
+Photos and avatars used to be served only as uploaded. After an image is
+stored, the pipeline renders every variant in VARIANT_SIZES (longest edge in
+pixels, never upscaled) as WebP and JPEG, stores them next to the original
+(``<original without extension>/<variant>.<ext>``) and records their object
+names on the rows referencing the original: ``user_photos.variants`` and
+``characters.avatar_variants``. When the last row referencing an original
+goes away, ``delete_image`` removes the original together with its variants.
+
+Decoding, resizing and encoding are CPU-bound, so they run on a pool of
+IMAGE_VARIANT_WORKERS processes; a thread per worker feeds the pool and does
+the storage and database I/O, so uploads return as soon as the original is
+stored. Readers pick the requested size in the best format the client accepts
+with ``choose_variant`` and keep serving the original until variants exist.
+"""
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services import storage_service
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of each variant, largest first
+VARIANT_SIZES = {"full": 1440, "card": 640, "thumb": 160}
+# Preferred format first: (Pillow format, content type, extension)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+DEFAULT_VARIANT = "card"
+
+Variants = Dict[str, Dict[str, str]]
+
+def variant_object_name(object_name: str, variant: str, fmt: str) -> str:
+    return f"{os.path.splitext(object_name)[0]}/{variant}.{FORMATS[fmt][2]}"
+
+def all_variant_names(object_name: str, variants: Any = None) -> Set[str]:
+    """
+    Object names of every variant of an original: the recorded ones and the
+    ones the pipeline would store (they may exist before being recorded).
+    """
+    names = {
+        variant_object_name(object_name, variant, fmt)
+        for variant in VARIANT_SIZES for fmt in FORMATS
+    }
+    for formats in parse_variants(variants).values():
+        names.update(formats.values())
+    return names
+
+def delete_image(bucket: str, object_name: str, variants: Any = None) -> None:
+    """
+    Delete a stored original and all its variants; the caller checks that no row references it anymore.
+    """
+    for name in [object_name, *sorted(all_variant_names(object_name, variants))]:
+        try:
+            storage_service.delete_file(bucket, name)
+        except Exception as e:
+            logger.error(f"Error deleting {name} from storage: {e}")
+
+def render_variants(data: bytes, quality: int) -> Dict[Tuple[str, str], bytes]:
+    """
+    Render all variants of an image (runs in a pool process).
+
+    Returns:
+        {(variant, format): encoded bytes}
+    """
+    from PIL import Image, ImageOps
+
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG decoding can scale down by 1/2..1/8 for free when the target is small enough
+        largest = max(VARIANT_SIZES.values())
+        image.draft("RGB", (largest, largest))
+        transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = ImageOps.exif_transpose(image).convert("RGBA" if transparent else "RGB")
+        # Each variant is resized from the previous, larger one
+        for variant, edge in VARIANT_SIZES.items():
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt, (pil_format, _, _) in FORMATS.items():
+                output = image
+                if transparent and fmt == "jpeg":
+                    # JPEG has no alpha: flatten onto white (a plain convert would make it black)
+                    output = Image.new("RGB", image.size, (255, 255, 255))
+                    output.paste(image, mask=image.getchannel("A"))
+                buffer = io.BytesIO()
+                output.save(buffer, pil_format, quality=quality, optimize=fmt == "jpeg")
+                rendered[(variant, fmt)] = buffer.getvalue()
+    return rendered
+
+def parse_variants(value: Any) -> Variants:
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+
+def choose_variant(variants: Any, size: Optional[str] = None, accept: Optional[str] = None) -> Optional[str]:
+    """
+    Object name of the variant of ``size`` in the best format the client accepts.
+
+    Args:
+        variants: Recorded variants (JSON string or dict)
+        size: thumb, card or full (DEFAULT_VARIANT when not given)
+        accept: The client's Accept header; JPEG is served unless it lists image/webp
+
+    Returns:
+        The object name, or None when there are no variants (serve the original)
+    """
+    formats = parse_variants(variants).get(size or DEFAULT_VARIANT)
+    if not formats:
+        return None
+    if accept and "image/webp" in accept and "webp" in formats:
+        return formats["webp"]
+    return formats.get("jpeg") or next(iter(formats.values()))
+
+def variant_urls(bucket: str, variants: Any) -> Variants:
+    """
+    Canonical URLs of all recorded variants, {variant: {format: url}}.
+    """
+    return {
+        variant: {fmt: storage_service.object_url(bucket, name) for fmt, name in formats.items()}
+        for variant, formats in parse_variants(variants).items()
+    }
+
+class ImageVariantPipeline:
+    """Renders and records image variants in the background"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        workers: Optional[int] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            session_factory: Callable returning a new SQLAlchemy session
+                (defaults to core.db.session.SessionLocal)
+            workers: Rendering processes (and feeding threads)
+            background: Whether images are processed on the pools once started
+        """
+        self._session_factory = session_factory
+        self.workers = workers or settings.IMAGE_VARIANT_WORKERS
+        self.background = background
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+
+        self.processed = 0
+        self.reused = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, bucket: str, object_name: str, kind: str) -> None:
+        """
+        Generate the variants of a stored image.
+
+        Args:
+            kind: "photo" (user_photos.filename) or "avatar" (characters.avatar_url)
+
+        Runs on the pools once started, inline otherwise.
+        """
+        if not settings.IMAGE_VARIANTS_ENABLED:
+            return
+        if self._threads is None:
+            self.process(bucket, object_name, kind)
+            return
+        self._threads.submit(self.process, bucket, object_name, kind)
+
+    def process(self, bucket: str, object_name: str, kind: str) -> Optional[Variants]:
+        """
+        Render, store and record the variants of one image.
+
+        Returns:
+            The recorded variants, or None on failure
+        """
+        try:
+            variants = {
+                variant: {fmt: variant_object_name(object_name, variant, fmt) for fmt in FORMATS}
+                for variant in VARIANT_SIZES
+            }
+            # Variants are stored in a fixed order: if the last one exists, all do (same content)
+            last_variant, last_format = list(VARIANT_SIZES)[-1], list(FORMATS)[-1]
+            if storage_service.stat_file(bucket, variants[last_variant][last_format]) is not None:
+                self.reused += 1
+            else:
+                rendered = self._render(storage_service.read_file(bucket, object_name))
+                for variant in VARIANT_SIZES:
+                    for fmt, (_, content_type, _) in FORMATS.items():
+                        storage_service.upload_file(
+                            bucket, variants[variant][fmt], io.BytesIO(rendered[(variant, fmt)]),
+                            content_type=content_type, immutable=True
+                        )
+            if not self._record(bucket, object_name, kind, variants):
+                # The original was deleted or replaced while rendering: drop the variants with it
+                for name in all_variant_names(object_name):
+                    storage_service.delete_file(bucket, name)
+                logger.info(f"No rows reference {object_name} anymore, discarded its variants")
+                return None
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error generating image variants for {object_name}: {e}")
+            return None
+
+        self.processed += 1
+        return variants
+
+    def start(self) -> None:
+        """Start the worker pools (no-op without background mode)."""
+        if not self.background or self._threads is not None:
+            return
+        # spawn: forking a process with running threads can deadlock the child
+        self._processes = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-variants")
+
+    def stop(self) -> None:
+        threads, processes = self._threads, self._processes
+        self._threads = self._processes = None
+        if threads is not None:
+            threads.shutdown(wait=True, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=True, cancel_futures=True)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"processed": self.processed, "reused": self.reused, "failed": self.failed}
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _render(self, data: bytes) -> Dict[Tuple[str, str], bytes]:
+        processes = self._processes
+        if processes is None:
+            return render_variants(data, settings.IMAGE_VARIANT_QUALITY)
+        return processes.submit(render_variants, data, settings.IMAGE_VARIANT_QUALITY).result()
+
+    def _record(self, bucket: str, object_name: str, kind: str, variants: Variants) -> bool:
+        # Whether any row still references the original
+        value = json.dumps(variants)
+        db = self._get_session_factory()()
+        try:
+            if kind == "photo":
+                # Rows sharing deduplicated content share the variants too
+                result = db.execute(text("UPDATE user_photos SET variants = :variants WHERE filename = :filename"),
+                                    {"variants": value, "filename": object_name})
+            else:
+                result = db.execute(text(
+                    "UPDATE characters SET avatar_variants = :variants WHERE avatar_url = :url"
+                ), {"variants": value, "url": storage_service.object_url(bucket, object_name)})
+                if result.rowcount:
+                    from app.services.catalog_service import bump_catalog_version, character_catalog
+                    from app.services.character_repository import character_repository
+                    bump_catalog_version(db)
+                    db.commit()
+                    character_catalog.invalidate()
+                    character_repository.invalidate()
+                    return True
+            db.commit()
+            return bool(result.rowcount)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _get_session_factory(self):
+        if self._session_factory is None:
+            from core.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+image_pipeline = ImageVariantPipeline()
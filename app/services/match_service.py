@@ -1,20 +1,57 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import base64
+import json
 import logging
 import uuid
 
 logger = logging.getLogger(__name__)
 
-def get_user_matches(db: Session, user_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+def encode_cursor(match: Dict[str, Any]) -> str:
     """
-    Get all matches for a user
+    Opaque keyset cursor pointing after the given match
+    """
+    last_message_at = match["last_message_at"]
+    if isinstance(last_message_at, datetime):
+        last_message_at = last_message_at.isoformat()
+    raw = json.dumps([last_message_at, str(match["id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor from encode_cursor; raises ValueError if it is malformed
+    """
+    try:
+        last_message_at, match_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(last_message_at), str(match_id)
+    except Exception as e:
+        raise ValueError(f"Invalid matches cursor: {cursor}") from e
+
+def get_user_matches_page(db: Session, user_id: str, limit: int = 50,
+                          cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Get a page of the user's matches, most recent conversation first
+    
+    Matches are ordered by the denormalized last_message_at (the match time
+    until the first message) and paged by (last_message_at, id), so a page is
+    one range scan of the (user_id, last_message_at, id) index.
+    
+    Returns:
+        The matches and the cursor of the next page (None on the last page)
     """
     # Convert user_id to string if it's a UUID object
     if isinstance(user_id, uuid.UUID):
         user_id = str(user_id)
+    
+    params = {"user_id": user_id, "limit": limit + 1}
+    after = ""
+    if cursor:
+        params["last_message_at"], params["match_id"] = decode_cursor(cursor)
+        after = "AND (m.last_message_at, m.id) < (:last_message_at, :match_id)"
         
-    query = text("""
+    query = text(f"""
         SELECT 
             m.id,
             m.user_id,
@@ -23,32 +60,43 @@ def get_user_matches(db: Session, user_id: str, limit: int = 50, offset: int = 0
             c.avatar_url,
             m.match_strength,
             m.created_at,
-            (
-                SELECT MAX(msg.created_at)
-                FROM messages msg
-                WHERE 
-                    (msg.sender_id::text = m.user_id::text AND msg.recipient_id::text = m.character_id::text) OR
-                    (msg.sender_id::text = m.character_id::text AND msg.recipient_id::text = m.user_id::text)
-            ) AS last_interaction
+            m.last_message_at,
+            m.last_message_preview,
+            CASE WHEN m.last_message_preview IS NULL THEN NULL ELSE m.last_message_at END AS last_interaction
         FROM 
             matches m
         JOIN 
-            characters c ON m.character_id::text = c.id::text
+            characters c ON m.character_id = c.id
         WHERE 
-            m.user_id::text = :user_id::text
+            m.user_id = :user_id
+            {after}
         ORDER BY 
-            last_interaction DESC NULLS LAST,
-            m.created_at DESC
+            m.last_message_at DESC,
+            m.id DESC
         LIMIT :limit
-        OFFSET :offset
     """)
     
     try:
-        result = db.execute(query, {"user_id": user_id, "limit": limit, "offset": offset})
-        return [dict(row) for row in result]
+        matches = [dict(row) for row in db.execute(query, params)]
     except Exception as e:
         logger.error(f"Error getting user matches: {e}")
-        return []
+        return [], None
+    
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        next_cursor = encode_cursor(matches[-1])
+    for match in matches:
+        match["id"] = str(match["id"])
+        match["user_id"] = str(match["user_id"])
+        match["character_id"] = str(match["character_id"])
+    return matches, next_cursor
+
+def get_user_matches(db: Session, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Get all matches for a user
+    """
+    return get_user_matches_page(db, user_id, limit, cursor)[0]
 
 def get_match_by_id(db: Session, match_id: str) -> Optional[Dict[str, Any]]:
     """
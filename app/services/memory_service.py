@@ -9,6 +9,9 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from core.db.models.memory_entry import MemoryEntry, memory_content_hash
+from core.db.unit_of_work import SYSTEM_USER_ID
+
 logger = logging.getLogger(__name__)
 
 def get_memories(db: Session, character_id: str, user_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
@@ -198,6 +201,88 @@ def check_duplicate_memory(
         logger.error(f"Error checking duplicate memory: {e}")
         return False
 
+def bulk_create_memories(
+    db: Session,
+    character_id: str,
+    user_id: Optional[str],
+    memories: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Store a batch of memories for one (character, user) pair in a single INSERT
+
+    Memories whose content hash already exists for the pair, or repeats earlier
+    in the batch, are skipped. Unknown users fall back to the system user.
+
+    Returns:
+        dict: user_id the memories were stored for, created/duplicate counts and
+        a per-item list of {"index", "status", "id"}
+    """
+    if user_id:
+        known = db.execute(
+            text("SELECT 1 FROM users WHERE CAST(user_id AS TEXT) = :user_id"),
+            {"user_id": user_id}
+        ).fetchone()
+        if not known:
+            logger.warning(f"User {user_id} not found, storing memories for the system user")
+            user_id = None
+    user_id = user_id or SYSTEM_USER_ID
+
+    hashes = [memory_content_hash(m.get("content") or "") for m in memories]
+    table = MemoryEntry.__table__
+    existing = set()
+    if hashes:
+        existing = {
+            row[0] for row in db.execute(
+                table.select().with_only_columns([table.c.content_hash]).where(
+                    (table.c.character_id == character_id)
+                    & (table.c.user_id == user_id)
+                    & table.c.content_hash.in_(set(hashes))
+                )
+            )
+        }
+
+    results = []
+    rows = []
+    timestamp = datetime.now()
+    for index, (memory, content_hash) in enumerate(zip(memories, hashes)):
+        content = (memory.get("content") or "").strip()
+        if not content:
+            results.append({"index": index, "status": "invalid", "id": None})
+            continue
+        if content_hash in existing:
+            results.append({"index": index, "status": "duplicate", "id": None})
+            continue
+        existing.add(content_hash)
+
+        memory_id = str(uuid.uuid4())
+        memory_type = memory.get("memory_type") or memory.get("type") or "unknown"
+        rows.append({
+            "id": memory_id,
+            "character_id": character_id,
+            "user_id": user_id,
+            "type": memory_type,
+            "memory_type": memory_type,
+            "category": memory.get("category") or "general",
+            "content": content,
+            "content_hash": content_hash,
+            "importance": memory.get("importance", 5),
+            "is_active": True,
+            "created_at": timestamp,
+            "updated_at": timestamp
+        })
+        results.append({"index": index, "status": "created", "id": memory_id})
+
+    if rows:
+        db.execute(table.insert().values(rows))
+    db.commit()
+
+    return {
+        "user_id": user_id,
+        "created": len(rows),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "results": results
+    }
+
 def delete_memory(db: Session, memory_id: str) -> bool:
     """
     Delete a memory entry
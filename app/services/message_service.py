@@ -4,6 +4,8 @@ from typing import List, Dict, Any, Optional
 import logging
 import uuid
 
+from core.db.relationship_stats import record_messages
+
 logger = logging.getLogger(__name__)
 
 def get_messages(db: Session, limit: int = 100, offset: int = 0):
@@ -147,8 +149,16 @@ def save_message(
             "is_read": is_read,
             "is_gift": is_gift
         })
+        message_id = result.scalar()
+        record_messages(db, [{
+            "sender_id": sender_id,
+            "sender_type": sender_type,
+            "recipient_id": recipient_id,
+            "recipient_type": recipient_type,
+            "is_gift": is_gift
+        }])
         db.commit()
-        return result.scalar()
+        return message_id
     except Exception as e:
         db.rollback()
         logger.error(f"Error saving message: {e}")
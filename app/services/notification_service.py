@@ -1,7 +1,6 @@
 from sqlalchemy.orm import Session
 import logging
 import json
-import requests
 import uuid
 from typing import Dict, Any, List, Optional
 import time
@@ -9,6 +8,7 @@ import jwt
 from datetime import datetime, timedelta
 
 from core.db.models.device_token import DeviceToken
+from app.services.apns import build_payload, get_apns_sender
 from core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -125,55 +125,36 @@ def send_apple_push(device_token: str, title: str, body: str,
     Отправка push-уведомления на устройство Apple
     """
     try:
-        url = f"{APNSConfig.get_apns_url()}/{device_token}"
-        
-        # Заголовки запроса
-        headers = {
-            "apns-topic": APNSConfig.bundle_id,
-            "authorization": f"bearer {APNSConfig.get_auth_token()}"
-        }
-        
-        # Тело уведомления
-        payload = {
-            "aps": {
-                "alert": {
-                    "title": title,
-                    "body": body
-                },
-                "sound": "default"
-            }
-        }
-        
-        # Добавляем badge, если он указан
-        if badge is not None:
-            payload["aps"]["badge"] = badge
-            
-        # Добавляем дополнительные данные, если они указаны
-        if data:
-            payload["data"] = data
-            
-        # Отправляем запрос
-        response = requests.post(
-            url, 
-            headers=headers,
-            json=payload
-        )
-        
-        # Проверяем статус ответа
-        if response.status_code == 200:
-            return True
-        else:
-            logger.error(f"Error sending push notification: {response.status_code} - {response.text}")
-            return False
+        results = get_apns_sender().send_batch([device_token], build_payload(title, body, data, badge))
+        return results[0].ok
     except Exception as e:
         logger.error(f"Exception sending push notification: {e}")
         return False
 
+def deactivate_device_tokens(db: Session, device_tokens: List[str]) -> int:
+    """
+    Деактивация токенов, которые APNS больше не принимает (410 / BadDeviceToken)
+    """
+    if not device_tokens:
+        return 0
+    try:
+        count = db.query(DeviceToken).filter(
+            DeviceToken.device_token.in_(device_tokens)
+        ).update({"is_active": False}, synchronize_session=False)
+        db.commit()
+        logger.info(f"Deactivated {count} unregistered device tokens")
+        return count
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error deactivating device tokens: {e}")
+        return 0
+
 def send_notification_to_user(db: Session, user_id: str, title: str, body: str, 
                             data: Dict[str, Any] = None) -> int:
     """
     Отправка уведомления всем устройствам пользователя
     
+    Уведомления на iOS-устройства уходят одним пакетом параллельно.
     Возвращает количество успешно отправленных уведомлений
     """
     try:
@@ -186,19 +167,37 @@ def send_notification_to_user(db: Session, user_id: str, title: str, body: str,
         if not device_tokens:
             return 0
             
-        success_count = 0
+        ios_tokens = [d.device_token for d in device_tokens if d.device_type.lower() == 'ios']
+        # TODO: Реализовать отправку через FCM для Android
         
-        # Отправляем уведомления на все устройства
-        for device in device_tokens:
-            if device.device_type.lower() == 'ios':
-                # Отправляем через APNS
-                if send_apple_push(device.device_token, title, body, data):
-                    success_count += 1
-            elif device.device_type.lower() == 'android':
-                # TODO: Реализовать отправку через FCM для Android
-                pass
+        if not ios_tokens:
+            return 0
+            
+        # Отправляем через APNS
+        results = get_apns_sender().send_batch(ios_tokens, build_payload(title, body, data))
+        deactivate_device_tokens(db, [r.device_token for r in results if r.unregistered])
                 
-        return success_count
+        return sum(1 for r in results if r.ok)
     except Exception as e:
         logger.error(f"Error sending notification to user: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+def notify_activated_events(events: List[Dict[str, Any]]) -> None:
+    """
+    Уведомление пользователей о событиях, которые активировал планировщик событий
+    """
+    from app.db.session import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        for event in events:
+            details = event.get("details") or {}
+            send_notification_to_user(
+                db,
+                event["user_id"],
+                title=details.get("name", "Новое событие"),
+                body=details.get("description", "Скоро у вас событие"),
+                data={"type": "event", "event_id": event["event_id"], "partner_id": event["partner_id"]}
+            )
+    finally:
+        db.close()
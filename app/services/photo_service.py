@@ -6,21 +6,45 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from core.db.models.user_photo import UserPhoto
-from app.services.storage_service import delete_file
+from app.services import storage_service
+from app.services.image_variants import choose_variant, delete_image, image_pipeline
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
-def get_user_photos(db: Session, user_id: str) -> List[Dict[str, Any]]:
+def photo_read_url(filename: str, url: str) -> str:
+    """
+    URL для чтения фотографии: из приватного бакета отдается presigned GET URL
+    """
+    if storage_service.supports_direct_uploads() and not settings.MINIO_PUBLIC_BUCKETS:
+        return storage_service.read_url(settings.S3_BUCKET_NAME, filename)
+    return url
+
+def photo_variant_url(photo: UserPhoto, size: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """
+    URL уменьшенной копии фотографии нужного размера в лучшем поддерживаемом клиентом формате,
+    или оригинала, пока копии не готовы
+    """
+    variant = choose_variant(photo.variants, size, accept)
+    if variant:
+        return storage_service.read_url(settings.S3_BUCKET_NAME, variant)
+    return photo_read_url(photo.filename, photo.url)
+
+def get_user_photos(db: Session, user_id: str, size: Optional[str] = None,
+                    accept: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Получить все фотографии пользователя
+    
+    Args:
+        size: Размер копии (thumb, card, full)
+        accept: Заголовок Accept клиента для выбора формата
     """
     try:
         photos = db.query(UserPhoto).filter(UserPhoto.user_id == user_id).order_by(UserPhoto.order).all()
         return [
             {
                 "id": str(photo.id),
-                "url": photo.url,
+                "url": photo_variant_url(photo, size, accept),
                 "is_primary": photo.is_primary,
                 "created_at": photo.created_at.isoformat() if photo.created_at else None
             }
@@ -30,6 +54,16 @@ def get_user_photos(db: Session, user_id: str) -> List[Dict[str, Any]]:
         logger.error(f"Error getting user photos: {e}")
         return []
 
+def get_photo_id_by_filename(db: Session, user_id: str, filename: str) -> Optional[str]:
+    """
+    Найти фотографию пользователя по имени объекта в хранилище
+    """
+    photo = db.query(UserPhoto.id).filter(
+        UserPhoto.user_id == user_id,
+        UserPhoto.filename == filename
+    ).first()
+    return str(photo.id) if photo else None
+
 def create_photo(db: Session, user_id: str, url: str, filename: str, 
                 content_type: str = None, size: int = None, is_primary: bool = False) -> Optional[str]:
     """
@@ -68,6 +102,9 @@ def create_photo(db: Session, user_id: str, url: str, filename: str,
         db.commit()
         db.refresh(new_photo)
         
+        # Уменьшенные копии создаются в фоне
+        image_pipeline.submit(settings.S3_BUCKET_NAME, filename, "photo")
+        
         return str(new_photo.id)
     except Exception as e:
         db.rollback()
@@ -88,16 +125,18 @@ def delete_photo(db: Session, user_id: str, photo_id: str) -> bool:
             logger.warning(f"Photo {photo_id} not found for user {user_id}")
             return False
         
-        # Delete file from storage
-        try:
-            bucket = settings.S3_BUCKET_NAME
-            delete_file(bucket, photo.filename)
-        except Exception as e:
-            logger.error(f"Error deleting file from storage: {e}")
+        # Файл и его уменьшенные копии удаляются, если другие фото не ссылаются на то же содержимое
+        shared = db.query(UserPhoto.id).filter(
+            UserPhoto.filename == photo.filename,
+            UserPhoto.id != photo.id
+        ).first()
+        filename, variants = photo.filename, photo.variants
         
         # Delete DB record
         db.delete(photo)
         db.commit()
+        if not shared:
+            delete_image(settings.S3_BUCKET_NAME, filename, variants)
         
         # Обновляем порядок оставшихся фото
         photos = db.query(UserPhoto).filter(UserPhoto.user_id == user_id).order_by(UserPhoto.order).all()
@@ -0,0 +1,286 @@
+"""
+Character recommendations - vectorized scoring for the discover feed
+
+Every active character is encoded once as an L2-normalized bag of its
+personality traits and interests, stored as a row of a preloaded float32
+matrix. A user is encoded in the same space from the interests of their
+profile and the characters they liked (superlikes count double). Ranking a
+request is then one matrix-vector product over the whole catalog, followed by
+a maximal marginal relevance re-rank of the best candidates, so consecutive
+cards are not near-duplicates.
+
+The matrix follows the character catalog version: when it changes, only the
+characters updated since the last load are re-encoded; a full rebuild happens
+when rows disappeared without an update (hard deletes).
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.catalog_service import read_catalog_version
+from app.services.character_repository import parse_list
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LIKE_WEIGHT = 1.0
+SUPERLIKE_WEIGHT = 2.0
+PROFILE_INTEREST_WEIGHT = 1.0
+# Candidates re-ranked for diversity, per requested card
+POOL_FACTOR = 5
+# Breaks ties between equal scores (e.g. users without history) randomly
+JITTER = 1e-3
+
+CHARACTERS_SQL = """
+    SELECT id, personality, interests, is_active, COALESCE(updated_at, created_at) AS changed_at
+    FROM characters
+"""
+
+def _tokens(prefix: str, values: Iterable[Any]) -> List[str]:
+    return [f"{prefix}:{str(value).strip().lower()}" for value in values if str(value).strip()]
+
+def character_features(personality: Any, interests: Any) -> List[str]:
+    """Feature names of a character (traits and interests are separate namespaces)"""
+    return _tokens("trait", parse_list(personality)) + _tokens("interest", parse_list(interests))
+
+class CharacterRecommender:
+    """Character feature matrix kept in memory and ranked per user"""
+
+    def __init__(self, check_interval: Optional[float] = None, diversity: float = 0.3, seed: Optional[int] = None):
+        """
+        Args:
+            check_interval: Seconds between checks of the catalog version
+            diversity: Weight of the similarity penalty in the re-rank (0 = pure relevance)
+            seed: Seed of the tie-breaking jitter
+        """
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else settings.CHARACTER_CATALOG_VERSION_CHECK_INTERVAL
+        )
+        self.diversity = diversity
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+
+        self._features: Dict[str, int] = {}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+        self._loaded = False
+        self._version: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._changed_since: Any = None
+
+        self.rebuilds = 0
+        self.updates = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def recommend_for_user(self, db: Session, user_id: Any, limit: int = 10) -> List[str]:
+        """
+        Ids of the characters to show the user next, best first.
+
+        Characters the user already swiped are never returned.
+        """
+        self.ensure_fresh(db)
+        user_id = str(user_id)
+        liked: List[Tuple[str, float]] = []
+        swiped = set()
+        try:
+            for character_id, interaction_type in db.execute(text(
+                "SELECT character_id, interaction_type FROM interactions WHERE user_id = :user_id"
+            ), {"user_id": user_id}):
+                swiped.add(str(character_id))
+                if interaction_type == "like":
+                    liked.append((str(character_id), LIKE_WEIGHT))
+                elif interaction_type == "superlike":
+                    liked.append((str(character_id), SUPERLIKE_WEIGHT))
+        except Exception as e:
+            logger.warning(f"Interactions unavailable for recommendations: {e}")
+            db.rollback()
+
+        interests: List[Any] = []
+        try:
+            interests = parse_list(db.execute(text(
+                "SELECT interests FROM user_profiles WHERE CAST(user_id AS TEXT) = :user_id"
+            ), {"user_id": user_id}).scalar())
+        except Exception as e:
+            logger.warning(f"User profile unavailable for recommendations: {e}")
+            db.rollback()
+
+        with self._lock:
+            return self.rank(self.user_vector(interests, liked), limit, exclude=swiped)
+
+    def user_vector(self, interests: Iterable[Any], liked: Sequence[Tuple[str, float]] = ()) -> np.ndarray:
+        """Encode a user from profile interests and (character id, weight) likes."""
+        with self._lock:
+            vector = np.zeros(len(self._features), dtype=np.float32)
+            for feature in _tokens("interest", interests):
+                column = self._features.get(feature)
+                if column is not None:
+                    vector[column] += PROFILE_INTEREST_WEIGHT
+            rows = [(self._rows[character_id], weight) for character_id, weight in liked
+                    if character_id in self._rows]
+            if rows:
+                indexes, weights = zip(*rows)
+                vector += np.asarray(weights, dtype=np.float32) @ self._matrix[list(indexes), :len(vector)]
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else vector
+
+    def rank(self, user_vector: np.ndarray, limit: int, exclude: Iterable[str] = ()) -> List[str]:
+        """
+        Score every character against the user vector and re-rank the best for diversity.
+        """
+        with self._lock:
+            size = len(self._ids)
+            if not size or limit <= 0:
+                return []
+            matrix = self._matrix[:size, :len(user_vector)]
+            scores = matrix @ user_vector + self._rng.random(size, dtype=np.float32) * JITTER
+            excluded = [self._rows[character_id] for character_id in exclude if character_id in self._rows]
+            scores[excluded] = -np.inf
+
+            available = size - len(excluded)
+            pool_size = min(available, limit * POOL_FACTOR)
+            if pool_size <= 0:
+                return []
+            pool = np.argpartition(-scores, pool_size - 1)[:pool_size]
+            relevance = scores[pool]
+            vectors = matrix[pool]
+
+            selected: List[int] = []
+            max_similarity = np.zeros(pool_size, dtype=np.float32)
+            chosen = np.zeros(pool_size, dtype=bool)
+            for _ in range(min(limit, pool_size)):
+                mmr = (1 - self.diversity) * relevance - self.diversity * max_similarity
+                mmr[chosen] = -np.inf
+                best = int(np.argmax(mmr))
+                chosen[best] = True
+                selected.append(int(pool[best]))
+                max_similarity = np.maximum(max_similarity, vectors @ vectors[best])
+            return [self._ids[row] for row in selected]
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Load the matrix, or apply catalog changes, at most every check_interval seconds."""
+        if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            version = read_catalog_version(db)
+            if not self._loaded:
+                self.rebuild(db)
+            elif version is None or version != self._version:
+                self.apply_changes(db)
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def rebuild(self, db: Session) -> None:
+        """Encode the whole catalog from scratch."""
+        rows = [dict(row) for row in db.execute(text(CHARACTERS_SQL))]
+        with self._lock:
+            self._features = {}
+            self._matrix = np.zeros((max(len(rows), 16), 64), dtype=np.float32)
+            self._ids = []
+            self._rows = {}
+            self._changed_since = None
+            for row in rows:
+                self._apply_row(row)
+            self._loaded = True
+            self.rebuilds += 1
+        logger.info(f"Recommendation matrix built: {len(self._ids)} characters, {len(self._features)} features")
+
+    def apply_changes(self, db: Session) -> None:
+        """Re-encode the characters changed since the last load."""
+        if self._changed_since is None:
+            self.rebuild(db)
+            return
+        rows = [dict(row) for row in db.execute(
+            text(CHARACTERS_SQL + " WHERE COALESCE(updated_at, created_at) >= :since"),
+            {"since": self._changed_since}
+        )]
+        with self._lock:
+            for row in rows:
+                self._apply_row(row)
+            self.updates += len(rows)
+            active = db.execute(text("SELECT COUNT(*) FROM characters WHERE is_active = TRUE")).scalar()
+        if active != len(self._ids):
+            # Rows were deleted or deactivated without an update timestamp
+            self.rebuild(db)
+
+    def upsert(self, character_id: Any, personality: Any, interests: Any) -> None:
+        """Encode or re-encode one character."""
+        with self._lock:
+            self._apply_row({"id": character_id, "personality": personality, "interests": interests,
+                             "is_active": True})
+
+    def remove(self, character_id: Any) -> None:
+        with self._lock:
+            row = self._rows.pop(str(character_id), None)
+            if row is None:
+                return
+            last = len(self._ids) - 1
+            if row != last:
+                # Move the last row into the hole to keep rows contiguous
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._matrix[last] = 0
+            self._ids.pop()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "characters": len(self._ids),
+            "features": len(self._features),
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _apply_row(self, row: Dict[str, Any]) -> None:
+        character_id = str(row["id"])
+        changed_at = row.get("changed_at")
+        if changed_at is not None and (self._changed_since is None or changed_at > self._changed_since):
+            self._changed_since = changed_at
+        if not row.get("is_active"):
+            self.remove(character_id)
+            return
+
+        columns = [self._feature_column(feature) for feature in character_features(row.get("personality"), row.get("interests"))]
+        vector = np.zeros(self._matrix.shape[1], dtype=np.float32)
+        np.add.at(vector, columns, 1.0)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+
+        row_index = self._rows.get(character_id)
+        if row_index is None:
+            row_index = len(self._ids)
+            if row_index >= self._matrix.shape[0]:
+                self._matrix = np.pad(self._matrix, ((0, self._matrix.shape[0]), (0, 0)))
+            self._ids.append(character_id)
+            self._rows[character_id] = row_index
+        self._matrix[row_index] = vector
+
+    def _feature_column(self, feature: str) -> int:
+        column = self._features.get(feature)
+        if column is None:
+            column = len(self._features)
+            self._features[feature] = column
+            if column >= self._matrix.shape[1]:
+                # Grow the vocabulary geometrically; existing rows keep their values
+                self._matrix = np.pad(self._matrix, ((0, 0), (0, max(self._matrix.shape[1], 16))))
+        return column
+
+character_recommender = CharacterRecommender()
@@ -1,79 +1,405 @@
+"""
+File storage on the local filesystem or Minio/S3.
+
+Uploads are streamed in STORAGE_CHUNK_SIZE chunks and never held in memory;
+the size and SHA-256 of the content are computed while reading, and objects
+larger than STORAGE_PART_SIZE go to Minio as a multipart upload. Buckets known
+to exist are cached per process, so an upload is a single request.
+
+``store_file`` names objects after their content hash under a prefix: storing
+the same bytes again only returns the existing object, costing no storage or
+bandwidth. Whether the object exists is asked from the storage on every
+store (another worker may have deleted it), never cached. ``upload_file``
+writes to an exact object name.
+
+Clients can also upload to and read from Minio directly with presigned URLs
+(``presigned_put_url``, ``read_url``), so media bytes never pass through the
+API workers. Presigning is done offline against MINIO_PUBLIC_URL, the
+address clients reach.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Optional, Set, Tuple
+from urllib.parse import urlparse
+
 from minio import Minio
+from minio.commonconfig import ENABLED, CopySource, Filter
 from minio.error import S3Error
+from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
 from core.config import settings
-import os
 
-# Initialize Minio client if configured
+logger = logging.getLogger(__name__)
+
+# Created on first use by get_minio_client / get_presign_client
 _minio_client = None
-if settings.STORAGE_TYPE.lower() in ("minio", "s3") and settings.S3_ENDPOINT and settings.S3_ACCESS_KEY and settings.S3_SECRET_KEY:
-    _minio_client = Minio(
-        endpoint=settings.S3_ENDPOINT,
-        access_key=settings.S3_ACCESS_KEY,
-        secret_key=settings.S3_SECRET_KEY,
-        secure=settings.S3_ENDPOINT.startswith("https://")
-    )
+_presign_client = None
+_client_lock = threading.Lock()
+# Buckets known to exist in this process
+_known_buckets: Set[str] = set()
+# (bucket, prefix) pairs whose expiry rule was set by this process
+_expiring_prefixes: Set[Tuple[str, str]] = set()
+
+@dataclass
+class StoredFile:
+    object_name: str
+    url: str
+    size: int
+    sha256: str
+    # True if identical content was already stored and nothing was uploaded
+    deduplicated: bool = False
+
 
+def _use_minio() -> bool:
+    return settings.STORAGE_TYPE.lower() in ("minio", "s3") and get_minio_client() is not None
 
-def upload_file(bucket: str, object_name: str, file_obj, content_type: str = None) -> str:
+
+def get_minio_client() -> Optional[Minio]:
     """
-    Uploads a file to storage (local or Minio/S3) and returns the public URL.
+    Return the Minio client if Minio/S3 storage is configured.
     """
-    # Read file bytes
-    file_obj.seek(0)
-    data = file_obj.read()
-    size = len(data)
-    file_obj.seek(0)
+    global _minio_client
+    if _minio_client is None and settings.STORAGE_TYPE.lower() in ("minio", "s3") \
+            and settings.S3_ENDPOINT and settings.S3_ACCESS_KEY and settings.S3_SECRET_KEY:
+        with _client_lock:
+            if _minio_client is None:
+                # Minio takes host:port, the setting may include the scheme
+                parsed = urlparse(settings.S3_ENDPOINT if "://" in settings.S3_ENDPOINT
+                                  else f"http://{settings.S3_ENDPOINT}")
+                _minio_client = Minio(
+                    endpoint=parsed.netloc,
+                    access_key=settings.S3_ACCESS_KEY,
+                    secret_key=settings.S3_SECRET_KEY,
+                    secure=parsed.scheme == "https",
+                    region=settings.S3_REGION
+                )
+    return _minio_client
 
-    # Minio/S3 storage
-    if settings.STORAGE_TYPE.lower() in ("minio", "s3") and _minio_client:
-        # Ensure bucket exists
-        try:
-            if not _minio_client.bucket_exists(bucket):
-                _minio_client.make_bucket(bucket)
-        except S3Error:
-            pass
 
-        # Upload object
-        try:
-            _minio_client.put_object(
-                bucket_name=bucket,
-                object_name=object_name,
-                data=file_obj,
-                length=size,
-                content_type=content_type
-            )
-        except S3Error as e:
+def get_presign_client() -> Optional[Minio]:
+    """
+    Return a client for presigning URLs on the public endpoint (no network access).
+    """
+    global _presign_client
+    if _presign_client is None and get_minio_client() is not None:
+        with _client_lock:
+            if _presign_client is None:
+                public_url = os.getenv("MINIO_PUBLIC_URL", settings.MINIO_PUBLIC_URL or settings.S3_ENDPOINT)
+                parsed = urlparse(public_url if "://" in public_url else f"http://{public_url}")
+                _presign_client = Minio(
+                    endpoint=parsed.netloc,
+                    access_key=settings.S3_ACCESS_KEY,
+                    secret_key=settings.S3_SECRET_KEY,
+                    secure=parsed.scheme == "https",
+                    # A known region avoids the region lookup request
+                    region=settings.S3_REGION or "us-east-1"
+                )
+    return _presign_client
+
+
+def supports_direct_uploads() -> bool:
+    return _use_minio()
+
+
+def _ensure_bucket(client: Minio, bucket: str) -> None:
+    if bucket in _known_buckets:
+        return
+    try:
+        if not client.bucket_exists(bucket):
+            client.make_bucket(bucket)
+    except S3Error as e:
+        # Created concurrently by another process
+        if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
             raise
+    _known_buckets.add(bucket)
+
+
+def _object_exists(client: Minio, bucket: str, object_name: str) -> bool:
+    try:
+        client.stat_object(bucket, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+            return False
+        raise
+    return True
+
 
-        # Construct URL
+def object_url(bucket: str, object_name: str) -> str:
+    """
+    Canonical (public) URL of an object, the one stored in the database.
+    """
+    if _use_minio():
         public_url = os.getenv("MINIO_PUBLIC_URL", settings.S3_ENDPOINT)
         # remove protocol prefix if present
         public_url = public_url.rstrip("/")
         return f"{public_url}/{bucket}/{object_name}"
-
-    # Local filesystem storage
     upload_dir = settings.UPLOAD_DIR.rstrip("/")
-    path = os.path.join(upload_dir, object_name)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "wb") as f:
-        f.write(data)
     base_url = settings.BASE_URL.rstrip("/")
     return f"{base_url}/{upload_dir}/{object_name}"
 
 
+def object_name_from_url(bucket: str, url: Optional[str]) -> Optional[str]:
+    """
+    Object name of a canonical URL made by ``object_url``, or None for any other URL.
+    """
+    prefix = object_url(bucket, "")
+    if url and url.startswith(prefix) and len(url) > len(prefix):
+        return url[len(prefix):]
+    return None
+
+
+def _local_path(object_name: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR.rstrip("/"), object_name)
+
+
+def _spool(file_obj: BinaryIO, target: Optional[BinaryIO] = None) -> Tuple[int, str]:
+    """
+    Read a file to the end in chunks, copying it to ``target`` if given.
+
+    Returns:
+        (size, sha256 hex digest) of the content
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = file_obj.read(settings.STORAGE_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+        if target is not None:
+            target.write(chunk)
+    return size, digest.hexdigest()
+
+
+def _put_object(client: Minio, bucket: str, object_name: str, file_obj: BinaryIO,
+                size: int, content_type: Optional[str], immutable: bool = False) -> None:
+    _ensure_bucket(client, bucket)
+    # Split into parts of STORAGE_PART_SIZE above that size (multipart upload)
+    client.put_object(
+        bucket_name=bucket,
+        object_name=object_name,
+        data=file_obj,
+        length=size,
+        content_type=content_type or "application/octet-stream",
+        part_size=settings.STORAGE_PART_SIZE,
+        metadata={"Cache-Control": settings.MEDIA_CACHE_CONTROL} if immutable else None
+    )
+
+
+def _write_local(file_obj: BinaryIO, object_name: str, path_for=None) -> Tuple[str, int, str, bool]:
+    """
+    Stream a file to local storage through a temporary file renamed into place.
+
+    ``path_for(sha256)`` picks the object name once the hash is known; an
+    existing file at that name is kept and the copy discarded.
+    """
+    upload_dir = settings.UPLOAD_DIR.rstrip("/")
+    os.makedirs(upload_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", delete=False) as tmp:
+        size, sha256 = _spool(file_obj, tmp)
+    if path_for is not None:
+        object_name = path_for(sha256)
+    path = _local_path(object_name)
+    if path_for is not None and os.path.exists(path):
+        os.remove(tmp.name)
+        return object_name, size, sha256, True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp.name, path)
+    return object_name, size, sha256, False
+
+
+def _seekable_copy(file_obj: BinaryIO):
+    """
+    Hash a file and return it positioned at the start; non-seekable streams are spooled to a temp file.
+    """
+    if getattr(file_obj, "seekable", lambda: False)():
+        file_obj.seek(0)
+        size, sha256 = _spool(file_obj)
+        file_obj.seek(0)
+        return file_obj, size, sha256
+    spooled = tempfile.SpooledTemporaryFile(max_size=settings.STORAGE_CHUNK_SIZE)
+    size, sha256 = _spool(file_obj, spooled)
+    spooled.seek(0)
+    return spooled, size, sha256
+
+
+def upload_file(bucket: str, object_name: str, file_obj, content_type: str = None,
+                immutable: bool = False) -> str:
+    """
+    Uploads a file to storage (local or Minio/S3) and returns the public URL.
+
+    ``immutable`` marks objects whose name changes with their content as cacheable forever.
+    """
+    if _use_minio():
+        if getattr(file_obj, "seekable", lambda: False)():
+            size = file_obj.seek(0, os.SEEK_END)
+            file_obj.seek(0)
+        else:
+            # Unknown length: Minio streams it as a multipart upload
+            size = -1
+        _put_object(get_minio_client(), bucket, object_name, file_obj, size, content_type, immutable=immutable)
+        return object_url(bucket, object_name)
+
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    _write_local(file_obj, object_name)
+    return object_url(bucket, object_name)
+
+
+def store_file(bucket: str, prefix: str, file_obj, filename: str = None,
+               content_type: str = None) -> StoredFile:
+    """
+    Store a file under ``prefix`` named after its SHA-256, uploading it only if that content is new.
+
+    Args:
+        bucket: Bucket (Minio/S3 only)
+        prefix: Object name prefix, e.g. "characters/<id>"
+        file_obj: Binary file object, read in chunks
+        filename: Original name, only used for the extension
+        content_type: MIME type of the content
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+
+    def object_name_for(sha256: str) -> str:
+        return f"{prefix.strip('/')}/{sha256}{extension}"
+
+    if _use_minio():
+        client = get_minio_client()
+        data, size, sha256 = _seekable_copy(file_obj)
+        object_name = object_name_for(sha256)
+        deduplicated = _object_exists(client, bucket, object_name)
+        if not deduplicated:
+            # Content-addressed objects never change and can be cached by clients
+            _put_object(client, bucket, object_name, data, size, content_type, immutable=True)
+    else:
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        object_name, size, sha256, deduplicated = _write_local(file_obj, None, path_for=object_name_for)
+
+    if deduplicated:
+        logger.info(f"Reused stored object {object_name} for identical content")
+    return StoredFile(
+        object_name=object_name,
+        url=object_url(bucket, object_name),
+        size=size,
+        sha256=sha256,
+        deduplicated=deduplicated
+    )
+
+
+def presigned_put_url(bucket: str, object_name: str, expires: int) -> str:
+    """
+    Presigned URL the client PUTs the object to directly (Minio/S3 only).
+    """
+    client = get_minio_client()
+    if client is None:
+        raise RuntimeError("Direct uploads require Minio/S3 storage")
+    _ensure_bucket(client, bucket)
+    return get_presign_client().presigned_put_object(bucket, object_name, expires=timedelta(seconds=expires))
+
+
+def copy_file(bucket: str, source: str, target: str) -> None:
+    """
+    Server-side copy of an object within a bucket (Minio/S3 only), keeping its metadata.
+    """
+    client = get_minio_client()
+    if client is None:
+        raise RuntimeError("Server-side copies require Minio/S3 storage")
+    client.copy_object(bucket, target, CopySource(bucket, source))
+
+
+def expire_prefix(bucket: str, prefix: str, days: int) -> None:
+    """
+    Make the bucket delete objects under prefix after the given number of days
+    (a lifecycle rule, Minio/S3 only). Rules for other prefixes are kept.
+    """
+    client = get_minio_client()
+    if client is None or (bucket, prefix) in _expiring_prefixes:
+        return
+    rule_id = f"expire-{prefix.strip('/')}"
+    try:
+        config = client.get_bucket_lifecycle(bucket)
+        rules = [rule for rule in (config.rules if config else []) if rule.rule_id != rule_id]
+        rules.append(Rule(ENABLED, rule_filter=Filter(prefix=f"{prefix.strip('/')}/"),
+                          rule_id=rule_id, expiration=Expiration(days=days)))
+        client.set_bucket_lifecycle(bucket, LifecycleConfig(rules))
+    except S3Error as e:
+        # Not fatal: stale objects then stay until removed by hand
+        logger.warning(f"Could not set expiry for {bucket}/{prefix}: {e}")
+    _expiring_prefixes.add((bucket, prefix))
+
+
+def read_file(bucket: str, object_name: str) -> bytes:
+    """
+    Read a whole stored object (meant for images, which are bounded in size).
+    """
+    if _use_minio():
+        response = get_minio_client().get_object(bucket, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    with open(_local_path(object_name), "rb") as f:
+        return f.read()
+
+
+def stat_file(bucket: str, object_name: str) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    Size and content type of a stored object, or None if it does not exist.
+    """
+    if _use_minio():
+        try:
+            stat = get_minio_client().stat_object(bucket, object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return None
+            raise
+        return stat.size, stat.content_type
+    path = _local_path(object_name)
+    if not os.path.exists(path):
+        return None
+    return os.path.getsize(path), None
+
+
+def read_url(bucket: str, object_name: str) -> str:
+    """
+    URL clients download an object from: the public URL when buckets are public
+    (or storage is local), a presigned GET URL with long cache headers otherwise.
+
+    Presigned URLs are signed at the start of the current PRESIGNED_GET_WINDOW,
+    so the same object gets the same URL for the whole window and client and
+    CDN caches keyed by URL keep hitting.
+    """
+    if not _use_minio() or settings.MINIO_PUBLIC_BUCKETS:
+        return object_url(bucket, object_name)
+    window = max(1, settings.PRESIGNED_GET_WINDOW)
+    now = datetime.now(timezone.utc).timestamp()
+    return get_presign_client().presigned_get_object(
+        bucket, object_name,
+        expires=timedelta(seconds=settings.PRESIGNED_GET_TTL),
+        response_headers={"response-cache-control": settings.MEDIA_CACHE_CONTROL},
+        request_date=datetime.fromtimestamp(now - now % window, timezone.utc)
+    )
+
+
 def delete_file(bucket: str, object_name: str):
     """
     Deletes a file from storage (local or Minio/S3).
     """
-    if settings.STORAGE_TYPE.lower() in ("minio", "s3") and _minio_client:
+    if _use_minio():
         try:
-            _minio_client.remove_object(bucket, object_name)
+            get_minio_client().remove_object(bucket, object_name)
         except S3Error:
             pass
     else:
         # Local filesystem delete
-        path = os.path.join(settings.UPLOAD_DIR.rstrip("/"), object_name)
         try:
-            os.remove(path)
+            os.remove(_local_path(object_name))
         except OSError:
-            pass
\ No newline at end of file
+            pass
@@ -0,0 +1,135 @@
+"""
+Direct-to-storage uploads through upload intents
+
+Instead of streaming media through the API, a client asks for an upload
+intent: the API checks the declared content type and size, reserves a unique
+object name and returns a presigned PUT URL together with a signed upload
+token. The client uploads the bytes straight to Minio/S3, then completes the
+upload with the token; the API checks the stored object against the intent
+(existence, declared size, content type) before registering it. Objects that
+violate the intent are deleted.
+
+Clients upload under UPLOAD_INTENT_PREFIX, and completion copies the object
+to its final name. Uploads that are never completed are therefore the only
+objects under that prefix, and a bucket lifecycle rule deletes them after
+UPLOAD_INTENT_EXPIRY_DAYS.
+"""
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+import jwt
+
+from app.services import storage_service
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ALGORITHM = "HS256"
+TOKEN_AUDIENCE = "upload-intent"
+
+class UploadIntentError(ValueError):
+    """The intent or the uploaded object does not satisfy the upload constraints"""
+
+@dataclass
+class CompletedUpload:
+    object_name: str
+    url: str
+    size: int
+    content_type: str
+
+def create_upload_intent(bucket: str, owner: str, prefix: str, content_type: str, size: int,
+                         allowed_types: Iterable[str], max_size: int,
+                         filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Validate a planned upload and presign the PUT request for it.
+
+    Args:
+        bucket: Target bucket
+        owner: Who may complete the upload (e.g. "user:<id>" or "character:<id>")
+        prefix: Object name prefix
+        content_type: Declared MIME type, must be in allowed_types
+        size: Declared size in bytes, at most max_size
+        filename: Original name, only used for the extension
+
+    Returns:
+        upload_url, method, headers to send, upload_token, object_name (where
+        the client uploads to) and expires_in
+    """
+    if content_type not in allowed_types:
+        raise UploadIntentError(f"Unsupported file type. Allowed types: {', '.join(allowed_types)}")
+    if size <= 0 or size > max_size:
+        raise UploadIntentError(f"File size must be between 1 byte and {max_size} bytes")
+
+    extension = os.path.splitext(filename or "")[1].lower()
+    target = f"{prefix.strip('/')}/{uuid.uuid4().hex}{extension}"
+    object_name = f"{settings.UPLOAD_INTENT_PREFIX.strip('/')}/{target}"
+    expires_in = settings.UPLOAD_INTENT_TTL
+    upload_url = storage_service.presigned_put_url(bucket, object_name, expires_in)
+    storage_service.expire_prefix(bucket, settings.UPLOAD_INTENT_PREFIX, settings.UPLOAD_INTENT_EXPIRY_DAYS)
+    token = jwt.encode({
+        "aud": TOKEN_AUDIENCE,
+        "sub": owner,
+        "bucket": bucket,
+        "object_name": object_name,
+        "target": target,
+        "content_type": content_type,
+        "size": size,
+        # The completion may arrive a little after the PUT URL expired
+        "exp": int(time.time()) + 2 * expires_in,
+    }, settings.SECRET_KEY, algorithm=TOKEN_ALGORITHM)
+
+    return {
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": content_type, "Cache-Control": settings.MEDIA_CACHE_CONTROL},
+        "upload_token": token,
+        "object_name": object_name,
+        "expires_in": expires_in,
+    }
+
+def complete_upload(upload_token: str, owner: str) -> CompletedUpload:
+    """
+    Verify that the object of an intent was uploaded as declared and move it
+    to its final name. Completing the same intent again returns the same upload.
+
+    Raises:
+        UploadIntentError: Invalid or expired token, missing object, or an
+            object that does not match the intent (it is deleted)
+    """
+    try:
+        claims = jwt.decode(upload_token, settings.SECRET_KEY, algorithms=[TOKEN_ALGORITHM],
+                            audience=TOKEN_AUDIENCE)
+    except jwt.PyJWTError as e:
+        raise UploadIntentError(f"Invalid upload token: {e}")
+    if claims.get("sub") != owner:
+        raise UploadIntentError("Upload token belongs to another owner")
+
+    bucket, object_name, target = claims["bucket"], claims["object_name"], claims["target"]
+    stat = storage_service.stat_file(bucket, object_name)
+    if stat is None:
+        # Already completed: the object was moved to its final name
+        stat = storage_service.stat_file(bucket, target)
+        if stat is None:
+            raise UploadIntentError("The file has not been uploaded")
+    else:
+        size, content_type = stat
+        content_type = content_type or claims["content_type"]
+        if size != claims["size"] or content_type != claims["content_type"]:
+            # Presigned PUT URLs cannot enforce these, so they are checked here
+            storage_service.delete_file(bucket, object_name)
+            logger.warning(f"Rejected upload {object_name}: {size} bytes of {content_type}")
+            raise UploadIntentError("The uploaded file does not match the upload intent")
+        storage_service.copy_file(bucket, object_name, target)
+        storage_service.delete_file(bucket, object_name)
+
+    size, content_type = stat
+    return CompletedUpload(
+        object_name=target,
+        url=storage_service.object_url(bucket, target),
+        size=size,
+        content_type=content_type or claims["content_type"]
+    )
@@ -0,0 +1,349 @@
+"""
+Async client for the backend API used by the Telegram bot.
+
+One instance is owned by the bot process. All calls go through a single
+aiohttp session with a keep-alive connector, so handlers reuse pooled
+connections instead of opening a new session per request, and every endpoint
+has its own timeout and retry policy.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+
+from core.api.client import memory_request_params, memory_user_id_formats
+
+logger = logging.getLogger(__name__)
+
+# Gateway errors are worth another attempt for calls that are safe to repeat
+RETRY_STATUSES = {502, 503, 504}
+
+UserId = Union[str, int, Tuple[Union[str, int], ...]]
+
+
+@dataclass(frozen=True)
+class EndpointPolicy:
+    """Timeout (seconds) and retry budget for one kind of backend call"""
+    timeout: float
+    retries: int = 0
+    backoff: float = 0.5
+    # Whether a request may be repeated after it possibly reached the server
+    idempotent: bool = True
+
+
+ENDPOINT_POLICIES: Dict[str, EndpointPolicy] = {
+    "health": EndpointPolicy(timeout=5, retries=1),
+    "characters": EndpointPolicy(timeout=10, retries=2),
+    "start_chat": EndpointPolicy(timeout=30, retries=1, idempotent=False),
+    "users": EndpointPolicy(timeout=10, retries=1),
+    "create_user": EndpointPolicy(timeout=10, retries=1, idempotent=False),
+    "memories": EndpointPolicy(timeout=10, retries=2),
+    # The server deduplicates by content hash, so retrying a batch is safe
+    "create_memories": EndpointPolicy(timeout=15, retries=1),
+    "compress": EndpointPolicy(timeout=120, idempotent=False),
+    "generate_character": EndpointPolicy(timeout=60, idempotent=False),
+    "gift": EndpointPolicy(timeout=60, idempotent=False),
+    "message": EndpointPolicy(timeout=90, idempotent=False),
+    "clear_history": EndpointPolicy(timeout=15, retries=1),
+    "relationship": EndpointPolicy(timeout=10, retries=2),
+    "media": EndpointPolicy(timeout=5, retries=2),
+}
+
+
+@dataclass
+class ApiResponse:
+    """Result of a backend call; status 0 means the server was not reached"""
+    status: int
+    body: bytes = b""
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def connection_error(self) -> bool:
+        return self.status == 0
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    @property
+    def data(self) -> Any:
+        """Parsed JSON body, or None if the body is not JSON"""
+        if not self.body:
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class BotApiClient:
+    """Typed async wrapper around every backend endpoint the bot calls"""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 policies: Optional[Dict[str, EndpointPolicy]] = None,
+                 connection_limit: Optional[int] = None, keepalive_timeout: Optional[float] = None):
+        """
+        Initialize the client; the HTTP session is created lazily inside the running loop
+
+        Args:
+            base_url: Base URL for API
+            api_key: API key for authentication
+            policies: Overrides for the per-endpoint timeout/retry policies
+            connection_limit: Maximum number of pooled connections
+            keepalive_timeout: Seconds an idle connection is kept open
+        """
+        self.base_url = (base_url or os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")).rstrip("/")
+        self.api_key = api_key or os.getenv("BOT_API_KEY", "")
+        self.policies = dict(ENDPOINT_POLICIES)
+        self.policies.update(policies or {})
+        self.connection_limit = connection_limit or int(os.getenv("BOT_API_CONNECTION_LIMIT", 100))
+        self.keepalive_timeout = keepalive_timeout or float(os.getenv("BOT_API_KEEPALIVE_TIMEOUT", 60))
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Authentication headers sent with every backend request"""
+        if not self.api_key:
+            return {}
+        return {"Authorization": f"Bearer {self.api_key}", "X-API-Key": self.api_key}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session and its pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def request(self, method: str, path: str, endpoint: str, *,
+                      params: Optional[Dict[str, str]] = None, json_body: Any = None,
+                      headers: Optional[Dict[str, str]] = None, external: bool = False) -> ApiResponse:
+        """
+        Perform a request using the policy of the given endpoint
+
+        Args:
+            method: HTTP method
+            path: Path relative to the API base URL, or a full URL if external
+            endpoint: Key into the endpoint policies
+            params: Query parameters
+            json_body: JSON payload
+            headers: Extra request headers
+            external: Request a non-API URL (e.g. media) without auth headers
+
+        Returns:
+            ApiResponse: Response; status 0 if every attempt failed to connect
+        """
+        policy = self.policies[endpoint]
+        url = path if external else f"{self.base_url}{path}"
+        request_headers = {} if external else self.headers
+        request_headers.update(headers or {})
+        timeout = aiohttp.ClientTimeout(total=policy.timeout)
+        retry_safe = method == "GET" or policy.idempotent
+        last_error = None
+
+        for attempt in range(policy.retries + 1):
+            if attempt:
+                await asyncio.sleep(policy.backoff * (2 ** (attempt - 1)))
+            try:
+                async with self._get_session().request(
+                    method, url, params=params, json=json_body, headers=request_headers, timeout=timeout
+                ) as resp:
+                    response = ApiResponse(
+                        status=resp.status,
+                        body=await resp.read(),
+                        content_type=resp.content_type,
+                        etag=resp.headers.get("ETag")
+                    )
+                if response.status in RETRY_STATUSES and retry_safe and attempt < policy.retries:
+                    logger.warning(f"{method} {url} returned {response.status}, retrying")
+                    continue
+                return response
+            except aiohttp.ClientConnectorError as e:
+                # The request never reached the server, so any method may be retried
+                last_error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                if not retry_safe:
+                    break
+            logger.warning(f"{method} {url} failed (attempt {attempt + 1}/{policy.retries + 1}): {last_error!r}")
+
+        return ApiResponse(status=0, error=repr(last_error))
+
+    async def health(self) -> bool:
+        """Check that the API is up"""
+        response = await self.request("GET", "/health", "health")
+        if not response.ok:
+            logger.error(f"API health check failed with status {response.status}")
+        return response.ok
+
+    async def list_characters(self) -> Optional[List[Dict[str, Any]]]:
+        """Get all characters, or None if the request failed"""
+        response = await self.request("GET", "/chat/characters", "characters")
+        if not response.ok:
+            logger.warning(f"API returned status {response.status} for character list")
+            return None
+        return response.data
+
+    async def revalidate_characters(self, etag: Optional[str] = None) -> ApiResponse:
+        """Get the character list, or 304 if it still matches the given ETag"""
+        headers = {"If-None-Match": etag} if etag else None
+        return await self.request("GET", "/chat/characters", "characters", headers=headers)
+
+    async def get_character(self, character_id: str) -> Optional[Dict[str, Any]]:
+        """Get a single character, or None if it does not exist or the request failed"""
+        response = await self.request("GET", f"/chat/characters/{character_id}", "characters")
+        if not response.ok:
+            if response.status != 404:
+                logger.warning(f"API returned status {response.status} for character {character_id}")
+            return None
+        return response.data
+
+    async def start_chat(self, character_id: str) -> Optional[Dict[str, Any]]:
+        """Start a chat with a character, returning the greeting payload"""
+        response = await self.request("POST", f"/chat/characters/{character_id}/start-chat", "start_chat")
+        return response.data if response.ok else None
+
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a user by UUID, or None if not found"""
+        response = await self.request("GET", f"/users/{user_id}", "users")
+        return response.data if response.status == 200 else None
+
+    async def create_user(self, user_data: Dict[str, Any]) -> bool:
+        """Create a user, trying each registration endpoint the API exposes"""
+        for path in ("/users/create", "/auth/register", "/users"):
+            response = await self.request("POST", path, "create_user", json_body=user_data)
+            if response.status in (200, 201):
+                logger.info(f"User created through {path}")
+                return True
+            logger.warning(f"Failed to create user through {path}: {response.status}")
+        return False
+
+    async def execute_sql(self, query: str) -> bool:
+        """Run a query through the admin SQL endpoint"""
+        response = await self.request("POST", "/admin/execute-sql", "create_user", json_body={"query": query})
+        return response.status == 200
+
+    async def system_ensure_user(self, telegram_id: int, user_id: str) -> bool:
+        """Ask the system endpoint to create the user for a Telegram ID"""
+        response = await self.request(
+            "POST", "/system/ensure-user", "create_user",
+            json_body={"telegram_id": telegram_id, "user_id": user_id}
+        )
+        return response.status == 200
+
+    async def create_memories(self, character_id: str, user_id: str,
+                              memories: List[Dict[str, Any]]) -> ApiResponse:
+        """Store a batch of memories for one user in a single request"""
+        return await self.request(
+            "POST", f"/chat/characters/{character_id}/memories/bulk", "create_memories",
+            json_body={"user_id": user_id, "memories": memories}
+        )
+
+    async def get_character_memories(self, character_id: str, user_id: Optional[UserId] = None,
+                                     include_all: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get memories for a character, trying every known format of the user ID
+
+        Args:
+            character_id: ID of the character
+            user_id: Optional ID of the user or tuple of IDs in different formats
+            include_all: Whether to include all memories regardless of user ID
+
+        Returns:
+            list: List of memories
+        """
+        path = f"/chat/characters/{character_id}/memories"
+        tried = []
+
+        for uid_format in memory_user_id_formats(user_id, include_all):
+            params = memory_request_params(uid_format, include_all)
+            key = tuple(params.items())
+            if key in tried:
+                continue
+            tried.append(key)
+
+            response = await self.request("GET", path, "memories", params=params)
+            memories = (response.data or {}).get("memories", []) if response.ok else []
+            if memories:
+                logger.info(f"Found {len(memories)} memories using {params}")
+                return memories
+
+        logger.warning(f"No memories found for character {character_id} after trying {len(tried)} different formats")
+        if not include_all:
+            logger.info("Falling back to fetch general memories (include_all=True)")
+            return await self.get_character_memories(character_id, None, include_all=True)
+        return []
+
+    async def compress_chat(self, character_id: str) -> ApiResponse:
+        """Compress the conversation history with a character"""
+        return await self.request("POST", f"/chat/characters/{character_id}/compress", "compress")
+
+    async def generate_character(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Generate a new character from a prompt"""
+        response = await self.request("POST", "/chat/generate-character", "generate_character",
+                                      json_body={"prompt": prompt})
+        if not response.ok:
+            logger.warning(f"API returned status {response.status} for character generation")
+            return None
+        return response.data
+
+    async def send_gift(self, character_id: str, gift: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Send a gift, trying each gift endpoint with its payload format"""
+        attempts = [
+            (f"/chat/characters/{character_id}/gift-alt",
+             {"gift_id": gift["id"], "name": gift["name"], "effect": gift["effect"]}),
+            (f"/chat/characters/{character_id}/gift",
+             {"gift_id": gift["id"], "gift_name": gift["name"], "gift_effect": gift["effect"]}),
+            (f"/characters/{character_id}/gift", {"gift_id": gift["id"]}),
+        ]
+        for path, payload in attempts:
+            response = await self.request("POST", path, "gift", json_body=payload)
+            if response.status == 200 and response.data:
+                logger.info(f"Gift sent successfully using {path}")
+                return response.data
+            logger.warning(f"Endpoint {path} returned status {response.status}")
+        return None
+
+    async def send_message(self, character_id: str, message: str, is_system: bool = False) -> ApiResponse:
+        """Send a chat message to a character"""
+        payload: Dict[str, Any] = {"message": message}
+        if is_system:
+            payload["is_system"] = True
+        return await self.request("POST", f"/chat/characters/{character_id}/message", "message", json_body=payload)
+
+    async def clear_history(self, character_id: str) -> bool:
+        """Clear the chat history with a character"""
+        response = await self.request("POST", f"/chat/characters/{character_id}/clear-history", "clear_history")
+        return response.status == 200
+
+    async def get_relationship(self, character_id: str) -> ApiResponse:
+        """Get relationship stats with a character"""
+        return await self.request("GET", f"/chat/characters/{character_id}/relationship", "relationship")
+
+    async def download(self, url: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Download a media file, returning (bytes, content_type) or (None, None)"""
+        response = await self.request("GET", url, "media", external=True)
+        if response.status == 200:
+            return response.body, response.content_type
+        if not response.connection_error:
+            logger.warning(f"Failed to download {url}: HTTP {response.status}")
+        return None, None
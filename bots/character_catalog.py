@@ -0,0 +1,113 @@
+"""
+Bot-side cache of the character catalog.
+
+The full list is kept in memory, indexed by id, and revalidated with
+If-None-Match once its TTL expires, so a chat turn resolves its character
+without an HTTP request and a stale list usually costs a 304. Characters that
+are not in the list yet (e.g. just generated) are fetched individually.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from bots.api_client import BotApiClient
+
+logger = logging.getLogger(__name__)
+
+
+class CharacterCatalog:
+    """TTL cache of the character list with an O(1) by-id index"""
+
+    def __init__(self, api_client: BotApiClient, ttl: Optional[float] = None,
+                 on_refresh: Optional[Callable[[List[Dict[str, Any]]], Any]] = None):
+        """
+        Args:
+            api_client: Shared bot API client
+            ttl: Seconds the cached list is trusted before revalidation
+            on_refresh: Called with the new list whenever it changes (e.g. to prefetch avatars)
+        """
+        self.api_client = api_client
+        self.ttl = ttl if ttl is not None else float(os.getenv("BOT_CHARACTER_CACHE_TTL", 300))
+        self.on_refresh = on_refresh
+        self._characters: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._etag: Optional[str] = None
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def _store(self, characters: List[Dict[str, Any]], etag: Optional[str]) -> None:
+        self._characters = characters
+        self._by_id = {str(character.get("id")): character for character in characters}
+        self._etag = etag
+        self._fetched_at = time.monotonic()
+
+    async def _refresh(self) -> bool:
+        """Revalidate the cached list; returns False if the API could not be reached"""
+        async with self._lock:
+            # Another task may have refreshed while we waited for the lock
+            if self._is_fresh():
+                return True
+
+            response = await self.api_client.revalidate_characters(self._etag if self._characters else None)
+            if response.status == 304:
+                self._fetched_at = time.monotonic()
+                return True
+            if response.ok and isinstance(response.data, list):
+                self._store(response.data, response.etag)
+                logger.info(f"Character catalog refreshed: {len(self._characters)} characters")
+                if self.on_refresh is not None:
+                    try:
+                        self.on_refresh(list(self._characters))
+                    except Exception as e:
+                        logger.error(f"Error in character catalog refresh hook: {e}")
+                return True
+
+            logger.warning(f"Failed to refresh character catalog: HTTP {response.status}")
+            return False
+
+    async def list(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get all characters
+
+        Returns:
+            list: Characters (possibly stale if the API is down), or None if nothing is cached
+        """
+        if not self._is_fresh():
+            await self._refresh()
+        if self._fetched_at is None:
+            return None
+        return list(self._characters)
+
+    async def get(self, character_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a character by ID from the cache, falling back to the single-character endpoint
+
+        Args:
+            character_id: ID of the character
+
+        Returns:
+            dict: Character, or None if it does not exist
+        """
+        character_id = str(character_id)
+        if not self._is_fresh():
+            await self._refresh()
+
+        character = self._by_id.get(character_id)
+        if character is not None:
+            return character
+
+        character = await self.api_client.get_character(character_id)
+        if character is not None:
+            self._by_id[character_id] = character
+        return character
+
+    def invalidate(self) -> None:
+        """Force revalidation on the next lookup (e.g. after a character is created)"""
+        if self._fetched_at is not None:
+            self._fetched_at = float("-inf")
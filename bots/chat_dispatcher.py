@@ -0,0 +1,222 @@
+"""
+Per-chat ordered update processing for the Telegram bot.
+
+Updates are sharded by chat into FIFO queues. A bounded pool of workers takes
+whole chats from a ready queue, so updates of one chat are handled strictly in
+order while different chats are handled in parallel. Optionally, a burst of
+plain text messages from one chat is merged into a single update so the user
+gets one LLM turn instead of several.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Set in handler data for updates that already went through the chat dispatcher
+DISPATCHED_KEY = "chat_dispatched"
+
+CHAT_WORKERS = int(os.getenv("BOT_CHAT_WORKERS", 16))
+MAX_PENDING_UPDATES = int(os.getenv("BOT_MAX_PENDING_UPDATES", 1000))
+# Seconds to wait for more messages from the same chat before a turn (0 disables merging)
+MERGE_WINDOW = float(os.getenv("BOT_MERGE_WINDOW", 0))
+
+
+class ChatDispatcher:
+    """Runs update handlers with per-chat FIFO ordering on a bounded worker pool"""
+
+    def __init__(self, handler: Callable[[Update], Awaitable[Any]], workers: int = CHAT_WORKERS,
+                 max_pending: int = MAX_PENDING_UPDATES, merge_window: float = MERGE_WINDOW,
+                 mergeable: Optional[Callable[[Update], Awaitable[bool]]] = None):
+        """
+        Args:
+            handler: Coroutine handling one update
+            workers: Number of chats processed concurrently
+            max_pending: Queued (not yet started) updates accepted before submit refuses more
+            merge_window: Seconds to collect a burst of messages before handling it
+            mergeable: Coroutine telling whether an update may be merged with its neighbours
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.merge_window = merge_window
+        self.mergeable = mergeable
+
+        # A chat key is present while the chat is scheduled or being processed
+        self._queues: Dict[Any, Deque[Update]] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._queued = 0
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._tasks: List[asyncio.Task] = []
+
+        self.processed = 0
+        self.failed = 0
+        self.merged = 0
+
+    @staticmethod
+    def chat_key(update: Update) -> Any:
+        """Shard key of an update: its chat, else its sender, else the update itself"""
+        event = update.event
+        chat = getattr(event, "chat", None)
+        if chat is None:
+            message = getattr(event, "message", None)
+            chat = getattr(message, "chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(event, "from_user", None)
+        if user is not None:
+            return user.id
+        return ("update", update.update_id)
+
+    @property
+    def pending(self) -> int:
+        return self._queued
+
+    def submit(self, update: Update) -> bool:
+        """Queue an update without waiting; returns False if the dispatcher is full"""
+        if self._queued >= self.max_pending:
+            self._space.clear()
+            return False
+
+        key = self.chat_key(update)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._ready.put_nowait(key)
+        queue.append(update)
+        self._queued += 1
+        self._unfinished += 1
+        self._idle.clear()
+        return True
+
+    async def put(self, update: Update) -> None:
+        """Queue an update, waiting for space if the dispatcher is full"""
+        while not self.submit(update):
+            await self._space.wait()
+
+    async def _is_mergeable(self, update: Update) -> bool:
+        if self.mergeable is None:
+            return False
+        try:
+            return await self.mergeable(update)
+        except Exception as e:
+            logger.error(f"Error checking whether update {update.update_id} can be merged: {e}")
+            return False
+
+    @staticmethod
+    def merge(batch: List[Update]) -> Update:
+        """Combine consecutive text messages into the last update of the batch"""
+        last = batch[-1]
+        text = "\n".join(update.message.text for update in batch)
+        return last.model_copy(update={"message": last.message.model_copy(update={"text": text})})
+
+    def _take(self, queue: Deque[Update], count: int = 1) -> List[Update]:
+        batch = [queue.popleft() for _ in range(count)]
+        self._queued -= count
+        if self._queued < self.max_pending:
+            self._space.set()
+        return batch
+
+    async def _next_batch(self, queue: Deque[Update]) -> List[Update]:
+        batch = self._take(queue)
+        if self.merge_window > 0 and await self._is_mergeable(batch[0]):
+            # Let the rest of a burst arrive, then take every mergeable message at the front
+            await asyncio.sleep(self.merge_window)
+            while queue and await self._is_mergeable(queue[0]):
+                batch.extend(self._take(queue))
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            queue = self._queues[key]
+            batch = await self._next_batch(queue)
+            update = self.merge(batch) if len(batch) > 1 else batch[0]
+            if len(batch) > 1:
+                self.merged += len(batch) - 1
+                logger.info(f"Merged {len(batch)} messages from chat {key} into one turn")
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.exception(f"Error handling update {update.update_id}: {e}")
+            finally:
+                # Requeue the chat behind the others so a busy chat cannot starve them
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._queues[key]
+                self._unfinished -= len(batch)
+                if self._unfinished == 0:
+                    self._idle.set()
+
+    async def start(self) -> None:
+        """Start the worker pool"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def join(self) -> None:
+        """Wait until every submitted update has been handled"""
+        await self._idle.wait()
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Finish queued updates (up to timeout seconds) and stop the workers"""
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self._unfinished} unprocessed updates")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "pending": self._queued,
+            "active_chats": len(self._queues),
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+            "merged": self.merged
+        }
+
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware routing polled updates through the chat dispatcher
+
+    Updates fed by the chat dispatcher itself carry DISPATCHED_KEY and pass through.
+    """
+
+    def __init__(self, chat_dispatcher: ChatDispatcher):
+        self.chat_dispatcher = chat_dispatcher
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        if data.get(DISPATCHED_KEY):
+            return await handler(event, data)
+        await self.chat_dispatcher.put(event)
+        return None
+
+
+def setup_chat_dispatcher(dp: Dispatcher, bot: Bot, **kwargs: Any) -> ChatDispatcher:
+    """Create a chat dispatcher feeding dp and route every update through it"""
+
+    async def feed(update: Update) -> Any:
+        return await dp.feed_update(bot, update, **{DISPATCHED_KEY: True})
+
+    chat_dispatcher = ChatDispatcher(feed, **kwargs)
+    dp.update.outer_middleware(ChatOrderingMiddleware(chat_dispatcher))
+    dp.startup.register(chat_dispatcher.start)
+    dp.shutdown.register(chat_dispatcher.stop)
+    return chat_dispatcher
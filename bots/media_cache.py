@@ -0,0 +1,257 @@
+"""
+Avatar and media cache for the Telegram bot.
+
+Downloaded images are kept in an on-disk content-addressed store bounded in
+size with LRU eviction. For every URL the bot storage records the content
+hash and, once the image has been sent, the Telegram file_id, so later sends
+reference the file_id and transfer no bytes at all. Avatars of the character
+list are prefetched in the background, so character screens render without
+touching MinIO in the steady state.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile
+
+from bots.storage import BotStorage
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = os.getenv("BOT_MEDIA_CACHE_DIR", "./media_cache")
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("BOT_MEDIA_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+PREFETCH_CONCURRENCY = int(os.getenv("BOT_MEDIA_PREFETCH_CONCURRENCY", 4))
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif"}
+
+# Downloads media for a URL (with an optional owner id for fallbacks): (bytes, content_type)
+Fetcher = Callable[[str, Optional[str]], Awaitable[Tuple[Optional[bytes], Optional[str]]]]
+
+
+class BlobStore:
+    """Content-addressed files under a directory, evicting least recently used beyond max_bytes"""
+
+    def __init__(self, directory: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # digest -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self.total_bytes += size
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Read a blob, marking it as recently used"""
+        if digest not in self._entries:
+            return None
+        try:
+            with open(self.path(digest), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.total_bytes -= self._entries.pop(digest)
+            return None
+        self._entries.move_to_end(digest)
+        # mtime carries the LRU order across restarts
+        os.utime(self.path(digest))
+        return data
+
+    def put(self, data: bytes) -> str:
+        """Store a blob and return its sha256 digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+            os.utime(self.path(digest))
+            return digest
+
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._entries[digest] = len(data)
+        self.total_bytes += len(data)
+        self._evict()
+        return digest
+
+    def _evict(self) -> None:
+        # The newest blob always stays, even if it alone exceeds the limit
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            digest, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+            logger.debug(f"Evicted media blob {digest[:12]} ({size} bytes)")
+
+
+class MediaCache:
+    """Serves media by URL from Telegram file_ids, the blob store, or the network, in that order"""
+
+    def __init__(self, fetch: Fetcher, storage: BotStorage, blobs: Optional[BlobStore] = None,
+                 prefetch_concurrency: int = PREFETCH_CONCURRENCY):
+        """
+        Args:
+            fetch: Coroutine downloading a URL, used on cache misses
+            storage: Bot storage holding the per-URL records
+            blobs: On-disk blob store (created from BOT_MEDIA_CACHE_DIR if omitted)
+            prefetch_concurrency: Parallel downloads of a background prefetch
+        """
+        self.fetch = fetch
+        self.storage = storage
+        self.blobs = blobs if blobs is not None else BlobStore()
+        self.prefetch_concurrency = prefetch_concurrency
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.file_id_sends = 0
+        self.uploads = 0
+
+    async def get(self, url: str, owner_id: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Get the bytes of a URL, downloading them only on a cache miss
+
+        Returns:
+            tuple: (bytes_data, content_type) or (None, None) if the download failed
+        """
+        record = await self.storage.get_media(url) or {}
+        digest = record.get("sha256")
+        if digest:
+            data = await asyncio.to_thread(self.blobs.get, digest)
+            if data is not None:
+                self.hits += 1
+                return data, record.get("content_type")
+
+        self.misses += 1
+        # Concurrent misses for one URL share a single download
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._download(url, owner_id))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _download(self, url: str, owner_id: Optional[str]) -> Tuple[Optional[bytes], Optional[str]]:
+        data, content_type = await self.fetch(url, owner_id)
+        if not data:
+            return None, None
+
+        digest = await asyncio.to_thread(self.blobs.put, data)
+        record = await self.storage.get_media(url) or {}
+        if record.get("sha256") != digest:
+            # A file_id refers to the old content
+            record = {"sha256": digest}
+        record["content_type"] = content_type
+        record["fetched_at"] = time.time()
+        await self.storage.set_media(url, record)
+        return data, content_type
+
+    async def send_photo(self, message: types.Message, url: str, owner_id: Optional[str] = None,
+                         caption: Optional[str] = None) -> bool:
+        """
+        Send a photo in reply to a message, reusing the Telegram file_id when one is known
+
+        Returns:
+            bool: Whether a photo was sent
+        """
+        record = await self.storage.get_media(url) or {}
+        file_id = record.get("file_id")
+        if file_id:
+            try:
+                await message.answer_photo(photo=file_id, caption=caption)
+                self.file_id_sends += 1
+                return True
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached file_id for {url} was rejected, uploading again: {e}")
+
+        data, content_type = await self.get(url, owner_id)
+        if not data:
+            return False
+
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{digest[:16]}.{EXTENSIONS.get(content_type or '', 'jpg')}"
+        sent = await message.answer_photo(photo=BufferedInputFile(data, filename=filename), caption=caption)
+        self.uploads += 1
+
+        if sent and sent.photo:
+            record = await self.storage.get_media(url) or {"sha256": digest, "content_type": content_type}
+            record["file_id"] = sent.photo[-1].file_id
+            await self.storage.set_media(url, record)
+        return True
+
+    async def prefetch(self, items: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """
+        Download (url, owner_id) pairs that are not cached yet
+
+        Returns:
+            int: Number of URLs downloaded
+        """
+        semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+
+        async def fetch_one(url: str, owner_id: Optional[str]) -> bool:
+            record = await self.storage.get_media(url) or {}
+            if record.get("file_id") or record.get("sha256") in self.blobs:
+                return False
+            async with semaphore:
+                try:
+                    data, _ = await self.get(url, owner_id)
+                    return data is not None
+                except Exception as e:
+                    logger.error(f"Error prefetching {url}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(fetch_one(url, owner_id) for url, owner_id in dict(items).items()))
+        fetched = sum(results)
+        if fetched:
+            logger.info(f"Prefetched {fetched} media files")
+        return fetched
+
+    def schedule_prefetch(self, items: Iterable[Tuple[str, Optional[str]]]) -> asyncio.Task:
+        """Run prefetch in the background"""
+        task = asyncio.create_task(self.prefetch(list(items)))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "file_id_sends": self.file_id_sends,
+            "uploads": self.uploads,
+            "blobs": len(self.blobs),
+            "bytes": self.blobs.total_bytes
+        }
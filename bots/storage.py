@@ -0,0 +1,405 @@
+"""
+Persistent, shareable storage for the Telegram bot.
+
+Holds aiogram FSM state/data, the recent chat history used as LLM context,
+the Telegram ID -> user UUID mapping and media cache records, so several bot
+workers can share state and a restart does not make users lose their selected
+character.
+
+Backends are chosen by URL (BOT_STORAGE_URL):
+- sqlite:///path.db, postgresql://... - a key/value table through SQLAlchemy
+- redis://host:port/db (or rediss://) - any server speaking the Redis protocol
+- memory:// - in-process only, for development and tests
+
+Values are stored as compact JSON, zlib-compressed above a size threshold,
+and every key carries a TTL.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import ssl
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORAGE_URL = "sqlite:///./bot_storage.db"
+
+# Values larger than this are compressed before they are stored
+COMPRESS_THRESHOLD = 512
+
+STATE_TTL = int(os.getenv("BOT_STORAGE_STATE_TTL", 30 * 24 * 3600))
+HISTORY_TTL = int(os.getenv("BOT_STORAGE_HISTORY_TTL", 7 * 24 * 3600))
+MAPPING_TTL = int(os.getenv("BOT_STORAGE_MAPPING_TTL", 90 * 24 * 3600))
+MEDIA_TTL = int(os.getenv("BOT_STORAGE_MEDIA_TTL", 30 * 24 * 3600))
+HISTORY_LIMIT = 50
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a value to compact JSON, compressing large payloads"""
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    if len(raw) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+
+def loads(blob: Optional[bytes]) -> Any:
+    """Inverse of dumps; returns None for a missing value"""
+    if not blob:
+        return None
+    blob = bytes(blob)
+    if blob[:1] == b"z":
+        return json.loads(zlib.decompress(blob[1:]))
+    return json.loads(blob[1:])
+
+
+class KeyValueBackend(ABC):
+    """Minimal async key/value interface implemented by every storage backend"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get a value, or None if it is missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        """Set a value, expiring after ttl seconds if given"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete a value"""
+
+    async def close(self) -> None:
+        """Release connections"""
+
+
+class MemoryBackend(KeyValueBackend):
+    """Process-local backend; state is lost on restart"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+class SQLBackend(KeyValueBackend):
+    """Key/value table in SQLite or PostgreSQL; blocking calls run in a worker thread"""
+
+    # Expired rows are purged after this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, url: str, table_name: str = "bot_storage"):
+        from sqlalchemy import Column, Float, LargeBinary, MetaData, String, Table, create_engine, event
+
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+        if self.engine.dialect.name == "sqlite":
+            # WAL lets several bot workers on one host read while another writes
+            @event.listens_for(self.engine, "connect")
+            def _set_sqlite_pragma(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.close()
+
+        self.table = Table(
+            table_name, MetaData(),
+            Column("key", String(255), primary_key=True),
+            Column("value", LargeBinary, nullable=False),
+            Column("expires_at", Float, nullable=True, index=True),
+        )
+        self.table.create(self.engine, checkfirst=True)
+        self._writes = 0
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                self.table.select().where(self.table.c.key == key)
+            ).fetchone()
+        if row is None:
+            return None
+        if row.expires_at is not None and row.expires_at <= time.time():
+            self._delete(key)
+            return None
+        return bytes(row.value)
+
+    def _set(self, key: str, value: bytes, ttl: Optional[int]) -> None:
+        values = {"key": key, "value": value, "expires_at": time.time() + ttl if ttl else None}
+        dialect = self.engine.dialect.name
+        with self.engine.begin() as conn:
+            if dialect in ("sqlite", "postgresql"):
+                if dialect == "sqlite":
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert
+                stmt = insert(self.table).values(**values)
+                conn.execute(stmt.on_conflict_do_update(
+                    index_elements=[self.table.c.key],
+                    set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}
+                ))
+            else:
+                conn.execute(self.table.delete().where(self.table.c.key == key))
+                conn.execute(self.table.insert().values(**values))
+
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge_expired()
+
+    def _delete(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.key == key))
+
+    def _purge_expired(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.expires_at <= time.time()))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    async def close(self) -> None:
+        self.engine.dispose()
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RedisBackend(KeyValueBackend):
+    """
+    Backend for any server speaking the Redis protocol (Redis, Valkey, KeyDB...)
+
+    Uses a single connection with a small RESP implementation, so the bot does
+    not need a Redis client library.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.use_ssl = parsed.scheme == "rediss"
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.use_ssl else None
+        )
+        if self.password:
+            await self._send("AUTH", self.password)
+        if self.db:
+            await self._send("SELECT", str(self.db))
+
+    async def _send(self, *args: Any) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def execute(self, *args: Any) -> Any:
+        """Run one command, reconnecting once if the connection was lost"""
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._send(*args)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    await self._reset()
+                    if attempt:
+                        raise
+
+    async def _reset(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        if ttl:
+            await self.execute("SET", key, value, "EX", str(int(ttl)))
+        else:
+            await self.execute("SET", key, value)
+
+    async def delete(self, key: str) -> None:
+        await self.execute("DEL", key)
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._reset()
+
+
+def create_backend(url: Optional[str] = None) -> KeyValueBackend:
+    """Create a backend from a storage URL (defaults to BOT_STORAGE_URL)"""
+    url = url or os.getenv("BOT_STORAGE_URL", DEFAULT_STORAGE_URL)
+    scheme = url.split(":", 1)[0].lower()
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme in ("redis", "rediss"):
+        return RedisBackend(url)
+    return SQLBackend(url)
+
+
+class BotStorage(BaseStorage):
+    """aiogram FSM storage that also keeps chat history and user id mappings"""
+
+    def __init__(self, backend: KeyValueBackend, prefix: str = "bot",
+                 state_ttl: Optional[int] = None, history_ttl: Optional[int] = None,
+                 mapping_ttl: Optional[int] = None, media_ttl: Optional[int] = None,
+                 history_limit: int = HISTORY_LIMIT):
+        """
+        Args:
+            backend: Key/value backend
+            prefix: Namespace for all keys
+            state_ttl: Seconds FSM state and data are kept since the last change
+            history_ttl: Seconds chat history is kept since the last message
+            mapping_ttl: Seconds a Telegram ID -> UUID mapping is kept
+            media_ttl: Seconds a media record (content hash, Telegram file_id) is kept
+            history_limit: Number of messages kept per conversation
+        """
+        self.backend = backend
+        self.prefix = prefix
+        self.state_ttl = state_ttl if state_ttl is not None else STATE_TTL
+        self.history_ttl = history_ttl if history_ttl is not None else HISTORY_TTL
+        self.mapping_ttl = mapping_ttl if mapping_ttl is not None else MAPPING_TTL
+        self.media_ttl = media_ttl if media_ttl is not None else MEDIA_TTL
+        self.history_limit = history_limit
+
+    def _fsm_key(self, key: StorageKey, part: str) -> str:
+        parts = [self.prefix, "fsm", str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        if key.business_connection_id:
+            parts.append(key.business_connection_id)
+        parts.extend([key.destiny, part])
+        return ":".join(parts)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_key = self._fsm_key(key, "state")
+        if state is None:
+            await self.backend.delete(state_key)
+            return
+        value = state.state if isinstance(state, State) else state
+        await self.backend.set(state_key, dumps(value), self.state_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return loads(await self.backend.get(self._fsm_key(key, "state")))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        data_key = self._fsm_key(key, "data")
+        if not data:
+            await self.backend.delete(data_key)
+            return
+        await self.backend.set(data_key, dumps(dict(data)), self.state_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return loads(await self.backend.get(self._fsm_key(key, "data"))) or {}
+
+    def _history_key(self, user_id: Any, character_id: Any) -> str:
+        return f"{self.prefix}:history:{user_id}:{character_id}"
+
+    async def get_history(self, user_id: Any, character_id: Any) -> List[Dict[str, Any]]:
+        """Get the recent messages between a user and a character"""
+        return loads(await self.backend.get(self._history_key(user_id, character_id))) or []
+
+    async def append_history(self, user_id: Any, character_id: Any, entry: Dict[str, Any]) -> None:
+        """Append a message, keeping only the last history_limit messages"""
+        history = await self.get_history(user_id, character_id)
+        history.append(entry)
+        await self.backend.set(
+            self._history_key(user_id, character_id),
+            dumps(history[-self.history_limit:]),
+            self.history_ttl
+        )
+
+    async def get_user_mapping(self, telegram_id: Any) -> Any:
+        """Get the cached user UUID (or tuple of formats) for a Telegram ID"""
+        value = loads(await self.backend.get(f"{self.prefix}:user:{telegram_id}"))
+        return tuple(value) if isinstance(value, list) else value
+
+    async def set_user_mapping(self, telegram_id: Any, value: Any) -> None:
+        """Cache the user UUID (or tuple of formats) for a Telegram ID"""
+        await self.backend.set(f"{self.prefix}:user:{telegram_id}", dumps(value), self.mapping_ttl)
+
+    def _media_key(self, url: str) -> str:
+        return f"{self.prefix}:media:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+    async def get_media(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get the media cache record of a URL (content hash, content type, Telegram file_id)"""
+        return loads(await self.backend.get(self._media_key(url)))
+
+    async def set_media(self, url: str, record: Dict[str, Any]) -> None:
+        """Store the media cache record of a URL"""
+        await self.backend.set(self._media_key(url), dumps(record), self.media_ttl)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def create_storage(url: Optional[str] = None) -> BotStorage:
+    """Create the bot storage for a URL (defaults to BOT_STORAGE_URL)"""
+    backend = create_backend(url)
+    logger.info(f"Using {type(backend).__name__} for bot storage")
+    return BotStorage(backend)
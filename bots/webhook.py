@@ -0,0 +1,129 @@
+"""
+Webhook ingestion for the Telegram bot.
+
+An aiohttp server receives updates from Telegram, checks the secret token,
+acknowledges immediately and hands the update to the chat dispatcher's bounded
+worker pool, so slow LLM turns never delay update intake and several bot
+instances can sit behind a load balancer.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from bots.chat_dispatcher import ChatDispatcher, DISPATCHED_KEY
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+# Maximum simultaneous HTTPS connections Telegram opens to this webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 16))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+
+
+class WebhookServer:
+    """Receives webhook updates and processes them on a bounded worker pool"""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: Optional[str] = None,
+                 path: str = WEBHOOK_PATH, workers: int = WEBHOOK_WORKERS,
+                 queue_size: int = WEBHOOK_QUEUE_SIZE, chat_dispatcher: Optional[ChatDispatcher] = None):
+        """
+        Args:
+            dispatcher: aiogram dispatcher with the bot handlers registered
+            bot: Bot instance passed to handlers
+            secret_token: Expected value of the secret token header (empty disables the check)
+            path: URL path the updates are posted to
+            workers: Number of concurrent update handlers
+            queue_size: Updates accepted but not yet started before intake answers 503
+            chat_dispatcher: Dispatcher shared with the bot (one is created if omitted)
+        """
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token if secret_token is not None else WEBHOOK_SECRET
+        self.path = path
+
+        if chat_dispatcher is None:
+            async def feed(update: Update):
+                return await dispatcher.feed_update(bot, update, **{DISPATCHED_KEY: True})
+            chat_dispatcher = ChatDispatcher(feed, workers=workers, max_pending=queue_size)
+        self.chat_dispatcher = chat_dispatcher
+
+        self.app = web.Application()
+        self.app.router.add_post(self.path, self.handle_update)
+        self.app.router.add_get("/health", self.handle_health)
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_shutdown.append(self._on_shutdown)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Validate and enqueue an update; Telegram only needs a fast 200"""
+        if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+            logger.warning("Rejected webhook request with invalid secret token")
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.error(f"Invalid update payload: {e}")
+            return web.Response(status=400)
+
+        if not self.chat_dispatcher.submit(update):
+            # Telegram retries non-2xx deliveries, so shed load instead of blocking intake
+            logger.warning(f"Update queue full, rejecting update {update.update_id}")
+            return web.Response(status=503)
+        return web.Response(status=200)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(self.chat_dispatcher.get_metrics())
+
+    @property
+    def processed(self) -> int:
+        return self.chat_dispatcher.processed
+
+    async def join(self) -> None:
+        """Wait until every accepted update has been handled"""
+        await self.chat_dispatcher.join()
+
+    async def _on_startup(self, app: web.Application) -> None:
+        await self.chat_dispatcher.start()
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        await self.chat_dispatcher.stop()
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, chat_dispatcher: Optional[ChatDispatcher] = None) -> None:
+    """Serve the webhook and register it with Telegram until cancelled"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL must be set to run the bot in webhook mode")
+
+    server = WebhookServer(dispatcher, bot, chat_dispatcher=chat_dispatcher)
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    await dispatcher.emit_startup(bot=bot)
+    await bot.set_webhook(
+        url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dispatcher.resolve_used_update_types()
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await dispatcher.emit_shutdown(bot=bot)
+        await bot.session.close()
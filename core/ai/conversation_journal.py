@@ -0,0 +1,598 @@
+"""
+Write-behind journal for the chat_history table.
+
+Instead of rewriting the whole conversation on every assistant reply, turns are
+appended to a per-session in-memory buffer and persisted in batches. Every turn
+is first written to an append-only write-ahead file, so turns that were
+acknowledged but not yet flushed survive a crash and are replayed on the next
+start. After every successful flush the file is compacted to the turns that are
+still pending, so it stays small under steady traffic.
+
+Each process (API worker) has its own write-ahead file, guarded by an exclusive
+flock on a companion lock file held for the life of the journal. On start, a
+journal claims only the files whose lock it can take, i.e. those left by
+processes that are gone: their turns are moved into its own file before the
+claimed file is deleted, and live workers' files are never touched.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import datetime
+import atexit
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import func
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# conversation_journal.<pid>.<token>.wal; the token keeps names unique when pids are reused
+WAL_PREFIX = "conversation_journal"
+
+
+class _JournalSession:
+    """Buffered state of a single (character, user) conversation."""
+
+    __slots__ = ("entries", "next_position", "first_pending_at")
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        # Next chat_history.position for this pair, loaded lazily on first flush
+        self.next_position: Optional[int] = None
+        self.first_pending_at: Optional[float] = None
+
+
+class ConversationJournal:
+    """
+    Buffers chat turns per session and flushes them to chat_history in batches.
+
+    A session is flushed when its buffer reaches ``batch_size`` turns, when its
+    oldest pending turn is older than ``flush_interval`` seconds, when it is
+    evicted from the bounded session table, or when the journal is closed.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        journal_dir: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_sessions: Optional[int] = None,
+        fsync: Optional[bool] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            session_factory: Callable returning a new SQLAlchemy session
+                (defaults to core.db.session.SessionLocal)
+            journal_dir: Directory for the write-ahead file
+            batch_size: Number of buffered turns that triggers a flush
+            flush_interval: Maximum age in seconds of a buffered turn
+            max_sessions: Maximum number of sessions kept in memory
+            fsync: Whether to fsync the write-ahead file on every append
+            background: Whether to run the periodic flusher thread
+        """
+        self._session_factory = session_factory
+        self.journal_dir = Path(journal_dir or settings.CONVERSATION_JOURNAL_DIR)
+        self.batch_size = batch_size or settings.CONVERSATION_JOURNAL_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.CONVERSATION_JOURNAL_FLUSH_INTERVAL
+        self.max_sessions = max_sessions or settings.CONVERSATION_JOURNAL_MAX_SESSIONS
+        self.fsync = settings.CONVERSATION_JOURNAL_FSYNC if fsync is None else fsync
+        self.background = background
+
+        self._lock = threading.RLock()
+        # Serializes flushes so positions are assigned in append order
+        self._flush_lock = threading.Lock()
+        self._sessions: "OrderedDict[Tuple[str, str], _JournalSession]" = OrderedDict()
+        # Pending entries of sessions that were evicted before being flushed
+        self._evicted: List[Tuple[Tuple[str, str], List[Dict[str, Any]]]] = []
+        self._in_flight = 0
+        self._wal_file = None
+        self._wal_lock = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._metrics = {
+            "appended": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0,
+            "evictions": 0,
+            "recovered": 0,
+        }
+        self._latencies = deque(maxlen=256)
+
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self._wal_path = self.journal_dir / f"{WAL_PREFIX}.{os.getpid()}.{uuid4().hex[:8]}.wal"
+        self._wal_lock = _try_lock(self._wal_path)
+        self._recover()
+        self._wal_file = open(self._wal_path, "a", encoding="utf-8")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def append(self, character_id: str, user_id: str, role: str, content: str,
+               metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Append a single turn to the journal.
+
+        The turn is durable once this returns: it is in the write-ahead file and
+        will be flushed to the database either by the flusher or on recovery.
+        """
+        if not content:
+            return
+
+        entry = {
+            "id": str(uuid4()),
+            "character_id": str(character_id),
+            "user_id": str(user_id),
+            "role": role,
+            "content": content,
+            "metadata": metadata,
+            "created_at": datetime.datetime.now().isoformat(),
+        }
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Conversation journal is closed")
+            self._write_wal(entry)
+            self._buffer(entry)
+            self._metrics["appended"] += 1
+            session = self._sessions[(entry["character_id"], entry["user_id"])]
+            should_wake = len(session.entries) >= self.batch_size or bool(self._evicted)
+
+        self._ensure_worker()
+        if should_wake:
+            if self.background:
+                self._wakeup.set()
+            else:
+                self.flush_due()
+
+    def flush(self) -> int:
+        """Flush every buffered turn. Returns the number of rows written."""
+        return self._flush(force=True)
+
+    def flush_due(self) -> int:
+        """Flush the sessions that reached the size or age threshold."""
+        return self._flush(force=False)
+
+    def pending_count(self) -> int:
+        """Number of turns that are not yet persisted."""
+        with self._lock:
+            buffered = sum(len(s.entries) for s in self._sessions.values())
+            evicted = sum(len(entries) for _, entries in self._evicted)
+            return buffered + evicted + self._in_flight
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return counters and flush latency statistics in milliseconds."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            last_latency = self._latencies[-1] if self._latencies else None
+            latencies = sorted(self._latencies)
+            metrics["sessions"] = len(self._sessions)
+        metrics["pending"] = self.pending_count()
+
+        if latencies:
+            metrics["flush_latency_ms"] = {
+                "last": round(last_latency, 3),
+                "avg": round(sum(latencies) / len(latencies), 3),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                "max": round(latencies[-1], 3),
+            }
+        else:
+            metrics["flush_latency_ms"] = {"last": None, "avg": None, "p95": None, "max": None}
+        return metrics
+
+    def discard_session(self, character_id: str, user_id: Optional[str] = None) -> None:
+        """
+        Forget cached positions for a character (and optionally a single user).
+
+        Used after the conversation is cleared or compressed outside the journal,
+        so the next flush re-reads the current max position.
+        """
+        with self._lock:
+            for key, session in self._sessions.items():
+                if key[0] == str(character_id) and (user_id is None or key[1] == str(user_id)):
+                    session.next_position = None
+
+    def discard_pending(self, character_id: str, user_id: Optional[str] = None) -> int:
+        """
+        Drop the unflushed turns of a character (and optionally a single user).
+
+        Used when a flush before clearing or compressing the conversation
+        failed: the turns belong to the history being replaced and must not be
+        written after it once the database is back.
+
+        Returns:
+            Number of dropped turns
+        """
+        def matches(key: Tuple[str, str]) -> bool:
+            return key[0] == str(character_id) and (user_id is None or key[1] == str(user_id))
+
+        with self._flush_lock, self._lock:
+            dropped = 0
+            for key, session in self._sessions.items():
+                if matches(key) and session.entries:
+                    dropped += len(session.entries)
+                    session.entries = []
+                    session.first_pending_at = None
+            kept = []
+            for key, entries in self._evicted:
+                if matches(key):
+                    dropped += len(entries)
+                else:
+                    kept.append((key, entries))
+            self._evicted = kept
+            if dropped:
+                self._compact_wal()
+            return dropped
+
+    def close(self) -> None:
+        """Stop the flusher thread and flush everything that is still buffered."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout=max(self.flush_interval, 1.0) * 2)
+
+        self.flush()
+
+        with self._lock:
+            if self._wal_file:
+                self._wal_file.close()
+                self._wal_file = None
+            # Nothing left to recover: remove the file instead of leaving it to the next start
+            if not self.pending_count():
+                _remove(self._wal_path)
+                _remove(_lock_path(self._wal_path))
+            if self._wal_lock:
+                self._wal_lock.close()
+                self._wal_lock = None
+        logger.info(f"Conversation journal closed: {self.get_metrics()}")
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _get_session_factory(self):
+        if self._session_factory is None:
+            from core.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _buffer(self, entry: Dict[str, Any]) -> None:
+        """Add an entry to its session buffer, evicting the least recently used session if needed."""
+        key = (entry["character_id"], entry["user_id"])
+        session = self._sessions.get(key)
+        if session is None:
+            session = _JournalSession()
+            self._sessions[key] = session
+        else:
+            self._sessions.move_to_end(key)
+
+        if not session.entries:
+            session.first_pending_at = time.monotonic()
+        session.entries.append(entry)
+
+        while len(self._sessions) > self.max_sessions:
+            old_key, old_session = self._sessions.popitem(last=False)
+            self._metrics["evictions"] += 1
+            if old_session.entries:
+                self._evicted.append((old_key, old_session.entries))
+
+    def _write_wal(self, entry: Dict[str, Any]) -> None:
+        if self._wal_file is None:
+            return
+        self._wal_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._wal_file.flush()
+        if self.fsync:
+            os.fsync(self._wal_file.fileno())
+
+    def _compact_wal(self) -> None:
+        """Replace the write-ahead file with the turns that are still pending."""
+        with self._lock:
+            if self._wal_file is None or self._in_flight:
+                return
+            self._wal_file.close()
+            self._wal_file = None
+            try:
+                self._rewrite_wal()
+            finally:
+                self._wal_file = open(self._wal_path, "a", encoding="utf-8")
+
+    def _take_batch(self, force: bool) -> List[Tuple[Tuple[str, str], List[Dict[str, Any]]]]:
+        """Detach the entries that should be flushed now."""
+        now = time.monotonic()
+        batch = []
+        with self._lock:
+            batch.extend(self._evicted)
+            self._evicted = []
+
+            for key, session in self._sessions.items():
+                if not session.entries:
+                    continue
+                is_full = len(session.entries) >= self.batch_size
+                is_old = session.first_pending_at is not None and now - session.first_pending_at >= self.flush_interval
+                if force or is_full or is_old:
+                    batch.append((key, session.entries))
+                    session.entries = []
+                    session.first_pending_at = None
+
+            self._in_flight += sum(len(entries) for _, entries in batch)
+        return batch
+
+    def _requeue(self, batch) -> None:
+        """Put entries of a failed flush back in front of their session buffers."""
+        with self._lock:
+            self._in_flight -= sum(len(entries) for _, entries in batch)
+            for key, entries in batch:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = _JournalSession()
+                    self._sessions[key] = session
+                session.entries = entries + session.entries
+                session.first_pending_at = time.monotonic()
+
+    def _flush(self, force: bool) -> int:
+        with self._flush_lock:
+            batch = self._take_batch(force)
+            if not batch:
+                return 0
+
+            row_count = sum(len(entries) for _, entries in batch)
+            # Replayed turns may have been committed just before the crash
+            unverified = {entry["id"] for _, entries in batch for entry in entries if entry.get("recovered")}
+            started = time.perf_counter()
+            db_session = None
+            try:
+                db_session = self._get_session_factory()()
+                rows = self._build_rows(db_session, batch)
+                if unverified:
+                    rows = self._filter_existing(db_session, rows, unverified)
+                if rows:
+                    from core.db.models.chat_history import ChatHistory
+                    db_session.execute(ChatHistory.__table__.insert(), rows)
+                db_session.commit()
+            except Exception as e:
+                logger.error(f"Error flushing conversation journal ({row_count} rows): {e}")
+                if db_session is not None:
+                    try:
+                        db_session.rollback()
+                    except Exception:
+                        pass
+                with self._lock:
+                    self._metrics["flush_errors"] += 1
+                    # Positions may be stale after a failure, re-read them next time
+                    for key, _ in batch:
+                        if key in self._sessions:
+                            self._sessions[key].next_position = None
+                self._requeue(batch)
+                return 0
+            finally:
+                if db_session is not None:
+                    db_session.close()
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._in_flight -= row_count
+                self._metrics["flushes"] += 1
+                self._metrics["rows_flushed"] += row_count
+                self._latencies.append(elapsed_ms)
+
+            logger.info(f"Flushed {row_count} chat_history rows in {elapsed_ms:.1f} ms")
+            self._compact_wal()
+            return row_count
+
+    def _build_rows(self, db_session, batch) -> List[Dict[str, Any]]:
+        """Convert journal entries to chat_history rows, assigning positions per session."""
+        from core.db.models.chat_history import ChatHistory
+
+        rows = []
+        for key, entries in batch:
+            with self._lock:
+                session = self._sessions.get(key)
+                next_position = session.next_position if session else None
+
+            if next_position is None:
+                max_position = db_session.query(func.max(ChatHistory.position)).filter(
+                    ChatHistory.character_id == key[0],
+                    ChatHistory.user_id == key[1]
+                ).scalar() or 0
+                next_position = max_position + 1
+
+            for entry in entries:
+                rows.append({
+                    "id": entry["id"],
+                    "character_id": entry["character_id"],
+                    "user_id": entry["user_id"],
+                    "role": entry["role"],
+                    "content": entry["content"],
+                    "message_metadata": json.dumps(entry["metadata"], ensure_ascii=False) if entry.get("metadata") else None,
+                    "position": next_position,
+                    "is_active": True,
+                    "compressed": False,
+                    "created_at": datetime.datetime.fromisoformat(entry["created_at"]),
+                })
+                next_position += 1
+
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is not None:
+                    session.next_position = next_position
+        return rows
+
+    def _filter_existing(self, db_session, rows: List[Dict[str, Any]], ids) -> List[Dict[str, Any]]:
+        """Skip rows among ``ids`` that were already committed before a crash (recovered turns)."""
+        from core.db.models.chat_history import ChatHistory
+
+        ids = list(ids)
+        existing = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            existing.update(
+                row_id for (row_id,) in db_session.query(ChatHistory.id).filter(ChatHistory.id.in_(chunk))
+            )
+        return [row for row in rows if row["id"] not in existing]
+
+    def _recover(self) -> None:
+        """Replay turns left in the write-ahead files of processes that are gone."""
+        claimed = []
+        entries = []
+        for wal_path in sorted(self.journal_dir.glob(f"{WAL_PREFIX}*.wal")):
+            if wal_path == self._wal_path:
+                continue
+            lock = _try_lock(wal_path)
+            if lock is None:
+                # Its owner is alive and still appending to it
+                continue
+            claimed.append((wal_path, lock))
+            entries.extend(_read_wal(wal_path))
+
+        if entries:
+            logger.info(f"Recovering {len(entries)} turns from conversation journal")
+            with self._lock:
+                for entry in entries:
+                    # Checked against chat_history on every flush until persisted
+                    entry["recovered"] = True
+                    self._buffer(entry)
+                self._metrics["recovered"] = len(entries)
+
+            if not self._flush(force=True) and self.pending_count():
+                logger.warning("Conversation journal recovery deferred, database unavailable")
+            # Turns still pending now live in this process's file, so the claimed ones can go
+            self._rewrite_wal()
+
+        for wal_path, lock in claimed:
+            _remove(wal_path)
+            _remove(_lock_path(wal_path))
+            lock.close()
+
+    def _rewrite_wal(self) -> None:
+        """Atomically rewrite the write-ahead file from the buffered and evicted entries."""
+        with self._lock:
+            pending = [session.entries for session in self._sessions.values()]
+            pending.extend(entries for _, entries in self._evicted)
+            tmp_path = self._wal_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entries in pending:
+                    for entry in entries:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self._wal_path)
+
+    def _ensure_worker(self) -> None:
+        if not self.background or (self._worker and self._worker.is_alive()):
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="conversation-journal", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush_due()
+            except Exception as e:
+                logger.exception(f"Conversation journal flusher error: {e}")
+
+
+def _lock_path(wal_path: Path) -> Path:
+    return wal_path.with_suffix(".lock")
+
+
+def _try_lock(wal_path: Path):
+    """
+    Take the exclusive flock guarding a write-ahead file without blocking.
+
+    Returns:
+        The open lock file (closing it releases the lock), or None while another
+        process holds it. Without flock (Windows, single-process development)
+        every file is treated as unlocked.
+    """
+    lock = open(_lock_path(wal_path), "a")
+    if fcntl is None:
+        return lock
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def _read_wal(wal_path: Path) -> List[Dict[str, Any]]:
+    entries = []
+    try:
+        with open(wal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write
+                    logger.warning("Skipping corrupt conversation journal record")
+    except FileNotFoundError:
+        # Claimed and removed by another process in the meantime
+        pass
+    return entries
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+_journal: Optional[ConversationJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_conversation_journal() -> ConversationJournal:
+    """Return the process-wide conversation journal, creating it on first use."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = ConversationJournal()
+                atexit.register(_journal.close)
+    return _journal
+
+
+def close_conversation_journal() -> None:
+    """Flush and close the process-wide journal if it was created."""
+    global _journal
+    with _journal_lock:
+        if _journal is not None:
+            _journal.close()
+            _journal = None
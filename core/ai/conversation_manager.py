@@ -18,14 +18,67 @@ class ConversationManager:
     Provides methods to store, retrieve, and manipulate conversation context.
     """
     
-    def __init__(self):
+    def __init__(self, journal=None):
         # Dictionary to store conversation history by character_id
         self.conversations = {}
+        # Write-behind journal for chat_history (created lazily on first use)
+        self._journal = journal
         # Dictionary to store character system prompts
         self.system_prompts = {}
         # Maximum number of messages to keep in history (excluding system prompt)
         self.max_history_length = 15
         self.logger = logging.getLogger(__name__)  # Initialize logger as instance attribute
+
+    @property
+    def journal(self):
+        """Write-behind journal used to persist conversation turns."""
+        if self._journal is None:
+            from core.ai.conversation_journal import get_conversation_journal
+            self._journal = get_conversation_journal()
+        return self._journal
+
+    def record_turn(self, character_id: str, user_id: str, user_message: str,
+                    assistant_message: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Append one user/assistant exchange to the conversation journal.
+
+        The rows are written to chat_history in batches by the journal instead
+        of rewriting the conversation on every reply.
+
+        Args:
+            character_id: Character identifier
+            user_id: User identifier
+            user_message: Text of the user message
+            assistant_message: Text of the assistant reply
+            metadata: Optional metadata for the assistant message (emotion, etc.)
+
+        Returns:
+            Whether the turn was accepted by the journal
+        """
+        try:
+            self.journal.append(character_id, user_id, "user", user_message)
+            self.journal.append(character_id, user_id, "assistant", assistant_message, metadata)
+            return True
+        except Exception as e:
+            logger.error(f"Error appending turn to conversation journal: {e}")
+            return False
+
+    def _flush_journal_for(self, character_id: str, user_id=None) -> None:
+        """
+        Persist pending journal rows before chat_history is modified directly.
+
+        If the flush fails, the pair's pending rows are dropped: written after
+        the clear or compression they would come back as active history.
+        """
+        user_key = str(user_id) if user_id else None
+        try:
+            self.journal.flush()
+            dropped = self.journal.discard_pending(character_id, user_key)
+            if dropped:
+                logger.warning(f"Dropped {dropped} unflushed journal rows of character {character_id}")
+            self.journal.discard_session(character_id, user_key)
+        except Exception as e:
+            logger.error(f"Error flushing conversation journal: {e}")
         
     def start_conversation(self, character_id: str, system_prompt: str, character_info: Dict[str, Any], db_session=None) -> None:
         """
@@ -557,6 +610,9 @@ class ConversationManager:
                 logger.warning(f"Invalid character_id UUID: {character_id}")
                 return
             
+            # Pending journal rows must be deactivated too
+            self._flush_journal_for(character_id)
+
             # Soft delete by setting is_active to False
             db_session.query(ChatHistory).filter(
                 ChatHistory.character_id == char_uuid,
@@ -649,6 +705,9 @@ class ConversationManager:
                     user_id = uuid4()
             
             logger.info(f"Using character_id={char_uuid}, user_id={user_id}")
+
+            # The summary has to be positioned after any turns still in the journal
+            self._flush_journal_for(character_id, user_id)
             
             # Clear previous compressed summaries in chat_history for this character-user pair
             try:
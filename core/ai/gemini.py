@@ -15,6 +15,7 @@ import re
 import logging
 from pathlib import Path
 from core.utils.db_helpers import save_message_safely, ensure_string_id
+from core.db.relationship_stats import record_messages
 
 # Import our universal ID module
 from core.utils.universal_id import ensure_uuid, is_valid_uuid, get_user_id_formats, get_platform_user_id
@@ -253,13 +254,17 @@ class GeminiAI:
             logger.exception(f"Error in API request: {e}")
             return ""
     
-    def generate_response(self, context: Dict[str, Any], message: str) -> Dict[str, Any]:
+    def generate_response(self, context: Dict[str, Any], message: str, unit_of_work=None) -> Dict[str, Any]:
         """
         Generate a response to the user message using conversation history.
         
         Args:
             context: Dialog context dictionary
             message: User message text
+            unit_of_work: Optional TurnUnitOfWork of the caller. When given, the
+                memories and the chat_history turn are staged on it and the
+                caller commits them together with its own writes; messages are
+                left to the caller.
             
         Returns:
             Dictionary with response (text, emotion, changes)
@@ -289,6 +294,8 @@ class GeminiAI:
         
         # Add user ID from context to explicitly set when storing messages
         user_id = context.get("user_id")
+        if unit_of_work is not None and not user_id:
+            user_id = unit_of_work.user_id
         if user_id:
             logger.info(f"User ID from context: {user_id}")
         
@@ -333,7 +340,9 @@ class GeminiAI:
                     
                     # Immediately save to database
                     try:
-                        if db_session:
+                        if unit_of_work is not None:
+                            unit_of_work.add_memories(potential_memories)
+                        elif db_session:
                             saved = self.memory_manager.save_to_database(db_session, character_id)
                             if saved:
                                 logger.info(f"{MAGENTA}💾 Memories successfully saved to database{RESET}")
@@ -414,8 +423,8 @@ class GeminiAI:
             )
             logger.info(f"✉️ Added user message: '{message}'")
             
-            # Store the user message in the database first
-            if db_session and user_id and not is_ui_command:
+            # Store the user message in the database first (the caller's unit of work stores it otherwise)
+            if db_session and user_id and not is_ui_command and unit_of_work is None:
                 try:
                     from core.models import Message
                     
@@ -436,6 +445,7 @@ class GeminiAI:
                         emotion="neutral"
                     )
                     db_session.add(user_db_message)
+                    record_messages(db_session, [user_db_message])
                     db_session.commit()
                     logger.info(f"✅ User message saved to messages table in database with ID format: {user_uuid}")
                     
@@ -535,7 +545,7 @@ class GeminiAI:
                             logger.info(f"{BLUE}    {mem_content}{RESET}")
                 
                 # Save the assistant message to the database
-                if db_session and user_id and not is_ui_command:
+                if db_session and user_id and not is_ui_command and unit_of_work is None:
                     try:
                         from core.models import Message
                         
@@ -554,30 +564,34 @@ class GeminiAI:
                             emotion=result.get("emotion", "neutral")
                         )
                         db_session.add(assistant_db_message)
+                        record_messages(db_session, [assistant_db_message])
                         db_session.commit()
                         logger.info(f"✅ Assistant response saved to messages table in database")
                     except Exception as db_error:
                         logger.error(f"❌ Error saving message to database: {db_error}")
                         db_session.rollback()
                 
-                # Save updated conversation to database
-                try:
-                    if db_session:
-                        # Use our universal ID utility for consistent handling
-                        user_id_str = ensure_uuid(user_id)
-                        character_id_str = ensure_uuid(character_id)
-                        
-                        save_success = self.conversation_manager.save_conversation_to_database(
-                            character_id=character_id_str,
-                            user_id=user_id_str,
-                            db_session=db_session
-                        )
-                        if save_success:
-                            logger.info("✅ Conversation successfully saved to database")
-                        else:
-                            logger.warning("⚠️ Failed to save conversation to database")
-                except Exception as save_error:
-                    logger.error(f"❌ Error saving conversation: {save_error}")
+                # Append the turn to the write-behind conversation journal
+                if unit_of_work is not None and not is_ui_command:
+                    # Journaled once the caller commits the turn
+                    unit_of_work.record_turn(
+                        user_message=message,
+                        assistant_message=result["text"],
+                        metadata={"emotion": result.get("emotion", "neutral")}
+                    )
+                    unit_of_work.after_commit(self._journal_committed_turns)
+                elif user_id and not is_ui_command:
+                    saved = self.conversation_manager.record_turn(
+                        character_id=ensure_uuid(character_id),
+                        user_id=ensure_uuid(user_id),
+                        user_message=message,
+                        assistant_message=result["text"],
+                        metadata={"emotion": result.get("emotion", "neutral")}
+                    )
+                    if saved:
+                        logger.info("✅ Conversation turn appended to journal")
+                    else:
+                        logger.warning("⚠️ Failed to append conversation turn to journal")
                     
             return result
                 
@@ -595,6 +609,19 @@ class GeminiAI:
                 except Exception as close_error:
                     logger.error(f"Error closing database session: {close_error}")
 
+    def _journal_committed_turns(self, unit_of_work) -> None:
+        """After-commit hook: append the turns of a committed unit of work to the journal."""
+        for turn in unit_of_work.turns:
+            self.conversation_manager.record_turn(
+                character_id=ensure_uuid(unit_of_work.character_id),
+                user_id=ensure_uuid(unit_of_work.user_id),
+                user_message=turn["user_message"],
+                assistant_message=turn["assistant_message"],
+                metadata=turn["metadata"]
+            )
+        # Hooks run once per commit
+        unit_of_work.turns = []
+
     def compress_conversation(self, character_id: str, db_session=None) -> Dict[str, Any]:
         """
         Compress conversation history with the AI to retain important context
@@ -1278,6 +1305,7 @@ class GeminiAI:
             # Direct SQL to avoid ORM issues
             sql = f"INSERT INTO messages ({columns}) VALUES ({placeholders})"
             db_session.execute(text(sql), message)
+            record_messages(db_session, [message])
             db_session.commit()
             
             logger.info(f"✅ Message saved to database: '{message['content'][:50]}...'")
@@ -1347,6 +1375,7 @@ def save_message_safely(db_session, message_data):
         # Execute the INSERT
         query = f"INSERT INTO messages ({column_names}) VALUES ({placeholders})"
         db_session.execute(text(query), insert_data)
+        record_messages(db_session, [insert_data])
         db_session.commit()
         
         return True
@@ -1396,6 +1425,7 @@ def save_message_safely(db, message_data):
         # Execute insert
         query = f"INSERT INTO messages ({column_names}) VALUES ({placeholders})"
         db.execute(text(query), data)
+        record_messages(db, [data])
         db.commit()
         
         logger.info(f"✅ Message saved to database with content: {data.get('content', '')[:50]}...")
@@ -11,6 +11,7 @@ from sqlalchemy import text
 
 # Import our universal ID handler
 from core.utils.universal_id import ensure_uuid, get_user_id_formats
+from core.db.models.memory_entry import memory_content_hash
 
 logger = logging.getLogger(__name__)
 
@@ -697,10 +698,10 @@ class MemoryManager:
                     
                     execute_safe_query(db_session, """
                         INSERT INTO memory_entries (
-                            id, character_id, user_id, type, memory_type, category, content,
+                            id, character_id, user_id, type, memory_type, category, content, content_hash,
                             importance, is_active, created_at, updated_at
                         ) VALUES (
-                            :id, :character_id, :user_id, :type, :memory_type, :category, :content,
+                            :id, :character_id, :user_id, :type, :memory_type, :category, :content, :content_hash,
                             :importance, :is_active, :created_at, :updated_at
                         )
                     """, {
@@ -711,6 +712,7 @@ class MemoryManager:
                         "memory_type": memory_type,
                         "category": category,
                         "content": memory_content,
+                        "content_hash": memory_content_hash(memory_content),
                         "importance": importance,
                         "is_active": True,
                         "created_at": timestamp,
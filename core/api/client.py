@@ -5,6 +5,119 @@ import re
 
 logger = logging.getLogger(__name__)
 
+def memory_user_id_formats(user_id=None, include_all=False):
+    """
+    Expand a user id into every format the memories endpoint may know it by
+
+    Args:
+        user_id: ID of the user or tuple of IDs in different formats
+        include_all: Whether memories are requested regardless of user ID
+
+    Returns:
+        list: User ID formats to try in order (None means no user filter)
+    """
+    user_id_formats = []
+    
+    if include_all:
+        # If include_all is True, we don't need any user_id parameters
+        user_id_formats = [None]
+    elif user_id is None:
+        # If no user_id provided, just make a basic request
+        user_id_formats = [None]
+    else:
+        # Handle both tuple format and single format
+        if isinstance(user_id, tuple):
+            # Add all items in the tuple
+            user_id_formats.extend(list(user_id))
+        else:
+            # Add the single user_id
+            user_id_formats.append(user_id)
+        
+        # Handle various UUID formats for Telegram IDs
+        for uid in list(user_id_formats):  # Make a copy to safely modify
+            if isinstance(uid, (int, str)):
+                # Convert to string
+                uid_str = str(uid)
+                
+                # Extract telegram ID from UUID format if possible
+                telegram_id = None
+                
+                # UUID format with embedded Telegram ID (decimal with leading zeros)
+                if re.match(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-00\d+$', uid_str):
+                    telegram_id = uid_str.split('-')[-1].lstrip('0')
+                    if telegram_id:
+                        # Original format with leading zeros
+                        if uid_str not in user_id_formats:
+                            user_id_formats.append(uid_str)
+                        
+                        # Add raw numeric format
+                        if telegram_id not in user_id_formats:
+                            user_id_formats.append(telegram_id)
+                        
+                        # Add hex format without leading zeros (used by memory manager)
+                        try:
+                            hex_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):x}"
+                            if hex_format not in user_id_formats:
+                                user_id_formats.append(hex_format)
+                        except (ValueError, TypeError):
+                            pass
+                
+                # UUID format with embedded Telegram ID (hex format)
+                elif re.match(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', uid_str):
+                    hex_part = uid_str.split('-')[-1]
+                    try:
+                        # Convert hex to decimal
+                        telegram_id = str(int(hex_part, 16))
+                        
+                        # Add decimal format with leading zeros
+                        decimal_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):012d}"
+                        if decimal_format not in user_id_formats:
+                            user_id_formats.append(decimal_format)
+                            
+                        # Add raw numeric format
+                        if telegram_id not in user_id_formats:
+                            user_id_formats.append(telegram_id)
+                    except (ValueError, TypeError):
+                        pass
+                
+                # Plain numeric Telegram ID
+                elif uid_str.isdigit():
+                    telegram_id = uid_str
+                    
+                    # Add UUID format with leading zeros
+                    decimal_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):012d}"
+                    if decimal_format not in user_id_formats:
+                        user_id_formats.append(decimal_format)
+                    
+                    # Add hex format
+                    try:
+                        hex_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):x}"
+                        if hex_format not in user_id_formats:
+                            user_id_formats.append(hex_format)
+                    except (ValueError, TypeError):
+                        pass
+    
+    return user_id_formats
+
+def memory_request_params(uid_format, include_all=False):
+    """
+    Build query parameters for a single memories request
+
+    Args:
+        uid_format: One of the formats returned by memory_user_id_formats
+        include_all: Whether to include all memories regardless of user ID
+
+    Returns:
+        dict: Query parameters
+    """
+    if include_all:
+        return {"include_all": "true"}
+    if uid_format is None:
+        return {}
+    # Decide whether to use user_id or telegram_id parameter
+    param_name = "telegram_id" if isinstance(uid_format, int) or (isinstance(uid_format, str) and uid_format.isdigit()) else "user_id"
+    return {param_name: str(uid_format)}
+
 class ApiClient:
     """Client for interacting with the AI Bot API"""
     
@@ -57,101 +170,12 @@ class ApiClient:
         tried_urls = []
         
         # Prepare multiple user ID formats to try
-        user_id_formats = []
-        
-        if include_all:
-            # If include_all is True, we don't need any user_id parameters
-            user_id_formats = [None]
-        elif user_id is None:
-            # If no user_id provided, just make a basic request
-            user_id_formats = [None]
-        else:
-            # Handle both tuple format and single format
-            if isinstance(user_id, tuple):
-                # Add all items in the tuple
-                user_id_formats.extend(list(user_id))
-            else:
-                # Add the single user_id
-                user_id_formats.append(user_id)
-            
-            # Handle various UUID formats for Telegram IDs
-            for uid in list(user_id_formats):  # Make a copy to safely modify
-                if isinstance(uid, (int, str)):
-                    # Convert to string
-                    uid_str = str(uid)
-                    
-                    # Extract telegram ID from UUID format if possible
-                    telegram_id = None
-                    
-                    # UUID format with embedded Telegram ID (decimal with leading zeros)
-                    if re.match(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-00\d+$', uid_str):
-                        telegram_id = uid_str.split('-')[-1].lstrip('0')
-                        if telegram_id:
-                            # Original format with leading zeros
-                            if uid_str not in user_id_formats:
-                                user_id_formats.append(uid_str)
-                            
-                            # Add raw numeric format
-                            if telegram_id not in user_id_formats:
-                                user_id_formats.append(telegram_id)
-                            
-                            # Add hex format without leading zeros (used by memory manager)
-                            try:
-                                hex_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):x}"
-                                if hex_format not in user_id_formats:
-                                    user_id_formats.append(hex_format)
-                            except (ValueError, TypeError):
-                                pass
-                    
-                    # UUID format with embedded Telegram ID (hex format)
-                    elif re.match(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', uid_str):
-                        hex_part = uid_str.split('-')[-1]
-                        try:
-                            # Convert hex to decimal
-                            telegram_id = str(int(hex_part, 16))
-                            
-                            # Add decimal format with leading zeros
-                            decimal_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):012d}"
-                            if decimal_format not in user_id_formats:
-                                user_id_formats.append(decimal_format)
-                                
-                            # Add raw numeric format
-                            if telegram_id not in user_id_formats:
-                                user_id_formats.append(telegram_id)
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    # Plain numeric Telegram ID
-                    elif uid_str.isdigit():
-                        telegram_id = uid_str
-                        
-                        # Add UUID format with leading zeros
-                        decimal_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):012d}"
-                        if decimal_format not in user_id_formats:
-                            user_id_formats.append(decimal_format)
-                        
-                        # Add hex format
-                        try:
-                            hex_format = f"c7cb5b5c-e469-586e-8e87-{int(telegram_id):x}"
-                            if hex_format not in user_id_formats:
-                                user_id_formats.append(hex_format)
-                        except (ValueError, TypeError):
-                            pass
+        user_id_formats = memory_user_id_formats(user_id, include_all)
         
         # Try all the user ID formats until we find memories
         for format_idx, uid_format in enumerate(user_id_formats):
-            params = {}
-            # Initialize param_name to support logging when include_all
-            param_name = None
-            
-            # Add parameters based on format
-            if include_all:
-                param_name = "include_all"
-                params["include_all"] = "true"
-            elif uid_format is not None:
-                # Decide whether to use user_id or telegram_id parameter
-                param_name = "telegram_id" if isinstance(uid_format, int) or (isinstance(uid_format, str) and uid_format.isdigit()) else "user_id"
-                params[param_name] = str(uid_format)
+            params = memory_request_params(uid_format, include_all)
+            param_name = next(iter(params), None)
             
             # Construct URL with parameters
             request_url = url
@@ -34,7 +34,35 @@ class Settings(BaseSettings):
     OPENROUTER_API_KEY: Optional[str] = os.environ.get("OPENROUTER_API_KEY", "")
     OPENROUTER_MODEL: str = os.environ.get("OPENROUTER_MODEL", "openai/gpt-4o-2024-11-20")
     OPENROUTER_WORKING: bool = False  # Track if the API key is valid and working
-    
+
+    # Conversation journal (write-behind buffer for chat_history)
+    CONVERSATION_JOURNAL_DIR: str = os.environ.get("CONVERSATION_JOURNAL_DIR", "logs/journal")
+    CONVERSATION_JOURNAL_BATCH_SIZE: int = int(os.environ.get("CONVERSATION_JOURNAL_BATCH_SIZE", 20))
+    CONVERSATION_JOURNAL_FLUSH_INTERVAL: float = float(os.environ.get("CONVERSATION_JOURNAL_FLUSH_INTERVAL", 5.0))
+    CONVERSATION_JOURNAL_MAX_SESSIONS: int = int(os.environ.get("CONVERSATION_JOURNAL_MAX_SESSIONS", 1000))
+    CONVERSATION_JOURNAL_FSYNC: bool = os.environ.get("CONVERSATION_JOURNAL_FSYNC", "False").lower() == "true"
+
+    # Character catalog cache: seconds between checks of the catalog version in the database
+    CHARACTER_CATALOG_VERSION_CHECK_INTERVAL: float = float(os.environ.get("CHARACTER_CATALOG_VERSION_CHECK_INTERVAL", 2.0))
+    # Character repository: hydrated characters kept per process
+    CHARACTER_CACHE_SIZE: int = int(os.environ.get("CHARACTER_CACHE_SIZE", 1000))
+
+    # Event scheduler: events become active EVENT_LEAD_TIME seconds before their target date
+    EVENT_SCHEDULER_ENABLED: bool = os.environ.get("EVENT_SCHEDULER_ENABLED", "True").lower() == "true"
+    EVENT_LEAD_TIME: float = float(os.environ.get("EVENT_LEAD_TIME", 86400))
+    # Pending events due within this many seconds are kept in the scheduler queue
+    EVENT_SCHEDULER_HORIZON: float = float(os.environ.get("EVENT_SCHEDULER_HORIZON", 3600))
+    EVENT_SCHEDULER_REFILL_INTERVAL: float = float(os.environ.get("EVENT_SCHEDULER_REFILL_INTERVAL", 60))
+    # Discovery feed: candidates queued per user and the remaining count below which a refill starts
+    DISCOVERY_QUEUE_SIZE: int = int(os.environ.get("DISCOVERY_QUEUE_SIZE", 200))
+    DISCOVERY_QUEUE_LOW_WATERMARK: int = int(os.environ.get("DISCOVERY_QUEUE_LOW_WATERMARK", 50))
+    # Admin dashboard figures are recomputed in the background once older than DASHBOARD_STATS_MAX_AGE seconds;
+    # PostgreSQL tables above DASHBOARD_STATS_EXACT_COUNT_LIMIT rows are counted from the planner estimate
+    DASHBOARD_STATS_MAX_AGE: float = float(os.environ.get("DASHBOARD_STATS_MAX_AGE", 300))
+    DASHBOARD_STATS_EXACT_COUNT_LIMIT: int = int(os.environ.get("DASHBOARD_STATS_EXACT_COUNT_LIMIT", 1000000))
+    # Debug log viewer: SQLite catalog of the conversation log files, kept up to date by the log writer
+    LOG_CATALOG_PATH: str = os.environ.get("LOG_CATALOG_PATH", "logs/conversation_catalog.db")
+
     # Image storage
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -63,7 +91,12 @@ class Settings(BaseSettings):
     APPLE_BUNDLE_ID: Optional[str] = os.environ.get("APPLE_BUNDLE_ID", "com.yourapp.identifier")
     APPLE_AUTH_KEY_PATH: str = os.environ.get("APPLE_AUTH_KEY_PATH", "keys/AuthKey_Apple.p8")
     APPLE_USE_SANDBOX: bool = os.environ.get("APPLE_USE_SANDBOX", "True").lower() == "true"
-    
+    # APNs sender: concurrent pushes on the shared HTTP/2 connection and provider token lifetime
+    # (APNs rejects tokens older than an hour and throttles refreshes more often than every 20 minutes)
+    APNS_MAX_CONCURRENCY: int = int(os.environ.get("APNS_MAX_CONCURRENCY", 100))
+    APNS_TIMEOUT: float = float(os.environ.get("APNS_TIMEOUT", 10))
+    APNS_TOKEN_TTL: float = float(os.environ.get("APNS_TOKEN_TTL", 3000))
+
     # URL базовый для сервиса
     BASE_URL: str = os.environ.get("BASE_URL", "http://localhost:8000")
     
@@ -76,6 +109,25 @@ class Settings(BaseSettings):
     S3_REGION: Optional[str] = os.environ.get("S3_REGION")
     # Public URL for MinIO/S3 access, fallback to endpoint
     MINIO_PUBLIC_URL: Optional[str] = os.environ.get("MINIO_PUBLIC_URL")
+    # Uploads are read in chunks of this size; larger objects use multipart parts of STORAGE_PART_SIZE (min 5 MiB)
+    STORAGE_CHUNK_SIZE: int = int(os.environ.get("STORAGE_CHUNK_SIZE", 1024 * 1024))
+    STORAGE_PART_SIZE: int = int(os.environ.get("STORAGE_PART_SIZE", 16 * 1024 * 1024))
+    # Media reads: public bucket URLs, or (private buckets) presigned GET URLs valid for PRESIGNED_GET_TTL seconds;
+    # the signing time is rounded down to PRESIGNED_GET_WINDOW seconds so the URL of an object stays cacheable
+    MINIO_PUBLIC_BUCKETS: bool = os.environ.get("MINIO_PUBLIC_BUCKETS", "True").lower() == "true"
+    PRESIGNED_GET_TTL: int = int(os.environ.get("PRESIGNED_GET_TTL", 7 * 24 * 3600))
+    PRESIGNED_GET_WINDOW: int = int(os.environ.get("PRESIGNED_GET_WINDOW", 24 * 3600))
+    # Stored media never changes under the same name, so clients may cache it for a year
+    MEDIA_CACHE_CONTROL: str = os.environ.get("MEDIA_CACHE_CONTROL", "public, max-age=31536000, immutable")
+    # Direct uploads: seconds a presigned PUT URL and its upload token stay valid
+    UPLOAD_INTENT_TTL: int = int(os.environ.get("UPLOAD_INTENT_TTL", 900))
+    # Clients upload under UPLOAD_INTENT_PREFIX; objects never completed there expire after this many days
+    UPLOAD_INTENT_PREFIX: str = os.environ.get("UPLOAD_INTENT_PREFIX", "upload-intents")
+    UPLOAD_INTENT_EXPIRY_DAYS: int = int(os.environ.get("UPLOAD_INTENT_EXPIRY_DAYS", 1))
+    # Resized WebP/JPEG variants of uploaded images, rendered on a pool of IMAGE_VARIANT_WORKERS processes
+    IMAGE_VARIANTS_ENABLED: bool = os.environ.get("IMAGE_VARIANTS_ENABLED", "True").lower() == "true"
+    IMAGE_VARIANT_WORKERS: int = int(os.environ.get("IMAGE_VARIANT_WORKERS", 2))
+    IMAGE_VARIANT_QUALITY: int = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
 
     class Config:
         env_file = ".env"
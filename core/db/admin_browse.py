@@ -0,0 +1,158 @@
+"""
+Keyset pagination and content search for the admin list views.
+
+Admin lists of messages and memories are ordered newest first and paged by
+(created_at, id) cursors: a page is a range scan of the (created_at, id)
+index starting after the last row of the previous page, so deep pages cost
+the same as the first one, where LIMIT/OFFSET reads and discards every
+skipped row.
+
+Content search is indexed as well. On PostgreSQL a pg_trgm GIN index on
+``content`` serves ``ILIKE '%term%'`` (substrings, any language). Local
+SQLite deployments get an FTS5 table per searchable table, kept in sync by
+triggers, which matches the search terms as word prefixes. Both are created
+by the add_admin_search migration; without them search falls back to a LIKE
+scan.
+"""
+import base64
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLES = ("messages", "memory_entries")
+
+# External content FTS5 table over the rowids of the source table
+SQLITE_FTS_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(content, content='{table}', content_rowid='rowid')",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts (rowid, content) VALUES (new.rowid, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF content ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+        INSERT INTO {table}_fts (rowid, content) VALUES (new.rowid, new.content);
+    END""",
+    # Index the rows that existed before the table was created
+    "INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')",
+)
+
+@dataclass
+class Page:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    # Cursor of the next page, None on the last one
+    next_cursor: Optional[str] = None
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """
+    Opaque cursor pointing after a row with created_at and id
+    """
+    created_at = row["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, row["id"] if isinstance(row["id"], int) else str(row["id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, Any]:
+    """
+    Decode a cursor from encode_cursor; raises ValueError if it is malformed
+    """
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), row_id
+    except Exception as e:
+        raise ValueError(f"Invalid page cursor: {cursor}") from e
+
+def create_sqlite_fts(conn, table: str) -> bool:
+    """
+    Create (or complete) the FTS5 search index of a table on SQLite.
+
+    Returns:
+        False if this SQLite build has no FTS5 (search falls back to LIKE)
+    """
+    try:
+        for statement in SQLITE_FTS_SQL:
+            conn.execute(text(statement.format(table=table)))
+    except OperationalError as e:
+        logger.warning(f"FTS5 search index for {table} not created: {e}")
+        return False
+    return True
+
+def drop_sqlite_fts(conn, table: str) -> None:
+    for trigger in ("insert", "delete", "update"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {table}_fts"))
+
+def fts5_query(search: str) -> str:
+    """
+    FTS5 query matching all terms of free text as prefixes, with FTS syntax quoted away
+    """
+    terms = ['"' + term.replace('"', '""') + '"*' for term in search.split()]
+    return " ".join(terms)
+
+def search_condition(db: Session, table: str, alias: str, search: str, params: Dict[str, Any]) -> str:
+    """
+    SQL condition on ``alias`` (a row of ``table``) matching rows whose content contains ``search``.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and _has_sqlite_fts(db, table) and fts5_query(search):
+        params["search"] = fts5_query(search)
+        return f"{alias}.rowid IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :search)"
+
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params["search"] = f"%{escaped}%"
+    operator = "ILIKE" if dialect == "postgresql" else "LIKE"
+    return f"{alias}.content {operator} :search ESCAPE '\\'"
+
+def keyset_page(db: Session, select_sql: str, table: str, alias: str = "m",
+                conditions: Optional[List[str]] = None, params: Optional[Dict[str, Any]] = None,
+                limit: int = 50, cursor: Optional[str] = None, search: Optional[str] = None) -> Page:
+    """
+    One page of ``table`` rows, newest first.
+
+    Args:
+        select_sql: ``SELECT ... FROM <table> <alias> [JOIN ...]`` without WHERE, ORDER BY or LIMIT;
+            it must select the row's id and created_at
+        conditions: Extra WHERE conditions, joined with AND
+        params: Parameters of select_sql and conditions
+        cursor: next_cursor of the previous page
+        search: Free text the content must contain
+
+    Raises:
+        ValueError: Malformed cursor
+    """
+    params = dict(params or {})
+    conditions = list(conditions or [])
+    if cursor:
+        params["cursor_created_at"], params["cursor_id"] = decode_cursor(cursor)
+        conditions.append(f"({alias}.created_at, {alias}.id) < (:cursor_created_at, :cursor_id)")
+    if search and search.strip():
+        conditions.append(search_condition(db, table, alias, search.strip(), params))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params["limit"] = limit + 1
+
+    result = db.execute(text(f"""
+        {select_sql}
+        {where}
+        ORDER BY {alias}.created_at DESC, {alias}.id DESC
+        LIMIT :limit
+    """), params)
+    rows = [dict(row) for row in result]
+    if len(rows) <= limit:
+        return Page(rows=rows)
+    rows = rows[:limit]
+    return Page(rows=rows, next_cursor=encode_cursor(rows[-1]))
+
+def _has_sqlite_fts(db: Session, table: str) -> bool:
+    return db.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {"name": f"{table}_fts"}).first() is not None
@@ -0,0 +1,236 @@
+"""
+Precomputed admin dashboard figures.
+
+Counting users, characters, messages and memory_entries on every admin page
+load is a full scan per table, and the memories page used to add one more
+COUNT(*) per character. The dashboard_stats table instead holds one row per
+figure: the table totals, plus the memory count of every character
+(``memory_entries:character:<id>``), computed with a single grouped
+aggregate. ``DashboardStats.refresh`` recomputes them all in one
+transaction, upserting every figure and dropping the ones it no longer
+produced; on PostgreSQL, tables estimated above
+DASHBOARD_STATS_EXACT_COUNT_LIMIT rows take the planner's row estimate
+instead of an exact count, and a transaction-level advisory lock lets only
+one process refresh at a time.
+
+Readers only read the stored rows. Once the stored figures (their
+``updated_at``, shared by every process) are older than
+DASHBOARD_STATS_MAX_AGE, a refresh starts on a background thread and the
+current figures are served meanwhile; only the very first load, with
+nothing stored yet, refreshes inline.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STAT_TABLES = ("users", "characters", "messages", "memory_entries")
+CHARACTER_MEMORY_PREFIX = "memory_entries:character:"
+
+# One grouped aggregate instead of a COUNT(*) per character
+CHARACTER_MEMORY_COUNTS_SQL = """
+    SELECT CAST(character_id AS TEXT), COUNT(*)
+    FROM memory_entries
+    WHERE character_id IS NOT NULL
+    GROUP BY character_id
+"""
+
+# Maintained by autovacuum/ANALYZE; -1 (PostgreSQL 14+) or 0 when never analyzed
+ESTIMATE_SQL = "SELECT CAST(reltuples AS BIGINT) FROM pg_class WHERE oid = to_regclass(:table)"
+
+# Works on PostgreSQL and SQLite (3.24+); concurrent refreshes update the same rows instead of colliding
+UPSERT_SQL = """
+    INSERT INTO dashboard_stats (name, value, updated_at)
+    VALUES (:name, :value, :updated_at)
+    ON CONFLICT (name) DO UPDATE
+    SET value = excluded.value, updated_at = excluded.updated_at
+"""
+
+# Figures not produced by this refresh, e.g. of characters without memories anymore
+DELETE_STALE_SQL = "DELETE FROM dashboard_stats WHERE updated_at < :updated_at"
+
+# Held until the refresh transaction ends; another process refreshing skips its own refresh
+REFRESH_LOCK_SQL = "SELECT pg_try_advisory_xact_lock(:key)"
+REFRESH_LOCK_KEY = 0x64617368626F6172  # "dashboar"
+
+class DashboardStats:
+    """Reads and refreshes the precomputed dashboard figures of one database"""
+
+    def __init__(self, engine: Engine, max_age: Optional[float] = None,
+                 exact_count_limit: Optional[int] = None):
+        """
+        Args:
+            engine: Engine of the application database
+            max_age: Seconds after which the figures are refreshed in the background
+            exact_count_limit: Estimated PostgreSQL row count above which the estimate is used
+        """
+        self.engine = engine
+        self.max_age = max_age if max_age is not None else settings.DASHBOARD_STATS_MAX_AGE
+        self.exact_count_limit = (
+            exact_count_limit if exact_count_limit is not None
+            else settings.DASHBOARD_STATS_EXACT_COUNT_LIMIT
+        )
+        self._lock = threading.Lock()
+        self._refreshing = False
+        # updated_at of the stored figures last read or written by this process
+        self._refreshed_at: Optional[datetime] = None
+        self.refreshes = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def totals(self) -> Dict[str, int]:
+        """Row counts of STAT_TABLES (0 for missing tables)."""
+        figures = self._figures()
+        return {table: figures.get(table, 0) for table in STAT_TABLES}
+
+    def memory_counts(self) -> Dict[str, int]:
+        """Number of memory entries per character id, for characters having any."""
+        return {
+            name[len(CHARACTER_MEMORY_PREFIX):]: value
+            for name, value in self._figures().items()
+            if name.startswith(CHARACTER_MEMORY_PREFIX)
+        }
+
+    def refresh(self) -> Optional[Dict[str, int]]:
+        """
+        Recompute and store every figure.
+
+        Returns:
+            The new figures by name, or None when another process is refreshing them
+        """
+        with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql" and not conn.execute(
+                text(REFRESH_LOCK_SQL), {"key": REFRESH_LOCK_KEY}
+            ).scalar():
+                logger.info("Dashboard stats are being refreshed by another process")
+                return None
+            figures = self._compute(conn)
+            refreshed_at = datetime.now(timezone.utc)
+            # ISO text compares correctly in SQLite and casts to timestamptz in PostgreSQL
+            updated_at = refreshed_at.isoformat(sep=" ")
+            if figures:
+                conn.execute(text(UPSERT_SQL), [
+                    {"name": name, "value": value, "updated_at": updated_at}
+                    for name, value in figures.items()
+                ])
+            conn.execute(text(DELETE_STALE_SQL), {"updated_at": updated_at})
+        self._refreshed_at = refreshed_at
+        self.refreshes += 1
+        return figures
+
+    def get_metrics(self) -> Dict[str, Any]:
+        age = None
+        if self._refreshed_at is not None:
+            age = (datetime.now(timezone.utc) - self._refreshed_at).total_seconds()
+        return {"refreshes": self.refreshes, "age": age}
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _figures(self) -> Dict[str, int]:
+        try:
+            figures, refreshed_at = self._read()
+        except Exception as e:
+            # Table not migrated yet: compute without storing
+            logger.warning(f"Dashboard stats unavailable, counting live: {e}")
+            return self._compute_live()
+
+        if not figures:
+            refreshed = self.refresh()
+            # Another process is storing them: count live for this load
+            return refreshed if refreshed is not None else self._compute_live()
+        self._refreshed_at = refreshed_at
+        if refreshed_at is None or (datetime.now(timezone.utc) - refreshed_at).total_seconds() > self.max_age:
+            self._refresh_in_background()
+        return figures
+
+    def _read(self) -> Tuple[Dict[str, int], Optional[datetime]]:
+        figures, refreshed_at = {}, None
+        with self.engine.connect() as conn:
+            for name, value, updated_at in conn.execute(text("SELECT name, value, updated_at FROM dashboard_stats")):
+                figures[name] = value
+                updated_at = _as_utc(updated_at)
+                if updated_at is not None and (refreshed_at is None or updated_at > refreshed_at):
+                    refreshed_at = updated_at
+        return figures, refreshed_at
+
+    def _compute_live(self) -> Dict[str, int]:
+        with self.engine.begin() as conn:
+            return self._compute(conn)
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="dashboard-stats", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing dashboard stats: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _compute(self, conn) -> Dict[str, int]:
+        # Savepoints, so a missing table does not abort the whole refresh
+        figures = {}
+        for table in STAT_TABLES:
+            try:
+                with conn.begin_nested():
+                    figures[table] = self._count(conn, table)
+            except Exception as e:
+                logger.warning(f"Cannot count {table}: {e}")
+        try:
+            with conn.begin_nested():
+                rows = conn.execute(text(CHARACTER_MEMORY_COUNTS_SQL)).fetchall()
+            for character_id, count in rows:
+                figures[f"{CHARACTER_MEMORY_PREFIX}{character_id}"] = count
+        except Exception as e:
+            logger.warning(f"Cannot count memories per character: {e}")
+        return figures
+
+    def _count(self, conn, table: str) -> int:
+        if conn.dialect.name == "postgresql":
+            estimate = conn.execute(text(ESTIMATE_SQL), {"table": table}).scalar()
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        # Table names come from STAT_TABLES only
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+def _as_utc(value: Any) -> Optional[datetime]:
+    # SQLite returns the stored text, PostgreSQL a datetime; naive values are UTC (CURRENT_TIMESTAMP)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+_instances: Dict[str, DashboardStats] = {}
+_instances_lock = threading.Lock()
+
+def get_dashboard_stats(engine: Engine) -> DashboardStats:
+    """Shared DashboardStats of an engine's database."""
+    key = str(engine.url)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = DashboardStats(engine)
+        return _instances[key]
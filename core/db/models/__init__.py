@@ -9,6 +9,12 @@ try:
     from core.db.models.user_profile import UserProfile  # Добавляем модель профиля пользователя
     from core.db.models.user_photo import UserPhoto  # Добавляем модель фотографий пользователя
     from core.db.models.event import Event  # Добавляем модель Event
+    from core.db.models.cache_version import CacheVersion
+    from core.db.models.relationship_stats import RelationshipStats
+    from core.db.models.rating_change import RatingChange, RatingDailyRollup
+    from core.db.models.scheduled_event import ScheduledEvent
+    from core.db.models.discovery_queue import DiscoveryQueueEntry
+    from core.db.models.dashboard_stat import DashboardStat
 except ImportError as e:
     import logging
     logging.warning(f"Could not import some models: {e}")
@@ -17,6 +17,8 @@ class Character(Base):
     system_prompt = Column(Text)
     greeting_message = Column(Text)
     avatar_url = Column(String(500))
+    # JSON {variant: {format: object name}} of resized copies of the avatar
+    avatar_variants = Column(Text)
     creator_id = Column(String)
     is_active = Column(Boolean, default=True)
     character_metadata = Column(Text)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from core.db.base import Base
+
+class DashboardStat(Base):
+    """One precomputed admin dashboard figure, recomputed by core.db.dashboard_stats"""
+    __tablename__ = "dashboard_stats"
+    
+    name = Column(String(100), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
+    
+    def __repr__(self):
+        return f"<DashboardStat {self.name}={self.value}>"
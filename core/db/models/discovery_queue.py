@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from core.db.base import Base
+
+class DiscoveryQueueEntry(Base):
+    """A pre-shuffled discovery feed candidate of a user; positions only grow, so they double as page cursors"""
+    __tablename__ = "discovery_queue"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    position = Column(Integer, primary_key=True, autoincrement=False)
+    character_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (
+        # Swipes remove the entry of the swiped character
+        Index("ix_discovery_queue_user_character", "user_id", "character_id"),
+    )
+
+    def __repr__(self):
+        return f"<DiscoveryQueueEntry {self.user_id}#{self.position} -> {self.character_id}>"
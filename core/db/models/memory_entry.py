@@ -1,10 +1,20 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Index
 from sqlalchemy.sql import func
 from core.db.base import Base
+import hashlib
 import uuid
 
+def memory_content_hash(content: str) -> str:
+    """Hash of a memory's content, insensitive to case and whitespace differences"""
+    normalized = " ".join(content.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
 class MemoryEntry(Base):
     __tablename__ = "memory_entries"
+    __table_args__ = (
+        # Deduplication lookups for one (character, user) pair
+        Index("ix_memory_entries_pair_hash", "character_id", "user_id", "content_hash"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     character_id = Column(String, nullable=False)
@@ -13,6 +23,7 @@ class MemoryEntry(Base):
     memory_type = Column(String(50), default="unknown")
     category = Column(String(50), default="general")
     content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the normalized content
     importance = Column(Integer, default=1)  # 1-10 scale
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Integer, SmallInteger, Date, DateTime, Index
+from sqlalchemy.sql import func
+from core.db.base import Base
+
+class RatingChange(Base):
+    """Append-only log of love rating changes of a (user, partner) pair"""
+    __tablename__ = "rating_changes"
+    __table_args__ = (
+        # History of one pair in time order
+        Index("ix_rating_changes_pair_time", "user_id", "partner_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(36), nullable=False)
+    partner_id = Column(String(36), nullable=False)
+    delta = Column(SmallInteger, nullable=False)
+    score = Column(SmallInteger, nullable=False)  # Score after the change
+    reason = Column(String(100))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<RatingChange {self.user_id}:{self.partner_id} {self.delta:+d}>"
+
+class RatingDailyRollup(Base):
+    """Sum of a pair's rating changes per UTC day, maintained with every logged change"""
+    __tablename__ = "rating_daily_rollups"
+    
+    user_id = Column(String(36), primary_key=True)
+    partner_id = Column(String(36), primary_key=True)
+    day = Column(Date, primary_key=True)
+    delta_sum = Column(Integer, nullable=False, default=0)
+    changes = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<RatingDailyRollup {self.user_id}:{self.partner_id} {self.day} {self.delta_sum:+d}>"
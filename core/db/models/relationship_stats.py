@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy.sql import func
+from core.db.base import Base
+
+class RelationshipStats(Base):
+    """Per user/character interaction counters, maintained with every message insert"""
+    __tablename__ = "relationship_stats"
+    
+    user_id = Column(String(36), primary_key=True)
+    character_id = Column(String(36), primary_key=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    gift_count = Column(Integer, nullable=False, default=0)
+    last_interaction_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<RelationshipStats {self.user_id}:{self.character_id} messages={self.message_count}>"
@@ -0,0 +1,35 @@
+import uuid
+from sqlalchemy import Column, String, DateTime, JSON, Index, CheckConstraint
+from sqlalchemy.sql import func
+
+from core.db.base import Base
+
+class ScheduledEvent(Base):
+    """
+    Relationship event of a (user, partner) pair with a due time (daily, quest, global).
+
+    pending events become active when the event scheduler reaches their
+    activation time; the chat reads the active events of a pair.
+    """
+    __tablename__ = "scheduled_events"
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'active', 'completed')", name="check_scheduled_event_status"),
+        # Active events of one pair, nearest first
+        Index("ix_scheduled_events_pair_status_target", "user_id", "partner_id", "status", "target_date"),
+        # Next pending events for the scheduler
+        Index("ix_scheduled_events_status_target", "status", "target_date"),
+    )
+
+    event_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String(36), nullable=False)
+    partner_id = Column(String(36), nullable=False)
+    type = Column(String(32), nullable=False)
+    status = Column(String(32), nullable=False, default="pending")
+    target_date = Column(DateTime(timezone=True), nullable=True)
+    schedule = Column(JSON, nullable=True)
+    details = Column(JSON, nullable=True)
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ScheduledEvent {self.type}: {self.event_id} ({self.status})>"
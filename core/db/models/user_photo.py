@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -21,6 +21,7 @@ class UserPhoto(Base):
     filename = Column(String(200), nullable=False)  # Оригинальное имя файла
     content_type = Column(String(100), nullable=True)  # Тип контента (image/jpeg, image/png, ...)
     size = Column(Integer, nullable=True)  # Размер файла в байтах
+    variants = Column(Text, nullable=True)  # JSON {вариант: {формат: объект}} уменьшенных копий
     
     # Метаданные
     is_primary = Column(Boolean, default=False)  # Основная фотография профиля
@@ -0,0 +1,181 @@
+"""
+Per user/character relationship counters.
+
+relationship_stats holds one row per (user, character) pair with the number
+of messages exchanged, gifts sent and the last interaction time. Writers of
+the messages table call ``record_messages`` in the same transaction as the
+insert, so the relationship screen is a single-row lookup whatever the
+history length. ``rebuild_relationship_stats`` recomputes every row from the
+messages table (backfill, or repair after writes that bypassed the counters).
+
+The same hook keeps the denormalized last_message_at / last_message_preview
+columns of the pair's match current, so the matches screen needs no messages
+lookup.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Works on PostgreSQL and SQLite (3.24+)
+UPSERT_SQL = """
+    INSERT INTO relationship_stats
+        (user_id, character_id, message_count, gift_count, last_interaction_at, updated_at)
+    VALUES (:user_id, :character_id, :messages, :gifts, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, character_id) DO UPDATE
+    SET message_count = relationship_stats.message_count + excluded.message_count,
+        gift_count = relationship_stats.gift_count + excluded.gift_count,
+        last_interaction_at = excluded.last_interaction_at,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Characters of the preview shown on the matches screen
+MATCH_PREVIEW_LENGTH = 200
+
+TOUCH_MATCH_SQL = """
+    UPDATE matches
+    SET last_message_at = CURRENT_TIMESTAMP, last_message_preview = :preview
+    WHERE user_id = :user_id AND character_id = :character_id
+"""
+
+# Same pairing rules as message_pair, applied to the whole history
+REBUILD_SQL = """
+    INSERT INTO relationship_stats
+        (user_id, character_id, message_count, gift_count, last_interaction_at, updated_at)
+    SELECT
+        CASE WHEN sender_type = 'user' THEN sender_id ELSE recipient_id END,
+        CASE WHEN sender_type = 'user' THEN recipient_id ELSE sender_id END,
+        COUNT(*),
+        SUM(CASE WHEN is_gift AND sender_type = 'user' THEN 1 ELSE 0 END),
+        MAX(created_at),
+        CURRENT_TIMESTAMP
+    FROM messages
+    WHERE (sender_type = 'user' AND recipient_type <> 'user')
+       OR (sender_type <> 'user' AND recipient_type = 'user')
+    GROUP BY 1, 2
+"""
+
+
+def message_pair(sender_id: Any, sender_type: str, recipient_id: Any,
+                 recipient_type: str) -> Optional[Tuple[str, str]]:
+    """Return (user_id, character_id) of a message, or None if it is not between a user and a character."""
+    if sender_type == "user" and recipient_type != "user":
+        return str(sender_id), str(recipient_id)
+    if recipient_type == "user" and sender_type != "user":
+        return str(recipient_id), str(sender_id)
+    return None
+
+
+def _field(message: Any, key: str) -> Any:
+    return message.get(key) if isinstance(message, dict) else getattr(message, key, None)
+
+
+def record_messages(db: Session, messages: Iterable[Any]) -> None:
+    """
+    Add messages to the counters of their pairs; call inside the transaction that inserts them.
+
+    Accepts Message objects or dicts with the same keys.
+    """
+    deltas: Dict[Tuple[str, str], Dict[str, int]] = {}
+    previews: Dict[Tuple[str, str], str] = {}
+    for message in messages:
+        sender_type = _field(message, "sender_type")
+        pair = message_pair(
+            _field(message, "sender_id"), sender_type,
+            _field(message, "recipient_id"), _field(message, "recipient_type")
+        )
+        if pair is None:
+            continue
+        delta = deltas.setdefault(pair, {"messages": 0, "gifts": 0})
+        delta["messages"] += 1
+        if _field(message, "is_gift") and sender_type == "user":
+            delta["gifts"] += 1
+        # Messages come in write order, the last one of a pair is the latest
+        previews[pair] = (_field(message, "content") or "")[:MATCH_PREVIEW_LENGTH]
+
+    if not deltas:
+        return
+
+    params = [
+        {"user_id": user_id, "character_id": character_id, **delta}
+        for (user_id, character_id), delta in deltas.items()
+    ]
+    try:
+        # Savepoint, so a missing table does not abort the caller's transaction
+        with db.begin_nested():
+            db.execute(text(UPSERT_SQL), params)
+    except Exception as e:
+        # The counters drift until the next rebuild, the messages are still saved
+        logger.error(f"Error updating relationship stats: {e}")
+
+    try:
+        with db.begin_nested():
+            db.execute(text(TOUCH_MATCH_SQL), [
+                {"user_id": user_id, "character_id": character_id, "preview": preview}
+                for (user_id, character_id), preview in previews.items()
+            ])
+    except Exception as e:
+        logger.error(f"Error updating match last message: {e}")
+
+
+def get_relationship_stats(db: Session, user_id: Any, character_id: Any) -> Dict[str, Any]:
+    """Read the counters of a pair (zeros if the pair has no messages yet)."""
+    stats = {"message_count": 0, "gift_count": 0, "last_interaction_at": None}
+    try:
+        row = db.execute(
+            text("""
+                SELECT message_count, gift_count, last_interaction_at FROM relationship_stats
+                WHERE user_id = :user_id AND character_id = :character_id
+            """),
+            {"user_id": str(user_id), "character_id": str(character_id)}
+        ).fetchone()
+    except Exception as e:
+        logger.error(f"Error reading relationship stats: {e}")
+        db.rollback()
+        return stats
+    if row:
+        stats.update(dict(row))
+    return stats
+
+
+def reset_relationship_stats(db: Session, user_id: Any, character_id: Any) -> None:
+    """Drop the counters of a pair; call inside the transaction that deletes its messages."""
+    params = {"user_id": str(user_id), "character_id": str(character_id)}
+    try:
+        with db.begin_nested():
+            db.execute(
+                text("DELETE FROM relationship_stats WHERE user_id = :user_id AND character_id = :character_id"),
+                params
+            )
+    except Exception as e:
+        logger.error(f"Error resetting relationship stats: {e}")
+
+    try:
+        # The match keeps its place in the list, without the deleted message text
+        with db.begin_nested():
+            db.execute(
+                text("UPDATE matches SET last_message_preview = NULL "
+                     "WHERE user_id = :user_id AND character_id = :character_id"),
+                params
+            )
+    except Exception as e:
+        logger.error(f"Error resetting match last message: {e}")
+
+
+def rebuild_relationship_stats(db: Session) -> int:
+    """
+    Recompute all counters from the messages table in one transaction.
+
+    Returns:
+        int: Number of pairs written
+    """
+    db.execute(text("DELETE FROM relationship_stats"))
+    db.execute(text(REBUILD_SQL))
+    pairs = db.execute(text("SELECT COUNT(*) FROM relationship_stats")).scalar()
+    db.commit()
+    logger.info(f"Rebuilt relationship stats for {pairs} pairs")
+    return pairs
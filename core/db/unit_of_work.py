@@ -0,0 +1,198 @@
+"""
+Unit of work for a single chat turn.
+
+Collects every write produced while handling one user message (user message,
+assistant messages, relationship counters, extracted memories, character
+emotion and chat_history turns) and applies them with a single commit.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy.orm import Session
+
+from core.db.models.message import Message
+from core.db.models.memory_entry import MemoryEntry
+from core.db.relationship_stats import record_messages
+
+logger = logging.getLogger(__name__)
+
+# Used for memories when the turn has no authenticated user
+SYSTEM_USER_ID = "00000000-0000-0000-0000-000000000000"
+
+
+class TurnUnitOfWork:
+    """
+    Stages the writes of one chat turn and commits them together.
+
+    Nothing is added to the session until ``commit`` is called, so reads made
+    on the same session while the turn is processed (including rollbacks done
+    by legacy helpers) cannot lose staged writes.
+    """
+
+    def __init__(self, db: Session, character_id: Any, user_id: Optional[Any] = None):
+        self.db = db
+        self.character_id = str(character_id)
+        self.user_id = str(user_id) if user_id else None
+
+        self.messages: List[Message] = []
+        self.memories: List[Dict[str, Any]] = []
+        self.emotion: Optional[str] = None
+        self.turns: List[Dict[str, Any]] = []
+        self._emotion_target = None
+        self._after_commit: List[Callable[["TurnUnitOfWork"], None]] = []
+        self.committed = False
+
+    def add_message(self, sender_id: Any, sender_type: str, recipient_id: Any, recipient_type: str,
+                    content: str, emotion: Optional[str] = "neutral", is_gift: bool = False) -> Message:
+        """Stage a row for the messages table and return it."""
+        message = Message(
+            id=str(uuid4()),
+            sender_id=str(sender_id),
+            sender_type=sender_type,
+            recipient_id=str(recipient_id),
+            recipient_type=recipient_type,
+            content=content,
+            emotion=emotion,
+            is_gift=is_gift
+        )
+        self.messages.append(message)
+        return message
+
+    def add_user_message(self, content: str, emotion: str = "neutral") -> Optional[Message]:
+        """Stage the user's message to the character."""
+        if not self.user_id:
+            return None
+        return self.add_message(self.user_id, "user", self.character_id, "character", content, emotion)
+
+    def add_character_message(self, content: str, emotion: str = "neutral") -> Optional[Message]:
+        """Stage a character reply to the user."""
+        if not self.user_id:
+            return None
+        return self.add_message(self.character_id, "character", self.user_id, "user", content, emotion)
+
+    def add_memories(self, memories: List[Dict[str, Any]]) -> None:
+        """Stage extracted memories; duplicates are filtered at commit time."""
+        for memory in memories or []:
+            if isinstance(memory, dict) and memory.get("content"):
+                self.memories.append(memory)
+
+    def set_character_emotion(self, character: Any, emotion: Optional[str]) -> None:
+        """Stage the character's current emotion."""
+        if emotion:
+            self.emotion = emotion
+            self._emotion_target = character
+
+    def record_turn(self, user_message: str, assistant_message: str,
+                    metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Stage a user/assistant exchange for chat_history."""
+        if self.user_id:
+            self.turns.append({
+                "user_message": user_message,
+                "assistant_message": assistant_message,
+                "metadata": metadata
+            })
+
+    def after_commit(self, callback: Callable[["TurnUnitOfWork"], None]) -> None:
+        """
+        Register a callback to run once the turn is committed.
+
+        This is the hook for persistence that does not need to be part of the
+        transaction (e.g. the write-behind conversation journal).
+        """
+        self._after_commit.append(callback)
+
+    def commit(self) -> bool:
+        """Apply all staged writes in one transaction and run the after-commit hooks."""
+        if self.committed:
+            return True
+
+        try:
+            if self.messages:
+                self.db.add_all(self.messages)
+                record_messages(self.db, self.messages)
+            self._stage_memories()
+            self._stage_emotion()
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"❌ Error committing chat turn: {e}")
+            try:
+                self.db.rollback()
+            except Exception:
+                pass
+            return False
+
+        self.committed = True
+        logger.info(
+            f"✅ Chat turn committed: {len(self.messages)} messages, "
+            f"{len(self.memories)} memories, emotion={self.emotion}"
+        )
+
+        for callback in self._after_commit:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Error in after-commit hook: {e}")
+        return True
+
+    def _stage_memories(self) -> None:
+        if not self.memories:
+            return
+
+        # Deduplicate within the turn and against existing rows in one query
+        unique = {}
+        for memory in self.memories:
+            unique.setdefault(memory["content"], memory)
+
+        existing = {
+            content for (content,) in self.db.query(MemoryEntry.content).filter(
+                MemoryEntry.character_id == self.character_id,
+                MemoryEntry.content.in_(list(unique.keys()))
+            )
+        }
+
+        for content, memory in unique.items():
+            if content in existing:
+                continue
+            memory_type = memory.get("type", "unknown")
+            self.db.add(MemoryEntry(
+                id=str(uuid4()),
+                character_id=self.character_id,
+                user_id=self.user_id or SYSTEM_USER_ID,
+                type=memory_type,
+                memory_type=memory_type,
+                category=memory.get("category", "general"),
+                content=content,
+                importance=memory.get("importance", 5),
+                is_active=True
+            ))
+
+    def _stage_emotion(self) -> None:
+        if not self.emotion:
+            return
+
+        from core.db.models.ai_partner import AIPartner
+
+        target = self._emotion_target
+        # Repository records are accepted too; only ai_partners has an emotion column
+        persisted = isinstance(target, AIPartner) or getattr(target, "source", None) == "ai_partners"
+        if persisted and target.id is not None:
+            try:
+                partner_id = target.id if isinstance(target.id, UUID) else UUID(str(target.id))
+            except ValueError:
+                return
+            # Update by key so a detached or transient instance still works
+            self.db.query(AIPartner).filter(AIPartner.id == partner_id).update(
+                {"current_emotion": self.emotion}, synchronize_session=False
+            )
+            target.current_emotion = self.emotion
+
+    def rollback(self) -> None:
+        """Discard all staged writes."""
+        self.messages = []
+        self.memories = []
+        self.turns = []
+        self.emotion = None
+        self._emotion_target = None
+        self._after_commit = []
@@ -1,6 +1,7 @@
 from core.services.user import UserService
 from core.services.ai_partner import AIPartnerService
 from core.services.love_rating import LoveRatingService
+from core.services.rating_history import RatingHistoryService
 from core.services.event import EventService
 from core.services.message import MessageService
 from core.services.gift import GiftService
@@ -9,6 +10,7 @@ __all__ = [
     "UserService",
     "AIPartnerService",
     "LoveRatingService",
+    "RatingHistoryService",
     "EventService",
     "MessageService",
     "GiftService"
@@ -1,13 +1,18 @@
 from typing import Dict, List, Optional, Any
 from uuid import UUID
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+import logging
 import random
 
-from core.db.models.event import Event
+from core.db.models.scheduled_event import ScheduledEvent as Event
 from core.services.base import BaseService
+from core.services.event_scheduler import get_event_scheduler, parse_target_date
 from core.services.love_rating import LoveRatingService
 
+logger = logging.getLogger(__name__)
+
 class EventService(BaseService):
     """Service for handling Event operations."""
     
@@ -15,6 +20,18 @@ class EventService(BaseService):
         super().__init__(Event, db)
         self.love_rating_service = LoveRatingService(db)
     
+    def get(self, id: Any) -> Optional[Event]:
+        """
+        Get an event by ID.
+        
+        event_id is stored as a string: BaseService.get would compare it with a uuid.UUID.
+        """
+        try:
+            return self.db.query(Event).filter(Event.event_id == str(id)).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Error retrieving event with ID {id}: {e}")
+            return None
+    
     def get_by_user_id(self, user_id: UUID) -> List[Event]:
         """Get all events for a specific user."""
         return self.db.query(Event).filter(Event.user_id == user_id).all()
@@ -34,16 +51,24 @@ class EventService(BaseService):
     def create_event(self, *, user_id: UUID, partner_id: UUID, event_type: str,
                    status: str = "pending", schedule: Dict = None, 
                    details: Dict = None) -> Event:
-        """Create a new event."""
+        """Create a new event, indexing schedule["target_date"] for the scheduler."""
+        schedule = schedule or {}
         event_data = {
-            "user_id": user_id,
-            "partner_id": partner_id,
+            "user_id": str(user_id),
+            "partner_id": str(partner_id),
             "type": event_type,
             "status": status,
-            "schedule": schedule or {},
+            "target_date": parse_target_date(schedule.get("target_date")),
+            "schedule": schedule,
             "details": details or {}
         }
-        return self.create(obj_in=event_data)
+        event = self.create(obj_in=event_data)
+        
+        # Events due soon are queued directly, the rest by the scheduler's refill
+        scheduler = get_event_scheduler()
+        if scheduler and event.status == "pending":
+            scheduler.schedule(event.event_id, event.target_date)
+        return event
     
     def update_status(self, *, event_id: UUID, status: str) -> Optional[Event]:
         """Update just the event status."""
@@ -77,29 +102,32 @@ class EventService(BaseService):
             self.love_rating_service.update_rating(
                 event.user_id, 
                 event.partner_id, 
-                delta=2
+                delta=2,
+                reason=f"Событие: {event.type}"
             )
         elif event.type == "quest":
             # Квесты дают больше бонусов
             self.love_rating_service.update_rating(
                 event.user_id, 
                 event.partner_id, 
-                delta=5
+                delta=5,
+                reason=f"Событие: {event.type}"
             )
         elif event.type == "global":
             # Глобальные события могут давать специальные награды
             self.love_rating_service.update_rating(
                 event.user_id, 
                 event.partner_id, 
-                delta=10
+                delta=10,
+                reason=f"Событие: {event.type}"
             )
         
-        # Добавляем информацию о завершении
-        if not event.details:
-            event.details = {}
-        
-        event.details["completed_at"] = datetime.utcnow().isoformat()
-        event.details["reward_applied"] = True
+        # Добавляем информацию о завершении (новый словарь: изменения JSON на месте не сохраняются)
+        event.details = {
+            **(event.details or {}),
+            "completed_at": datetime.utcnow().isoformat(),
+            "reward_applied": True
+        }
         
         # Сохраняем изменения
         self.db.commit()
@@ -166,39 +194,22 @@ class EventService(BaseService):
         """
         Проверяет наличие событий, срок выполнения которых подходит.
         
+        События переводит в статус "active" планировщик (core.services.event_scheduler),
+        здесь читается только небольшой набор активных событий пары по индексу.
+        
         Args:
             user_id: UUID пользователя
             partner_id: UUID партнера
             
         Returns:
-            Список событий, которые скоро наступят
+            Список событий, которые скоро наступят (ближайшие первыми)
         """
-        now = datetime.utcnow()
-        upcoming_events = []
-        
-        # Получаем все активные события
-        pending_events = self.db.query(Event).filter(
-            Event.user_id == user_id,
-            Event.partner_id == partner_id,
-            Event.status == "pending"
-        ).all()
-        
-        for event in pending_events:
-            if not event.schedule or "target_date" not in event.schedule:
-                continue
-                
-            # Парсим дату события
-            try:
-                target_date = datetime.fromisoformat(event.schedule["target_date"])
-                
-                # Проверяем, близко ли событие (в пределах 24 часов)
-                time_delta = target_date - now
-                if 0 <= time_delta.total_seconds() <= 86400:  # 24 часа в секундах
-                    upcoming_events.append(event)
-            except (ValueError, TypeError):
-                continue
-        
-        return upcoming_events
+        return self.db.query(Event).filter(
+            Event.user_id == str(user_id),
+            Event.partner_id == str(partner_id),
+            Event.status == "active",
+            Event.target_date >= datetime.utcnow()
+        ).order_by(Event.target_date).all()
     
     def get_active_event_context(self, user_id: UUID, partner_id: UUID) -> Dict:
         """
@@ -219,13 +230,17 @@ class EventService(BaseService):
         # Формируем контекст на основе ближайшего события
         next_event = upcoming_events[0]
         
+        details = next_event.details or {}
+        target_date = parse_target_date(next_event.target_date)
+        days_left = (target_date - datetime.utcnow()).days if target_date else None
+        
         context = {
             "has_events": True,
             "event_type": next_event.type,
-            "event_name": next_event.details.get("name", "событие"),
-            "event_description": next_event.details.get("description", ""),
-            "event_date": next_event.schedule.get("target_date", ""),
-            "days_left": "скоро"  # Можно рассчитать точнее при необходимости
+            "event_name": details.get("name", "событие"),
+            "event_description": details.get("description", ""),
+            "event_date": target_date.isoformat() if target_date else "",
+            "days_left": days_left if days_left else "скоро"
         }
         
         return context
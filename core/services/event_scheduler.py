@@ -0,0 +1,299 @@
+"""
+Background scheduler that activates relationship events when they become due.
+
+Pending events are kept in the indexed scheduled_events table. The scheduler
+holds the ones whose activation time (target date minus EVENT_LEAD_TIME) falls
+within EVENT_SCHEDULER_HORIZON in a priority queue, sleeps until the earliest
+one, marks it active and hands it to the notification callbacks. The queue is
+refilled from the (status, target_date) index every
+EVENT_SCHEDULER_REFILL_INTERVAL seconds, which also picks up events created by
+other processes; events created in this process are pushed directly.
+
+The chat path then only reads the small set of active events of a pair.
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from core.db.models.scheduled_event import ScheduledEvent
+
+logger = logging.getLogger(__name__)
+
+# Receives the events activated by one run (as dicts, after commit)
+ActivationCallback = Callable[[List[Dict[str, Any]]], None]
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime to naive UTC, the representation used by the event services."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_target_date(value: Any) -> Optional[datetime]:
+    """Parse a schedule target_date (ISO string or datetime) to naive UTC."""
+    if isinstance(value, datetime):
+        return to_utc_naive(value)
+    if isinstance(value, str) and value:
+        try:
+            return to_utc_naive(datetime.fromisoformat(value))
+        except ValueError:
+            return None
+    return None
+
+
+def event_snapshot(event: ScheduledEvent) -> Dict[str, Any]:
+    return {
+        "event_id": str(event.event_id),
+        "user_id": str(event.user_id),
+        "partner_id": str(event.partner_id),
+        "type": event.type,
+        "details": event.details or {},
+        "target_date": to_utc_naive(event.target_date),
+    }
+
+
+class EventScheduler:
+    """Priority queue of pending events ordered by activation time, drained by a worker thread"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        lead_time: Optional[float] = None,
+        horizon: Optional[float] = None,
+        refill_interval: Optional[float] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            session_factory: Callable returning a new SQLAlchemy session
+                (defaults to core.db.session.SessionLocal)
+            lead_time: Seconds before the target date an event becomes active
+            horizon: Seconds ahead whose events are kept in the queue
+            refill_interval: Seconds between queue refills from the database
+            background: Whether to run the worker thread
+        """
+        self._session_factory = session_factory
+        self.lead_time = timedelta(seconds=lead_time if lead_time is not None else settings.EVENT_LEAD_TIME)
+        self.horizon = timedelta(seconds=horizon if horizon is not None else settings.EVENT_SCHEDULER_HORIZON)
+        self.refill_interval = (
+            refill_interval if refill_interval is not None else settings.EVENT_SCHEDULER_REFILL_INTERVAL
+        )
+        self.background = background
+
+        self._lock = threading.Lock()
+        # (activate_at, event_id), earliest first
+        self._queue: List[Tuple[datetime, str]] = []
+        self._queued: Set[str] = set()
+        self._next_refill: Optional[datetime] = None
+        self._callbacks: List[ActivationCallback] = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.activated = 0
+        self.refills = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def on_activate(self, callback: ActivationCallback) -> None:
+        """Register a callback for newly activated events (e.g. push notifications)."""
+        self._callbacks.append(callback)
+
+    def schedule(self, event_id: Any, target_date: Optional[datetime], now: Optional[datetime] = None) -> bool:
+        """
+        Queue a pending event created in this process if it is due within the horizon.
+
+        Returns:
+            bool: Whether the event was queued
+        """
+        target_date = to_utc_naive(target_date)
+        if target_date is None:
+            return False
+        now = now or datetime.utcnow()
+        activate_at = target_date - self.lead_time
+        if activate_at > now + self.horizon or target_date <= now:
+            # Picked up by a later refill, or already past
+            return False
+
+        with self._lock:
+            if str(event_id) in self._queued:
+                return False
+            self._queued.add(str(event_id))
+            heapq.heappush(self._queue, (activate_at, str(event_id)))
+            is_next = self._queue[0][1] == str(event_id)
+        if is_next:
+            # The worker may be sleeping until a later event
+            self._wakeup.set()
+        return True
+
+    def refill(self, now: Optional[datetime] = None) -> int:
+        """
+        Queue the pending events that become active within the horizon.
+
+        Returns:
+            int: Number of events added to the queue
+        """
+        now = now or datetime.utcnow()
+        db = self._get_session_factory()()
+        try:
+            rows = db.query(ScheduledEvent.event_id, ScheduledEvent.target_date).filter(
+                ScheduledEvent.status == "pending",
+                ScheduledEvent.target_date > now,
+                ScheduledEvent.target_date <= now + self.lead_time + self.horizon
+            ).order_by(ScheduledEvent.target_date).all()
+        finally:
+            db.close()
+
+        added = sum(self.schedule(event_id, target_date, now=now) for event_id, target_date in rows)
+        with self._lock:
+            self._next_refill = now + timedelta(seconds=self.refill_interval)
+        self.refills += 1
+        if added:
+            logger.info(f"Event scheduler queued {added} events")
+        return added
+
+    def run_due(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Activate the queued events whose activation time has come.
+
+        Returns:
+            list: Snapshots of the events this scheduler activated
+        """
+        now = now or datetime.utcnow()
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                _, event_id = heapq.heappop(self._queue)
+                self._queued.discard(event_id)
+                due.append(event_id)
+        if not due:
+            return []
+
+        activated = []
+        db = self._get_session_factory()()
+        try:
+            for event_id in due:
+                # Conditional update: with several workers only one activates an event
+                updated = db.query(ScheduledEvent).filter(
+                    ScheduledEvent.event_id == event_id,
+                    ScheduledEvent.status == "pending"
+                ).update({"status": "active", "activated_at": now}, synchronize_session=False)
+                if updated:
+                    activated.append(event_id)
+            db.commit()
+            events = db.query(ScheduledEvent).filter(
+                ScheduledEvent.event_id.in_(activated)
+            ).all() if activated else []
+            snapshots = [event_snapshot(event) for event in events]
+        except Exception:
+            db.rollback()
+            # Retried on the next refill
+            raise
+        finally:
+            db.close()
+
+        if not snapshots:
+            return []
+        self.activated += len(snapshots)
+        logger.info(f"Event scheduler activated {len(snapshots)} events")
+        for callback in self._callbacks:
+            try:
+                callback(snapshots)
+            except Exception as e:
+                logger.error(f"Error in event activation callback: {e}")
+        return snapshots
+
+    def next_wakeup(self, now: Optional[datetime] = None) -> float:
+        """Seconds until the earliest queued activation or the next refill."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            candidates = [self._next_refill or now]
+            if self._queue:
+                candidates.append(self._queue[0][0])
+        return max((min(candidates) - now).total_seconds(), 0.0)
+
+    def pending_count(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        """Start the worker thread (no-op without background mode)."""
+        if not self.background or (self._worker and self._worker.is_alive()):
+            return
+        self._stopped.clear()
+        self._worker = threading.Thread(target=self._run, name="event-scheduler", daemon=True)
+        self._worker.start()
+        logger.info("Event scheduler started")
+
+    def stop(self) -> None:
+        """Stop the worker thread; queued events are reloaded by the next start."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout=5.0)
+        self._worker = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": self.pending_count(),
+            "activated": self.activated,
+            "refills": self.refills,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _get_session_factory(self):
+        if self._session_factory is None:
+            from core.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            now = datetime.utcnow()
+            try:
+                if self._next_refill is None or now >= self._next_refill:
+                    self.refill(now)
+                self.run_due(now)
+            except Exception as e:
+                logger.exception(f"Event scheduler error: {e}")
+                with self._lock:
+                    self._next_refill = now + timedelta(seconds=self.refill_interval)
+            self._wakeup.wait(timeout=max(self.next_wakeup(), 0.05))
+            self._wakeup.clear()
+
+
+_scheduler: Optional[EventScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_event_scheduler() -> Optional[EventScheduler]:
+    """Return the process-wide scheduler if it was started."""
+    return _scheduler
+
+
+def start_event_scheduler(**kwargs) -> EventScheduler:
+    """Create and start the process-wide scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = EventScheduler(**kwargs)
+            _scheduler.start()
+    return _scheduler
+
+
+def stop_event_scheduler() -> None:
+    """Stop the process-wide scheduler if it was started."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
@@ -142,7 +142,9 @@ class GiftService(BaseService):
         
         # Обновляем основной рейтинг
         if general_effect != 0:
-            self.love_rating_service.update_rating(user_id, partner_id, general_effect)
+            self.love_rating_service.update_rating(
+                user_id, partner_id, general_effect, reason=f"Подарок: {gift['name']}"
+            )
         
         # Генерируем реакцию бота на подарок
         message_service = MessageService(db=self.db)
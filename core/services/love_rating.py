@@ -5,12 +5,14 @@ from datetime import datetime, timedelta
 
 from core.db.models.love_rating import LoveRating
 from core.services.base import BaseService
+from core.services.rating_history import RatingHistoryService, TREND_WINDOWS
 
 class LoveRatingService(BaseService):
     """Service for handling LoveRating operations."""
     
     def __init__(self, db: Session):
         super().__init__(LoveRating, db)
+        self.history = RatingHistoryService(db)
     
     def get_by_user_and_partner(self, user_id: UUID, partner_id: UUID) -> Optional[LoveRating]:
         """Get the love rating between a user and an AI partner."""
@@ -48,14 +50,18 @@ class LoveRatingService(BaseService):
     
     # Новые методы для реализации бизнес-логики
     
-    def update_rating(self, user_id: UUID, partner_id: UUID, delta: int) -> LoveRating:
+    def update_rating(self, user_id: UUID, partner_id: UUID, delta: int,
+                      reason: Optional[str] = None) -> LoveRating:
         """
         Обновляет рейтинг любви между пользователем и AI-партнером.
         
+        Изменение записывается в историю рейтинга в той же транзакции.
+        
         Args:
             user_id: UUID пользователя
             partner_id: UUID партнера
             delta: Изменение рейтинга (положительное или отрицательное)
+            reason: Причина изменения (для истории)
             
         Returns:
             Обновленный объект рейтинга
@@ -72,12 +78,18 @@ class LoveRatingService(BaseService):
         
         # Применяем изменение с учетом ограничений
         new_score = max(0, min(100, rating.score + delta))
+        applied = new_score - rating.score
+        if not applied:
+            return rating
         
-        # Обновляем значение в БД
-        self.update(id=rating.rating_id, obj_in={"score": new_score})
-        
-        # Обновляем объект в памяти
+        # Новое значение и запись истории сохраняются одним коммитом
         rating.score = new_score
+        try:
+            self.history.record_change(user_id, partner_id, applied, new_score, reason)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
         
         return rating
     
@@ -106,25 +118,30 @@ class LoveRatingService(BaseService):
         """
         Анализирует изменения рейтинга за последние дни для определения тренда.
         
+        Суммы берутся из дневных агрегатов истории, поэтому стоимость запроса
+        не зависит от количества изменений.
+        
         Args:
             user_id: UUID пользователя
             partner_id: UUID партнера
             days: Количество дней для анализа
             
         Returns:
-            Словарь с результатами анализа (тренд, изменения)
+            Словарь с результатами анализа (тренд, изменения, изменения по окнам 1/7/30 дней)
         """
         rating = self.get_by_user_and_partner(user_id, partner_id)
         if not rating:
             return {"trend": "neutral", "change": 0}
         
-        # Здесь должен быть код для получения истории изменений
-        # Для примера вернем фиктивные данные
+        windows = self.history.get_window_changes(user_id, partner_id, set(TREND_WINDOWS) | {days})
+        change = windows[days]
         return {
-            "trend": "positive" if rating.score > 50 else "negative",
-            "change": rating.score - 50,
+            "trend": "positive" if change > 0 else "negative" if change < 0 else "neutral",
+            "change": change,
+            "windows": {f"{window}d": windows[window] for window in TREND_WINDOWS},
             "stage": self.get_relationship_stage(rating.score),
-            "score": rating.score
+            "score": rating.score,
+            "current_rating": rating.score
         }
         
     def process_interaction(self, user_id: UUID, partner_id: UUID, 
@@ -179,6 +196,6 @@ class LoveRatingService(BaseService):
             reason = "Успешное свидание значительно улучшает отношения"
         
         # Обновляем рейтинг
-        self.update_rating(user_id, partner_id, delta)
+        self.update_rating(user_id, partner_id, delta, reason)
         
         return (delta, reason)
@@ -273,7 +273,7 @@ class MessageService(BaseService):
             if rel_type == "general" and change_value != 0:
                 # Преобразуем изменения в целочисленное значение для совместимости
                 delta = int(change_value * 10) if abs(change_value) < 1 else int(change_value)
-                self.love_rating_service.update_rating(user_id, partner_id, delta)
+                self.love_rating_service.update_rating(user_id, partner_id, delta, reason="Изменение отношений в ответе персонажа")
         
         # Get updated relationship data after changes
         updated_relationship_info = self.love_rating_service.analyze_recent_changes(user_id, partner_id)
@@ -759,7 +759,7 @@ class MessageService(BaseService):
                             if general_change != 0:
                                 # Apply the relationship changes
                                 delta = int(general_change * 10) if abs(general_change) < 1 else int(general_change)
-                                self.love_rating_service.update_rating(user_id, partner_id, delta)
+                                self.love_rating_service.update_rating(user_id, partner_id, delta, reason="Изменение отношений в ответе персонажа")
                 except json.JSONDecodeError:
                     logger.warning(f"Failed to parse JSON from response: {response_text}")
                     # Keep the response as is if parsing fails
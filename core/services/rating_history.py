@@ -0,0 +1,92 @@
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.db.models.rating_change import RatingChange
+from core.services.base import BaseService
+
+# Trend windows in days reported by analyze_recent_changes
+TREND_WINDOWS = (1, 7, 30)
+
+# Works on PostgreSQL and SQLite (3.24+)
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO rating_daily_rollups (user_id, partner_id, day, delta_sum, changes)
+    VALUES (:user_id, :partner_id, :day, :delta, 1)
+    ON CONFLICT (user_id, partner_id, day) DO UPDATE
+    SET delta_sum = rating_daily_rollups.delta_sum + excluded.delta_sum,
+        changes = rating_daily_rollups.changes + 1
+"""
+
+class RatingHistoryService(BaseService):
+    """
+    Append-only history of love rating changes with per-day rollups.
+
+    Every change adds a row to rating_changes and folds its delta into the
+    pair's rating_daily_rollups row for the UTC day, so a trend over N days
+    reads at most N rollup rows whatever the number of changes.
+    """
+
+    def __init__(self, db: Session):
+        super().__init__(RatingChange, db)
+
+    def record_change(self, user_id: Any, partner_id: Any, delta: int, score: int,
+                      reason: Optional[str] = None, at: Optional[datetime] = None) -> RatingChange:
+        """
+        Stage a rating change in the caller's transaction (the caller commits).
+
+        Args:
+            user_id: ID of the user
+            partner_id: ID of the partner
+            delta: Applied change of the score
+            score: Score after the change
+            reason: Short description of the interaction
+            at: Time of the change (now by default)
+        """
+        at = at or datetime.now(timezone.utc)
+        change = RatingChange(
+            user_id=str(user_id),
+            partner_id=str(partner_id),
+            delta=delta,
+            score=score,
+            reason=reason[:100] if reason else None,
+            created_at=at
+        )
+        self.db.add(change)
+        self.db.execute(text(ROLLUP_UPSERT_SQL), {
+            "user_id": str(user_id),
+            "partner_id": str(partner_id),
+            "day": at.astimezone(timezone.utc).date() if at.tzinfo else at.date(),
+            "delta": delta
+        })
+        return change
+
+    def get_window_changes(self, user_id: Any, partner_id: Any,
+                           windows: Iterable[int] = TREND_WINDOWS,
+                           today: Optional[datetime] = None) -> Dict[int, int]:
+        """
+        Sum of the score changes over the last N days (today included) for each window.
+
+        Returns:
+            Dict mapping window length in days to the summed change
+        """
+        windows = sorted(set(windows))
+        today = (today or datetime.now(timezone.utc)).date()
+        params = {"user_id": str(user_id), "partner_id": str(partner_id)}
+        sums = []
+        for days in windows:
+            params[f"since_{days}"] = today - timedelta(days=days - 1)
+            sums.append(f"COALESCE(SUM(CASE WHEN day >= :since_{days} THEN delta_sum END), 0)")
+
+        row = self.db.execute(text(f"""
+            SELECT {", ".join(sums)} FROM rating_daily_rollups
+            WHERE user_id = :user_id AND partner_id = :partner_id AND day >= :since_{windows[-1]}
+        """), params).fetchone()
+        return {days: int(row[i] or 0) for i, days in enumerate(windows)}
+
+    def get_recent_changes(self, user_id: Any, partner_id: Any, limit: int = 10) -> List[RatingChange]:
+        """Latest logged changes of a pair, newest first."""
+        return self.db.query(RatingChange).filter(
+            RatingChange.user_id == str(user_id),
+            RatingChange.partner_id == str(partner_id)
+        ).order_by(RatingChange.created_at.desc(), RatingChange.id.desc()).limit(limit).all()
@@ -11,12 +11,24 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from core.config import settings
+from core.utils.log_catalog import KIND_CONVERSATION, LogCatalog
+
 logger = logging.getLogger(__name__)
 
 # Create logs directory if it doesn't exist
 LOGS_DIR = Path("logs/conversations")
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Index of the log files for the debug viewer, updated on every write
+log_catalog = LogCatalog(LOGS_DIR, settings.LOG_CATALOG_PATH)
+
+def _write_log(file_path: Path, log_data: Dict[str, Any]) -> None:
+    content = json.dumps(log_data, ensure_ascii=False, indent=2)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    log_catalog.record(file_path, log_data, size=len(content.encode('utf-8')))
+
 def log_conversation(
     character_id: str,
     user_message: str, 
@@ -66,9 +78,8 @@ def log_conversation(
             "conversation_history": conversation_history
         }
         
-        # Write to JSON file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
+        # Write to JSON file and catalog it
+        _write_log(file_path, log_data)
             
         logger.info(f"Conversation logged to {file_path}")
         return str(file_path)
@@ -117,9 +128,8 @@ def log_model_request(
             "response": response
         }
         
-        # Write to file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
+        # Write to file and catalog it
+        _write_log(file_path, log_data)
             
         return str(file_path)
     
@@ -139,19 +149,14 @@ def get_recent_conversations(character_id: str, limit: int = 10) -> List[Dict[st
         List of conversation logs
     """
     try:
-        char_dir = LOGS_DIR / character_id
-        if not char_dir.exists():
-            return []
-            
-        # Get all JSON files in the character directory
-        files = list(char_dir.glob("*.json"))
-        
-        # Sort by modification time (newest first)
-        files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+        # Newest files from the catalog instead of a glob and a stat per file
+        log_catalog.ensure_synced()
+        entries = log_catalog.logs(character_id, KIND_CONVERSATION, limit=limit).rows
+        files = [log_catalog.file_path(entry) for entry in entries]
         
         # Load the files
         logs = []
-        for file in files[:limit]:
+        for file in files:
             try:
                 with open(file, 'r', encoding='utf-8') as f:
                     logs.append(json.load(f))
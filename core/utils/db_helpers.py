@@ -6,6 +6,7 @@ This module provides helper functions for working with the database.
 import logging
 from sqlalchemy import text, inspect
 from uuid import UUID, uuid4
+from core.db.relationship_stats import record_messages
 
 logger = logging.getLogger(__name__)
 
@@ -239,6 +240,7 @@ def save_message_safely(db_session, message_data):
         
         query = f"INSERT INTO messages ({column_names}) VALUES ({placeholders})"
         db_session.execute(text(query), filtered_data)
+        record_messages(db_session, [filtered_data])
         db_session.commit()
         
         return True
@@ -0,0 +1,355 @@
+"""
+SQLite catalog of the conversation log files.
+
+The debug log viewer used to glob every character directory under
+logs/conversations, stat every file to find the newest one and open JSON
+files for their previews on each request. The catalog keeps one row per log
+file instead (character, kind, timestamp, size and short previews of the
+exchange), plus per-character totals, in a small SQLite database next to the
+logs. The log writer records every file it writes, so the catalog grows
+incrementally; ``sync`` indexes files written without it (older logs, other
+tools) and drops rows of deleted files.
+
+Listings are keyset pages ordered newest first, so any page of a character
+with hundreds of thousands of logs is an index range scan.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from core.db.admin_browse import Page, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+KIND_CONVERSATION = "conversation"
+KIND_API = "api"
+# Length of the user/AI previews shown in listings
+PREVIEW_LENGTH = 100
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS log_files (
+        path TEXT PRIMARY KEY,
+        character_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        datetime TEXT,
+        size INTEGER NOT NULL,
+        user_preview TEXT,
+        ai_preview TEXT,
+        emotion TEXT
+    );
+    CREATE INDEX IF NOT EXISTS ix_log_files_character_time
+        ON log_files (character_id, kind, timestamp DESC, path DESC);
+    CREATE TABLE IF NOT EXISTS log_characters (
+        character_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        file_count INTEGER NOT NULL,
+        total_size INTEGER NOT NULL,
+        last_timestamp INTEGER NOT NULL,
+        PRIMARY KEY (character_id, kind)
+    );
+    CREATE INDEX IF NOT EXISTS ix_log_characters_activity
+        ON log_characters (kind, last_timestamp DESC, character_id DESC);
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    );
+"""
+
+UPSERT_FILE_SQL = """
+    INSERT INTO log_files (path, character_id, kind, timestamp, datetime, size, user_preview, ai_preview, emotion)
+    VALUES (:path, :character_id, :kind, :timestamp, :datetime, :size, :user_preview, :ai_preview, :emotion)
+    ON CONFLICT (path) DO UPDATE SET
+        timestamp = excluded.timestamp, datetime = excluded.datetime, size = excluded.size,
+        user_preview = excluded.user_preview, ai_preview = excluded.ai_preview, emotion = excluded.emotion
+"""
+
+UPSERT_CHARACTER_SQL = """
+    INSERT INTO log_characters (character_id, kind, file_count, total_size, last_timestamp)
+    VALUES (:character_id, :kind, :added, :size_delta, :timestamp)
+    ON CONFLICT (character_id, kind) DO UPDATE SET
+        file_count = file_count + excluded.file_count,
+        total_size = total_size + excluded.total_size,
+        last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+"""
+
+RECOUNT_CHARACTERS_SQL = """
+    INSERT INTO log_characters (character_id, kind, file_count, total_size, last_timestamp)
+    SELECT character_id, kind, COUNT(*), SUM(size), MAX(timestamp)
+    FROM log_files
+    GROUP BY character_id, kind
+"""
+
+def _preview(value: Any) -> str:
+    text = value if isinstance(value, str) else str(value or "")
+    if len(text) > PREVIEW_LENGTH:
+        return text[:PREVIEW_LENGTH] + "..."
+    return text
+
+def summarize(data: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    """
+    Catalog fields of a log record: timestamp, datetime and the previews.
+    """
+    user_text, ai_text, emotion = "", "", None
+    if kind == KIND_API:
+        messages = (data.get("request") or {}).get("messages") or []
+        user_messages = [m.get("content", "") for m in messages if isinstance(m, dict) and m.get("role") == "user"]
+        user_text = user_messages[-1] if user_messages else ""
+        ai_text = data.get("response", "")
+    else:
+        user_text = data.get("user_message", "")
+        processed = (data.get("ai_response") or {}).get("processed", {})
+        if isinstance(processed, dict) and "text" in processed:
+            ai_text = processed["text"]
+            emotion = processed.get("emotion")
+        else:
+            ai_text = processed
+    return {
+        "timestamp": int(data.get("timestamp") or 0),
+        "datetime": data.get("datetime"),
+        "user_preview": _preview(user_text),
+        "ai_preview": _preview(ai_text),
+        "emotion": emotion if isinstance(emotion, str) else None,
+    }
+
+class LogCatalog:
+    """Index of the log files under one logs directory"""
+
+    def __init__(self, logs_dir: Union[str, Path], path: Union[str, Path]):
+        """
+        Args:
+            logs_dir: Root of the log tree (<logs_dir>/<character_id>/[api/]<file>.json)
+            path: SQLite database file of the catalog
+        """
+        self.logs_dir = Path(logs_dir)
+        self.path = Path(path)
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def record(self, file_path: Union[str, Path], data: Dict[str, Any], size: Optional[int] = None) -> None:
+        """
+        Add (or update) the catalog row of a log file that was just written.
+
+        Args:
+            file_path: The log file, under logs_dir
+            data: The record written to it
+            size: Its size in bytes (stat'ed when not given)
+
+        Errors are logged, not raised: the log file itself is already written.
+        """
+        try:
+            entry = self._entry(Path(file_path), data, size)
+            conn = self._connection()
+            with conn:
+                self._upsert(conn, entry)
+        except Exception as e:
+            logger.error(f"Error cataloging log file {file_path}: {e}")
+
+    def characters(self, kind: str = KIND_CONVERSATION, limit: int = 50, cursor: Optional[str] = None) -> Page:
+        """
+        Characters having logs of a kind, most recently active first.
+
+        Rows: character_id, file_count, total_size, last_timestamp
+
+        Raises:
+            ValueError: Malformed cursor
+        """
+        params: Dict[str, Any] = {"kind": kind, "limit": limit + 1}
+        where = "kind = :kind"
+        if cursor:
+            last_timestamp, character_id = decode_cursor(cursor)
+            params.update(cursor_timestamp=int(last_timestamp), cursor_id=character_id)
+            where += " AND (last_timestamp, character_id) < (:cursor_timestamp, :cursor_id)"
+        rows = self._connection().execute(f"""
+            SELECT character_id, file_count, total_size, last_timestamp
+            FROM log_characters
+            WHERE {where}
+            ORDER BY last_timestamp DESC, character_id DESC
+            LIMIT :limit
+        """, params).fetchall()
+        return self._page(rows, limit, "last_timestamp", "character_id")
+
+    def character(self, character_id: str, kind: str = KIND_CONVERSATION) -> Optional[Dict[str, Any]]:
+        """Totals of one character's logs of a kind, None if it has none."""
+        row = self._connection().execute(
+            "SELECT * FROM log_characters WHERE character_id = ? AND kind = ?", (character_id, kind)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def logs(self, character_id: str, kind: str = KIND_CONVERSATION, limit: int = 100,
+             cursor: Optional[str] = None) -> Page:
+        """
+        Log files of a character, newest first.
+
+        Rows: path, name, character_id, kind, timestamp, datetime, size, user_preview, ai_preview, emotion
+
+        Raises:
+            ValueError: Malformed cursor
+        """
+        params: Dict[str, Any] = {"character_id": character_id, "kind": kind, "limit": limit + 1}
+        where = "character_id = :character_id AND kind = :kind"
+        if cursor:
+            timestamp, path = decode_cursor(cursor)
+            params.update(cursor_timestamp=int(timestamp), cursor_path=path)
+            where += " AND (timestamp, path) < (:cursor_timestamp, :cursor_path)"
+        rows = self._connection().execute(f"""
+            SELECT * FROM log_files
+            WHERE {where}
+            ORDER BY timestamp DESC, path DESC
+            LIMIT :limit
+        """, params).fetchall()
+        return self._page(rows, limit, "timestamp", "path")
+
+    def get(self, character_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Catalog row of a conversation log by file name, None if it is not cataloged.
+
+        Only cataloged files are served, which also keeps request paths inside logs_dir.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM log_files WHERE path = ?", (f"{character_id}/{name}",)
+        ).fetchone()
+        return self._row(row) if row is not None else None
+
+    def file_path(self, entry: Dict[str, Any]) -> Path:
+        return self.logs_dir / entry["path"]
+
+    def totals(self, kind: str = KIND_CONVERSATION) -> Dict[str, int]:
+        """character_count, total_log_files and total_size of a kind of logs."""
+        count, files, size = self._connection().execute("""
+            SELECT COUNT(*), COALESCE(SUM(file_count), 0), COALESCE(SUM(total_size), 0)
+            FROM log_characters WHERE kind = ?
+        """, (kind,)).fetchone()
+        return {"character_count": count, "total_log_files": files, "total_size": size}
+
+    def ensure_synced(self) -> None:
+        """Index the existing log tree once, on the first use of a new catalog."""
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM catalog_meta WHERE name = 'synced_at'").fetchone() is None:
+            self.sync()
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Reconcile the catalog with the log tree: index uncataloged files and
+        drop rows of deleted ones. Only new files are read.
+
+        Returns:
+            Numbers of files added and removed
+        """
+        with self._sync_lock:
+            conn = self._connection()
+            known = {row[0] for row in conn.execute("SELECT path FROM log_files")}
+            on_disk = set()
+            added = 0
+            for file_path in self._walk():
+                relative = file_path.relative_to(self.logs_dir).as_posix()
+                on_disk.add(relative)
+                if relative in known:
+                    continue
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    entry = self._entry(file_path, data, None)
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable log file {file_path}: {e}")
+                    continue
+                with conn:
+                    conn.execute(UPSERT_FILE_SQL, entry)
+                added += 1
+
+            removed = known - on_disk
+            with conn:
+                conn.executemany("DELETE FROM log_files WHERE path = ?", [(path,) for path in removed])
+                # Totals of files recorded concurrently are kept by the recount as well
+                conn.execute("DELETE FROM log_characters")
+                conn.execute(RECOUNT_CHARACTERS_SQL)
+                conn.execute(
+                    "INSERT OR REPLACE INTO catalog_meta (name, value) VALUES ('synced_at', datetime('now'))"
+                )
+            if added or removed:
+                logger.info(f"Log catalog synced: {added} files added, {len(removed)} removed")
+            return {"added": added, "removed": len(removed)}
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections belong to the thread that opened them
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10)
+            conn.row_factory = sqlite3.Row
+            # Writers (API workers, the bot) do not block the viewer's reads
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA_SQL)
+            self._local.conn = conn
+        return conn
+
+    def _entry(self, file_path: Path, data: Dict[str, Any], size: Optional[int]) -> Dict[str, Any]:
+        parts = file_path.relative_to(self.logs_dir).parts
+        kind = KIND_API if len(parts) == 3 and parts[1] == "api" else KIND_CONVERSATION
+        entry = summarize(data, kind)
+        if not entry["timestamp"]:
+            entry["timestamp"] = int(file_path.stat().st_mtime)
+        entry.update(
+            path="/".join(parts),
+            character_id=parts[0],
+            kind=kind,
+            size=size if size is not None else file_path.stat().st_size,
+        )
+        return entry
+
+    def _upsert(self, conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
+        previous = conn.execute("SELECT size FROM log_files WHERE path = ?", (entry["path"],)).fetchone()
+        conn.execute(UPSERT_FILE_SQL, entry)
+        conn.execute(UPSERT_CHARACTER_SQL, {
+            "character_id": entry["character_id"],
+            "kind": entry["kind"],
+            "added": 0 if previous else 1,
+            "size_delta": entry["size"] - (previous[0] if previous else 0),
+            "timestamp": entry["timestamp"],
+        })
+
+    def _walk(self):
+        if not self.logs_dir.is_dir():
+            return
+        for char_dir in os.scandir(self.logs_dir):
+            if not char_dir.is_dir():
+                continue
+            for directory in (Path(char_dir.path), Path(char_dir.path) / "api"):
+                if not directory.is_dir():
+                    continue
+                for item in os.scandir(directory):
+                    if item.is_file() and item.name.endswith(".json"):
+                        yield Path(item.path)
+
+    def _row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(row)
+        if "path" in entry:
+            entry["name"] = entry["path"].rsplit("/", 1)[-1]
+        return entry
+
+    def _page(self, rows, limit: int, time_key: str, id_key: str) -> Page:
+        entries = [self._row(row) for row in rows]
+        if len(entries) <= limit:
+            return Page(rows=entries)
+        entries = entries[:limit]
+        last = entries[-1]
+        return Page(rows=entries, next_cursor=encode_cursor({"created_at": last[time_key], "id": last[id_key]}))
@@ -30,6 +30,7 @@ CREATE TABLE IF NOT EXISTS characters (
   system_prompt TEXT,
   greeting_message TEXT,
   avatar_url TEXT,
+  avatar_variants TEXT,
   creator_id UUID,
   is_active BOOLEAN DEFAULT TRUE,
   character_metadata JSONB DEFAULT '{}',
@@ -91,6 +92,9 @@ CREATE TABLE IF NOT EXISTS matches (
   match_strength FLOAT DEFAULT 0.5,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP,
+  -- Kept current by the message write path; the match time until the first message
+  last_message_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  last_message_preview VARCHAR(200),
   CONSTRAINT fk_user
     FOREIGN KEY(user_id) 
     REFERENCES users(user_id)
@@ -121,6 +125,7 @@ CREATE TABLE IF NOT EXISTS interactions (
 -- Create indexes to improve query performance
 CREATE INDEX IF NOT EXISTS idx_matches_user ON matches(user_id);
 CREATE INDEX IF NOT EXISTS idx_matches_character ON matches(character_id);
+CREATE INDEX IF NOT EXISTS ix_matches_user_last_message ON matches(user_id, last_message_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_interactions_user ON interactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_interactions_character ON interactions(character_id);
 
@@ -0,0 +1,34 @@
+"""
+Recompute the relationship_stats counters from the messages table.
+
+Run after restoring messages from a backup or whenever the counters are
+suspected to have drifted (writes that bypassed record_messages).
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+from app.db.session import SessionLocal
+from core.db.relationship_stats import rebuild_relationship_stats
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    db = SessionLocal()
+    try:
+        pairs = rebuild_relationship_stats(db)
+        logger.info(f"Relationship stats rebuilt: {pairs} pairs")
+        return True
+    except Exception as e:
+        logger.error(f"Error rebuilding relationship stats: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
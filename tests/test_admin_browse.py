@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from core.db.admin_browse import create_sqlite_fts, keyset_page
+from core.db.models.message import Message
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+SELECT = "SELECT m.id, m.content, m.created_at FROM messages m"
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'admin.db'}")
+    Message.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def add_messages(db, contents, start=0):
+    for i, content in enumerate(contents, start=start):
+        db.execute(text(
+            "INSERT INTO messages (id, sender_id, sender_type, recipient_id, recipient_type, content, created_at) "
+            "VALUES (:id, :user_id, 'user', :character_id, 'character', :content, :created_at)"
+        ), {"id": f"message-{i:02d}", "user_id": USER_ID, "character_id": CHARACTER_ID, "content": content,
+            # Pairs of messages share a timestamp, so the id breaks the ties
+            "created_at": f"2026-01-01 10:00:{i // 2:02d}"})
+    db.commit()
+
+def test_keyset_pages_cover_all_rows_once_newest_first(db):
+    add_messages(db, [f"сообщение {i}" for i in range(7)])
+
+    pages, cursor = [], None
+    while True:
+        page = keyset_page(db, SELECT, "messages", limit=3, cursor=cursor)
+        pages.append([row["id"] for row in page.rows])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert pages == [["message-06", "message-05", "message-04"],
+                     ["message-03", "message-02", "message-01"],
+                     ["message-00"]]
+
+    with pytest.raises(ValueError):
+        keyset_page(db, SELECT, "messages", cursor="not-a-cursor")
+
+def test_search_uses_the_fts_index_and_falls_back_to_like(db):
+    add_messages(db, ["Люблю джаз и кофе", "Погода сегодня отличная", "100% джазовый вечер"])
+
+    # Without the FTS table: substring LIKE with wildcards escaped
+    assert [r["id"] for r in keyset_page(db, SELECT, "messages", search="100%").rows] == ["message-02"]
+    assert [r["id"] for r in keyset_page(db, SELECT, "messages", search="джаз").rows] == ["message-02", "message-00"]
+
+    assert create_sqlite_fts(db.connection(), "messages")
+    db.commit()
+    # Rows inserted, edited and deleted after the index was built are kept in sync by triggers
+    add_messages(db, ["Джаз по пятницам"], start=3)
+    db.execute(text("UPDATE messages SET content = 'Погода для джаза' WHERE id = 'message-01'"))
+    db.execute(text("DELETE FROM messages WHERE id = 'message-00'"))
+    db.commit()
+
+    page = keyset_page(db, SELECT, "messages", search="джаз", limit=2)
+    assert [r["id"] for r in page.rows] == ["message-03", "message-02"]
+    rest = keyset_page(db, SELECT, "messages", search="джаз", limit=2, cursor=page.next_cursor)
+    assert [r["id"] for r in rest.rows] == ["message-01"] and rest.next_cursor is None
+    # FTS syntax in the search text is treated as plain text
+    assert keyset_page(db, SELECT, "messages", search='"OR" NEAR(').rows == []
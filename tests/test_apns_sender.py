@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+httpx = pytest.importorskip("httpx")
+
+from app.services import apns, notification_service
+from app.services.apns import APNSSender, build_payload
+from core.db.models.device_token import DeviceToken
+
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+APNS_URL = "https://apns.test/3/device"
+
+class APNSStub:
+    """Local stand-in for APNs answering by device token"""
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.requests = []
+        self.active = self.peak = 0
+
+    async def handler(self, request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.requests.append(request)
+        device_token = request.url.path.rsplit("/", 1)[-1]
+        status, reason = self.responses.get(device_token, (200, None))
+        return httpx.Response(status, json={"reason": reason} if reason else None)
+
+class H2Server:
+    """Local cleartext HTTP/2 listener (prior knowledge) answering like APNs"""
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.connections = 0
+        self.requests = []
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def _run(self, started):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._serve, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+
+    async def _serve(self, reader, writer):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        self.connections += 1
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        streams = {}
+        while True:
+            data = await reader.read(65535)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    streams[event.stream_id] = [dict(event.headers), b""]
+                elif isinstance(event, h2.events.DataReceived):
+                    streams[event.stream_id][1] += event.data
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    headers, body = streams.pop(event.stream_id)
+                    self._respond(conn, event.stream_id, headers, body)
+            writer.write(conn.data_to_send())
+            await writer.drain()
+        writer.close()
+
+    def _respond(self, conn, stream_id, headers, body):
+        self.requests.append((headers, body))
+        device_token = headers[b":path"].decode().rsplit("/", 1)[-1]
+        status, reason = self.responses.get(device_token, (200, None))
+        content = json.dumps({"reason": reason}).encode() if reason else b""
+        conn.send_headers(stream_id, [(":status", str(status)), ("content-length", str(len(content)))],
+                          end_stream=not content)
+        if content:
+            conn.send_data(stream_id, content, end_stream=True)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+def make_sender(stub, **kwargs):
+    tokens = iter(f"jwt-{i}" for i in range(100))
+    return APNSSender(APNS_URL, "com.test.app", lambda: next(tokens),
+                      transport=httpx.MockTransport(stub.handler), **kwargs)
+
+def test_batch_is_multiplexed_with_one_cached_provider_token():
+    stub = APNSStub({"gone": (410, "Unregistered"), "bad": (400, "BadDeviceToken"),
+                     "busy": (429, "TooManyRequests")})
+    sender = make_sender(stub, max_concurrency=4)
+    devices = [f"device-{i}" for i in range(10)] + ["gone", "bad", "busy"]
+
+    results = sender.send_batch(devices, build_payload("Привет", "Скучаю", {"type": "event"}))
+    assert [r.device_token for r in results] == devices
+    assert sum(r.ok for r in results) == 10
+    assert [r.device_token for r in results if r.unregistered] == ["gone", "bad"]
+    assert 1 < stub.peak <= 4
+
+    request = stub.requests[0]
+    assert request.headers["authorization"] == "bearer jwt-0"
+    assert request.headers["apns-topic"] == "com.test.app"
+    assert json.loads(request.content)["aps"]["alert"] == {"title": "Привет", "body": "Скучаю"}
+
+    sender.send_batch(["device-0"], build_payload("Ещё", "раз"))
+    assert sender.tokens.signed == 1
+    sender.close()
+
+def test_batch_is_multiplexed_over_one_real_http2_connection():
+    pytest.importorskip("h2")
+    server = H2Server({"gone": (410, "Unregistered")})
+    tokens = iter(f"jwt-{i}" for i in range(100))
+    sender = APNSSender(f"http://127.0.0.1:{server.port}/3/device", "com.test.app", lambda: next(tokens),
+                        transport=httpx.AsyncHTTPTransport(http1=False, http2=True), max_concurrency=8)
+    devices = [f"device-{i}" for i in range(20)] + ["gone"]
+    try:
+        results = sender.send_batch(devices, build_payload("Привет", "Скучаю"))
+        assert [r.device_token for r in results if r.ok] == devices[:-1]
+        assert [r.device_token for r in results if r.unregistered] == ["gone"]
+        assert len(server.requests) == len(devices)
+        assert server.connections == 1
+
+        headers, body = server.requests[0]
+        assert headers[b"authorization"] == b"bearer jwt-0"
+        assert headers[b"apns-topic"] == b"com.test.app"
+        assert json.loads(body)["aps"]["alert"] == {"title": "Привет", "body": "Скучаю"}
+    finally:
+        sender.close()
+        server.close()
+
+def test_expired_provider_token_is_refreshed_once():
+    stub = APNSStub()
+
+    async def handler(request):
+        if request.headers["authorization"] == "bearer jwt-0":
+            return httpx.Response(403, json={"reason": "ExpiredProviderToken"})
+        return await stub.handler(request)
+
+    tokens = iter(f"jwt-{i}" for i in range(100))
+    sender = APNSSender(APNS_URL, "com.test.app", lambda: next(tokens),
+                        transport=httpx.MockTransport(handler))
+    results = asyncio.run(sender.push_many(["device-0", "device-1"], build_payload("a", "b")))
+    assert all(r.ok for r in results)
+    assert sender.tokens.signed == 2
+
+def test_unregistered_tokens_are_deactivated(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'devices.db'}", connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        # The PostgreSQL UUID columns of device_tokens have no SQLite DDL
+        conn.execute(text(
+            "CREATE TABLE device_tokens (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, device_token TEXT, "
+            "device_type TEXT, app_version TEXT, os_version TEXT, device_model TEXT, is_active BOOLEAN, "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"
+        ))
+    db = sessionmaker(bind=engine)()
+    user_id = uuid.UUID(USER_ID)
+    for token, device_type in (("phone", "ios"), ("old-phone", "ios"), ("pixel", "android")):
+        db.add(DeviceToken(user_id=user_id, device_token=token, device_type=device_type))
+    db.commit()
+
+    stub = APNSStub({"old-phone": (410, "Unregistered")})
+    sender = make_sender(stub)
+    monkeypatch.setattr(apns, "_sender", sender)
+
+    assert notification_service.send_notification_to_user(db, user_id, "Привет", "Скучаю") == 1
+    db.expire_all()
+    active = {d.device_token for d in db.query(DeviceToken).filter(DeviceToken.is_active == True)}
+    assert active == {"phone", "pixel"}
+    assert len(stub.requests) == 2
+
+    sender.close()
+    db.close()
+    engine.dispose()
@@ -0,0 +1,102 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bots.api_client import BotApiClient, EndpointPolicy
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+
+def run_with_server(routes, scenario):
+    """Start a local API server, run scenario(client, calls) against it and return the calls."""
+    calls = []
+
+    async def main():
+        app = web.Application()
+        for method, path, handler in routes:
+            async def wrapped(request, handler=handler):
+                calls.append((request.method, request.path, dict(request.query), request.headers.get("X-API-Key")))
+                return await handler(request)
+            app.router.add_route(method, path, wrapped)
+
+        async with TestServer(app) as server:
+            client = BotApiClient(
+                base_url=str(server.make_url("/api/v1")),
+                api_key="bot-key",
+                policies={name: EndpointPolicy(timeout=5, retries=2, backoff=0, idempotent=name != "start_chat")
+                          for name in ("characters", "start_chat", "memories")}
+            )
+            try:
+                await scenario(client, calls)
+            finally:
+                await client.close()
+
+    asyncio.run(main())
+    return calls
+
+def test_calls_share_one_session():
+    async def characters(request):
+        return web.json_response([{"id": CHARACTER_ID, "name": "Алиса"}])
+
+    async def scenario(client, calls):
+        first = await client.list_characters()
+        session = client._session
+        second = await client.list_characters()
+        assert first == second == [{"id": CHARACTER_ID, "name": "Алиса"}]
+        assert client._session is session
+
+    calls = run_with_server([("GET", "/api/v1/chat/characters", characters)], scenario)
+    assert [call[3] for call in calls] == ["bot-key", "bot-key"]
+
+def test_gateway_errors_are_retried_for_idempotent_calls_only():
+    attempts = {"characters": 0}
+
+    async def characters(request):
+        attempts["characters"] += 1
+        if attempts["characters"] < 3:
+            return web.Response(status=503)
+        return web.json_response([])
+
+    async def start_chat(request):
+        return web.Response(status=503)
+
+    async def scenario(client, calls):
+        assert await client.list_characters() == []
+        assert await client.start_chat(CHARACTER_ID) is None
+
+    calls = run_with_server([
+        ("GET", "/api/v1/chat/characters", characters),
+        ("POST", f"/api/v1/chat/characters/{CHARACTER_ID}/start-chat", start_chat),
+    ], scenario)
+    paths = [call[1] for call in calls]
+    assert paths.count("/api/v1/chat/characters") == 3
+    assert paths.count(f"/api/v1/chat/characters/{CHARACTER_ID}/start-chat") == 1
+
+def test_memories_try_user_id_formats():
+    async def memories(request):
+        if request.query.get("telegram_id") == "12345678":
+            return web.json_response({"memories": [{"content": "Любит кофе"}]})
+        return web.json_response({"memories": []})
+
+    async def scenario(client, calls):
+        result = await client.get_character_memories(CHARACTER_ID, "c7cb5b5c-e469-586e-8e87-000012345678")
+        assert result == [{"content": "Любит кофе"}]
+
+    calls = run_with_server([("GET", f"/api/v1/chat/characters/{CHARACTER_ID}/memories", memories)], scenario)
+    assert [call[2] for call in calls] == [
+        {"user_id": "c7cb5b5c-e469-586e-8e87-000012345678"},
+        {"telegram_id": "12345678"},
+    ]
+
+def test_connection_error_is_reported():
+    async def main():
+        client = BotApiClient(base_url="http://127.0.0.1:9/api/v1",
+                              policies={"relationship": EndpointPolicy(timeout=1, backoff=0)})
+        try:
+            response = await client.get_relationship(CHARACTER_ID)
+        finally:
+            await client.close()
+        assert response.connection_error
+        assert response.data is None
+
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from bots.storage import (BotStorage, MemoryBackend, RedisBackend, RedisError, SQLBackend,
+                          create_backend, dumps, loads)
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+
+async def start_resp_server(store):
+    """Tiny Redis-protocol server supporting GET/SET [EX]/DEL, enough to exercise the client."""
+
+    async def handle(reader, writer):
+        while True:
+            header = await reader.readline()
+            if not header:
+                break
+            args = []
+            for _ in range(int(header[1:-2])):
+                length = int((await reader.readline())[1:-2])
+                args.append((await reader.readexactly(length + 2))[:-2])
+            command = args[0].upper()
+            if command == b"GET":
+                item = store.get(args[1])
+                if item is None or (item[1] and item[1] <= time.time()):
+                    writer.write(b"$-1\r\n")
+                else:
+                    writer.write(b"$%d\r\n%s\r\n" % (len(item[0]), item[0]))
+            elif command == b"SET":
+                expires = time.time() + int(args[4]) if len(args) > 4 and args[3].upper() == b"EX" else None
+                store[args[1]] = (args[2], expires)
+                writer.write(b"+OK\r\n")
+            elif command == b"DEL":
+                writer.write(b":%d\r\n" % (1 if store.pop(args[1], None) else 0))
+            else:
+                writer.write(b"-ERR unknown command\r\n")
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+def exercise(storage):
+    async def scenario():
+        await storage.set_state(KEY, "BotStates:chatting")
+        await storage.update_data(KEY, {"character_id": CHARACTER_ID, "character_name": "Алиса"})
+        assert await storage.get_state(KEY) == "BotStates:chatting"
+        assert (await storage.get_data(KEY))["character_name"] == "Алиса"
+
+        for i in range(5):
+            await storage.append_history(42, CHARACTER_ID, {"content": f"message {i}", "sender_type": "user"})
+        history = await storage.get_history(42, CHARACTER_ID)
+        assert [m["content"] for m in history] == ["message 2", "message 3", "message 4"]
+
+        await storage.set_user_mapping(42, ("c7cb5b5c-e469-586e-8e87-2a", "c7cb5b5c-e469-586e-8e87-000000000042", 42))
+        assert await storage.get_user_mapping(42) == ("c7cb5b5c-e469-586e-8e87-2a", "c7cb5b5c-e469-586e-8e87-000000000042", 42)
+
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        assert await storage.get_state(KEY) is None
+        assert await storage.get_data(KEY) == {}
+    return scenario()
+
+def test_serialization_compresses_large_values():
+    small = {"a": 1}
+    large = {"history": ["сообщение"] * 200}
+    assert dumps(small) == b'j{"a":1}'
+    assert dumps(large)[:1] == b"z"
+    assert loads(dumps(large)) == large
+    assert loads(None) is None
+
+def test_memory_backend():
+    asyncio.run(exercise(BotStorage(MemoryBackend(), history_limit=3)))
+
+def test_sql_backend_persists_across_instances(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bot.db'}"
+    assert isinstance(create_backend(url), SQLBackend)
+
+    async def scenario():
+        first = BotStorage(SQLBackend(url), history_limit=3)
+        await exercise(first)
+        await first.set_state(KEY, "BotStates:chatting")
+        await first.close()
+
+        restarted = BotStorage(SQLBackend(url))
+        assert await restarted.get_state(KEY) == "BotStates:chatting"
+        await restarted.close()
+
+    asyncio.run(scenario())
+
+def test_sql_backend_expires_keys(tmp_path):
+    async def scenario():
+        backend = SQLBackend(f"sqlite:///{tmp_path / 'bot.db'}")
+        await backend.set("short", b"jvalue", ttl=1)
+        await backend.set("long", b"jvalue")
+        with backend.engine.begin() as conn:
+            conn.execute(backend.table.update().where(backend.table.c.key == "short").values(expires_at=time.time() - 1))
+        assert await backend.get("short") is None
+        assert await backend.get("long") == b"jvalue"
+        await backend.close()
+
+    asyncio.run(scenario())
+
+def test_redis_backend_against_local_server():
+    async def scenario():
+        store = {}
+        server = await start_resp_server(store)
+        port = server.sockets[0].getsockname()[1]
+        backend = create_backend(f"redis://127.0.0.1:{port}/0")
+        assert isinstance(backend, RedisBackend)
+        storage = BotStorage(backend, history_limit=3)
+        try:
+            await exercise(storage)
+            await storage.set_state(KEY, "BotStates:chatting")
+            assert store[b"bot:fsm:1:42:42:default:state"][1] is not None  # TTL applied
+        finally:
+            await storage.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+def test_redis_backend_reports_errors():
+    async def scenario():
+        server = await start_resp_server({})
+        port = server.sockets[0].getsockname()[1]
+        backend = RedisBackend(f"redis://127.0.0.1:{port}")
+        try:
+            with pytest.raises(RedisError, match="unknown command"):
+                await backend.execute("PING")
+        finally:
+            await backend.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
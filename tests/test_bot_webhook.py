@@ -0,0 +1,106 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from bots.webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "webhook-secret"
+
+def recorded_update(update_id, text, chat_id=42):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1712345678,
+            "chat": {"id": chat_id, "type": "private", "first_name": "Anna"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Anna"},
+            "text": text
+        }
+    }
+
+def make_server(handler, **kwargs):
+    dp = Dispatcher()
+    dp.message.register(handler)
+    return WebhookServer(dp, Bot(token="123456:TEST"), secret_token=SECRET, path="/webhook", **kwargs)
+
+def test_updates_are_acknowledged_and_processed():
+    received = []
+
+    async def handler(message: Message):
+        received.append(message.text)
+
+    async def scenario():
+        server = make_server(handler, workers=2)
+        async with TestClient(TestServer(server.app)) as client:
+            for i, text in enumerate(["Привет", "Как дела?"], 1):
+                response = await client.post("/webhook", json=recorded_update(i, text), headers={SECRET_HEADER: SECRET})
+                assert response.status == 200
+            await server.join()
+            health = await (await client.get("/health")).json()
+        assert health["processed"] == 2
+        await server.bot.session.close()
+
+    asyncio.run(scenario())
+    assert sorted(received) == ["Как дела?", "Привет"]
+
+def test_slow_handlers_do_not_delay_acknowledgement():
+    release = asyncio.Event()
+
+    async def handler(message: Message):
+        await release.wait()
+
+    async def scenario():
+        server = make_server(handler, workers=1)
+        async with TestClient(TestServer(server.app)) as client:
+            for i in range(3):
+                response = await asyncio.wait_for(
+                    client.post("/webhook", json=recorded_update(i, "hi"), headers={SECRET_HEADER: SECRET}),
+                    timeout=2
+                )
+                assert response.status == 200
+            assert server.processed == 0
+            release.set()
+            await server.join()
+            assert server.processed == 3
+        await server.bot.session.close()
+
+    asyncio.run(scenario())
+
+def test_invalid_requests_are_rejected():
+    async def handler(message: Message):
+        pass
+
+    async def scenario():
+        server = make_server(handler)
+        async with TestClient(TestServer(server.app)) as client:
+            assert (await client.post("/webhook", json=recorded_update(1, "hi"))).status == 401
+            assert (await client.post("/webhook", json=recorded_update(1, "hi"),
+                                      headers={SECRET_HEADER: "wrong"})).status == 401
+            assert (await client.post("/webhook", data=b"not json",
+                                      headers={SECRET_HEADER: SECRET})).status == 400
+        await server.bot.session.close()
+
+    asyncio.run(scenario())
+
+def test_full_queue_sheds_load():
+    release = asyncio.Event()
+
+    async def handler(message: Message):
+        await release.wait()
+
+    async def scenario():
+        server = make_server(handler, workers=1, queue_size=1)
+        async with TestClient(TestServer(server.app)) as client:
+            statuses = []
+            for i in range(4):
+                response = await client.post("/webhook", json=recorded_update(i, "hi"), headers={SECRET_HEADER: SECRET})
+                statuses.append(response.status)
+                await asyncio.sleep(0.05)
+            release.set()
+            await server.join()
+        assert statuses == [200, 200, 503, 503]
+        await server.bot.session.close()
+
+    asyncio.run(scenario())
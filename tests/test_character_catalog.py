@@ -0,0 +1,202 @@
+import asyncio
+import json
+
+from bots.api_client import ApiResponse
+from bots.character_catalog import CharacterCatalog
+
+ALICE = {"id": "8c054f20-4a77-4eef-83e6-245d3456bdf1", "name": "Алиса"}
+BELLA = {"id": "b0e5a9c6-1e8f-4d3b-9a57-3f2b7c1d9e10", "name": "Белла"}
+
+class FakeApiClient:
+    """Serves a character list with ETag semantics and records every call."""
+
+    def __init__(self, characters):
+        self.characters = characters
+        self.version = 1
+        self.calls = []
+
+    async def revalidate_characters(self, etag=None):
+        self.calls.append(("list", etag))
+        current = f'W/"{self.version}"'
+        if etag == current:
+            return ApiResponse(status=304, etag=current)
+        return ApiResponse(status=200, body=json.dumps(self.characters).encode(), etag=current)
+
+    async def get_character(self, character_id):
+        self.calls.append(("get", character_id))
+        return next((c for c in self.characters if c["id"] == character_id), None)
+
+def test_lookups_are_served_from_cache():
+    api = FakeApiClient([ALICE])
+    catalog = CharacterCatalog(api, ttl=60)
+
+    async def scenario():
+        assert await catalog.get(ALICE["id"]) == ALICE
+        assert await catalog.get(ALICE["id"]) == ALICE
+        assert await catalog.list() == [ALICE]
+
+    asyncio.run(scenario())
+    assert api.calls == [("list", None)]
+
+def test_expired_list_is_revalidated_with_etag():
+    api = FakeApiClient([ALICE])
+    catalog = CharacterCatalog(api, ttl=0)
+
+    async def scenario():
+        await catalog.list()
+        await catalog.list()
+        api.version = 2
+        api.characters = [ALICE, BELLA]
+        assert await catalog.list() == [ALICE, BELLA]
+
+    asyncio.run(scenario())
+    assert api.calls == [("list", None), ("list", 'W/"1"'), ("list", 'W/"1"')]
+
+def test_refresh_hook_sees_only_changed_lists():
+    api = FakeApiClient([ALICE])
+    refreshed = []
+    catalog = CharacterCatalog(api, ttl=0, on_refresh=refreshed.append)
+
+    async def scenario():
+        await catalog.list()
+        await catalog.list()  # 304, nothing changed
+        api.version = 2
+        api.characters = [ALICE, BELLA]
+        await catalog.list()
+
+    asyncio.run(scenario())
+    assert refreshed == [[ALICE], [ALICE, BELLA]]
+
+def test_unknown_id_falls_back_to_single_fetch():
+    api = FakeApiClient([ALICE])
+    catalog = CharacterCatalog(api, ttl=60)
+
+    async def scenario():
+        await catalog.list()
+        api.characters = [ALICE, BELLA]
+        assert await catalog.get(BELLA["id"]) == BELLA
+        assert await catalog.get(BELLA["id"]) == BELLA
+        assert await catalog.get("missing") is None
+
+    asyncio.run(scenario())
+    assert api.calls == [("list", None), ("get", BELLA["id"]), ("get", "missing")]
+
+def test_stale_list_is_kept_when_api_is_down():
+    api = FakeApiClient([ALICE])
+    catalog = CharacterCatalog(api, ttl=60)
+
+    async def scenario():
+        await catalog.list()
+        catalog.invalidate()
+
+        async def unavailable(etag=None):
+            return ApiResponse(status=0, error="connection refused")
+        api.revalidate_characters = unavailable
+        assert await catalog.list() == [ALICE]
+
+    asyncio.run(scenario())
+
+def test_single_character_endpoint_revalidates(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.api.v1 import chat
+    from app.db.session import get_db
+    from app.services.catalog_service import CharacterCatalogCache
+    from core.db.models.character import Character
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}", connect_args={"check_same_thread": False})
+    Character.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    catalog = CharacterCatalogCache(check_interval=60)
+    monkeypatch.setattr(chat, "character_catalog", catalog)
+    session = Session()
+    session.add(Character(id=ALICE["id"], name="Алиса", age=23, personality='["добрая"]', interests="чтение"))
+    session.commit()
+    session.close()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    response = client.get(f"/chat/characters/{ALICE['id']}")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["name"] == "Алиса"
+    assert body["personality_traits"] == ["добрая"]
+    assert body["interests"] == ["чтение"]
+
+    etag = response.headers["etag"]
+    revalidated = client.get(f"/chat/characters/{ALICE['id']}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    # Both requests were answered from one snapshot
+    assert catalog.rebuilds == 1
+
+    assert client.get("/chat/characters/missing").status_code == 404
+    engine.dispose()
+
+def test_character_list_is_served_from_versioned_snapshot(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.api.v1 import chat
+    from app.db.session import get_db
+    from app.services.catalog_service import CharacterCatalogCache, bump_catalog_version
+    from core.db.models.cache_version import CacheVersion
+    from core.db.models.character import Character
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}", connect_args={"check_same_thread": False})
+    Character.__table__.create(engine)
+    CacheVersion.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    session.add(Character(id=ALICE["id"], name="Алиса", age=23))
+    session.commit()
+
+    catalog = CharacterCatalogCache(check_interval=60)
+    monkeypatch.setattr(chat, "character_catalog", catalog)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    response = client.get("/chat/characters")
+    assert [c["name"] for c in response.json()] == ["Алиса"]
+    etag = response.headers["etag"]
+    assert client.get("/chat/characters", headers={"If-None-Match": etag}).status_code == 304
+
+    # A write that bumps the version is picked up at the next version check
+    session.add(Character(id=BELLA["id"], name="Белла", age=25))
+    bump_catalog_version(session)
+    session.commit()
+    assert [c["name"] for c in client.get("/chat/characters").json()] == ["Алиса"]
+    catalog.check_interval = 0
+    response = client.get("/chat/characters", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [c["name"] for c in response.json()] == ["Алиса", "Белла"]
+
+    # Unchanged version: no rebuild
+    client.get("/chat/characters")
+    assert catalog.rebuilds == 2
+    session.close()
+    engine.dispose()
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.catalog_service import bump_catalog_version
+from app.services.character_repository import CharacterRepository
+from core.db.models.cache_version import CacheVersion
+from core.db.models.character import Character
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+PARTNER_ID = "b0e5a9c6-1e8f-4d3b-9a57-3f2b7c1d9e10"
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'characters.db'}", connect_args={"check_same_thread": False})
+    Character.__table__.create(engine)
+    CacheVersion.__table__.create(engine)
+    with engine.begin() as conn:
+        # ai_partners uses a PostgreSQL UUID column; a text id is enough here
+        conn.execute(text(
+            "CREATE TABLE ai_partners (id TEXT PRIMARY KEY, name TEXT, age INTEGER, gender TEXT, "
+            "personality_traits TEXT, interests TEXT, background TEXT, current_emotion TEXT)"
+        ))
+        conn.execute(text(
+            "INSERT INTO ai_partners (id, name, age, personality_traits, interests, current_emotion) "
+            "VALUES (:id, 'Белла', 25, '[\"смелая\"]', 'музыка', 'calm')"
+        ), {"id": PARTNER_ID})
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    session.add(Character(id=CHARACTER_ID, name="Алиса", age=23, personality='["добрая", "весёлая"]'))
+    session.commit()
+    session.close()
+    yield Session
+    engine.dispose()
+
+def test_resolves_both_tables_and_serves_identity_from_cache(session_factory):
+    db = session_factory()
+    repository = CharacterRepository(check_interval=60)
+
+    alice = repository.get(db, CHARACTER_ID)
+    assert (alice.source, alice.name) == ("characters", "Алиса")
+    assert alice.personality_traits == ["добрая", "весёлая"]
+    assert alice.partner_id == CHARACTER_ID
+
+    bella = repository.get(db, PARTNER_ID)
+    assert (bella.source, bella.interests) == ("ai_partners", ["музыка"])
+    assert bella.to_context()["current_emotion"]["name"] == "calm"
+
+    assert repository.get(db, CHARACTER_ID) is alice
+    assert repository.get(db, "missing") is None
+    assert (repository.hits, repository.misses) == (1, 3)
+    db.close()
+
+def test_cache_is_bounded_and_invalidated_explicitly(session_factory):
+    db = session_factory()
+    repository = CharacterRepository(max_size=1, check_interval=60)
+
+    alice = repository.get(db, CHARACTER_ID)
+    repository.get(db, PARTNER_ID)
+    assert repository.get_metrics()["size"] == 1
+    assert repository.get(db, CHARACTER_ID) is not alice
+
+    db.execute(text("UPDATE characters SET name = 'Алиса Н.' WHERE id = :id"), {"id": CHARACTER_ID})
+    db.commit()
+    assert repository.get(db, CHARACTER_ID).name == "Алиса"
+    repository.invalidate(CHARACTER_ID)
+    assert repository.get(db, CHARACTER_ID).name == "Алиса Н."
+    db.close()
+
+def test_catalog_version_bump_drops_cached_characters(session_factory):
+    db = session_factory()
+    repository = CharacterRepository(check_interval=0)
+    assert repository.get(db, CHARACTER_ID).name == "Алиса"
+
+    # An edit from another process, e.g. the admin panel
+    db.execute(text("UPDATE characters SET name = 'Алиса Н.' WHERE id = :id"), {"id": CHARACTER_ID})
+    assert repository.get(db, CHARACTER_ID).name == "Алиса"
+    bump_catalog_version(db)
+    db.commit()
+    assert repository.get(db, CHARACTER_ID).name == "Алиса Н."
+    db.close()
+
+def test_update_emotion_persists_only_for_ai_partners(session_factory):
+    db = session_factory()
+    repository = CharacterRepository(check_interval=60)
+    bella = repository.get(db, PARTNER_ID)
+    alice = repository.get(db, CHARACTER_ID)
+
+    repository.update_emotion(db, bella, "happy")
+    repository.update_emotion(db, alice, "sad")
+    db.commit()
+
+    assert db.execute(text("SELECT current_emotion FROM ai_partners")).scalar() == "happy"
+    assert repository.get(db, PARTNER_ID).current_emotion == "happy"
+    assert alice.current_emotion == "sad"
+    db.close()
@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message, Update
+
+from bots.chat_dispatcher import ChatDispatcher, setup_chat_dispatcher
+
+def make_update(update_id, text, chat_id=42):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1712345678,
+            "chat": {"id": chat_id, "type": "private", "first_name": "Anna"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Anna"},
+            "text": text
+        }
+    })
+
+def test_updates_of_one_chat_are_handled_in_order():
+    handled = []
+
+    async def handler(update):
+        # Later messages finish faster, so any overlap would reorder them
+        await asyncio.sleep(0.01 * (5 - int(update.message.text)))
+        handled.append(update.message.text)
+
+    async def scenario():
+        dispatcher = ChatDispatcher(handler, workers=4)
+        await dispatcher.start()
+        for i in range(5):
+            assert dispatcher.submit(make_update(i, str(i)))
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    assert handled == ["0", "1", "2", "3", "4"]
+
+def test_different_chats_are_handled_in_parallel():
+    running = set()
+    overlap = []
+
+    async def handler(update):
+        running.add(update.message.chat.id)
+        overlap.append(len(running))
+        await asyncio.sleep(0.05)
+        running.discard(update.message.chat.id)
+
+    async def scenario():
+        dispatcher = ChatDispatcher(handler, workers=3)
+        await dispatcher.start()
+        for chat_id in (1, 2, 3):
+            dispatcher.submit(make_update(chat_id, "hi", chat_id=chat_id))
+        await dispatcher.join()
+        assert dispatcher.get_metrics()["processed"] == 3
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    assert max(overlap) == 3
+
+def test_slow_blocking_turns_of_different_chats_overlap():
+    # Like bots.bot.chat_handler: the blocking LLM call runs in a thread via asyncio.to_thread
+    def generate_response(text):
+        time.sleep(0.2)
+        return text
+
+    ticks = []
+
+    async def handler(update):
+        await asyncio.to_thread(generate_response, update.message.text)
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        dispatcher = ChatDispatcher(handler, workers=2)
+        await dispatcher.start()
+        ticking = asyncio.create_task(ticker())
+        started = time.monotonic()
+        for chat_id in (1, 2):
+            dispatcher.submit(make_update(chat_id, "hi", chat_id=chat_id))
+        await dispatcher.join()
+        elapsed = time.monotonic() - started
+        ticking.cancel()
+        await dispatcher.stop()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+    # Both turns ran at the same time, and the event loop kept running meanwhile
+    assert elapsed < 0.35
+    assert len(ticks) >= 10
+
+def test_submit_refuses_updates_beyond_max_pending():
+    async def scenario():
+        dispatcher = ChatDispatcher(lambda update: asyncio.sleep(0), workers=1, max_pending=2)
+        assert dispatcher.submit(make_update(1, "a"))
+        assert dispatcher.submit(make_update(2, "b", chat_id=7))
+        assert not dispatcher.submit(make_update(3, "c"))
+
+        # put waits for a worker to free a slot instead of refusing
+        put = asyncio.create_task(dispatcher.put(make_update(4, "d")))
+        await asyncio.sleep(0.01)
+        assert not put.done()
+        await dispatcher.start()
+        await asyncio.wait_for(put, 1)
+        await dispatcher.join()
+        assert dispatcher.processed == 3
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+def test_bursts_are_merged_into_one_turn():
+    handled = []
+
+    async def handler(update):
+        handled.append(update.message.text)
+
+    async def mergeable(update):
+        return not update.message.text.startswith("/")
+
+    async def scenario():
+        dispatcher = ChatDispatcher(handler, workers=2, merge_window=0.05, mergeable=mergeable)
+        await dispatcher.start()
+        for i, text in enumerate(["Привет", "Как дела?", "/menu", "Пока"]):
+            dispatcher.submit(make_update(i, text))
+        await dispatcher.join()
+        assert dispatcher.merged == 1
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    assert handled == ["Привет\nКак дела?", "/menu", "Пока"]
+
+def test_polled_updates_are_routed_through_the_dispatcher():
+    handled = []
+
+    async def handler(message: Message):
+        await asyncio.sleep(0.01 * (3 - message.message_id))
+        handled.append(message.text)
+
+    async def scenario():
+        bot = Bot(token="123456:TEST")
+        dp = Dispatcher()
+        dp.message.register(handler)
+        chat_dispatcher = setup_chat_dispatcher(dp, bot, workers=2)
+        await chat_dispatcher.start()
+        # Polling feeds updates concurrently; the middleware queues them instead of handling
+        await asyncio.gather(*(dp.feed_update(bot, make_update(i, str(i))) for i in range(3)))
+        await chat_dispatcher.join()
+        await chat_dispatcher.stop()
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    assert handled == ["0", "1", "2"]
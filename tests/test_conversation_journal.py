@@ -0,0 +1,218 @@
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.ai.conversation_journal import ConversationJournal, WAL_PREFIX
+from core.db.models.chat_history import ChatHistory
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'journal.db'}")
+    ChatHistory.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def make_journal(session_factory, tmp_path, **kwargs):
+    options = {"batch_size": 4, "flush_interval": 60, "max_sessions": 10, "background": False}
+    options.update(kwargs)
+    return ConversationJournal(
+        session_factory=session_factory,
+        journal_dir=str(tmp_path / "journal"),
+        **options
+    )
+
+def crash(journal):
+    """Simulate a crash: the buffer is lost but the write-ahead file remains and its lock is released"""
+    journal._wal_file.close()
+    journal._wal_file = None
+    journal._wal_lock.close()
+    journal._wal_lock = None
+
+def wal_lines(journal):
+    return journal._wal_path.read_text(encoding="utf-8").splitlines()
+
+def stored_rows(session_factory):
+    session = session_factory()
+    try:
+        return session.query(ChatHistory).order_by(ChatHistory.position).all()
+    finally:
+        session.close()
+
+def test_flush_on_batch_size(session_factory, tmp_path):
+    journal = make_journal(session_factory, tmp_path)
+
+    journal.append(CHARACTER_ID, USER_ID, "user", "Привет")
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "Привет!", {"emotion": "happy"})
+    assert stored_rows(session_factory) == []
+    assert journal.pending_count() == 2
+
+    journal.append(CHARACTER_ID, USER_ID, "user", "Как дела?")
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "Хорошо")
+
+    rows = stored_rows(session_factory)
+    assert [row.position for row in rows] == [1, 2, 3, 4]
+    assert all(row.is_active for row in rows)
+    assert json.loads(rows[1].message_metadata) == {"emotion": "happy"}
+    assert journal.pending_count() == 0
+
+    metrics = journal.get_metrics()
+    assert metrics["flushes"] == 1
+    assert metrics["rows_flushed"] == 4
+    assert metrics["flush_latency_ms"]["last"] is not None
+    journal.close()
+
+def test_positions_continue_after_existing_rows(session_factory, tmp_path):
+    session = session_factory()
+    session.add(ChatHistory(character_id=CHARACTER_ID, user_id=USER_ID, role="system",
+                            content="prompt", position=7, is_active=True))
+    session.commit()
+    session.close()
+
+    journal = make_journal(session_factory, tmp_path)
+    journal.append(CHARACTER_ID, USER_ID, "user", "one")
+    journal.flush()
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "two")
+    journal.close()
+
+    assert [row.position for row in stored_rows(session_factory)] == [7, 8, 9]
+
+def test_eviction_flushes_least_recent_session(session_factory, tmp_path):
+    journal = make_journal(session_factory, tmp_path, max_sessions=1)
+
+    journal.append(CHARACTER_ID, USER_ID, "user", "first session")
+    journal.append(CHARACTER_ID, "other-user", "user", "second session")
+
+    rows = stored_rows(session_factory)
+    assert [row.content for row in rows] == ["first session"]
+    assert journal.get_metrics()["evictions"] == 1
+    journal.close()
+
+def test_recovery_replays_unflushed_turns_once(session_factory, tmp_path):
+    journal = make_journal(session_factory, tmp_path)
+    journal.append(CHARACTER_ID, USER_ID, "user", "before crash")
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "reply")
+    crash(journal)
+    lines = wal_lines(journal)
+    assert len(lines) == 2
+
+    # A row that was committed before the crash must not be duplicated
+    committed = json.loads(lines[0])
+    session = session_factory()
+    session.add(ChatHistory(id=committed["id"], character_id=CHARACTER_ID, user_id=USER_ID,
+                            role="user", content="before crash", position=1, is_active=True))
+    session.commit()
+    session.close()
+
+    recovered = make_journal(session_factory, tmp_path)
+    assert recovered.get_metrics()["recovered"] == 2
+    assert [row.content for row in stored_rows(session_factory)] == ["before crash", "reply"]
+    # The claimed file is gone and nothing is pending in the new one
+    assert not journal._wal_path.exists()
+    assert not wal_lines(recovered)
+    recovered.close()
+
+def test_failed_flush_keeps_turns(tmp_path):
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    journal = make_journal(broken_session, tmp_path)
+    journal.append(CHARACTER_ID, USER_ID, "user", "keep me")
+
+    assert journal.flush() == 0
+    assert journal.pending_count() == 1
+    assert journal.get_metrics()["flush_errors"] == 1
+
+def test_wal_is_compacted_to_pending_turns_after_each_flush(session_factory, tmp_path):
+    journal = make_journal(session_factory, tmp_path)
+    journal.append(CHARACTER_ID, "other-user", "user", "still pending")
+    for i in range(4):
+        journal.append(CHARACTER_ID, USER_ID, "user", f"turn {i}")
+
+    # The other session never went idle, yet the flushed turns left the file
+    assert [json.loads(line)["content"] for line in wal_lines(journal)] == ["still pending"]
+
+    journal.append(CHARACTER_ID, USER_ID, "user", "appended after compaction")
+    assert len(wal_lines(journal)) == 2
+    journal.close()
+
+def test_recovered_turns_are_checked_until_persisted(session_factory, tmp_path):
+    journal = make_journal(session_factory, tmp_path)
+    journal.append(CHARACTER_ID, USER_ID, "user", "before crash")
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "reply")
+    crash(journal)
+
+    committed = json.loads(wal_lines(journal)[0])
+    session = session_factory()
+    session.add(ChatHistory(id=committed["id"], character_id=CHARACTER_ID, user_id=USER_ID,
+                            role="user", content="before crash", position=1, is_active=True))
+    session.commit()
+    session.close()
+
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    # The recovery flush fails; a later regular flush must still skip the committed row
+    recovered = make_journal(broken_session, tmp_path)
+    assert recovered.pending_count() == 2
+    recovered._session_factory = session_factory
+    assert recovered.flush() == 2
+    assert [row.content for row in stored_rows(session_factory)] == ["before crash", "reply"]
+    recovered.close()
+
+def test_discard_pending_drops_unflushed_turns_of_a_session(tmp_path):
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    journal = make_journal(broken_session, tmp_path)
+    journal.append(CHARACTER_ID, USER_ID, "user", "cleared")
+    journal.append(CHARACTER_ID, "other-user", "user", "kept")
+    assert journal.flush() == 0
+
+    assert journal.discard_pending(CHARACTER_ID, USER_ID) == 1
+    assert journal.pending_count() == 1
+    assert [json.loads(line)["content"] for line in wal_lines(journal)] == ["kept"]
+
+def test_gift_between_buffered_turns_keeps_positions_unique(session_factory, tmp_path, monkeypatch):
+    from app.api.v1 import chat
+    from core.ai import conversation_journal
+
+    journal = make_journal(session_factory, tmp_path, batch_size=100)
+    monkeypatch.setattr(conversation_journal, "_journal", journal)
+
+    journal.append(CHARACTER_ID, USER_ID, "user", "Привет")
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "Привет!")
+    chat.record_gift_history(CHARACTER_ID, USER_ID, "Цветы", "Спасибо!", "happy", {"gift_id": "flowers"})
+    journal.append(CHARACTER_ID, USER_ID, "user", "Нравится?")
+    journal.append(CHARACTER_ID, USER_ID, "assistant", "Очень")
+    journal.flush()
+
+    rows = stored_rows(session_factory)
+    assert [row.position for row in rows] == [1, 2, 3, 4, 5, 6]
+    assert [row.content for row in rows] == [
+        "Привет", "Привет!", "Пользователь отправил подарок: Цветы", "Спасибо!", "Нравится?", "Очень"]
+    assert json.loads(rows[2].message_metadata) == {"gift_event": {"gift_id": "flowers"}}
+    journal.close()
+
+def test_live_workers_write_ahead_files_are_not_recovered(session_factory, tmp_path):
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    live = make_journal(broken_session, tmp_path)
+    live.append(CHARACTER_ID, USER_ID, "user", "still being handled")
+    dead = make_journal(broken_session, tmp_path)
+    dead.append(CHARACTER_ID, USER_ID, "user", "left by a crash")
+    crash(dead)
+
+    # A worker starting next to them only claims the crashed one's file
+    starting = make_journal(session_factory, tmp_path)
+    assert starting.get_metrics()["recovered"] == 1
+    assert [row.content for row in stored_rows(session_factory)] == ["left by a crash"]
+    assert not dead._wal_path.exists()
+    assert [json.loads(line)["content"] for line in wal_lines(live)] == ["still being handled"]
+    assert sorted(p.name for p in (tmp_path / "journal").glob(f"{WAL_PREFIX}*.wal")) == sorted(
+        [live._wal_path.name, starting._wal_path.name])
+    starting.close()
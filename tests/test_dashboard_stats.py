@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from core.db.dashboard_stats import DashboardStats
+from core.db.models.dashboard_stat import DashboardStat
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dashboard.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (user_id TEXT PRIMARY KEY)"))
+        conn.execute(text("CREATE TABLE characters (id TEXT PRIMARY KEY, name TEXT)"))
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, content TEXT)"))
+        conn.execute(text("CREATE TABLE memory_entries (id INTEGER PRIMARY KEY, character_id TEXT, content TEXT)"))
+        conn.execute(text("INSERT INTO users VALUES (:id)"), {"id": USER_ID})
+        conn.execute(text("INSERT INTO characters VALUES (:id, 'Алиса'), ('character-2', 'Вика')"), {"id": CHARACTER_ID})
+        conn.execute(text("INSERT INTO memory_entries (character_id, content) VALUES "
+                          "(:id, 'a'), (:id, 'b'), ('character-2', 'c')"), {"id": CHARACTER_ID})
+    yield engine
+    engine.dispose()
+
+def add_memory(engine, character_id):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO memory_entries (character_id, content) VALUES (:id, 'new')"),
+                     {"id": character_id})
+
+def test_figures_are_served_precomputed_and_refreshed_in_the_background(engine):
+    DashboardStat.__table__.create(engine)
+    stats = DashboardStats(engine, max_age=60)
+
+    # The first load computes the figures inline
+    assert stats.totals() == {"users": 1, "characters": 2, "messages": 0, "memory_entries": 3}
+    assert stats.memory_counts() == {CHARACTER_ID: 2, "character-2": 1}
+
+    # New rows are not counted on page loads...
+    add_memory(engine, CHARACTER_ID)
+    assert stats.totals()["memory_entries"] == 3 and stats.refreshes == 1
+
+    # ...but once the figures are stale, a background refresh picks them up
+    stats.max_age = 0
+    assert stats.memory_counts()[CHARACTER_ID] == 2
+    deadline = time.monotonic() + 5
+    while stats.refreshes < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats.max_age = 60
+    assert stats.memory_counts() == {CHARACTER_ID: 3, "character-2": 1}
+    assert stats.totals()["memory_entries"] == 4
+
+def test_figures_are_counted_live_without_the_stats_table(engine):
+    stats = DashboardStats(engine)
+    assert stats.totals()["memory_entries"] == 3
+    assert stats.memory_counts() == {CHARACTER_ID: 2, "character-2": 1}
+    assert stats.refreshes == 0
+
+def wait_for_refreshes(stats, count):
+    deadline = time.monotonic() + 5
+    while stats.refreshes < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_staleness_is_decided_by_the_stored_figures(engine):
+    DashboardStat.__table__.create(engine)
+    DashboardStats(engine).refresh()
+
+    # A new process serves fresh stored figures without refreshing them
+    add_memory(engine, CHARACTER_ID)
+    other_process = DashboardStats(engine, max_age=60)
+    assert other_process.totals()["memory_entries"] == 3
+    assert other_process.refreshes == 0
+
+    # Figures stored long ago are refreshed in the background
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE dashboard_stats SET updated_at = '2020-01-01 00:00:00'"))
+    assert other_process.totals()["memory_entries"] == 3
+    wait_for_refreshes(other_process, 1)
+    assert other_process.totals()["memory_entries"] == 4 and other_process.refreshes == 1
+
+def test_refreshes_upsert_and_drop_figures_no_longer_produced(engine):
+    DashboardStat.__table__.create(engine)
+    first, second = DashboardStats(engine), DashboardStats(engine)
+    first.refresh()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM memory_entries WHERE character_id = 'character-2'"))
+    # Refreshing over existing rows does not collide on the name key
+    second.refresh()
+    assert first.memory_counts() == {CHARACTER_ID: 2}
+    assert first.totals()["memory_entries"] == 2
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.discovery_feed import DiscoveryFeed
+from core.db.models.character import Character
+
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'feed.db'}", connect_args={"check_same_thread": False})
+    Character.__table__.create(engine)
+    with engine.begin() as conn:
+        # The PostgreSQL UUID columns of discovery_queue have no SQLite DDL
+        conn.execute(text("CREATE TABLE discovery_queue (user_id TEXT, position INTEGER, character_id TEXT, "
+                          "created_at DATETIME, PRIMARY KEY (user_id, position))"))
+        conn.execute(text("CREATE TABLE interactions (id TEXT PRIMARY KEY, user_id TEXT, character_id TEXT, "
+                          "interaction_type TEXT, created_at DATETIME)"))
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add_all([
+        Character(id=f"character-{i:02d}", name=f"Персонаж {i}", age=20 + i,
+                  interests='["музыка", "книги"]', is_active=i != 13)
+        for i in range(30)
+    ])
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+def swipe(db, feed, character_id):
+    db.execute(text("INSERT INTO interactions (id, user_id, character_id, interaction_type) "
+                    "VALUES (:id, :user_id, :character_id, 'dislike')"),
+               {"id": f"{USER_ID}:{character_id}", "user_id": USER_ID, "character_id": character_id})
+    feed.consume(db, USER_ID, character_id)
+    db.commit()
+
+def test_cursor_pages_are_stable_and_skip_inactive(session_factory):
+    feed = DiscoveryFeed(session_factory, queue_size=100, low_watermark=0, background=False)
+    db = session_factory()
+
+    first = feed.get_page(db, USER_ID, limit=10)
+    assert first.items[0]["interests"] == ["музыка", "книги"]
+    # Re-reading a page returns the same characters, no reshuffle
+    assert [c["id"] for c in feed.get_page(db, USER_ID, limit=10).items] == [c["id"] for c in first.items]
+
+    seen, cursor = [], None
+    for _ in range(3):
+        page = feed.get_page(db, USER_ID, limit=10, cursor=cursor)
+        seen += [c["id"] for c in page.items]
+        cursor = page.next_cursor
+    assert sorted(seen) == sorted(f"character-{i:02d}" for i in range(30) if i != 13)
+    assert feed.refills == 1
+
+    # Nothing was swiped: after the last page the characters are queued again
+    page = feed.get_page(db, USER_ID, limit=10, cursor=cursor)
+    assert feed.refills == 2 and len(page.items) == 10 and set(c["id"] for c in page.items) <= set(seen)
+    db.close()
+
+def test_swipes_consume_the_queue_and_low_queue_is_refilled(session_factory):
+    feed = DiscoveryFeed(session_factory, queue_size=10, low_watermark=5, background=False)
+    db = session_factory()
+
+    page = feed.get_page(db, USER_ID, limit=4)
+    for character in page.items:
+        swipe(db, feed, character["id"])
+    assert db.execute(text("SELECT COUNT(*) FROM discovery_queue")).scalar() == 6
+
+    # Only 2 candidates remain after this page, below the watermark
+    page = feed.get_page(db, USER_ID, limit=4, cursor=page.next_cursor)
+    assert feed.refills == 2
+    queued = [row[0] for row in db.execute(text("SELECT character_id FROM discovery_queue"))]
+    # The 4 entries paged past are dropped: 2 left ahead of the cursor and 10 new
+    assert len(queued) == len(set(queued)) == 12
+
+    swiped = {row[0] for row in db.execute(text("SELECT character_id FROM interactions"))}
+    assert not swiped & set(queued)
+    db.close()
+
+def test_paged_past_entries_are_pruned_and_queued_again(session_factory):
+    feed = DiscoveryFeed(session_factory, queue_size=10, low_watermark=3, background=False)
+    db = session_factory()
+
+    first = feed.get_page(db, USER_ID, limit=8)
+    skipped = {c["id"] for c in first.items}
+    # 2 candidates remain behind this page: the refill drops the 8 paged past and appends 10 more
+    second = feed.get_page(db, USER_ID, limit=2, cursor=first.next_cursor)
+    assert feed.refills == 2
+    positions = [row[0] for row in db.execute(text("SELECT position FROM discovery_queue ORDER BY position"))]
+    assert positions[0] > first.next_cursor and len(positions) == 12
+
+    # Once the new characters run out, the skipped ones come back
+    seen, cursor = [], second.next_cursor
+    while True:
+        page = feed.get_page(db, USER_ID, limit=5, cursor=cursor)
+        if not page.items:
+            break
+        seen += [c["id"] for c in page.items]
+        cursor = page.next_cursor
+        if skipped & set(seen):
+            break
+    assert skipped & set(seen)
+    db.close()
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.db.models.scheduled_event import ScheduledEvent
+from core.services import event_scheduler
+from core.services.event import EventService
+from core.services.event_scheduler import EventScheduler
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+DAY = 86400
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}", connect_args={"check_same_thread": False})
+    ScheduledEvent.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def create_event(db, name, target_date):
+    return EventService(db).create_event(
+        user_id=USER_ID, partner_id=CHARACTER_ID, event_type="daily",
+        schedule={"target_date": target_date.isoformat()}, details={"name": name}
+    )
+
+def test_scheduler_activates_events_in_due_order(session_factory):
+    now = datetime.utcnow()
+    db = session_factory()
+    create_event(db, "прогулка", now + timedelta(hours=30))
+    create_event(db, "совместный завтрак", now + timedelta(hours=2))
+    create_event(db, "путешествие", now + timedelta(days=5))
+
+    scheduler = EventScheduler(session_factory, lead_time=DAY, horizon=12 * 3600, background=False)
+    notified = []
+    scheduler.on_activate(notified.extend)
+
+    # Only events activating within the horizon are queued
+    assert scheduler.refill(now) == 2
+    assert [e["details"]["name"] for e in scheduler.run_due(now)] == ["совместный завтрак"]
+    assert 0 < scheduler.next_wakeup(now) <= 6 * 3600
+
+    later = now + timedelta(hours=7)
+    assert [e["details"]["name"] for e in scheduler.run_due(later)] == ["прогулка"]
+    assert [e["details"]["name"] for e in notified] == ["совместный завтрак", "прогулка"]
+    db.close()
+
+def test_chat_reads_only_active_events_of_the_pair(session_factory):
+    now = datetime.utcnow()
+    db = session_factory()
+    create_event(db, "прогулка", now + timedelta(hours=3))
+    service = EventService(db)
+    assert service.get_active_event_context(USER_ID, CHARACTER_ID) == {"has_events": False}
+
+    scheduler = EventScheduler(session_factory, lead_time=DAY, background=False)
+    scheduler.refill()
+    scheduler.run_due()
+    db.expire_all()
+
+    context = service.get_active_event_context(USER_ID, CHARACTER_ID)
+    assert (context["has_events"], context["event_name"]) == (True, "прогулка")
+    assert service.check_due_events("someone-else", CHARACTER_ID) == []
+    db.close()
+
+def test_events_created_in_process_are_pushed_and_activated_once(session_factory, monkeypatch):
+    now = datetime.utcnow()
+    first = EventScheduler(session_factory, lead_time=DAY, background=False)
+    second = EventScheduler(session_factory, lead_time=DAY, background=False)
+    monkeypatch.setattr(event_scheduler, "_scheduler", first)
+
+    db = session_factory()
+    create_event(db, "прогулка", now + timedelta(hours=1))
+    assert first.pending_count() == 1
+    second.refill(now)
+
+    assert len(first.run_due()) == 1
+    # Another process may have queued the same event; it is activated only once
+    assert second.run_due() == []
+    db.close()
+
+class RecordingLoveRating:
+    def __init__(self):
+        self.updates = []
+
+    def update_rating(self, user_id, partner_id, delta, reason=None):
+        self.updates.append((user_id, partner_id, delta))
+
+def test_status_updates_and_completion_find_events_by_string_id(session_factory):
+    db = session_factory()
+    event = create_event(db, "прогулка", datetime.utcnow() + timedelta(hours=3))
+    service = EventService(db)
+    service.love_rating_service = RecordingLoveRating()
+
+    assert service.get(event.event_id).event_id == event.event_id
+    assert service.update_status(event_id=event.event_id, status="active").status == "active"
+
+    completed = service.complete_event(event.event_id)
+    assert completed.status == "completed"
+    assert completed.details["name"] == "прогулка" and completed.details["reward_applied"] is True
+    assert service.love_rating_service.updates == [(USER_ID, CHARACTER_ID, 2)]
+
+    # Completing again applies no second reward
+    service.complete_event(event.event_id)
+    assert len(service.love_rating_service.updates) == 1
+    db.expire_all()
+    assert "completed_at" in service.get(event.event_id).details
+
+    with pytest.raises(ValueError):
+        service.complete_event("00000000-0000-0000-0000-000000000000")
+    db.close()
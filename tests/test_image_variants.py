@@ -0,0 +1,169 @@
+import io
+import json
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+Image = pytest.importorskip("PIL.Image")
+
+from app.services import storage_service
+from app.services import photo_service
+from app.services.character_service import apply_avatar_variant, get_character_by_id, set_character_avatar_url
+from app.services.image_variants import ImageVariantPipeline, all_variant_names, choose_variant, render_variants
+from core.config import settings
+from core.db.models.cache_version import CacheVersion
+from core.db.models.character import Character
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+def jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "IMAGE_VARIANTS_ENABLED", True)
+    engine = create_engine(f"sqlite:///{tmp_path / 'variants.db'}")
+    Character.__table__.create(engine)
+    CacheVersion.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE user_photos (id TEXT PRIMARY KEY, user_id TEXT, url TEXT, "
+                          "filename TEXT, variants TEXT, content_type TEXT, size INTEGER, is_primary BOOLEAN, "
+                          "is_moderated BOOLEAN, \"order\" INTEGER, created_at DATETIME, updated_at DATETIME)"))
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def store(object_name, data):
+    return storage_service.store_file("bucket", object_name, io.BytesIO(data), filename="image.jpg",
+                                      content_type="image/jpeg")
+
+def test_variants_are_rendered_recorded_and_reused(session_factory):
+    stored = store(f"users/{USER_ID}", jpeg(2000, 1000))
+    db = session_factory()
+    for photo_id in ("photo-1", "photo-2"):
+        db.execute(text("INSERT INTO user_photos (id, user_id, url, filename) VALUES (:id, :user_id, :url, :name)"),
+                   {"id": photo_id, "user_id": USER_ID, "url": stored.url, "name": stored.object_name})
+    db.commit()
+
+    pipeline = ImageVariantPipeline(session_factory=session_factory, background=False)
+    variants = pipeline.process("bucket", stored.object_name, "photo")
+
+    card = storage_service.read_file("bucket", variants["card"]["webp"])
+    with Image.open(io.BytesIO(card)) as image:
+        assert (image.format, image.size) == ("WEBP", (640, 320))
+    with Image.open(io.BytesIO(storage_service.read_file("bucket", variants["thumb"]["jpeg"]))) as image:
+        assert (image.format, image.size) == ("JPEG", (160, 80))
+    # Both rows sharing the deduplicated original get the variants
+    recorded = [json.loads(row[0]) for row in db.execute(text("SELECT variants FROM user_photos"))]
+    assert recorded == [variants, variants]
+
+    assert pipeline.process("bucket", stored.object_name, "photo") == variants
+    assert pipeline.get_metrics() == {"processed": 2, "reused": 1, "failed": 0}
+
+    # Small originals are not upscaled
+    small = store("users/small", jpeg(300, 200))
+    db.execute(text("INSERT INTO user_photos (id, user_id, url, filename) VALUES ('photo-3', :user_id, :url, :name)"),
+               {"user_id": USER_ID, "url": small.url, "name": small.object_name})
+    db.commit()
+    small_variants = pipeline.process("bucket", small.object_name, "photo")
+    with Image.open(io.BytesIO(storage_service.read_file("bucket", small_variants["full"]["jpeg"]))) as image:
+        assert image.size == (300, 200)
+    db.close()
+
+def test_transparency_is_kept_in_webp_and_white_in_jpeg():
+    buffer = io.BytesIO()
+    image = Image.new("RGBA", (400, 400), (0, 0, 0, 0))
+    image.paste((200, 120, 40, 255), (100, 100, 300, 300))
+    image.save(buffer, "PNG")
+
+    rendered = render_variants(buffer.getvalue(), 80)
+    with Image.open(io.BytesIO(rendered[("card", "webp")])) as webp:
+        assert webp.mode == "RGBA"
+        assert webp.getpixel((0, 0))[3] == 0
+    with Image.open(io.BytesIO(rendered[("card", "jpeg")])) as jpeg_image:
+        assert all(channel > 245 for channel in jpeg_image.getpixel((0, 0)))
+        assert jpeg_image.getpixel((200, 200))[0] > 150
+
+def test_clients_get_the_best_avatar_variant(session_factory):
+    stored = store(f"characters/{CHARACTER_ID}", jpeg(800, 800))
+    db = session_factory()
+    db.add(Character(id=CHARACTER_ID, name="Алиса", avatar_url=stored.url))
+    db.commit()
+
+    # Until the variants exist the original is served
+    assert apply_avatar_variant(get_character_by_id(db, CHARACTER_ID))["avatar_url"] == stored.url
+
+    pipeline = ImageVariantPipeline(session_factory=session_factory, background=False)
+    variants = pipeline.process("bucket", stored.object_name, "avatar")
+    db.expire_all()
+
+    webp = apply_avatar_variant(get_character_by_id(db, CHARACTER_ID), "thumb", "image/avif,image/webp,*/*")
+    assert webp["avatar_url"].endswith(variants["thumb"]["webp"]) and "avatar_variants" not in webp
+    legacy = apply_avatar_variant(get_character_by_id(db, CHARACTER_ID), accept="image/jpeg,*/*")
+    assert legacy["avatar_url"].endswith(variants["card"]["jpeg"])
+    assert choose_variant(None) is None
+    db.close()
+
+def test_background_pipeline_renders_on_the_process_pool(session_factory):
+    stored = store(f"characters/{CHARACTER_ID}", jpeg(500, 400))
+    db = session_factory()
+    db.add(Character(id=CHARACTER_ID, name="Алиса", avatar_url=stored.url))
+    db.commit()
+
+    pipeline = ImageVariantPipeline(session_factory=session_factory, workers=1)
+    pipeline.start()
+    try:
+        pipeline.submit("bucket", stored.object_name, "avatar")
+    finally:
+        pipeline.stop()
+
+    assert pipeline.get_metrics()["processed"] == 1
+    db.expire_all()
+    assert json.loads(db.query(Character).one().avatar_variants)["full"]["webp"].endswith("/full.webp")
+    db.close()
+
+def stored_names(bucket_dir):
+    return sorted(str(p.relative_to(bucket_dir)) for p in bucket_dir.rglob("*") if p.is_file())
+
+def test_variants_are_deleted_with_the_last_reference(session_factory, tmp_path):
+    pipeline = ImageVariantPipeline(session_factory=session_factory, background=False)
+    stored = store(f"users/{USER_ID}", jpeg(900, 600))
+    db = session_factory()
+    photo_ids = [str(uuid.uuid4()) for _ in range(2)]
+    for photo_id in photo_ids:
+        db.execute(text("INSERT INTO user_photos (id, user_id, url, filename, \"order\") "
+                        "VALUES (:id, :user_id, :url, :name, 0)"),
+                   {"id": photo_id, "user_id": USER_ID, "url": stored.url, "name": stored.object_name})
+    db.commit()
+    pipeline.process("bucket", stored.object_name, "photo")
+    uploads = tmp_path / "uploads"
+    assert len(stored_names(uploads)) == 7
+
+    # The other photo still references the same content
+    assert photo_service.delete_photo(db, USER_ID, photo_ids[0])
+    assert len(stored_names(uploads)) == 7
+    assert photo_service.delete_photo(db, USER_ID, photo_ids[1])
+    assert stored_names(uploads) == []
+
+    # A replaced avatar goes away with its variants
+    old = store(f"characters/{CHARACTER_ID}", jpeg(400, 400))
+    db.add(Character(id=CHARACTER_ID, name="Алиса", avatar_url=old.url))
+    db.commit()
+    pipeline.process("bucket", old.object_name, "avatar")
+    new = store(f"characters/{CHARACTER_ID}", jpeg(500, 300))
+    set_character_avatar_url(db, CHARACTER_ID, new.url, new.object_name)
+    assert stored_names(uploads) == sorted([new.object_name, *all_variant_names(new.object_name)])
+    db.close()
+
+def test_variants_of_an_original_deleted_while_rendering_are_discarded(session_factory, tmp_path):
+    stored = store(f"users/{USER_ID}", jpeg(300, 300))
+    pipeline = ImageVariantPipeline(session_factory=session_factory, background=False)
+    # No row references the original anymore when the variants are recorded
+    assert pipeline.process("bucket", stored.object_name, "photo") is None
+    assert stored_names(tmp_path / "uploads") == [stored.object_name]
@@ -0,0 +1,96 @@
+import json
+
+from tools.analyze_conversations import MemoryExtractionAnalyzer
+from tools.analyze_message_flow import MessageFlowAnalyzer
+from tools.log_analytics import run_analysis
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+
+def conversation(user_message, memory=None):
+    return {
+        "character_id": CHARACTER_ID,
+        "user_message": user_message,
+        "ai_response": {"raw": "{}", "processed": {"text": "Приятно познакомиться", "memory": memory or []}},
+        "conversation_history": [{"role": "system", "content": "..."}, {"role": "user", "content": "Привет"}],
+    }
+
+def write_json(path, record):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+
+def test_reruns_only_read_new_files_and_segment_lines(tmp_path):
+    logs_dir = tmp_path / "conversations"
+    checkpoint = tmp_path / "checkpoint.json"
+    char_dir = logs_dir / CHARACTER_ID
+    write_json(char_dir / "1.json", conversation("Меня зовут Анна"))
+    write_json(char_dir / "2.json", conversation("Мне 25 лет", memory=[{"type": "age"}]))
+    # Request logs in <character>/api are not conversations
+    write_json(char_dir / "api" / "1_api.json", {"request": {"messages": []}, "response": ""})
+    segment = char_dir / "segment.jsonl"
+    segment.write_text(json.dumps(conversation("Я живу в Москве"), ensure_ascii=False) + "\n" + '{"user_message": "незаконч',
+                       encoding="utf-8")
+
+    report = run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=1)
+    assert (report["total_conversations"], report["memory_opportunities"], report["memory_extracted"]) == (3, 3, 1)
+    assert report["missed_by_category"] == {"location": 1, "name": 1}
+    assert report["files_processed"] == 3
+
+    # The unfinished line is completed and another file is added
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('енная строка"}\n')
+    write_json(char_dir / "3.json", conversation("Завтра у нас свидание"))
+    report = run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=1)
+    assert report["files_processed"] == 2 and report["files_total"] == 4
+    assert (report["total_conversations"], report["memory_opportunities"]) == (5, 4)
+    assert len(report["missed_memory_examples"]) == 3
+
+    assert run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=1)["files_processed"] == 0
+
+def test_process_pool_matches_serial_analysis(tmp_path):
+    for i in range(30):
+        char_dir = tmp_path / f"character-{i % 3}"
+        write_json(char_dir / f"{i}.json", conversation("" if i % 10 == 0 else f"Сообщение {i}"))
+        roles = ["system", "user"] if i % 4 else ["system", "assistant"]
+        write_json(char_dir / "api" / f"{i}_api.json", {"request": {"messages": [{"role": r} for r in roles]}})
+
+    serial = run_analysis(MessageFlowAnalyzer(), tmp_path, workers=1)
+    parallel = run_analysis(MessageFlowAnalyzer(), tmp_path, workers=3, chunk_size=7)
+    assert parallel == serial
+    assert (serial["conversations"], serial["requests"]) == (30, 30)
+    assert serial["conversations_by_character"] == {"8c054f20-4a77-4eef-83e6-245d3456bdf1": 30}
+    assert serial["request_role_counts"] == {"assistant": 8, "system": 30, "user": 22}
+    assert serial["history_role_counts"] == {"system": 30, "user": 30}
+    assert (serial["missing_user_message_count"], serial["request_without_user_message_count"]) == (3, 8)
+
+def test_unreadable_files_are_retried_on_the_next_run(tmp_path):
+    logs_dir = tmp_path / "conversations"
+    checkpoint = tmp_path / "checkpoint.json"
+    char_dir = logs_dir / CHARACTER_ID
+    write_json(char_dir / "1.json", conversation("Меня зовут Анна"))
+    broken = char_dir / "2.json"
+    broken.parent.mkdir(parents=True, exist_ok=True)
+    broken.write_text('{"user_message": "Мне 25', encoding="utf-8")
+
+    report = run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=1)
+    assert report["total_conversations"] == 1 and report["files_total"] == 1
+    assert report["unreadable_files"] == 1
+    # Still broken on the next run: counted once per run, not accumulated
+    report = run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=1)
+    assert report["unreadable_files"] == 1
+
+    # Once the file is readable it is analyzed instead of staying skipped
+    write_json(broken, conversation("Мне 25 лет"))
+    report = run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=1)
+    assert report["files_processed"] == 1 and report["files_total"] == 2
+    assert report["total_conversations"] == 2 and report["unreadable_files"] == 0
+
+def test_ai_response_without_processed_data_counts_as_missed(tmp_path):
+    logs_dir = tmp_path / "conversations"
+    for name, ai_response in (("1.json", "Приятно познакомиться"), ("2.json", None)):
+        record = conversation("Меня зовут Анна")
+        record["ai_response"] = ai_response
+        write_json(logs_dir / CHARACTER_ID / name, record)
+
+    report = run_analysis(MemoryExtractionAnalyzer(), logs_dir, workers=1)
+    assert report["unreadable_files"] == 0
+    assert report["memory_opportunities"] == 2 and report["memory_extracted"] == 0
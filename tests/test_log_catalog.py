@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from core.utils import conversation_logger
+from core.utils.log_catalog import KIND_API, LogCatalog
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+OTHER_CHARACTER_ID = "1ff2dc2d-ef33-4927-8737-c91fe997dc8a"
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    logs_dir = tmp_path / "conversations"
+    logs_dir.mkdir()
+    catalog = LogCatalog(logs_dir, tmp_path / "catalog.db")
+    monkeypatch.setattr(conversation_logger, "LOGS_DIR", logs_dir)
+    monkeypatch.setattr(conversation_logger, "log_catalog", catalog)
+    yield catalog
+    catalog.close()
+
+def write_log(logs_dir, character_id, timestamp, user_message):
+    char_dir = logs_dir / character_id
+    char_dir.mkdir(exist_ok=True)
+    path = char_dir / f"2024-01-01_{timestamp}_{character_id}.json"
+    data = {
+        "timestamp": timestamp,
+        "datetime": "2024-01-01T00:00:00",
+        "character_id": character_id,
+        "user_message": user_message,
+        "ai_response": {"raw": "{}", "processed": {"text": "Ответ " * 40, "emotion": "happy"}},
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return path, data
+
+def test_writer_keeps_the_catalog_paged_newest_first(catalog):
+    for timestamp in range(1000, 1005):
+        catalog.record(*write_log(catalog.logs_dir, CHARACTER_ID, timestamp, f"Привет {timestamp}"))
+    catalog.record(*write_log(catalog.logs_dir, OTHER_CHARACTER_ID, 900, "Hi"))
+    # Rewriting a file updates its row without counting it twice
+    catalog.record(*write_log(catalog.logs_dir, CHARACTER_ID, 1004, "Привет снова"))
+    conversation_logger.log_model_request(CHARACTER_ID, [{"role": "user", "content": "Привет"}], "Ответ")
+
+    first = catalog.logs(CHARACTER_ID, limit=3)
+    assert [row["timestamp"] for row in first.rows] == [1004, 1003, 1002]
+    assert first.rows[0]["user_preview"] == "Привет снова"
+    assert first.rows[0]["ai_preview"].endswith("...") and len(first.rows[0]["ai_preview"]) == 103
+    assert first.rows[0]["emotion"] == "happy"
+    second = catalog.logs(CHARACTER_ID, limit=3, cursor=first.next_cursor)
+    assert [row["timestamp"] for row in second.rows] == [1001, 1000] and second.next_cursor is None
+
+    characters = catalog.characters(limit=1)
+    assert [row["character_id"] for row in characters.rows] == [CHARACTER_ID]
+    assert characters.rows[0]["file_count"] == 5
+    assert catalog.characters(limit=1, cursor=characters.next_cursor).rows[0]["character_id"] == OTHER_CHARACTER_ID
+    assert catalog.totals()["total_log_files"] == 6
+    assert catalog.logs(CHARACTER_ID, kind=KIND_API).rows[0]["user_preview"] == "Привет"
+
+    name = first.rows[0]["name"]
+    assert catalog.file_path(catalog.get(CHARACTER_ID, name)).exists()
+    assert catalog.get("..", name) is None
+    with pytest.raises(ValueError):
+        catalog.logs(CHARACTER_ID, cursor="not a cursor")
+
+def test_sync_indexes_existing_files_once(catalog):
+    paths = [write_log(catalog.logs_dir, CHARACTER_ID, timestamp, "Привет")[0] for timestamp in (1000, 1001, 1002)]
+    (catalog.logs_dir / CHARACTER_ID / "notes.txt").write_text("not a log")
+
+    assert [log["timestamp"] for log in conversation_logger.get_recent_conversations(CHARACTER_ID, limit=2)] == [1002, 1001]
+    assert catalog.character(CHARACTER_ID)["file_count"] == 3
+
+    paths[0].unlink()
+    write_log(catalog.logs_dir, OTHER_CHARACTER_ID, 1003, "Hi")
+    assert catalog.sync() == {"added": 1, "removed": 1}
+    assert catalog.totals() == {"character_count": 2, "total_log_files": 3,
+                                "total_size": sum(p.stat().st_size for p in catalog.logs_dir.glob("*/*.json"))}
+
+def test_catalog_sync_endpoint_is_admin_only(catalog, monkeypatch):
+    from types import SimpleNamespace
+
+    from fastapi import HTTPException
+
+    from app.api.v1 import debug
+
+    monkeypatch.setattr(debug, "log_catalog", catalog)
+    write_log(catalog.logs_dir, CHARACTER_ID, 1, "Привет")
+    for user in (None, SimpleNamespace(is_admin=False)):
+        with pytest.raises(HTTPException) as error:
+            debug.sync_logs_catalog(current_user=user)
+        assert error.value.status_code == 403
+    assert debug.sync_logs_catalog(current_user=SimpleNamespace(is_admin=True))["added"] == 1
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.match_service import decode_cursor, get_user_matches_page
+from core.db.models.character import Character
+from core.db.models.message import Message
+from core.db.models.relationship_stats import RelationshipStats
+from core.db.relationship_stats import reset_relationship_stats
+from core.db.unit_of_work import TurnUnitOfWork
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matches.db'}")
+    for model in (Character, Message, RelationshipStats):
+        model.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE matches (id TEXT PRIMARY KEY, user_id TEXT, character_id TEXT, match_strength FLOAT, "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME, "
+            "last_message_at DATETIME DEFAULT CURRENT_TIMESTAMP, last_message_preview VARCHAR(200))"
+        ))
+    session = sessionmaker(bind=engine)()
+    for i, character_id in enumerate([CHARACTER_ID, "character-1", "character-2", "character-3"]):
+        session.add(Character(id=character_id, name=f"Персонаж {i}"))
+        session.execute(text(
+            "INSERT INTO matches (id, user_id, character_id, match_strength, created_at, last_message_at) "
+            "VALUES (:id, :user_id, :character_id, 0.9, :at, :at)"
+        ), {"id": f"match-{i}", "user_id": USER_ID, "character_id": character_id, "at": f"2026-01-0{i + 1} 10:00:00"})
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_turns_move_the_match_to_the_top_with_a_preview(db):
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID, user_id=USER_ID)
+    turn.add_user_message("Привет!")
+    turn.add_character_message("Привет, рада тебя видеть!")
+    assert turn.commit()
+
+    matches, next_cursor = get_user_matches_page(db, USER_ID, limit=3)
+    assert [m["id"] for m in matches] == ["match-0", "match-3", "match-2"]
+    assert matches[0]["last_message_preview"] == "Привет, рада тебя видеть!"
+    assert matches[0]["last_interaction"] is not None
+    # Matches without messages keep their place by match time, with no interaction
+    assert matches[1]["last_interaction"] is None
+    assert decode_cursor(next_cursor)[1] == "match-2"
+
+    rest, last_cursor = get_user_matches_page(db, USER_ID, limit=3, cursor=next_cursor)
+    assert [m["id"] for m in rest] == ["match-1"]
+    assert last_cursor is None
+
+    reset_relationship_stats(db, USER_ID, CHARACTER_ID)
+    db.commit()
+    assert get_user_matches_page(db, USER_ID, limit=1)[0][0]["last_message_preview"] is None
+
+def test_malformed_cursor_is_rejected(db):
+    with pytest.raises(ValueError):
+        get_user_matches_page(db, USER_ID, cursor="not-a-cursor")
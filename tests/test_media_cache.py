@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile
+
+from bots.media_cache import BlobStore, MediaCache
+from bots.storage import BotStorage, MemoryBackend
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+AVATAR_URL = "http://minio:9000/avatars/alice.png"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+class FakeFetcher:
+    """Stands in for the MinIO download and counts requests."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    async def __call__(self, url, owner_id=None):
+        self.calls.append(url)
+        await asyncio.sleep(0.01)
+        data = self.payloads.get(url)
+        return (data, "image/png") if data else (None, None)
+
+class FakeMessage:
+    """Records answer_photo calls and replies like Telegram, optionally rejecting file_ids."""
+
+    def __init__(self, reject_file_ids=False):
+        self.sent = []
+        self.reject_file_ids = reject_file_ids
+
+    async def answer_photo(self, photo, caption=None):
+        if isinstance(photo, str) and self.reject_file_ids:
+            raise TelegramBadRequest(method=None, message="Bad Request: wrong file identifier")
+        self.sent.append(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id=f"file-{len(self.sent)}")])
+
+def make_cache(tmp_path, payloads, max_bytes=1024 * 1024):
+    fetcher = FakeFetcher(payloads)
+    cache = MediaCache(fetcher, BotStorage(MemoryBackend()), BlobStore(str(tmp_path / "media"), max_bytes))
+    return cache, fetcher
+
+def test_blob_store_evicts_least_recently_used(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=250)
+    first = store.put(b"a" * 100)
+    second = store.put(b"b" * 100)
+    assert store.get(first) == b"a" * 100  # first is now the most recently used
+    third = store.put(b"c" * 100)
+
+    assert second not in store
+    assert first in store and third in store
+    assert store.total_bytes == 200
+
+    reopened = BlobStore(str(tmp_path), max_bytes=250)
+    assert len(reopened) == 2 and reopened.total_bytes == 200
+
+def test_downloads_once_and_serves_from_disk(tmp_path):
+    cache, fetcher = make_cache(tmp_path, {AVATAR_URL: PNG})
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get(AVATAR_URL, CHARACTER_ID) for _ in range(3)))
+        assert all(result == (PNG, "image/png") for result in results)
+        assert await cache.get(AVATAR_URL) == (PNG, "image/png")
+        assert await cache.get("http://minio:9000/avatars/missing.png") == (None, None)
+
+    asyncio.run(scenario())
+    assert fetcher.calls == [AVATAR_URL, "http://minio:9000/avatars/missing.png"]
+    assert cache.hits == 1
+
+def test_send_photo_reuses_telegram_file_id(tmp_path):
+    cache, fetcher = make_cache(tmp_path, {AVATAR_URL: PNG})
+    message = FakeMessage()
+
+    async def scenario():
+        assert await cache.send_photo(message, AVATAR_URL, CHARACTER_ID, caption="Алиса")
+        assert await cache.send_photo(message, AVATAR_URL, CHARACTER_ID, caption="Алиса")
+
+    asyncio.run(scenario())
+    assert isinstance(message.sent[0], BufferedInputFile)
+    assert message.sent[1] == "file-1"
+    assert fetcher.calls == [AVATAR_URL]
+    assert cache.get_metrics()["file_id_sends"] == 1
+
+def test_rejected_file_id_falls_back_to_upload(tmp_path):
+    cache, fetcher = make_cache(tmp_path, {AVATAR_URL: PNG})
+
+    async def scenario():
+        await cache.storage.set_media(AVATAR_URL, {"file_id": "stale"})
+        message = FakeMessage(reject_file_ids=True)
+        assert await cache.send_photo(message, AVATAR_URL, CHARACTER_ID)
+        assert isinstance(message.sent[0], BufferedInputFile)
+        assert (await cache.storage.get_media(AVATAR_URL))["file_id"] == "file-1"
+
+    asyncio.run(scenario())
+
+def test_prefetch_skips_cached_urls(tmp_path):
+    other_url = "http://minio:9000/avatars/bella.png"
+    cache, fetcher = make_cache(tmp_path, {AVATAR_URL: PNG, other_url: PNG + b"bella"})
+
+    async def scenario():
+        await cache.get(AVATAR_URL)
+        fetched = await cache.schedule_prefetch([(AVATAR_URL, CHARACTER_ID), (other_url, None)])
+        assert fetched == 1
+
+    asyncio.run(scenario())
+    assert fetcher.calls == [AVATAR_URL, other_url]
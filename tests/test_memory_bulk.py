@@ -0,0 +1,97 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1 import chat
+from app.db.session import get_db
+from app.services.memory_service import memory_content_hash
+from core.db.models.character import Character
+from core.db.models.memory_entry import MemoryEntry
+from core.db.unit_of_work import SYSTEM_USER_ID
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+BOT_API_KEY = "bot-test-key"
+HEADERS = {"X-API-Key": BOT_API_KEY}
+
+@pytest.fixture
+def memory_api(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOT_API_KEY", BOT_API_KEY)
+    engine = create_engine(f"sqlite:///{tmp_path / 'memories.db'}", connect_args={"check_same_thread": False})
+    Character.__table__.create(engine)
+    MemoryEntry.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (user_id TEXT PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO users (user_id) VALUES (:id)"), {"id": USER_ID})
+    session = Session()
+    session.add(Character(id=CHARACTER_ID, name="Алиса", age=23))
+    session.commit()
+    session.close()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), Session
+    engine.dispose()
+
+def post_batch(client, memories, user_id=USER_ID, headers=HEADERS):
+    return client.post(
+        f"/chat/characters/{CHARACTER_ID}/memories/bulk",
+        json={"user_id": user_id, "memories": memories},
+        headers=headers
+    )
+
+def test_content_hash_ignores_case_and_whitespace():
+    assert memory_content_hash("Любит  кофе\n") == memory_content_hash("любит кофе")
+    assert memory_content_hash("любит кофе") != memory_content_hash("любит чай")
+
+def test_bulk_insert_reports_per_item_status(memory_api):
+    client, Session = memory_api
+    response = post_batch(client, [
+        {"memory_type": "personal_info", "category": "name", "content": "Пользователя зовут Анна", "importance": 9},
+        {"memory_type": "preference", "content": "Любит кофе"},
+        {"memory_type": "preference", "content": "любит  кофе"},
+        {"content": "   "},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user_id"] == USER_ID
+    assert (body["created"], body["duplicates"]) == (2, 1)
+    assert [item["status"] for item in body["results"]] == ["created", "created", "duplicate", "invalid"]
+
+    # A retried or overlapping batch only stores what is new
+    again = post_batch(client, [{"content": "Любит кофе"}, {"content": "Работает дизайнером"}]).json()
+    assert [item["status"] for item in again["results"]] == ["duplicate", "created"]
+
+    session = Session()
+    rows = session.execute(text("SELECT content, user_id, memory_type, content_hash FROM memory_entries")).fetchall()
+    session.close()
+    assert len(rows) == 3
+    assert {row[1] for row in rows} == {USER_ID}
+    assert all(row[3] == memory_content_hash(row[0]) for row in rows)
+
+def test_unknown_user_falls_back_to_system_user(memory_api):
+    client, _ = memory_api
+    body = post_batch(client, [{"content": "Любит кофе"}], user_id="c7cb5b5c-e469-586e-8e87-000000000999").json()
+    assert body["user_id"] == SYSTEM_USER_ID
+    assert body["created"] == 1
+
+def test_bulk_requires_authentication_and_known_character(memory_api):
+    client, _ = memory_api
+    assert post_batch(client, [{"content": "Любит кофе"}], headers={}).status_code == 401
+    response = client.post(
+        "/chat/characters/missing/memories/bulk",
+        json={"user_id": USER_ID, "memories": [{"content": "Любит кофе"}]},
+        headers=HEADERS
+    )
+    assert response.status_code == 404
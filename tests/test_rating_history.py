@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from core.db.models.rating_change import RatingChange, RatingDailyRollup
+from core.services.love_rating import LoveRatingService
+from core.services.rating_history import RatingHistoryService
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ratings.db'}")
+    RatingChange.__table__.create(engine)
+    RatingDailyRollup.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_changes_are_rolled_up_per_day(db):
+    history = RatingHistoryService(db)
+    for days_ago, delta in ((0, 3), (0, -1), (3, 5), (20, -4), (45, 10)):
+        history.record_change(USER_ID, CHARACTER_ID, delta, 50, "Сообщение", at=NOW - timedelta(days=days_ago))
+    db.commit()
+
+    assert db.execute(text("SELECT COUNT(*) FROM rating_daily_rollups")).scalar() == 4
+    assert history.get_window_changes(USER_ID, CHARACTER_ID, today=NOW) == {1: 2, 7: 7, 30: 3}
+    assert history.get_window_changes("someone-else", CHARACTER_ID, today=NOW) == {1: 0, 7: 0, 30: 0}
+    assert [c.delta for c in history.get_recent_changes(USER_ID, CHARACTER_ID, limit=2)] == [-1, 3]
+
+def test_update_rating_logs_applied_delta_and_reports_trend(db):
+    service = LoveRatingService(db)
+    rating = SimpleNamespace(score=97)
+    service.get_by_user_and_partner = lambda user_id, partner_id: rating
+
+    service.update_rating(USER_ID, CHARACTER_ID, 5, reason="Подарок")
+    service.update_rating(USER_ID, CHARACTER_ID, 0)
+    assert rating.score == 100
+
+    change = db.query(RatingChange).one()
+    assert (change.delta, change.score, change.reason) == (3, 100, "Подарок")
+
+    analysis = service.analyze_recent_changes(USER_ID, CHARACTER_ID, days=7)
+    assert (analysis["trend"], analysis["change"]) == ("positive", 3)
+    assert analysis["windows"] == {"1d": 3, "7d": 3, "30d": 3}
+    assert analysis["current_rating"] == 100
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+np = pytest.importorskip("numpy")
+
+from app.services.catalog_service import bump_catalog_version
+from app.services.recommendation import CharacterRecommender
+from core.db.models.cache_version import CacheVersion
+from core.db.models.character import Character
+
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+CHARACTERS = {
+    "artist": (["creative", "dreamy"], ["art", "music"]),
+    "painter": (["creative", "dreamy"], ["art", "travel"]),
+    "musician": (["creative", "funny"], ["music", "concerts"]),
+    "athlete": (["energetic"], ["sport", "travel"]),
+    "chef": (["caring"], ["cooking"]),
+    "coder": (["smart"], ["games", "science"]),
+}
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'recommendations.db'}")
+    Character.__table__.create(engine)
+    CacheVersion.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE interactions (id TEXT PRIMARY KEY, user_id TEXT, character_id TEXT, "
+                          "interaction_type TEXT, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE user_profiles (user_id TEXT PRIMARY KEY, interests TEXT)"))
+    session = sessionmaker(bind=engine)()
+    for character_id, (traits, interests) in CHARACTERS.items():
+        session.add(Character(id=character_id, name=character_id.title(),
+                              personality=json.dumps(traits), interests=json.dumps(interests)))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def swipe(db, character_id, interaction_type):
+    db.execute(text("INSERT INTO interactions (id, user_id, character_id, interaction_type) "
+                    "VALUES (:id, :user_id, :character_id, :type)"),
+               {"id": character_id, "user_id": USER_ID, "character_id": character_id, "type": interaction_type})
+    db.commit()
+
+def test_ranking_follows_likes_and_profile_and_excludes_swipes(db):
+    db.execute(text("INSERT INTO user_profiles VALUES (:user_id, :interests)"),
+               {"user_id": USER_ID, "interests": json.dumps(["Cooking"])})
+    swipe(db, "artist", "superlike")
+    swipe(db, "coder", "dislike")
+
+    recommender = CharacterRecommender(check_interval=60, diversity=0.0, seed=1)
+    ranked = recommender.recommend_for_user(db, USER_ID, limit=10)
+    assert set(ranked) == {"painter", "musician", "athlete", "chef"}
+    assert ranked[0] == "painter"
+
+    user = recommender.user_vector(["cooking"])
+    assert recommender.rank(user, limit=1) == ["chef"]
+
+def test_diversity_rerank_avoids_near_duplicates(db):
+    recommender = CharacterRecommender(check_interval=60, diversity=0.0, seed=1)
+    recommender.ensure_fresh(db)
+    user = recommender.user_vector([], [("artist", 1.0)])
+    assert recommender.rank(user, limit=2, exclude={"artist"}) == ["painter", "musician"]
+
+    # Without excluding the liked character its near-duplicate comes second...
+    assert recommender.rank(user, limit=2) == ["artist", "painter"]
+    # ...unless similarity to the cards already picked is penalized
+    recommender.diversity = 0.7
+    ranked = recommender.rank(user, limit=2)
+    assert ranked[0] == "artist" and ranked[1] != "painter"
+
+def test_catalog_changes_are_applied_incrementally(db):
+    recommender = CharacterRecommender(check_interval=0, seed=1)
+    recommender.ensure_fresh(db)
+    assert recommender.get_metrics()["characters"] == 6
+
+    later = datetime.utcnow() + timedelta(minutes=5)
+    db.add(Character(id="dancer", name="Dancer", personality='["energetic"]', interests='["dance"]',
+                     created_at=later))
+    db.query(Character).filter(Character.id == "chef").update({"is_active": False, "updated_at": later})
+    bump_catalog_version(db)
+    db.commit()
+
+    recommender.ensure_fresh(db)
+    metrics = recommender.get_metrics()
+    # Applied without a full rebuild
+    assert (metrics["characters"], metrics["rebuilds"]) == (6, 1)
+    assert recommender.rank(recommender.user_vector(["dance"]), limit=1) == ["dancer"]
+    assert "chef" not in recommender.rank(recommender.user_vector(["cooking"]), limit=10)
+
+def test_discovery_endpoint_requires_a_user(db):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.deps import get_current_user, get_db
+    from app.api.v1 import interactions
+
+    app = FastAPI()
+    app.include_router(interactions.router)
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    assert client.get("/discover/characters").status_code == 401
+
+    # An authentication dependency that yields no user is refused as well
+    app.dependency_overrides[get_current_user] = lambda: None
+    assert client.get("/discover/characters").status_code == 401
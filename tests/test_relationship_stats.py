@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.db.models.character import Character
+from core.db.models.message import Message
+from core.db.models.relationship_stats import RelationshipStats
+from core.db.relationship_stats import get_relationship_stats, rebuild_relationship_stats, record_messages
+from core.db.unit_of_work import TurnUnitOfWork
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+OTHER_USER_ID = "c7cb5b5c-e469-586e-8e87-000000000999"
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'relationships.db'}", connect_args={"check_same_thread": False})
+    for model in (Character, Message, RelationshipStats):
+        model.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def gift(user_id=USER_ID):
+    return Message(sender_id=user_id, sender_type="user", recipient_id=CHARACTER_ID,
+                   recipient_type="character", content="Отправил подарок: Духи", is_gift=True)
+
+def test_counters_follow_each_committed_turn(session_factory):
+    db = session_factory()
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID, user_id=USER_ID)
+    turn.add_user_message("Привет!")
+    turn.add_character_message("Привет, рада тебя видеть!")
+    turn.add_character_message("Как дела?")
+    assert turn.commit()
+
+    db.add(gift())
+    record_messages(db, [gift()])
+    db.commit()
+
+    stats = get_relationship_stats(db, USER_ID, CHARACTER_ID)
+    assert (stats["message_count"], stats["gift_count"]) == (4, 1)
+    assert stats["last_interaction_at"] is not None
+    assert get_relationship_stats(db, OTHER_USER_ID, CHARACTER_ID)["message_count"] == 0
+    db.close()
+
+def test_rebuild_recomputes_counters_from_history(session_factory):
+    db = session_factory()
+    db.add_all([
+        Message(sender_id=USER_ID, sender_type="user", recipient_id=CHARACTER_ID,
+                recipient_type="character", content="Привет!"),
+        Message(sender_id=CHARACTER_ID, sender_type="character", recipient_id=USER_ID,
+                recipient_type="user", content="Привет!"),
+        Message(sender_id=CHARACTER_ID, sender_type="character", recipient_id=OTHER_USER_ID,
+                recipient_type="user", content="Здравствуй!"),
+        gift(),
+    ])
+    db.commit()
+    # Written without record_messages, so nothing is counted yet
+    assert get_relationship_stats(db, USER_ID, CHARACTER_ID)["message_count"] == 0
+
+    assert rebuild_relationship_stats(db) == 2
+    stats = get_relationship_stats(db, USER_ID, CHARACTER_ID)
+    assert (stats["message_count"], stats["gift_count"]) == (3, 1)
+    assert get_relationship_stats(db, OTHER_USER_ID, CHARACTER_ID)["message_count"] == 1
+    db.close()
+
+def test_relationship_endpoint_reads_pair_counters(session_factory, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.v1 import chat
+    from app.auth.jwt import get_current_user, get_current_user_optional
+    from app.db.session import get_db
+    from app.services.character_repository import CharacterRepository
+
+    db = session_factory()
+    db.add(Character(id=CHARACTER_ID, name="Алиса", age=23))
+    db.add_all([gift(), gift(OTHER_USER_ID)])
+    record_messages(db, [gift(), gift(OTHER_USER_ID)])
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    user = SimpleNamespace(user_id=USER_ID)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_current_user_optional] = lambda: user
+    client = TestClient(app)
+    monkeypatch.setattr(chat, "character_repository", CharacterRepository(check_interval=60))
+
+    body = client.get(f"/chat/characters/{CHARACTER_ID}/relationship").json()
+    # One message and one gift of this user only: 50 + 1 * 2 + 1 * 10
+    assert body["rating"]["value"] == 62
+    assert body["emotions"]["romance"]["percentage"] == 10
+
+    cleared = client.post(f"/chat/characters/{CHARACTER_ID}/clear-history").json()
+    assert cleared["deleted_messages"] == 1
+    assert client.get(f"/chat/characters/{CHARACTER_ID}/relationship").json()["rating"]["value"] == 50
+
+    session = session_factory()
+    assert get_relationship_stats(session, OTHER_USER_ID, CHARACTER_ID)["gift_count"] == 1
+    session.close()
@@ -0,0 +1,83 @@
+import hashlib
+import io
+
+import pytest
+from minio.error import S3Error
+
+from app.services import storage_service
+from core.config import settings
+
+IMAGE = b"\x89PNG" + bytes(range(256)) * 40
+
+class RecordingMinio:
+    """In-memory stand-in for the Minio client recording the calls made"""
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def bucket_exists(self, bucket):
+        self.calls.append("bucket_exists")
+        return True
+
+    def stat_object(self, bucket, object_name):
+        self.calls.append("stat_object")
+        if (bucket, object_name) not in self.objects:
+            raise S3Error(None, "NoSuchKey", "missing", object_name, "req", "host")
+
+    def put_object(self, bucket_name, object_name, data, length, content_type, part_size, metadata=None):
+        self.calls.append("put_object")
+        self.objects[(bucket_name, object_name)] = (data.read(), length, part_size)
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_CHUNK_SIZE", 1000)
+    monkeypatch.setattr(storage_service, "_known_buckets", set())
+
+def test_local_store_deduplicates_identical_content(tmp_path, monkeypatch, small_chunks):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+    first = storage_service.store_file("bucket", "characters/alice", io.BytesIO(IMAGE), filename="Avatar.PNG")
+    again = storage_service.store_file("bucket", "characters/alice", io.BytesIO(IMAGE), filename="copy.png")
+    other = storage_service.store_file("bucket", "characters/alice", io.BytesIO(IMAGE[::-1]), filename="b.png")
+
+    sha256 = hashlib.sha256(IMAGE).hexdigest()
+    assert (first.object_name, first.size, first.sha256) == (f"characters/alice/{sha256}.png", len(IMAGE), sha256)
+    assert (again.object_name, again.deduplicated, first.deduplicated) == (first.object_name, True, False)
+    assert other.object_name != first.object_name
+    assert (tmp_path / first.object_name).read_bytes() == IMAGE
+    # Only the two distinct files remain, no temporary copies
+    assert sorted(p.name for p in (tmp_path / "characters" / "alice").iterdir()) == sorted(
+        [f"{sha256}.png", f"{other.sha256}.png"])
+    assert not list(tmp_path.glob(".upload-*"))
+
+def test_minio_uploads_new_content_once_and_caches_the_bucket(monkeypatch, small_chunks):
+    client = RecordingMinio()
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "minio")
+    monkeypatch.setattr(storage_service, "_minio_client", client)
+
+    first = storage_service.store_file("bucket", "users/u1", io.BytesIO(IMAGE), filename="a.jpg",
+                                       content_type="image/jpeg")
+    again = storage_service.store_file("bucket", "users/u1", io.BytesIO(IMAGE), filename="a.jpg")
+    storage_service.upload_file("bucket", "exports/report.bin", io.BytesIO(b"report"))
+
+    assert again.deduplicated and again.object_name == first.object_name
+    assert client.calls == ["stat_object", "bucket_exists", "put_object", "stat_object", "put_object"]
+    data, length, part_size = client.objects[("bucket", first.object_name)]
+    assert (data, length, part_size) == (IMAGE, len(IMAGE), settings.STORAGE_PART_SIZE)
+    assert first.url.endswith(f"/bucket/{first.object_name}")
+
+def test_minio_store_uploads_again_after_a_delete_elsewhere(monkeypatch, small_chunks):
+    client = RecordingMinio()
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "minio")
+    monkeypatch.setattr(storage_service, "_minio_client", client)
+
+    first = storage_service.store_file("bucket", "users/u1", io.BytesIO(IMAGE), filename="a.jpg")
+    # Deleted by another worker: this process must not trust its earlier upload
+    del client.objects[("bucket", first.object_name)]
+    again = storage_service.store_file("bucket", "users/u1", io.BytesIO(IMAGE), filename="a.jpg")
+
+    assert not again.deduplicated
+    assert client.calls.count("put_object") == 2
+    assert ("bucket", first.object_name) in client.objects
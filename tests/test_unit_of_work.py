@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from core.db.models.message import Message
+from core.db.models.memory_entry import MemoryEntry
+from core.db.unit_of_work import TurnUnitOfWork, SYSTEM_USER_ID
+
+CHARACTER_ID = "8c054f20-4a77-4eef-83e6-245d3456bdf1"
+USER_ID = "c7cb5b5c-e469-586e-8e87-000012345678"
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'uow.db'}")
+    Message.__table__.create(engine)
+    MemoryEntry.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def count_commits(session):
+    commits = []
+    event.listen(session, "after_commit", lambda s: commits.append(1))
+    return commits
+
+def test_turn_commits_once(db):
+    commits = count_commits(db)
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID, user_id=USER_ID)
+
+    turn.add_user_message("Меня зовут Анна")
+    turn.add_memories([{"type": "personal_info", "category": "name", "content": "Имя пользователя: Анна"}])
+    turn.add_character_message("Приятно познакомиться, Анна!", "happy")
+    turn.add_character_message("Как прошёл день?")
+
+    # Staged writes are not visible before commit
+    assert db.query(Message).count() == 0
+    assert turn.commit()
+
+    assert len(commits) == 1
+    assert db.query(Message).count() == 3
+    assert db.query(MemoryEntry).one().user_id == USER_ID
+
+def test_memories_are_deduplicated(db):
+    db.add(MemoryEntry(character_id=CHARACTER_ID, user_id=USER_ID, content="Любит кофе"))
+    db.commit()
+
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID)
+    turn.add_memories([
+        {"content": "Любит кофе"},
+        {"content": "Живёт в Алматы"},
+        {"content": "Живёт в Алматы"},
+    ])
+    assert turn.commit()
+
+    contents = sorted(m.content for m in db.query(MemoryEntry).all())
+    assert contents == ["Живёт в Алматы", "Любит кофе"]
+    assert db.query(MemoryEntry).filter_by(content="Живёт в Алматы").one().user_id == SYSTEM_USER_ID
+
+def test_messages_require_user(db):
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID)
+    assert turn.add_user_message("hello") is None
+    assert turn.add_character_message("hi") is None
+    turn.record_turn("hello", "hi")
+    assert turn.turns == []
+
+def test_after_commit_hooks(db):
+    calls = []
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID, user_id=USER_ID)
+    turn.record_turn("hello", "hi", {"emotion": "happy"})
+    turn.after_commit(lambda uow: calls.append(list(uow.turns)))
+
+    assert turn.commit()
+    assert calls == [[{"user_message": "hello", "assistant_message": "hi", "metadata": {"emotion": "happy"}}]]
+
+    # Committing again is a no-op
+    assert turn.commit()
+    assert len(calls) == 1
+
+def test_failed_commit_skips_hooks(db):
+    calls = []
+    turn = TurnUnitOfWork(db, character_id=CHARACTER_ID, user_id=USER_ID)
+    turn.add_user_message(None)  # content is NOT NULL
+    turn.after_commit(lambda uow: calls.append(uow))
+
+    assert not turn.commit()
+    assert calls == []
+    assert db.query(Message).count() == 0
@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import pytest
+from minio import Minio
+from minio.commonconfig import ENABLED, Filter
+from minio.error import S3Error
+from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+
+from app.services import storage_service
+from app.services.upload_intents import UploadIntentError, complete_upload, create_upload_intent
+from core.config import settings
+
+ALLOWED = ["image/jpeg", "image/png"]
+MAX_SIZE = 1024
+
+class UploadedMinio:
+    """Minio stand-in holding the (size, content type) of objects uploaded by clients"""
+
+    def __init__(self):
+        self.objects = {}
+        self.removed = []
+        self.lifecycle = None
+
+    def bucket_exists(self, bucket):
+        return True
+
+    def stat_object(self, bucket, object_name):
+        if (bucket, object_name) not in self.objects:
+            raise S3Error(None, "NoSuchKey", "missing", object_name, "req", "host")
+        size, content_type = self.objects[(bucket, object_name)]
+        return SimpleNamespace(size=size, content_type=content_type)
+
+    def copy_object(self, bucket, object_name, source):
+        self.objects[(bucket, object_name)] = self.objects[(source.bucket_name, source.object_name)]
+
+    def get_bucket_lifecycle(self, bucket):
+        return self.lifecycle
+
+    def set_bucket_lifecycle(self, bucket, config):
+        self.lifecycle = config
+
+    def remove_object(self, bucket, object_name):
+        self.removed.append(object_name)
+        self.objects.pop((bucket, object_name), None)
+
+@pytest.fixture
+def client(monkeypatch):
+    client = UploadedMinio()
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "minio")
+    monkeypatch.setattr(settings, "MINIO_PUBLIC_BUCKETS", False)
+    monkeypatch.setattr(storage_service, "_minio_client", client)
+    monkeypatch.setattr(storage_service, "_known_buckets", set())
+    monkeypatch.setattr(storage_service, "_expiring_prefixes", set())
+    # Presigning is local computation, a real client needs no server
+    monkeypatch.setattr(storage_service, "_presign_client", Minio(
+        "media.example.com", access_key="key", secret_key="secret", secure=True, region="us-east-1"))
+    return client
+
+def test_completed_upload_is_checked_against_the_intent(client):
+    intent = create_upload_intent("bucket", "user:u1", "users/u1", "image/png", 500, ALLOWED, MAX_SIZE,
+                                  filename="Me.PNG")
+    assert intent["object_name"].startswith("upload-intents/users/u1/") and intent["object_name"].endswith(".png")
+    assert intent["upload_url"].startswith(f"https://media.example.com/bucket/{intent['object_name']}?")
+    assert "X-Amz-Signature=" in intent["upload_url"]
+
+    with pytest.raises(UploadIntentError):
+        complete_upload(intent["upload_token"], "user:u1")  # nothing uploaded yet
+
+    client.objects[("bucket", intent["object_name"])] = (500, "image/png")
+    with pytest.raises(UploadIntentError):
+        complete_upload(intent["upload_token"], "user:u2")
+    upload = complete_upload(intent["upload_token"], "user:u1")
+    final_name = intent["object_name"][len("upload-intents/"):]
+    assert (upload.object_name, upload.size, upload.content_type) == (final_name, 500, "image/png")
+    # Moved out of the expiring intent prefix
+    assert client.removed == [intent["object_name"]]
+    assert ("bucket", final_name) in client.objects
+    # Completing again (e.g. a retried request) returns the same upload
+    assert complete_upload(intent["upload_token"], "user:u1") == upload
+
+    # Signed read URLs for private buckets carry the cache headers
+    read_url = storage_service.read_url("bucket", upload.object_name)
+    assert "X-Amz-Signature=" in read_url and "response-cache-control=" in read_url
+    # ...and are signed at the start of the (daily) signing window, so they stay cacheable
+    assert "T000000Z" in read_url.split("X-Amz-Date=")[1].split("&")[0]
+    assert storage_service.read_url("bucket", upload.object_name) == read_url
+
+def test_uploads_violating_the_intent_are_rejected_and_deleted(client):
+    with pytest.raises(UploadIntentError):
+        create_upload_intent("bucket", "user:u1", "users/u1", "image/gif", 500, ALLOWED, MAX_SIZE)
+    with pytest.raises(UploadIntentError):
+        create_upload_intent("bucket", "user:u1", "users/u1", "image/png", MAX_SIZE + 1, ALLOWED, MAX_SIZE)
+
+    intent = create_upload_intent("bucket", "user:u1", "users/u1", "image/png", 500, ALLOWED, MAX_SIZE)
+    client.objects[("bucket", intent["object_name"])] = (MAX_SIZE * 10, "image/png")
+    with pytest.raises(UploadIntentError):
+        complete_upload(intent["upload_token"], "user:u1")
+    assert client.removed == [intent["object_name"]]
+
+def test_upload_of_another_size_than_declared_is_rejected(client):
+    intent = create_upload_intent("bucket", "user:u1", "users/u1", "image/png", 500, ALLOWED, MAX_SIZE)
+    # Within max_size, but not the size the intent was validated for
+    client.objects[("bucket", intent["object_name"])] = (MAX_SIZE, "image/png")
+    with pytest.raises(UploadIntentError):
+        complete_upload(intent["upload_token"], "user:u1")
+    assert client.removed == [intent["object_name"]]
+
+def test_uncompleted_uploads_expire_by_a_lifecycle_rule(client):
+    client.lifecycle = LifecycleConfig([Rule(ENABLED, rule_filter=Filter(prefix="tmp/"), rule_id="tmp",
+                                             expiration=Expiration(days=7))])
+    create_upload_intent("bucket", "user:u1", "users/u1", "image/png", 500, ALLOWED, MAX_SIZE)
+    create_upload_intent("bucket", "user:u1", "users/u1", "image/png", 500, ALLOWED, MAX_SIZE)
+
+    rules = {rule.rule_id: rule for rule in client.lifecycle.rules}
+    assert set(rules) == {"tmp", "expire-upload-intents"}
+    assert rules["expire-upload-intents"].rule_filter.prefix == "upload-intents/"
+    assert rules["expire-upload-intents"].expiration.days == settings.UPLOAD_INTENT_EXPIRY_DAYS
+
+def test_completed_avatar_gets_its_variants_rendered(client, monkeypatch):
+    from app.api.v1.endpoints import characters
+    from app.schemas.upload import UploadCompleteRequest
+
+    calls = []
+    monkeypatch.setattr(characters, "set_character_avatar_url",
+                        lambda db, character_id, url, object_name=None: calls.append(object_name) or url)
+    intent = create_upload_intent("bucket", "character:c1", "characters/c1", "image/png", 500, ALLOWED, MAX_SIZE)
+    client.objects[("bucket", intent["object_name"])] = (500, "image/png")
+
+    characters.complete_avatar_upload(UploadCompleteRequest(upload_token=intent["upload_token"]),
+                                      character_id="c1", db=None, current_user=None)
+    # The object name is what set_character_avatar_url submits to the variant pipeline
+    assert calls == [intent["object_name"][len("upload-intents/"):]]
@@ -3,7 +3,10 @@
 Помогает выявить проблемы, когда сообщения пользователей не передаются в запросах.
 
 Использование:
-    python -m tools.analyze_api_requests [--directory=logs/requests]
+    python -m tools.analyze_api_requests [--directory=logs/requests] [--workers=N] [--full]
+
+Анализируются все запросы (движок tools.log_analytics: пул процессов,
+повторный запуск читает только новые файлы).
 """
 
 import argparse
@@ -11,55 +14,65 @@ import json
 import logging
 import os
 from pathlib import Path
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
+
+from tools.log_analytics import AnalysisState, LogAnalyzer, run_analysis
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+CHECKPOINT_FILE = Path("api_requests_analysis.checkpoint.json")
+
+def request_messages(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Сообщения запроса: тело запроса OpenRouter или журнал log_model_request"""
+    messages = data.get("messages")
+    if messages is None:
+        messages = (data.get("request") or {}).get("messages")
+    return [msg for msg in messages or [] if isinstance(msg, dict)]
+
+def summarize_request(file_path: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сводка одного запроса API"""
+    # Подсчет ролей в сообщениях
+    role_counts = {}
+    for msg in messages:
+        role = msg.get("role", "unknown")
+        if role not in role_counts:
+            role_counts[role] = 0
+        role_counts[role] += 1
+    
+    # Поиск последнего сообщения пользователя
+    last_user_message = None
+    for msg in reversed(messages):
+        if msg.get("role") == "user":
+            last_user_message = msg.get("content", "")
+            break
+    
+    # Анализ системных сообщений
+    system_messages = [msg.get("content", "") for msg in messages if msg.get("role") == "system"]
+    system_messages_preview = []
+    for i, msg in enumerate(system_messages):
+        preview = msg[:100] + "..." if len(msg) > 100 else msg
+        system_messages_preview.append(f"System message {i+1}: {preview}")
+    
+    return {
+        "file": file_path,
+        "timestamp": Path(file_path).stem.replace("openrouter_request_", ""),
+        "message_count": len(messages),
+        "role_counts": role_counts,
+        "has_user_messages": last_user_message is not None,
+        "last_user_message": last_user_message,
+        "system_messages_count": len(system_messages),
+        "system_messages_preview": system_messages_preview
+    }
+
 def analyze_request_file(file_path: Path) -> Dict[str, Any]:
     """Анализ одного файла с запросом API"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        messages = data.get("messages", [])
-        
-        # Подсчет ролей в сообщениях
-        role_counts = {}
-        for msg in messages:
-            role = msg.get("role", "unknown")
-            if role not in role_counts:
-                role_counts[role] = 0
-            role_counts[role] += 1
-        
-        # Проверка наличия сообщений пользователя
-        has_user_messages = any(msg.get("role") == "user" for msg in messages)
-        
-        # Поиск последнего сообщения пользователя
-        last_user_message = None
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                last_user_message = msg.get("content", "")
-                break
-        
-        # Анализ системных сообщений
-        system_messages = [msg.get("content", "") for msg in messages if msg.get("role") == "system"]
-        system_messages_preview = []
-        for i, msg in enumerate(system_messages):
-            preview = msg[:100] + "..." if len(msg) > 100 else msg
-            system_messages_preview.append(f"System message {i+1}: {preview}")
-        
-        return {
-            "file": str(file_path),
-            "timestamp": file_path.stem.replace("openrouter_request_", ""),
-            "message_count": len(messages),
-            "role_counts": role_counts,
-            "has_user_messages": has_user_messages,
-            "last_user_message": last_user_message,
-            "system_messages_count": len(system_messages),
-            "system_messages_preview": system_messages_preview
-        }
+        return summarize_request(str(file_path), request_messages(data))
     except Exception as e:
         logger.error(f"Error analyzing file {file_path}: {e}")
         return {
@@ -67,47 +80,69 @@ def analyze_request_file(file_path: Path) -> Dict[str, Any]:
             "error": str(e)
         }
 
-def analyze_requests_directory(directory: Path) -> Dict[str, Any]:
+class ApiRequestAnalyzer(LogAnalyzer):
+    """Запросы к API без сообщений пользователя и распределение ролей"""
+    
+    name = "api_requests"
+    # logs/requests и журналы запросов персонажей (<character_id>/api) в logs/conversations
+    patterns = ("*.json", "*.jsonl", "*/api/*.json", "*/api/*.jsonl")
+    max_examples = 20
+    
+    def analyze(self, record: Dict[str, Any], path: str, state: AnalysisState) -> None:
+        messages = request_messages(record)
+        state.count("requests")
+        state.count("messages", len(messages))
+        for msg in messages:
+            state.count(f"role:{msg.get('role', 'unknown')}")
+        
+        if messages and messages[-1].get("role") != "user":
+            state.count("last_message_not_user")
+        # Проблемные запросы: без сообщений пользователя
+        if not any(msg.get("role") == "user" for msg in messages):
+            state.count("problematic")
+            state.example("problematic_requests", summarize_request(path, messages))
+    
+    def report(self, state: AnalysisState) -> Dict[str, Any]:
+        return {
+            "total_requests": state.counts["requests"],
+            "total_messages": state.counts["messages"],
+            "role_counts": state.prefixed("role:"),
+            "last_message_not_user_count": state.counts["last_message_not_user"],
+            "problematic_requests_count": state.counts["problematic"],
+            "unreadable_files": state.counts["errors"],
+            "problematic_requests": state.examples.get("problematic_requests", [])
+        }
+
+def analyze_requests_directory(
+    directory: Path,
+    checkpoint: Optional[Path] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
     """Анализ всей директории с запросами API"""
     if not directory.exists():
         logger.error(f"Directory {directory} does not exist")
         return {"error": f"Directory {directory} does not exist"}
     
-    # Получение всех JSON файлов с запросами
-    request_files = list(directory.glob("*.json"))
-    request_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-    
-    total_files = len(request_files)
-    logger.info(f"Found {total_files} request files in {directory}")
-    
-    # Анализ первых 20 файлов (самых новых)
-    analysis_results = []
-    files_to_analyze = request_files[:20]
-    
-    for file_path in files_to_analyze:
-        result = analyze_request_file(file_path)
-        analysis_results.append(result)
-    
-    # Подсчет проблемных запросов (без сообщений пользователя)
-    problematic_requests = [r for r in analysis_results if not r.get("has_user_messages", True)]
-    
-    return {
-        "total_files": total_files,
-        "analyzed_files": len(files_to_analyze),
-        "problematic_requests_count": len(problematic_requests),
-        "problematic_requests": problematic_requests,
-        "recent_requests": analysis_results
-    }
+    results = run_analysis(ApiRequestAnalyzer(), directory, checkpoint=checkpoint, workers=workers)
+    results["total_files"] = results["files_total"]
+    results["analyzed_files"] = results["files_processed"]
+    return results
 
 def main():
     """Основная функция для запуска анализа"""
     parser = argparse.ArgumentParser(description="Analyze OpenRouter API requests")
     parser.add_argument("--directory", type=str, default="logs/requests", help="Directory with request log files")
+    parser.add_argument("--checkpoint", type=str, default=str(CHECKPOINT_FILE), help="Checkpoint of previous runs")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and analyze all requests")
+    parser.add_argument("--workers", type=int, default=None, help="Analysis processes (default: CPU count)")
     args = parser.parse_args()
     
     logger.info(f"Analyzing API requests in directory: {args.directory}")
     
-    results = analyze_requests_directory(Path(args.directory))
+    checkpoint = Path(args.checkpoint)
+    if args.full and checkpoint.exists():
+        checkpoint.unlink()
+    results = analyze_requests_directory(Path(args.directory), checkpoint=checkpoint, workers=args.workers)
     
     if "error" in results:
         logger.error(results["error"])
@@ -115,12 +150,13 @@ def main():
     
     # Вывод общей статистики
     logger.info(f"Total request files: {results['total_files']}")
-    logger.info(f"Analyzed files: {results['analyzed_files']}")
+    logger.info(f"Analyzed files (new since the last run): {results['analyzed_files']}")
+    logger.info(f"Requests: {results['total_requests']}, role counts: {results['role_counts']}")
     logger.info(f"Problematic requests (no user messages): {results['problematic_requests_count']}")
     
     # Вывод информации о проблемных запросах
     if results['problematic_requests']:
-        logger.info("\nDetails of problematic requests:")
+        logger.info("\nDetails of problematic requests (first examples):")
         for req in results['problematic_requests']:
             logger.info(f"\nFile: {req['file']}")
             logger.info(f"Timestamp: {req['timestamp']}")
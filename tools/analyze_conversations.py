@@ -2,42 +2,37 @@
 Утилита для анализа сохраненных диалогов и проверки извлечения памяти AI
 
 Использование:
-    python -m tools.analyze_conversations
+    python -m tools.analyze_conversations [--directory=logs/conversations] [--workers=N] [--full]
 
 Эта утилита:
-1. Сканирует директорию с журналами разговоров
+1. Сканирует директорию с журналами разговоров (движок tools.log_analytics:
+   пул процессов, повторный запуск читает только новые журналы)
 2. Анализирует, где AI должна была выделить память, но этого не сделала
 3. Создает отчет для улучшения работы извлечения памяти
 """
 
+import argparse
 import json
 import logging
 import os
 import re
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Set
+from typing import List, Dict, Any, Optional, Tuple, Set
 import sys
 
+from tools.log_analytics import AnalysisState, LogAnalyzer, run_analysis
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 LOGS_DIR = Path("logs/conversations")
+CHECKPOINT_FILE = Path("memory_analysis.checkpoint.json")
 
-def should_extract_memory(message: str) -> Tuple[bool, Set[str]]:
-    """
-    Проверяет, содержит ли сообщение пользователя информацию, которая должна быть добавлена в память
-    
-    Args:
-        message: Сообщение пользователя
-        
-    Returns:
-        (bool, set): Флаг наличия важной информации и набор найденных категорий
-    """
-    found_categories = set()
-    
-    # Шаблоны для разных типов информации
-    patterns = {
+# Шаблоны для разных типов информации (компилируются один раз, а не на каждое сообщение)
+MEMORY_PATTERNS = {
+    category: [re.compile(pattern, re.IGNORECASE) for pattern in category_patterns]
+    for category, category_patterns in {
         'name': [r'меня зовут\s+([А-Я][а-я]+|[A-Z][a-z]+)', 
                 r'моё имя\s+([А-Я][а-я]+|[A-Z][a-z]+)'],
         'age': [r'мне (\d{1,2})\s+(?:год|года|лет)',
@@ -52,96 +47,132 @@ def should_extract_memory(message: str) -> Tuple[bool, Set[str]]:
                 r'я люблю\s+(\w+)'],
         'meeting': [r'(?:завтра|сегодня|скоро)\s+(?:у нас|встретимся|будем|пойдем)',
                   r'(?:свидание|встреча|увидимся)'],
-    }
+    }.items()
+}
+
+def should_extract_memory(message: str) -> Tuple[bool, Set[str]]:
+    """
+    Проверяет, содержит ли сообщение пользователя информацию, которая должна быть добавлена в память
+    
+    Args:
+        message: Сообщение пользователя
+        
+    Returns:
+        (bool, set): Флаг наличия важной информации и набор найденных категорий
+    """
+    found_categories = set()
     
     # Проверяем наличие каждой категории информации
-    for category, category_patterns in patterns.items():
+    for category, category_patterns in MEMORY_PATTERNS.items():
         for pattern in category_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
+            if pattern.search(message):
                 found_categories.add(category)
                 break
     
     # Если нашли хотя бы одну категорию, должны сохранить в память
     return len(found_categories) > 0, found_categories
 
-def analyze_conversation_logs() -> Dict[str, Any]:
+class MemoryExtractionAnalyzer(LogAnalyzer):
+    """Случаи, когда AI должна была сохранить память, но не сделала этого"""
+    
+    name = "memory_extraction"
+    # Журналы разговоров персонажей; запросы к API в <character_id>/api не учитываются
+    patterns = ("*/*.json", "*/*.jsonl")
+    
+    def analyze(self, record: Dict[str, Any], path: str, state: AnalysisState) -> None:
+        state.count("total_conversations")
+        
+        # Получаем сообщение пользователя
+        user_message = record.get("user_message", "")
+        if not user_message:
+            return
+        
+        # Проверяем, содержит ли сообщение информацию для памяти
+        should_memorize, categories = should_extract_memory(user_message)
+        if not should_memorize:
+            return
+        
+        state.count("memory_opportunities")
+        for category in categories:
+            state.count(f"category:{category}")
+        
+        # Проверяем, была ли память извлечена
+        ai_response = record.get("ai_response")
+        # В старых журналах ai_response - строка ответа или null
+        ai_response = ai_response.get("processed", {}) if isinstance(ai_response, dict) else ai_response
+        memory_data = ai_response.get("memory", []) if isinstance(ai_response, dict) else []
+        
+        if memory_data:
+            state.count("memory_extracted")
+        else:
+            for category in categories:
+                state.count(f"missed:{category}")
+            # Сохраняем для анализа
+            state.example("missed_memory", {
+                "file": path,
+                "user_message": user_message,
+                "ai_response": ai_response.get("text", "") if isinstance(ai_response, dict) else str(ai_response or ""),
+                "categories": sorted(categories)
+            })
+    
+    def report(self, state: AnalysisState) -> Dict[str, Any]:
+        memory_opportunities = state.counts["memory_opportunities"]
+        memory_extracted = state.counts["memory_extracted"]
+        return {
+            "total_conversations": state.counts["total_conversations"],
+            "memory_opportunities": memory_opportunities,
+            "memory_extracted": memory_extracted,
+            "missed_memory_count": memory_opportunities - memory_extracted,
+            "extraction_rate": f"{(memory_extracted / memory_opportunities * 100) if memory_opportunities > 0 else 0:.2f}%",
+            "opportunities_by_category": state.prefixed("category:"),
+            "missed_by_category": state.prefixed("missed:"),
+            "unreadable_files": state.counts["errors"],
+            "missed_memory_examples": state.examples.get("missed_memory", [])  # Только первые 10 примеров
+        }
+
+def analyze_conversation_logs(
+    logs_dir: Path = LOGS_DIR,
+    checkpoint: Optional[Path] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
     """
     Анализирует все журналы разговоров и находит случаи, 
     когда AI должна была сохранить память, но не сделала этого
     
+    Args:
+        logs_dir: Директория с журналами разговоров
+        checkpoint: Контрольная точка предыдущих запусков (без нее анализируется все)
+        workers: Количество процессов анализа
+    
     Returns:
         Словарь со статистикой и найденными проблемами
     """
-    if not LOGS_DIR.exists():
-        logger.error(f"Директория с журналами не найдена: {LOGS_DIR}")
+    if not logs_dir.exists():
+        logger.error(f"Директория с журналами не найдена: {logs_dir}")
         return {"error": "Logs directory not found"}
     
-    # Обходим все файлы во всех директориях персонажей
-    total_conversations = 0
-    memory_opportunities = 0
-    memory_extracted = 0
-    missed_memory = []
-    
-    for char_dir in LOGS_DIR.iterdir():
-        if not char_dir.is_dir():
-            continue
-            
-        character_id = char_dir.name
-        
-        for log_file in char_dir.glob("*.json"):
-            total_conversations += 1
-            
-            try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    log_data = json.load(f)
-                
-                # Получаем сообщение пользователя
-                user_message = log_data.get("user_message", "")
-                if not user_message:
-                    continue
-                
-                # Проверяем, содержит ли сообщение информацию для памяти
-                should_memorize, categories = should_extract_memory(user_message)
-                
-                if should_memorize:
-                    memory_opportunities += 1
-                    
-                    # Проверяем, была ли память извлечена
-                    ai_response = log_data.get("ai_response", {}).get("processed", {})
-                    memory_data = ai_response.get("memory", []) if isinstance(ai_response, dict) else []
-                    
-                    if memory_data:
-                        memory_extracted += 1
-                    else:
-                        # Сохраняем для анализа
-                        missed_memory.append({
-                            "file": str(log_file),
-                            "user_message": user_message,
-                            "ai_response": log_data.get("ai_response", {}).get("processed", {}).get("text", ""),
-                            "categories": list(categories)
-                        })
-            except Exception as e:
-                logger.error(f"Ошибка при анализе файла {log_file}: {e}")
-    
-    # Формируем отчет
-    report = {
-        "total_conversations": total_conversations,
-        "memory_opportunities": memory_opportunities,
-        "memory_extracted": memory_extracted,
-        "missed_memory_count": len(missed_memory),
-        "extraction_rate": f"{(memory_extracted / memory_opportunities * 100) if memory_opportunities > 0 else 0:.2f}%",
-        "missed_memory_examples": missed_memory[:10]  # Показываем только первые 10 примеров
-    }
-    
-    return report
+    return run_analysis(MemoryExtractionAnalyzer(), logs_dir, checkpoint=checkpoint, workers=workers)
 
 def main():
     """Основная функция запуска анализа"""
+    parser = argparse.ArgumentParser(description="Analyze memory extraction in conversation logs")
+    parser.add_argument("--directory", type=str, default=str(LOGS_DIR), help="Directory with conversation logs")
+    parser.add_argument("--checkpoint", type=str, default=str(CHECKPOINT_FILE), help="Checkpoint of previous runs")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and analyze all logs")
+    parser.add_argument("--workers", type=int, default=None, help="Analysis processes (default: CPU count)")
+    args = parser.parse_args()
+    
     logger.info("Запуск анализа журналов разговоров...")
     
-    report = analyze_conversation_logs()
+    checkpoint = Path(args.checkpoint)
+    if args.full and checkpoint.exists():
+        checkpoint.unlink()
+    report = analyze_conversation_logs(Path(args.directory), checkpoint=checkpoint, workers=args.workers)
+    if "error" in report:
+        return 1
     
     logger.info("Анализ завершен")
+    logger.info(f"Новых файлов журналов: {report.get('files_processed')} (всего учтено: {report.get('files_total')})")
     logger.info(f"Всего проанализировано разговоров: {report.get('total_conversations')}")
     logger.info(f"Обнаружено возможностей для извлечения памяти: {report.get('memory_opportunities')}")
     logger.info(f"Успешно извлечено памяти: {report.get('memory_extracted')}")
@@ -0,0 +1,154 @@
+"""
+Утилита для анализа прохождения сообщений через журналы разговоров
+
+Использование:
+    python -m tools.analyze_message_flow [--directory=logs/conversations] [--workers=N] [--full]
+
+Эта утилита:
+1. Сканирует журналы разговоров и запросов к API всех персонажей
+   (движок tools.log_analytics: пул процессов, повторный запуск читает
+   только новые журналы)
+2. Считает роли сообщений в истории разговоров и в запросах к API
+3. Находит разговоры без сообщения пользователя или без ответа AI и запросы,
+   в которые не попало сообщение пользователя
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from tools.analyze_api_requests import request_messages
+from tools.log_analytics import AnalysisState, LogAnalyzer, run_analysis
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+LOGS_DIR = Path("logs/conversations")
+CHECKPOINT_FILE = Path("message_flow_analysis.checkpoint.json")
+
+class MessageFlowAnalyzer(LogAnalyzer):
+    """Роли сообщений и пропущенные сообщения пользователя по журналам персонажей"""
+
+    name = "message_flow"
+    # <character_id>/*.json - разговоры, <character_id>/api/*.json - запросы к API
+    patterns = ("*/*.json", "*/*.jsonl", "*/api/*.json", "*/api/*.jsonl")
+
+    def analyze(self, record: Dict[str, Any], path: str, state: AnalysisState) -> None:
+        character_id = str(record.get("character_id") or Path(path).parts[-2])
+        if "request" in record:
+            self._analyze_request(record, path, character_id, state)
+        else:
+            self._analyze_conversation(record, path, character_id, state)
+
+    def _analyze_conversation(self, record: Dict[str, Any], path: str, character_id: str,
+                              state: AnalysisState) -> None:
+        state.count("conversations")
+        state.count(f"character:{character_id}")
+        for msg in record.get("conversation_history") or []:
+            if isinstance(msg, dict):
+                state.count(f"history_role:{msg.get('role', 'unknown')}")
+
+        if not (record.get("user_message") or "").strip():
+            state.count("missing_user_message")
+            state.example("missing_user_message", {"file": path, "datetime": record.get("datetime")})
+
+        processed = (record.get("ai_response") or {}).get("processed")
+        ai_text = processed.get("text") if isinstance(processed, dict) else processed
+        if not ai_text:
+            state.count("empty_ai_response")
+            state.example("empty_ai_response", {"file": path, "user_message": record.get("user_message")})
+
+    def _analyze_request(self, record: Dict[str, Any], path: str, character_id: str,
+                         state: AnalysisState) -> None:
+        messages = request_messages(record)
+        state.count("requests")
+        for msg in messages:
+            state.count(f"request_role:{msg.get('role', 'unknown')}")
+
+        # Сообщение пользователя должно быть последним в запросе
+        if not messages or messages[-1].get("role") != "user":
+            state.count("request_without_user_message")
+            state.example("request_without_user_message", {
+                "file": path,
+                "character_id": character_id,
+                "roles": [msg.get("role", "unknown") for msg in messages[-5:]],
+            })
+
+    def report(self, state: AnalysisState) -> Dict[str, Any]:
+        counts = state.counts
+        return {
+            "conversations": counts["conversations"],
+            "requests": counts["requests"],
+            "conversations_by_character": state.prefixed("character:"),
+            "history_role_counts": state.prefixed("history_role:"),
+            "request_role_counts": state.prefixed("request_role:"),
+            "missing_user_message_count": counts["missing_user_message"],
+            "empty_ai_response_count": counts["empty_ai_response"],
+            "request_without_user_message_count": counts["request_without_user_message"],
+            "unreadable_files": counts["errors"],
+            "examples": state.examples,
+        }
+
+def analyze_message_flow(
+    logs_dir: Path = LOGS_DIR,
+    checkpoint: Optional[Path] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Анализирует журналы разговоров и запросов всех персонажей
+
+    Args:
+        logs_dir: Директория с журналами разговоров
+        checkpoint: Контрольная точка предыдущих запусков (без нее анализируется все)
+        workers: Количество процессов анализа
+
+    Returns:
+        Словарь со статистикой и примерами проблем
+    """
+    if not logs_dir.exists():
+        logger.error(f"Директория с журналами не найдена: {logs_dir}")
+        return {"error": "Logs directory not found"}
+
+    return run_analysis(MessageFlowAnalyzer(), logs_dir, checkpoint=checkpoint, workers=workers)
+
+def main():
+    """Основная функция запуска анализа"""
+    parser = argparse.ArgumentParser(description="Analyze message flow in conversation and request logs")
+    parser.add_argument("--directory", type=str, default=str(LOGS_DIR), help="Directory with conversation logs")
+    parser.add_argument("--checkpoint", type=str, default=str(CHECKPOINT_FILE), help="Checkpoint of previous runs")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and analyze all logs")
+    parser.add_argument("--workers", type=int, default=None, help="Analysis processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logger.info("Запуск анализа прохождения сообщений...")
+
+    checkpoint = Path(args.checkpoint)
+    if args.full and checkpoint.exists():
+        checkpoint.unlink()
+    report = analyze_message_flow(Path(args.directory), checkpoint=checkpoint, workers=args.workers)
+    if "error" in report:
+        return 1
+
+    logger.info(f"Новых файлов журналов: {report['files_processed']} (всего учтено: {report['files_total']})")
+    logger.info(f"Разговоров: {report['conversations']}, запросов к API: {report['requests']}")
+    logger.info(f"Роли в истории разговоров: {report['history_role_counts']}")
+    logger.info(f"Роли в запросах к API: {report['request_role_counts']}")
+    logger.info(f"Разговоров без сообщения пользователя: {report['missing_user_message_count']}")
+    logger.info(f"Разговоров без ответа AI: {report['empty_ai_response_count']}")
+    logger.info(f"Запросов без сообщения пользователя в конце: {report['request_without_user_message_count']}")
+
+    # Сохраняем отчет в файл
+    output_file = Path("message_flow_report.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Отчет сохранен в файл: {output_file}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
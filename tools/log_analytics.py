@@ -0,0 +1,280 @@
+"""
+Общий движок анализа журналов разговоров и запросов к API
+
+Утилиты analyze_conversations, analyze_api_requests и analyze_message_flow
+описывают только, что считать в одной записи журнала (анализатор), а обход
+журналов выполняет движок:
+
+1. Находит файлы журналов по шаблонам анализатора: JSON-файлы (одна запись
+   на файл) и JSONL-сегменты (одна запись на строку), читая записи по одной.
+2. Делит файлы на пачки и обрабатывает их в пуле процессов; частичные
+   агрегаты пачек складываются в итоговый.
+3. Сохраняет контрольную точку: какие файлы уже учтены (для JSONL - до
+   какого смещения) и накопленный агрегат. Повторный запуск читает только
+   новые файлы и дописанные строки сегментов. Счетчики RUN_COUNTS (например,
+   нечитаемые файлы) относятся только к текущему запуску и не сохраняются.
+
+Файлы журналов пишутся один раз, поэтому уже учтенный JSON-файл повторно не
+читается; для полного пересчета контрольную точку нужно удалить (--full).
+"""
+
+import fnmatch
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+# Файлов в одной задаче пула: меньше - больше накладных расходов, больше - хуже балансировка
+DEFAULT_CHUNK_SIZE = 200
+# Счетчики одного запуска: нечитаемые файлы не отмечаются и читаются снова,
+# поэтому в накопленном агрегате они считались бы повторно
+RUN_COUNTS = ("errors",)
+
+class AnalysisState:
+    """Агрегат анализа: счетчики и ограниченные списки примеров"""
+
+    def __init__(self, max_examples: int = 10):
+        self.max_examples = max_examples
+        self.counts: Counter = Counter()
+        self.examples: Dict[str, List[Any]] = {}
+
+    def count(self, key: str, amount: int = 1) -> None:
+        self.counts[key] += amount
+
+    def example(self, kind: str, item: Any) -> None:
+        items = self.examples.setdefault(kind, [])
+        if len(items) < self.max_examples:
+            items.append(item)
+
+    def merge(self, other: "AnalysisState") -> None:
+        self.counts.update(other.counts)
+        for kind, items in other.examples.items():
+            for item in items:
+                self.example(kind, item)
+
+    def prefixed(self, prefix: str) -> Dict[str, int]:
+        """Счетчики с ключами вида "<prefix><name>", по имени"""
+        return {
+            key[len(prefix):]: value
+            for key, value in sorted(self.counts.items())
+            if key.startswith(prefix)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": dict(self.counts), "examples": self.examples}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_examples: int = 10) -> "AnalysisState":
+        state = cls(max_examples)
+        state.counts.update(data.get("counts", {}))
+        state.examples = {kind: list(items) for kind, items in data.get("examples", {}).items()}
+        return state
+
+class LogAnalyzer:
+    """
+    Базовый анализатор: какие файлы читать и что считать в одной записи.
+
+    Экземпляры передаются в процессы пула, поэтому анализаторы должны быть
+    определены на уровне модуля и не хранить ресурсов (соединений, файлов).
+    """
+
+    # Имя анализатора в контрольной точке
+    name = "base"
+    # Шаблоны путей относительно корня журналов; "*" не переходит через "/"
+    patterns: Tuple[str, ...] = ("*.json", "*.jsonl")
+    max_examples = 10
+
+    def analyze(self, record: Dict[str, Any], path: str, state: AnalysisState) -> None:
+        """Учесть одну запись журнала из файла path"""
+        raise NotImplementedError
+
+    def report(self, state: AnalysisState) -> Dict[str, Any]:
+        """Итоговый отчет по агрегату"""
+        return state.to_dict()
+
+    def matches(self, relative_path: str) -> bool:
+        parts = relative_path.split("/")
+        for pattern in self.patterns:
+            pattern_parts = pattern.split("/")
+            if len(pattern_parts) == len(parts) and all(
+                fnmatch.fnmatchcase(part, pattern_part) for part, pattern_part in zip(parts, pattern_parts)
+            ):
+                return True
+        return False
+
+def iter_records(path: Path, offset: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """
+    Записи журнала по одной.
+
+    Args:
+        path: JSON-файл (одна запись) или JSONL-сегмент
+        offset: Смещение в сегменте, с которого продолжить чтение
+
+    Yields:
+        (запись, смещение после нее); незавершенная последняя строка сегмента
+        пропускается и будет прочитана при следующем запуске
+    """
+    if path.suffix != ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+            end = f.tell()
+        yield record, end
+        return
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                logger.error(f"Invalid JSON line in {path} before offset {offset}: {e}")
+                continue
+            yield record, offset
+
+def process_files(analyzer: LogAnalyzer, tasks: Sequence[Tuple[str, int]]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Обработка пачки файлов (выполняется в процессе пула).
+
+    Args:
+        tasks: (путь, смещение начала) для каждого файла
+
+    Returns:
+        Частичный агрегат и смещения, до которых прочитан каждый файл; файл с
+        ошибкой чтения не отмечается и будет прочитан при следующем запуске
+    """
+    state = AnalysisState(analyzer.max_examples)
+    offsets = {}
+    for path, offset in tasks:
+        # Записи файла копятся отдельно и попадают в агрегат, только если файл прочитан целиком
+        file_state = AnalysisState(analyzer.max_examples)
+        end = offset
+        try:
+            for record, end in iter_records(Path(path), offset):
+                if isinstance(record, dict):
+                    analyzer.analyze(record, path, file_state)
+        except Exception as e:
+            state.count("errors")
+            logger.error(f"Error analyzing file {path}: {e}")
+            continue
+        state.merge(file_state)
+        state.count("files")
+        offsets[path] = end
+    return state.to_dict(), offsets
+
+def run_analysis(
+    analyzer: LogAnalyzer,
+    root: Path,
+    checkpoint: Optional[Path] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    Проанализировать журналы в директории root.
+
+    Args:
+        analyzer: Что считать
+        root: Корень журналов
+        checkpoint: Файл контрольной точки; без него анализируется все
+        workers: Процессов в пуле (по умолчанию по числу CPU; 1 - без пула)
+        chunk_size: Файлов в одной задаче пула
+
+    Returns:
+        Отчет анализатора с полями files_total (учтено всего) и
+        files_processed (прочитано в этом запуске)
+    """
+    root = Path(root)
+    state, offsets = _load_checkpoint(analyzer, checkpoint)
+
+    tasks = []
+    for relative, size in _discover(analyzer, root):
+        start = offsets.get(relative)
+        if start is None:
+            tasks.append((str(root / relative), 0))
+        elif relative.endswith(".jsonl") and size != start:
+            # Сегмент дописан (или начат заново после ротации)
+            tasks.append((str(root / relative), start if size > start else 0))
+
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = pool.map(process_files, [analyzer] * len(chunks), chunks)
+            _merge_results(analyzer, root, state, offsets, results)
+    else:
+        _merge_results(analyzer, root, state, offsets, (process_files(analyzer, chunk) for chunk in chunks))
+
+    if checkpoint is not None:
+        _save_checkpoint(analyzer, checkpoint, state, offsets)
+
+    report = analyzer.report(state)
+    report["files_total"] = len(offsets)
+    report["files_processed"] = len(tasks)
+    logger.info(f"{analyzer.name}: {len(tasks)} new files analyzed, {len(offsets)} in total")
+    return report
+
+def _discover(analyzer: LogAnalyzer, root: Path) -> Iterator[Tuple[str, int]]:
+    # os.scandir отдает тип записи без отдельного stat на каждый файл
+    if not root.is_dir():
+        return
+    # Глубже самого длинного шаблона файлов нет
+    max_depth = max(len(pattern.split("/")) for pattern in analyzer.patterns)
+    stack = [(str(root), "", 1)]
+    while stack:
+        directory, prefix, depth = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                relative = f"{prefix}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    if depth < max_depth:
+                        stack.append((entry.path, f"{relative}/", depth + 1))
+                elif entry.is_file() and analyzer.matches(relative):
+                    yield relative, entry.stat().st_size
+
+def _merge_results(analyzer: LogAnalyzer, root: Path, state: AnalysisState, offsets: Dict[str, int],
+                   results) -> None:
+    # Контрольная точка хранит пути относительно корня журналов
+    for partial, chunk_offsets in results:
+        state.merge(AnalysisState.from_dict(partial, analyzer.max_examples))
+        offsets.update({Path(path).relative_to(root).as_posix(): end for path, end in chunk_offsets.items()})
+
+def _load_checkpoint(analyzer: LogAnalyzer, checkpoint: Optional[Path]) -> Tuple[AnalysisState, Dict[str, int]]:
+    if checkpoint is None or not Path(checkpoint).exists():
+        return AnalysisState(analyzer.max_examples), {}
+    try:
+        with open(checkpoint, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CHECKPOINT_VERSION or data.get("analyzer") != analyzer.name:
+            raise ValueError("checkpoint of another analyzer or version")
+        state = AnalysisState.from_dict(data["state"], analyzer.max_examples)
+        for key in RUN_COUNTS:
+            state.counts.pop(key, None)
+        return state, dict(data["files"])
+    except Exception as e:
+        logger.warning(f"Ignoring checkpoint {checkpoint}, analyzing everything: {e}")
+        return AnalysisState(analyzer.max_examples), {}
+
+def _save_checkpoint(analyzer: LogAnalyzer, checkpoint: Path, state: AnalysisState, offsets: Dict[str, int]) -> None:
+    checkpoint = Path(checkpoint)
+    temporary = checkpoint.with_name(checkpoint.name + ".tmp")
+    saved = state.to_dict()
+    saved["counts"] = {key: value for key, value in saved["counts"].items() if key not in RUN_COUNTS}
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": CHECKPOINT_VERSION,
+            "analyzer": analyzer.name,
+            "files": offsets,
+            "state": saved,
+        }, f, ensure_ascii=False)
+    # Прерванный запуск не портит предыдущую контрольную точку
+    os.replace(temporary, checkpoint)